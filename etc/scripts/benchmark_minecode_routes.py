@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# purldb is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/nexB/purldb for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+"""
+Benchmark the resolution of URIs with the rules of the minecode visit, map and
+priority routers, compared to trying every rule.
+
+Run in the configured purldb virtualenv with:
+    python etc/scripts/benchmark_minecode_routes.py --count 10000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+
+def get_uris(router, count):
+    """
+    Return a list of `count` URIs made from the literal prefixes of the
+    `router` patterns, such that most of them share a prefix with a rule.
+    """
+    from minecode import route
+
+    randomizer = random.Random(42)
+    prefixes = [route.get_literal_prefix(pattern) for pattern in router.keys()]
+    return [
+        f'{randomizer.choice(prefixes)}some/path/{i}/file-{i}.tar.gz'
+        for i in range(count)
+    ]
+
+
+def benchmark_resolve(count):
+    """
+    Print the time spent matching `count` URIs against the rules of each
+    router, with and without a RuleIndex. Return False if the indexed matches
+    differ from the matches of every rule.
+    """
+    from minecode import map_router
+    from minecode import priority_router
+    from minecode import route
+    from minecode import visit_router
+    # importing the mappers and visitors modules triggers routes registration
+    from minecode import mappers  # NOQA
+    from minecode import visitors  # NOQA
+
+    for name, router in [
+        ('visit_router', visit_router),
+        ('map_router', map_router),
+        ('priority_router', priority_router),
+    ]:
+        uris = get_uris(router, count)
+        rules = list(router.route_map.values())
+
+        start = time.perf_counter()
+        expected = [[rule for rule in rules if rule.match(uri)] for uri in uris]
+        linear = time.perf_counter() - start
+
+        index = route.RuleIndex(rules)
+        start = time.perf_counter()
+        results = [index.get_matches(uri) for uri in uris]
+        indexed = time.perf_counter() - start
+
+        if expected != results:
+            print(f'{name}: indexed rules matches differ from all rules matches')
+            return False
+
+        print(
+            f'{name}: {len(rules)} rules, {count} URIs: '
+            f'all rules: {linear:.3f}s, indexed rules: {indexed:.3f}s'
+        )
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--count',
+        type=int,
+        default=10_000,
+        help='Number of URIs resolved with each router.',
+    )
+    args = parser.parse_args()
+
+    # make the purldb apps importable when run from any directory
+    root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    sys.path.insert(0, root_dir)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'purldb_project.settings')
+    import django
+    django.setup()
+
+    if not benchmark_resolve(args.count):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,11 +6,14 @@
 # See https://github.com/nexB/purldb for support or download.
 # See https://aboutcode.org for more information about nexB OSS projects.
 #
+from collections.abc import Mapping
+
 from django.db.models import Q
 from django.forms import widgets
 from django.forms.fields import MultipleChoiceField
 from django_filters.filters import MultipleChoiceFilter
 from django_filters.rest_framework import FilterSet
+from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.serializers import CharField
@@ -24,7 +27,6 @@ from rest_framework.viewsets import ReadOnlyModelViewSet
 from matchcode_toolkit.fingerprinting import create_halohash_chunks
 from matchcode_toolkit.fingerprinting import hexstring_to_binarray
 from matchcode_toolkit.fingerprinting import split_fingerprint
-from matchcode_toolkit.halohash import byte_hamming_distance
 from matchcode.models import ExactFileIndex
 from matchcode.models import ExactPackageArchiveIndex
 from matchcode.models import ApproximateDirectoryContentIndex
@@ -66,6 +68,7 @@ class BaseDirectoryIndexSerializer(ModelSerializer):
         read_only=True
     )
 
+
 class ApproximateDirectoryContentIndexSerializer(BaseDirectoryIndexSerializer):
     class Meta:
         model = ApproximateDirectoryContentIndex
@@ -261,28 +264,48 @@ class ExactPackageArchiveIndexViewSet(BaseFileIndexViewSet):
 class BaseDirectoryIndexViewSet(ReadOnlyModelViewSet):
     lookup_field = 'fingerprint'
 
-    @action(detail=False)
+    @action(detail=False, methods=['get', 'post'])
     def match(self, request):
-        fingerprints = request.query_params.getlist('fingerprint')
+        """
+        Return the approximate matches of the `fingerprint` values provided
+        either as query parameters with a GET request, or as a list of
+        `fingerprints` in the body of a POST request for large batches.
+        """
+        if request.method == 'POST':
+            if not isinstance(request.data, Mapping):
+                message = {
+                    'status': 'The request body must be an object with a list of `fingerprints`'
+                }
+                return Response(message, status=status.HTTP_400_BAD_REQUEST)
+            fingerprints = request.data.get('fingerprints') or []
+            if isinstance(fingerprints, str):
+                fingerprints = [fingerprints]
+            if not (
+                isinstance(fingerprints, list)
+                and all(isinstance(fingerprint, str) for fingerprint in fingerprints)
+            ):
+                message = {
+                    'status': '`fingerprints` must be a list of fingerprint strings'
+                }
+                return Response(message, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            fingerprints = request.query_params.getlist('fingerprint')
         if not fingerprints:
             return Response()
 
         model_class = self.get_serializer().Meta.model
         results = []
-        unique_fingerprints = set(fingerprints)
-        for fingerprint in unique_fingerprints:
-            matches = model_class.match(fingerprint)
+        unique_fingerprints = list(dict.fromkeys(fingerprints))
+        matches_by_fingerprint = model_class.match_many(
+            (fingerprint, None) for fingerprint in unique_fingerprints
+        )
+        for fingerprint, matches in zip(unique_fingerprints, matches_by_fingerprint):
             for match in matches:
-                _, bah128 = split_fingerprint(fingerprint)
-                # Get fingerprint from the match
-                fp = match.fingerprint()
-                _, match_bah128 = split_fingerprint(fp)
-                hd = byte_hamming_distance(bah128, match_bah128)
-                similarity_score = (128 - hd) / 128
+                similarity_score = (128 - match.hamming_distance) / 128
                 results.append(
                     {
                         'fingerprint': fingerprint,
-                        'matched_fingerprint': fp,
+                        'matched_fingerprint': match.fingerprint(),
                         'package': match.package,
                         'similarity_score': similarity_score,
                     }
@@ -0,0 +1,486 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# purldb is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/nexB/purldb for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+"""
+An optional in-memory index of the 128-bit halo fingerprints stored in the
+ApproximateMatchingHashMixin models (ApproximateDirectoryContentIndex,
+ApproximateDirectoryStructureIndex and ApproximateResourceContentIndex).
+
+A fingerprint is kept as two packed unsigned 64-bit integers in contiguous
+arrays, together with its `indexed_elements_count` and the primary key of its
+database row. Rows are sorted by the value of each of their four 32-bit
+chunks, the same way the `chunk1` to `chunk4` database columns are used, so a
+lookup only has to compute Hamming distances on the few rows that share at
+least one chunk with the fingerprint we are looking up.
+
+The index is "resident": it is loaded once per process from the database,
+when the worker process starts, and then used by
+ApproximateMatchingHashMixin.match() instead of querying the database. It is
+refreshed with the rows added to the database every
+`MATCHCODE_RESIDENT_INDEX_REFRESH_INTERVAL` seconds. When it is not enabled
+with the `MATCHCODE_RESIDENT_INDEX` setting, the regular database queries are
+used.
+
+The candidates found in the index are fetched from the database and checked
+again: rows deleted or updated since they were loaded are marked as deleted in
+the index, and the index is loaded again once too many rows are deleted.
+"""
+
+from array import array
+from bisect import bisect_left
+from bisect import bisect_right
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+TRACE = False
+
+logger = logging.getLogger(__name__)
+
+if TRACE:
+    logger.setLevel(logging.DEBUG)
+
+CHUNK_MASK = 0xFFFFFFFF
+
+try:
+    # Python 3.10 and up
+    popcount = int.bit_count
+except AttributeError:
+    def popcount(n):
+        return bin(n).count('1')
+
+
+def split_bah128(bah128):
+    """
+    Return a tuple of two 64-bit integers (high, low) from a `bah128` 128-bit
+    fingerprint hex string.
+    """
+    value = int(bah128, 16)
+    return value >> 64, value & 0xFFFFFFFFFFFFFFFF
+
+
+def get_halves(chunk1, chunk2, chunk3, chunk4):
+    """
+    Return a tuple of two 64-bit integers (high, low) from the four 4-bytes
+    binary chunks of a 128-bit fingerprint, as stored in the database.
+    """
+    high = int.from_bytes(bytes(chunk1) + bytes(chunk2), 'big')
+    low = int.from_bytes(bytes(chunk3) + bytes(chunk4), 'big')
+    return high, low
+
+
+def hamming_distance(high1, low1, high2, low2):
+    """
+    Return the Hamming distance between two 128-bit fingerprints, each given as
+    its `high` and `low` 64-bit halves.
+    """
+    return popcount(high1 ^ high2) + popcount(low1 ^ low2)
+
+
+def get_chunks(high, low):
+    """
+    Return a tuple of the four 32-bit integer chunks of a 128-bit fingerprint
+    given as its `high` and `low` 64-bit halves.
+    """
+    return high >> 32, high & CHUNK_MASK, low >> 32, low & CHUNK_MASK
+
+
+def to_signed(value, bits):
+    """
+    Return the unsigned integer `value` of `bits` bits as a signed integer of
+    the same bits, as stored in a database integer column.
+    """
+    if value >> (bits - 1):
+        return value - (1 << bits)
+    return value
+
+
+def to_unsigned(value, bits):
+    """
+    Return the signed integer `value` of `bits` bits, as stored in a database
+    integer column, as an unsigned integer of the same bits.
+    """
+    return value & ((1 << bits) - 1)
+
+
+def get_fingerprint_columns(high, low):
+    """
+    Return a mapping of {field name: value} for the compact fingerprint
+    columns of an ApproximateMatchingHashMixin model for a 128-bit fingerprint
+    given as its `high` and `low` 64-bit halves.
+
+    The fingerprint is stored as two signed 64-bit integers and each of its
+    four 32-bit chunks is stored as a signed 32-bit integer "band".
+    """
+    columns = {
+        'fingerprint_high': to_signed(high, 64),
+        'fingerprint_low': to_signed(low, 64),
+    }
+    for position, chunk in enumerate(get_chunks(high, low), 1):
+        columns[f'band{position}'] = to_signed(chunk, 32)
+    return columns
+
+
+class ResidentFingerprintIndex(object):
+    """
+    An in-memory index of the fingerprints of an ApproximateMatchingHashMixin
+    `model_class`.
+
+    Each of the four chunk positions is indexed with one flat sorted array of
+    (chunk, indexed_elements_count) keys packed in a 64-bit integer, and a
+    parallel array of the row offsets of these keys. Rows added since these
+    arrays were last built are kept in a small "delta" that is scanned
+    linearly until the arrays are built again. Rows deleted from the database
+    are kept as "tombstones": the primary keys of the rows to skip.
+    """
+
+    # build the sorted arrays again when the delta grows beyond this size
+    max_delta_size = 50000
+    # load the index again when it has more deleted rows than this
+    max_deleted_size = 50000
+
+    def __init__(self, model_class):
+        self.model_class = model_class
+        # the columns of the index: one entry per fingerprint row
+        self.pks = array('q')
+        self.indexed_elements_counts = array('q')
+        self.highs = array('Q')
+        self.lows = array('Q')
+        # one array of sorted packed (chunk, count) keys and one array of row
+        # offsets per chunk position, for the rows before `sorted_count`
+        self.keys_by_position = [array('Q') for _ in range(4)]
+        self.offsets_by_position = [array('I') for _ in range(4)]
+        self.sorted_count = 0
+        # the largest primary key loaded and the primary keys loaded recently
+        # that are larger than `max_pk - refresh_lookback`
+        self.max_pk = 0
+        self.recent_pks = set()
+        # the primary keys of the rows deleted or updated in the database
+        self.deleted_pks = set()
+        self.loaded_at = time.monotonic()
+        # True while this index is being refreshed by a thread
+        self.refreshing = False
+
+    def __len__(self):
+        return len(self.pks)
+
+    def __repr__(self):
+        return f'ResidentFingerprintIndex({self.model_class.__name__}, rows={len(self)})'
+
+    def add(self, pk, indexed_elements_count, high, low):
+        """
+        Add a fingerprint row to the delta of this index.
+        """
+        self.pks.append(pk)
+        self.indexed_elements_counts.append(indexed_elements_count)
+        self.highs.append(high)
+        self.lows.append(low)
+        if pk > self.max_pk:
+            self.max_pk = pk
+
+    def build(self):
+        """
+        Build the sorted key and offset arrays of each chunk position for all
+        the rows of this index, emptying the delta.
+        """
+        counts = self.indexed_elements_counts
+        highs = self.highs
+        lows = self.lows
+        row_count = len(self.pks)
+
+        for position in range(4):
+            # sort 96-bit (chunk, count, offset) integers, then split them
+            entries = sorted(
+                (((get_chunks(highs[offset], lows[offset])[position] << 32)
+                  | counts[offset]) << 32) | offset
+                for offset in range(row_count)
+            )
+            self.keys_by_position[position] = array('Q', (entry >> 32 for entry in entries))
+            self.offsets_by_position[position] = array('I', (entry & CHUNK_MASK for entry in entries))
+            del entries
+
+        self.sorted_count = row_count
+
+    def load_rows(self, queryset, chunk_size=10000):
+        """
+        Add the fingerprint rows of the `queryset` to this index, skipping the
+        rows already loaded. Return the number of rows added.
+        """
+        return self.add_rows(self.fetch_rows(queryset, chunk_size=chunk_size))
+
+    def fetch_rows(self, queryset, chunk_size=10000):
+        """
+        Return a list of (pk, indexed_elements_count, high, low) tuples for the
+        fingerprint rows of the `queryset` that are not already loaded, sorted
+        by primary key.
+        """
+        rows = (
+            queryset
+            .order_by('pk')
+            .values_list(
+                'pk',
+                'indexed_elements_count',
+                'fingerprint_high',
+                'fingerprint_low',
+                'chunk1',
+                'chunk2',
+                'chunk3',
+                'chunk4',
+            )
+            .iterator(chunk_size=chunk_size)
+        )
+        recent_pks = self.recent_pks
+        fetched = []
+        for pk, indexed_elements_count, high, low, *chunks in rows:
+            if pk in recent_pks:
+                continue
+            if high is None:
+                # rows not yet backfilled with the compact columns
+                high, low = get_halves(*chunks)
+            else:
+                high, low = to_unsigned(high, 64), to_unsigned(low, 64)
+            fetched.append((pk, indexed_elements_count, high, low))
+        return fetched
+
+    def add_rows(self, rows):
+        """
+        Add the list of (pk, indexed_elements_count, high, low) `rows` sorted
+        by primary key to this index. Return the number of rows added.
+        """
+        add = self.add
+        added = 0
+        for pk, indexed_elements_count, high, low in rows:
+            add(pk, indexed_elements_count, high, low)
+            added += 1
+
+        self._update_recent_pks(added)
+        return added
+
+    def discard(self, pks):
+        """
+        Mark the rows of the iterable of `pks` primary keys as deleted, such
+        that they are no longer returned by `search`.
+        """
+        self.deleted_pks.update(pks)
+
+    def needs_reload(self):
+        """
+        Return True if this index has so many deleted rows that it should be
+        loaded again from the database.
+        """
+        return len(self.deleted_pks) > self.max_deleted_size
+
+    def _update_recent_pks(self, added):
+        """
+        Keep track of the loaded primary keys that are within the refresh
+        lookback window of the largest loaded primary key, given the number of
+        rows `added` by the last load, which are sorted by primary key.
+        """
+        min_pk = self.max_pk - get_refresh_lookback()
+        recent_pks = {pk for pk in self.recent_pks if pk > min_pk}
+        pks = self.pks
+        for offset in range(len(pks) - 1, len(pks) - 1 - added, -1):
+            pk = pks[offset]
+            if pk <= min_pk:
+                break
+            recent_pks.add(pk)
+        self.recent_pks = recent_pks
+
+    @classmethod
+    def from_db(cls, model_class, chunk_size=10000):
+        """
+        Return a new ResidentFingerprintIndex loaded with all the fingerprints
+        stored for `model_class`.
+        """
+        index = cls(model_class)
+        index.load_rows(model_class.objects.all(), chunk_size=chunk_size)
+        index.build()
+        logger.info(f'Loaded {index!r}')
+        return index
+
+    def refresh(self, chunk_size=10000):
+        """
+        Add the fingerprint rows stored for the `model_class` of this index
+        since it was loaded or last refreshed. Return the number of rows added.
+
+        Rows are fetched by primary key from a lookback window below the
+        largest loaded primary key, such that rows committed late with a
+        smaller primary key than an already loaded row are not missed.
+
+        This index can be searched while it is refreshed: the rows are fetched
+        before they are added to the delta.
+        """
+        min_pk = self.max_pk - get_refresh_lookback()
+        queryset = self.model_class.objects.filter(pk__gt=min_pk)
+        added = self.add_rows(self.fetch_rows(queryset, chunk_size=chunk_size))
+        if len(self) - self.sorted_count > self.max_delta_size:
+            self.build()
+        self.loaded_at = time.monotonic()
+        if added:
+            logger.info(f'Refreshed {self!r} with {added} new rows')
+        return added
+
+    def search(self, bah128, count_range, hamming_distance_threshold=8):
+        """
+        Return a list of (hamming distance, pk) tuples for the fingerprint rows
+        that share at least one chunk with the `bah128` fingerprint hex string,
+        that have an `indexed_elements_count` within the (low, high)
+        `count_range` tuple and that are at a Hamming distance lower than
+        `hamming_distance_threshold` from `bah128`.
+        """
+        high, low = split_bah128(bah128)
+        low_count, high_count = count_range
+        low_count = max(low_count, 0)
+        high_count = min(high_count, CHUNK_MASK)
+        chunks = get_chunks(high, low)
+
+        seen = set()
+        for keys, offsets, chunk in zip(self.keys_by_position, self.offsets_by_position, chunks):
+            start = bisect_left(keys, (chunk << 32) | low_count)
+            end = bisect_right(keys, (chunk << 32) | high_count)
+            if start < end:
+                seen.update(offsets[start:end])
+
+        pks = self.pks
+        counts = self.indexed_elements_counts
+        highs = self.highs
+        lows = self.lows
+
+        # scan the delta of rows added since the sorted arrays were built
+        for offset in range(self.sorted_count, len(pks)):
+            if (
+                low_count <= counts[offset] <= high_count
+                and any(c1 == c2 for c1, c2 in zip(chunks, get_chunks(highs[offset], lows[offset])))
+            ):
+                seen.add(offset)
+
+        deleted_pks = self.deleted_pks
+        results = []
+        for offset in seen:
+            distance = (
+                popcount(high ^ highs[offset])
+                + popcount(low ^ lows[offset])
+            )
+            if distance < hamming_distance_threshold:
+                pk = pks[offset]
+                if pk not in deleted_pks:
+                    results.append((distance, pk))
+
+        if TRACE:
+            logger.debug(f'search: {bah128} candidates: {len(seen)} matches: {len(results)}')
+
+        return results
+
+
+def get_refresh_interval():
+    """
+    Return the number of seconds after which a resident index is refreshed
+    with the rows added to the database.
+    """
+    return getattr(settings, 'MATCHCODE_RESIDENT_INDEX_REFRESH_INTERVAL', 60)
+
+
+def get_refresh_lookback():
+    """
+    Return the number of primary keys below the largest loaded primary key
+    that are fetched again when a resident index is refreshed.
+    """
+    return getattr(settings, 'MATCHCODE_RESIDENT_INDEX_REFRESH_LOOKBACK', 10000)
+
+
+def is_enabled():
+    """
+    Return True if resident indexes are enabled with the
+    `MATCHCODE_RESIDENT_INDEX` setting.
+    """
+    return getattr(settings, 'MATCHCODE_RESIDENT_INDEX', False)
+
+
+# Process-wide loaded indexes, keyed by model class
+_resident_indexes = {}
+_resident_indexes_lock = threading.Lock()
+
+
+def load_resident_index(model_class):
+    """
+    Load (or reload) and return the resident index for `model_class`.
+    """
+    index = ResidentFingerprintIndex.from_db(model_class)
+    _resident_indexes[model_class] = index
+    return index
+
+
+def load_resident_indexes():
+    """
+    Load the resident indexes of all the ApproximateMatchingHashMixin models if
+    resident indexes are enabled. This is meant to be called once when a worker
+    process starts, rather than on its first match request.
+    """
+    if not is_enabled():
+        return
+
+    from matchcode.models import ApproximateDirectoryContentIndex
+    from matchcode.models import ApproximateDirectoryStructureIndex
+    from matchcode.models import ApproximateResourceContentIndex
+
+    with _resident_indexes_lock:
+        for model_class in (
+            ApproximateDirectoryContentIndex,
+            ApproximateDirectoryStructureIndex,
+            ApproximateResourceContentIndex,
+        ):
+            if model_class not in _resident_indexes:
+                load_resident_index(model_class)
+
+
+def get_resident_index(model_class):
+    """
+    Return the resident index for `model_class` or None if resident indexes are
+    not enabled with the `MATCHCODE_RESIDENT_INDEX` setting. The index is
+    loaded if it was not loaded when the process started.
+
+    The index is refreshed with the new database rows once it is older than
+    the refresh interval, or loaded again if it has too many deleted rows. The
+    database is read outside of the lock by the calling thread, while the
+    other threads keep using the current index.
+    """
+    if not is_enabled():
+        return
+
+    with _resident_indexes_lock:
+        index = _resident_indexes.get(model_class)
+        if index is None:
+            return load_resident_index(model_class)
+
+        if index.refreshing:
+            return index
+        if not index.needs_reload() and time.monotonic() - index.loaded_at <= get_refresh_interval():
+            return index
+        index.refreshing = True
+
+    try:
+        if index.needs_reload():
+            reloaded = ResidentFingerprintIndex.from_db(model_class)
+            with _resident_indexes_lock:
+                _resident_indexes[model_class] = reloaded
+            return reloaded
+        index.refresh()
+        return index
+    finally:
+        index.refreshing = False
+
+
+def clear_resident_indexes():
+    """
+    Unload all the resident indexes.
+    """
+    with _resident_indexes_lock:
+        _resident_indexes.clear()
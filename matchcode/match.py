@@ -7,12 +7,8 @@
 # See https://aboutcode.org for more information about nexB OSS projects.
 #
 
-from functools import reduce
-from operator import or_
-
 import attr
 from commoncode.resource import VirtualCodebase
-from django.db.models import Q
 from matchcode_toolkit.fingerprinting import compute_codebase_directory_fingerprints
 
 from matchcode.models import ApproximateDirectoryContentIndex
@@ -82,6 +78,7 @@ def package_archive_match(codebase):
     Return the number of matches found in `codebase`
     """
     match_count = 0
+    package_paths_by_package_id = {}
     for resource in codebase.walk(topdown=True):
         if (resource.is_dir
                 or not resource.is_archive
@@ -95,7 +92,9 @@ def package_archive_match(codebase):
         match_count += len(archive_matches)
 
         # Tag matched Resource as `matched` as to not analyze it later
-        tag_matched_resources(resource, codebase, archive_matches, match_type)
+        tag_matched_resources(
+            resource, codebase, archive_matches, match_type, package_paths_by_package_id
+        )
     return match_count
 
 
@@ -106,6 +105,7 @@ def approximate_directory_content_match(codebase):
     Return the number of matches found in `codebase`
     """
     match_count = 0
+    package_paths_by_package_id = {}
     for resource in codebase.walk(topdown=True):
         if resource.is_file or resource.extra_data.get('matched', False):
             continue
@@ -114,8 +114,10 @@ def approximate_directory_content_match(codebase):
         if not directory_matches:
             continue
 
-        match_count += directory_matches.count()
-        tag_matched_resources(resource, codebase, directory_matches, match_type)
+        match_count += len(directory_matches)
+        tag_matched_resources(
+            resource, codebase, directory_matches, match_type, package_paths_by_package_id
+        )
     return match_count
 
 
@@ -126,6 +128,7 @@ def approximate_directory_structure_match(codebase):
     Return the number of matches found in `codebase`
     """
     match_count = 0
+    package_paths_by_package_id = {}
     for resource in codebase.walk(topdown=True):
         if resource.is_file or resource.extra_data.get('matched', False):
             continue
@@ -134,8 +137,10 @@ def approximate_directory_structure_match(codebase):
         if not directory_matches:
             continue
 
-        match_count += directory_matches.count()
-        tag_matched_resources(resource, codebase, directory_matches, match_type)
+        match_count += len(directory_matches)
+        tag_matched_resources(
+            resource, codebase, directory_matches, match_type, package_paths_by_package_id
+        )
     return match_count
 
 
@@ -146,6 +151,7 @@ def individual_file_match(codebase):
     Return the number of matches found in `codebase`.
     """
     match_count = 0
+    package_paths_by_package_id = {}
     for resource in codebase.walk(topdown=True):
         if resource.is_dir or resource.extra_data.get('matched', False):
             continue
@@ -155,7 +161,9 @@ def individual_file_match(codebase):
             continue
 
         match_count += len(file_matches)
-        tag_matched_resources(resource, codebase, file_matches, match_type)
+        tag_matched_resources(
+            resource, codebase, file_matches, match_type, package_paths_by_package_id
+        )
     return match_count
 
 
@@ -166,6 +174,7 @@ def approximate_file_match(codebase):
     Return  the number of approximate matches found in `codebase`.
     """
     match_count = 0
+    package_paths_by_package_id = {}
     for resource in codebase.walk(topdown=True):
         if resource.is_dir or resource.extra_data.get('matched', False):
             continue
@@ -174,7 +183,9 @@ def approximate_file_match(codebase):
             continue
 
         match_count += len(file_matches)
-        tag_matched_resources(resource, codebase, file_matches, match_type)
+        tag_matched_resources(
+            resource, codebase, file_matches, match_type, package_paths_by_package_id
+        )
     return match_count
 
 
@@ -183,14 +194,13 @@ def get_directory_content_match(resource):
     Match a directory to a Package using its contents
     """
     directory_content_fingerprint = resource.extra_data.get('directory_content', '')
-    matches = ApproximateDirectoryContentIndex.objects.none()
+    matches = []
     match_type = ''
     if directory_content_fingerprint:
-        directory_matches = ApproximateDirectoryContentIndex.match(
+        matches = ApproximateDirectoryContentIndex.match(
             directory_content_fingerprint,
             resource
         )
-        matches |= directory_matches
         match_type = 'approximate-content'
     return matches, match_type
 
@@ -201,14 +211,13 @@ def get_directory_structure_match(resource):
     Match a directory to a Package using its structure
     """
     directory_structure_fingerprint = resource.extra_data.get('directory_structure', '')
-    matches = ApproximateDirectoryStructureIndex.objects.none()
+    matches = []
     match_type = ''
     if directory_structure_fingerprint:
-        directory_matches = ApproximateDirectoryStructureIndex.match(
+        matches = ApproximateDirectoryStructureIndex.match(
             directory_structure_fingerprint,
             resource
         )
-        matches |= directory_matches
         match_type = 'approximate-structure'
     return matches, match_type
 
@@ -255,12 +264,21 @@ def tag_matched_resource(resource, codebase, purl):
     resource.save(codebase)
 
 
-def tag_matched_resources(resource, codebase, matches, match_type):
+def tag_matched_resources(
+    resource, codebase, matches, match_type, package_paths_by_package_id=None
+):
     """
     Tag this directory and other Resources under this directory so they are not
     candidates for matching by checking to see if a Resource path from
     `resource` or its children exists in the matched packages in `matches`
+
+    `package_paths_by_package_id` is an optional mapping of sets of Resource
+    paths by Package id, used as a cache of the paths of matched packages.
     """
+    if package_paths_by_package_id is None:
+        package_paths_by_package_id = {}
+
+    children = None
     for match in matches:
         # Prep matched package data and append to `codebase`
         matched_package_info = match.package.to_dict()
@@ -272,16 +290,28 @@ def tag_matched_resources(resource, codebase, matches, match_type):
         tag_matched_resource(resource, codebase, purl)
 
         # Find matching package child path for `resource` by creating all possible
-        # path suffixes from `child.path`, chaining them in Q objects (joined
-        # by or), then querying the matched packages resources to see if any of
-        # those suffixes match a package child resource path
-        for child in resource.walk(codebase):
-            query = reduce(or_, (Q(path=suffix) for suffix in path_suffixes(child.path)), Q())
-            matched_child_resources = match.package.resources.filter(query)
-            if len(matched_child_resources) > 0:
+        # path suffixes from `child.path` and checking if any of those suffixes
+        # is the path of a matched package child resource
+        package_paths = get_package_paths(match.package, package_paths_by_package_id)
+        if children is None:
+            children = list(resource.walk(codebase))
+        for child in children:
+            if any(suffix in package_paths for suffix in path_suffixes(child.path)):
                 tag_matched_resource(child, codebase, purl)
 
 
+def get_package_paths(package, package_paths_by_package_id):
+    """
+    Return a set of the Resource paths of `package`. Paths are loaded once per
+    Package and cached in the `package_paths_by_package_id` mapping.
+    """
+    package_paths = package_paths_by_package_id.get(package.id)
+    if package_paths is None:
+        package_paths = set(package.resources.values_list('path', flat=True))
+        package_paths_by_package_id[package.id] = package_paths
+    return package_paths
+
+
 def path_suffixes(path):
     """
     Yield all the suffixes of `path`, starting from the longest (e.g. more segments).
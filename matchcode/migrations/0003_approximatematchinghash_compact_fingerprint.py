@@ -0,0 +1,103 @@
+# Generated by Django 5.0.6 on 2026-10-18 04:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matchcode', '0002_alter_approximatedirectorycontentindex_package_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='approximatedirectorycontentindex',
+            name='band1',
+            field=models.IntegerField(blank=True, db_index=True, help_text='The first 32 bits (0-7 hex digits) of the fingerprint, as a signed integer', null=True),
+        ),
+        migrations.AddField(
+            model_name='approximatedirectorycontentindex',
+            name='band2',
+            field=models.IntegerField(blank=True, db_index=True, help_text='The second 32 bits (8-15 hex digits) of the fingerprint, as a signed integer', null=True),
+        ),
+        migrations.AddField(
+            model_name='approximatedirectorycontentindex',
+            name='band3',
+            field=models.IntegerField(blank=True, db_index=True, help_text='The third 32 bits (16-23 hex digits) of the fingerprint, as a signed integer', null=True),
+        ),
+        migrations.AddField(
+            model_name='approximatedirectorycontentindex',
+            name='band4',
+            field=models.IntegerField(blank=True, db_index=True, help_text='The fourth 32 bits (24-31 hex digits) of the fingerprint, as a signed integer', null=True),
+        ),
+        migrations.AddField(
+            model_name='approximatedirectorycontentindex',
+            name='fingerprint_high',
+            field=models.BigIntegerField(blank=True, help_text='The first 64 bits (0-15 hex digits) of the fingerprint, as a signed integer', null=True),
+        ),
+        migrations.AddField(
+            model_name='approximatedirectorycontentindex',
+            name='fingerprint_low',
+            field=models.BigIntegerField(blank=True, help_text='The last 64 bits (16-31 hex digits) of the fingerprint, as a signed integer', null=True),
+        ),
+        migrations.AddField(
+            model_name='approximatedirectorystructureindex',
+            name='band1',
+            field=models.IntegerField(blank=True, db_index=True, help_text='The first 32 bits (0-7 hex digits) of the fingerprint, as a signed integer', null=True),
+        ),
+        migrations.AddField(
+            model_name='approximatedirectorystructureindex',
+            name='band2',
+            field=models.IntegerField(blank=True, db_index=True, help_text='The second 32 bits (8-15 hex digits) of the fingerprint, as a signed integer', null=True),
+        ),
+        migrations.AddField(
+            model_name='approximatedirectorystructureindex',
+            name='band3',
+            field=models.IntegerField(blank=True, db_index=True, help_text='The third 32 bits (16-23 hex digits) of the fingerprint, as a signed integer', null=True),
+        ),
+        migrations.AddField(
+            model_name='approximatedirectorystructureindex',
+            name='band4',
+            field=models.IntegerField(blank=True, db_index=True, help_text='The fourth 32 bits (24-31 hex digits) of the fingerprint, as a signed integer', null=True),
+        ),
+        migrations.AddField(
+            model_name='approximatedirectorystructureindex',
+            name='fingerprint_high',
+            field=models.BigIntegerField(blank=True, help_text='The first 64 bits (0-15 hex digits) of the fingerprint, as a signed integer', null=True),
+        ),
+        migrations.AddField(
+            model_name='approximatedirectorystructureindex',
+            name='fingerprint_low',
+            field=models.BigIntegerField(blank=True, help_text='The last 64 bits (16-31 hex digits) of the fingerprint, as a signed integer', null=True),
+        ),
+        migrations.AddField(
+            model_name='approximateresourcecontentindex',
+            name='band1',
+            field=models.IntegerField(blank=True, db_index=True, help_text='The first 32 bits (0-7 hex digits) of the fingerprint, as a signed integer', null=True),
+        ),
+        migrations.AddField(
+            model_name='approximateresourcecontentindex',
+            name='band2',
+            field=models.IntegerField(blank=True, db_index=True, help_text='The second 32 bits (8-15 hex digits) of the fingerprint, as a signed integer', null=True),
+        ),
+        migrations.AddField(
+            model_name='approximateresourcecontentindex',
+            name='band3',
+            field=models.IntegerField(blank=True, db_index=True, help_text='The third 32 bits (16-23 hex digits) of the fingerprint, as a signed integer', null=True),
+        ),
+        migrations.AddField(
+            model_name='approximateresourcecontentindex',
+            name='band4',
+            field=models.IntegerField(blank=True, db_index=True, help_text='The fourth 32 bits (24-31 hex digits) of the fingerprint, as a signed integer', null=True),
+        ),
+        migrations.AddField(
+            model_name='approximateresourcecontentindex',
+            name='fingerprint_high',
+            field=models.BigIntegerField(blank=True, help_text='The first 64 bits (0-15 hex digits) of the fingerprint, as a signed integer', null=True),
+        ),
+        migrations.AddField(
+            model_name='approximateresourcecontentindex',
+            name='fingerprint_low',
+            field=models.BigIntegerField(blank=True, help_text='The last 64 bits (16-31 hex digits) of the fingerprint, as a signed integer', null=True),
+        ),
+    ]
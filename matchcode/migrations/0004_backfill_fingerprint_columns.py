@@ -0,0 +1,65 @@
+# Generated by Django 5.0.6 on 2026-10-18 07:10
+
+from django.db import migrations
+from django.db import transaction
+
+
+# Number of primary keys covered by each UPDATE, each run in its own
+# transaction such that the rows are not locked for the whole migration.
+BATCH_SIZE = 50000
+
+# Compute the compact columns from the four 4-bytes chunk columns in SQL: a
+# bytea is read as a bit string and cast to a signed integer.
+BACKFILL_SQL = """
+    UPDATE {table} SET
+        fingerprint_high = ('x' || encode(chunk1 || chunk2, 'hex'))::bit(64)::bigint,
+        fingerprint_low = ('x' || encode(chunk3 || chunk4, 'hex'))::bit(64)::bigint,
+        band1 = ('x' || encode(chunk1, 'hex'))::bit(32)::integer,
+        band2 = ('x' || encode(chunk2, 'hex'))::bit(32)::integer,
+        band3 = ('x' || encode(chunk3, 'hex'))::bit(32)::integer,
+        band4 = ('x' || encode(chunk4, 'hex'))::bit(32)::integer
+    WHERE {pk} >= %s AND {pk} < %s AND fingerprint_high IS NULL
+"""
+
+
+def backfill_fingerprint_columns(apps, schema_editor):
+    """
+    Populate the compact fingerprint columns of the rows indexed before these
+    columns existed, from their chunk columns. The rows are updated with one
+    set-based UPDATE per range of `BATCH_SIZE` primary keys.
+    """
+    connection = schema_editor.connection
+    quote_name = schema_editor.quote_name
+    for model_name in (
+        'ApproximateDirectoryContentIndex',
+        'ApproximateDirectoryStructureIndex',
+        'ApproximateResourceContentIndex',
+    ):
+        model_class = apps.get_model('matchcode', model_name)
+        table = quote_name(model_class._meta.db_table)
+        pk = quote_name(model_class._meta.pk.column)
+        sql = BACKFILL_SQL.format(table=table, pk=pk)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT min({pk}), max({pk}) FROM {table} WHERE fingerprint_high IS NULL')
+            min_pk, max_pk = cursor.fetchone()
+        if min_pk is None:
+            continue
+
+        for start in range(min_pk, max_pk + 1, BATCH_SIZE):
+            with transaction.atomic(using=connection.alias):
+                with connection.cursor() as cursor:
+                    cursor.execute(sql, [start, start + BATCH_SIZE])
+
+
+class Migration(migrations.Migration):
+    # each batch is committed on its own
+    atomic = False
+
+    dependencies = [
+        ('matchcode', '0003_approximatematchinghash_compact_fingerprint'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_fingerprint_columns, migrations.RunPython.noop),
+    ]
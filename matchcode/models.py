@@ -8,22 +8,35 @@
 #
 
 import binascii
+import copy
 import logging
+import posixpath
 import sys
 from collections import defaultdict
 from datetime import datetime
 from difflib import SequenceMatcher
 
 from django.db import models
+from django.db import router
+from django.db import transaction
 from django.forms.models import model_to_dict
 from django.utils.translation import gettext_lazy as _
 from matchcode_toolkit.fingerprinting import create_halohash_chunks
 from matchcode_toolkit.fingerprinting import hexstring_to_binarray
 from matchcode_toolkit.fingerprinting import split_fingerprint
-from matchcode_toolkit.halohash import byte_hamming_distance
 
+from matchcode.index import get_chunks
+from matchcode.index import get_fingerprint_columns
+from matchcode.index import get_halves
+from matchcode.index import get_resident_index
+from matchcode.index import hamming_distance
+from matchcode.index import split_bah128
+from matchcode.index import to_signed
+from matchcode.index import to_unsigned
 from minecode.management.commands import get_error_message
+from minecode.utils import bulk_insert
 from packagedb.models import Package
+from packagedb.models import Resource
 
 TRACE = False
 
@@ -88,6 +101,42 @@ class BaseFileIndex(models.Model):
             package.save()
             logger.error(msg)
 
+    @classmethod
+    def bulk_index(cls, sha1s, package, batch_size=5000):
+        """
+        Index the iterable of `sha1s` strings for `package` in bulk, in a single
+        transaction.
+
+        Return the number of rows actually inserted. SHA1 values already
+        indexed for `package` are skipped.
+        """
+        try:
+            sha1s_bin = set(bytes(hexstring_to_binarray(sha1)) for sha1 in sha1s if sha1)
+            if not sha1s_bin:
+                return 0
+
+            with transaction.atomic(using=router.db_for_write(cls)):
+                existing = cls.objects.filter(
+                    package=package,
+                    sha1__in=sha1s_bin,
+                ).values_list('sha1', flat=True)
+                sha1s_bin.difference_update(bytes(sha1) for sha1 in existing)
+                inserted = bulk_insert(
+                    cls,
+                    [cls(package=package, sha1=sha1) for sha1 in sha1s_bin],
+                    batch_size=batch_size,
+                )
+
+            logger.info(f'Inserted {inserted} {cls.__name__} for Package {package.download_url}')
+            return inserted
+        except Exception as e:
+            msg = f'Error creating FileIndex:\n'
+            msg += get_error_message(e)
+            package.index_error = msg
+            package.save()
+            logger.error(msg)
+            return 0
+
     @classmethod
     def match(cls, sha1):
         """
@@ -138,6 +187,51 @@ def bah128_ranges(indexed_elements_count, range_ratio=0.05):
     )
 
 
+def rank_matches(resource, matches, matched_resources_by_package_and_path):
+    """
+    Return a list of the best ranked `matches` for `resource`, using the
+    matched Resources from the `matched_resources_by_package_and_path` mapping
+    of {(package_id, path): Resource}.
+
+    Each of `matches` must have a `hamming_distance` attribute. The returned
+    matches have `size_difference` and `name_difference` attributes.
+
+    Matches are ranked from low to high (low being low difference/very
+    similar), first by Hamming distance, then by size difference, and finally
+    by name difference.
+    """
+    resource_size = resource.size or 0
+    matches_by_rank_attributes = defaultdict(list)
+    for match in matches:
+        matched_resource = matched_resources_by_package_and_path.get(
+            (match.package_id, match.path)
+        )
+
+        # Compute size and name difference
+        if matched_resource and matched_resource.is_file:
+            size_difference = abs(resource_size - (matched_resource.size or 0))
+        else:
+            # TODO: index number of files in a directory so we can use
+            # that for size comparison. For now, we are going to
+            # disregard size as a factor.
+            size_difference = 0
+
+        if matched_resource:
+            matched_name = matched_resource.name
+        else:
+            matched_name = posixpath.basename(match.path)
+        name_sequence_matcher = SequenceMatcher(a=resource.name, b=matched_name)
+        name_difference = 1 - name_sequence_matcher.ratio()
+
+        match.size_difference = size_difference
+        match.name_difference = name_difference
+        rank_attributes = (match.hamming_distance, size_difference, name_difference)
+        matches_by_rank_attributes[rank_attributes].append(match)
+
+    best_ranked_attributes = min(matches_by_rank_attributes)
+    return matches_by_rank_attributes[best_ranked_attributes]
+
+
 class ApproximateMatchingHashMixin(models.Model):
     indexed_elements_count = models.IntegerField(
         help_text='Number of elements that went into the fingerprint',
@@ -175,6 +269,51 @@ class ApproximateMatchingHashMixin(models.Model):
         blank=False
     )
 
+    # Compact storage of the 128-bit fingerprint. These columns are null for
+    # rows indexed before they were introduced, until these rows are
+    # backfilled by the `0004_backfill_fingerprint_columns` migration. The
+    # chunk1 to chunk4 columns are still written and read as a fallback: they
+    # are dropped in a later release, once every deployment is backfilled.
+    fingerprint_high = models.BigIntegerField(
+        help_text='The first 64 bits (0-15 hex digits) of the fingerprint, as a signed integer',
+        null=True,
+        blank=True,
+    )
+
+    fingerprint_low = models.BigIntegerField(
+        help_text='The last 64 bits (16-31 hex digits) of the fingerprint, as a signed integer',
+        null=True,
+        blank=True,
+    )
+
+    band1 = models.IntegerField(
+        db_index=True,
+        help_text='The first 32 bits (0-7 hex digits) of the fingerprint, as a signed integer',
+        null=True,
+        blank=True,
+    )
+
+    band2 = models.IntegerField(
+        db_index=True,
+        help_text='The second 32 bits (8-15 hex digits) of the fingerprint, as a signed integer',
+        null=True,
+        blank=True,
+    )
+
+    band3 = models.IntegerField(
+        db_index=True,
+        help_text='The third 32 bits (16-23 hex digits) of the fingerprint, as a signed integer',
+        null=True,
+        blank=True,
+    )
+
+    band4 = models.IntegerField(
+        db_index=True,
+        help_text='The fourth 32 bits (24-31 hex digits) of the fingerprint, as a signed integer',
+        null=True,
+        blank=True,
+    )
+
     package = models.ForeignKey(
         Package,
         help_text='The Package that this resource is a part of',
@@ -207,6 +346,7 @@ class ApproximateMatchingHashMixin(models.Model):
         try:
             indexed_elements_count, fp = split_fingerprint(fingerprint)
             fp_chunk1, fp_chunk2, fp_chunk3, fp_chunk4 = create_halohash_chunks(fp)
+            fingerprint_columns = get_fingerprint_columns(*split_bah128(fp))
             bdi, created = cls.objects.get_or_create(
                 indexed_elements_count=indexed_elements_count,
                 chunk1=fp_chunk1,
@@ -215,7 +355,12 @@ class ApproximateMatchingHashMixin(models.Model):
                 chunk4=fp_chunk4,
                 path=resource_path,
                 package=package,
+                defaults=fingerprint_columns,
             )
+            if not created and bdi.fingerprint_high is None:
+                for name, value in fingerprint_columns.items():
+                    setattr(bdi, name, value)
+                bdi.save(update_fields=list(fingerprint_columns))
             if created:
                 logger.info(
                     '{} - Inserted {} for Package {}:\t{}'.format(
@@ -233,10 +378,75 @@ class ApproximateMatchingHashMixin(models.Model):
             package.save()
             logger.error(msg)
 
+    @classmethod
+    def bulk_index(cls, fingerprints_and_paths, package, batch_size=5000):
+        """
+        Index the iterable of (fingerprint, resource_path) tuples,
+        `fingerprints_and_paths`, for `package` in bulk, in a single
+        transaction.
+
+        Return the number of rows actually inserted. Fingerprints already
+        indexed for the same path of `package`, including those indexed
+        concurrently, are skipped.
+        """
+        try:
+            rows = set()
+            for fingerprint, resource_path in fingerprints_and_paths:
+                if not fingerprint:
+                    continue
+                indexed_elements_count, fp = split_fingerprint(fingerprint)
+                chunks = tuple(bytes(chunk) for chunk in create_halohash_chunks(fp))
+                rows.add((indexed_elements_count, chunks, resource_path))
+
+            if not rows:
+                return 0
+
+            with transaction.atomic(using=router.db_for_write(cls)):
+                existing = cls.objects.filter(
+                    package=package,
+                    path__in=set(path for _, _, path in rows),
+                ).values_list(
+                    'indexed_elements_count', 'chunk1', 'chunk2', 'chunk3', 'chunk4', 'path',
+                )
+                rows.difference_update(
+                    (indexed_elements_count, tuple(bytes(chunk) for chunk in chunks), path)
+                    for indexed_elements_count, *chunks, path in existing
+                )
+                objs = [
+                    cls(
+                        indexed_elements_count=indexed_elements_count,
+                        chunk1=chunk1,
+                        chunk2=chunk2,
+                        chunk3=chunk3,
+                        chunk4=chunk4,
+                        path=path,
+                        package=package,
+                        **get_fingerprint_columns(*get_halves(chunk1, chunk2, chunk3, chunk4)),
+                    )
+                    for indexed_elements_count, (chunk1, chunk2, chunk3, chunk4), path in rows
+                ]
+                # skip conflicts with rows inserted concurrently
+                inserted = bulk_insert(cls, objs, batch_size=batch_size)
+
+            logger.info(f'Inserted {inserted} {cls.__name__} for Package {package.download_url}')
+            return inserted
+        except Exception as e:
+            msg = f'Error creating ApproximateMatchingHashMixin:\n'
+            msg += get_error_message(e)
+            package.index_error = msg
+            package.save()
+            logger.error(msg)
+            return 0
+
     @classmethod
     def match(cls, fingerprint, resource=None, exact_match=False):
         """
-        Return a list of matched Packages
+        Return a list of matches for `fingerprint`. Each match has a
+        `hamming_distance` attribute.
+
+        If a `resource` is provided, only the best ranked matches for this
+        `resource` are returned, and each match also has `size_difference` and
+        `name_difference` attributes. See rank_matches() for details.
         """
         if TRACE:
             logger_debug(
@@ -249,153 +459,303 @@ class ApproximateMatchingHashMixin(models.Model):
             )
 
         if not fingerprint:
-            return cls.objects.none()
-
-        indexed_elements_count, bah128 = split_fingerprint(fingerprint)
-        chunk1, chunk2, chunk3, chunk4 = create_halohash_chunks(bah128)
+            return []
 
-        # Step 0: if exact only, then return a filter
+        # Step 0: if exact only, then return exact matches
         if exact_match:
-            matches = cls.objects.filter(
-                indexed_elements_count=indexed_elements_count,
-                chunk1=chunk1,
-                chunk2=chunk2,
-                chunk3=chunk3,
-                chunk4=chunk4,
+            indexed_elements_count, bah128 = split_fingerprint(fingerprint)
+            chunk1, chunk2, chunk3, chunk4 = create_halohash_chunks(bah128)
+            fingerprint_columns = get_fingerprint_columns(*split_bah128(bah128))
+            matches = list(
+                cls.objects.select_related('package').filter(
+                    models.Q(
+                        band1=fingerprint_columns['band1'],
+                        band2=fingerprint_columns['band2'],
+                        band3=fingerprint_columns['band3'],
+                        band4=fingerprint_columns['band4'],
+                    )
+                    | models.Q(
+                        band1__isnull=True,
+                        chunk1=chunk1,
+                        chunk2=chunk2,
+                        chunk3=chunk3,
+                        chunk4=chunk4,
+                    ),
+                    indexed_elements_count=indexed_elements_count,
+                )
             )
+            for match in matches:
+                match.hamming_distance = 0
             return matches
 
-        # Step 1: find fingerprints with matching chunks
-        range = bah128_ranges(indexed_elements_count)
-        matches = cls.objects.filter(
-            models.Q(
-                indexed_elements_count__range=range,
-                chunk1=chunk1
-            ) |
-            models.Q(
-                indexed_elements_count__range=range,
-                chunk2=chunk2
-            ) |
-            models.Q(
-                indexed_elements_count__range=range,
-                chunk3=chunk3
-            ) |
-            models.Q(
-                indexed_elements_count__range=range,
-                chunk4=chunk4
-            )
-        )
+        # Steps 1 to 4 are the same as for a batch of one fingerprint
+        matches, = cls.match_many([(fingerprint, resource)])
 
         if TRACE:
             for match in matches:
                 dct = model_to_dict(match)
-                logger_debug(cls.__name__, 'match:', 'matched_package:', dct)
+                logger_debug(
+                    cls.__name__,
+                    'match:',
+                    'hamming_distance:',
+                    match.hamming_distance,
+                    'matched_package:',
+                    dct
+                )
+
+        return matches
+
+    @classmethod
+    def match_many(cls, fingerprints_with_resources, exact_match=False, batch_size=1000):
+        """
+        Return a list of lists of matches for an iterable of (fingerprint,
+        resource) tuples, `fingerprints_with_resources`. There is one list of
+        matches for each input tuple, in the same order. `resource` is optional
+        and can be None.
 
-        # Step 2: calculate Hamming distance of all matches
+        This is the batch equivalent of calling match() for each fingerprint:
+        the candidates of `batch_size` fingerprints are fetched with a single
+        query, and the Resources used to rank these candidates are fetched with
+        another single query.
 
-        # Store all close matches in a dictionary of querysets
-        matches_by_hamming_distance = defaultdict(cls.objects.none)
-        for match in matches:
-            # Get fingerprint from the match
-            fp = match.fingerprint()
-            _, match_bah128 = split_fingerprint(fp)
+        Each match has a `hamming_distance` attribute. Matches ranked against a
+        resource also have `size_difference` and `name_difference` attributes.
 
-            # Perform Hamming distance calculation between the fingerprint we
-            # are looking up and a potential match fingerprint
-            hd = byte_hamming_distance(bah128, match_bah128)
+        If `exact_match` is True, only return the exact matches of each
+        fingerprint, without ranking.
+        """
+        fingerprints_with_resources = list(fingerprints_with_resources)
+        results = []
+        for start in range(0, len(fingerprints_with_resources), batch_size):
+            batch = fingerprints_with_resources[start:start + batch_size]
+            results.extend(cls._match_batch(batch, exact_match=exact_match))
+        return results
 
+    @classmethod
+    def _match_batch(cls, fingerprints_with_resources, exact_match=False):
+        """
+        Return a list of lists of matches for a list of (fingerprint, resource)
+        tuples, `fingerprints_with_resources`.
+        """
+        if exact_match:
+            # exact matches have the same number of indexed elements and no
+            # differing bits. They are not ranked.
+            hamming_distance_threshold = 1
+            fingerprints_with_resources = [
+                (fingerprint, None) for fingerprint, _ in fingerprints_with_resources
+            ]
+        else:
             # TODO: try other thresholds if this is too restrictive
-            if hd < 8:
-                # Save match to `matches_by_hamming_distance` by adding the matched object to the queryset
-                matches_by_hamming_distance[hd] |= cls.objects.filter(pk=match.pk)
-
-        if TRACE:
-            logger_debug(list(matches_by_hamming_distance.items()))
-
-        # Step 3: order matches from lowest Hamming distance to highest Hamming distance
-        # TODO: consider limiting matches for brevity
-        hamming_distances_and_matches = []
-        for hamming_distance, matches in sorted(matches_by_hamming_distance.items()):
-            hamming_distances_and_matches.append(
-                (hamming_distance, matches)
+            hamming_distance_threshold = 8
+
+        lookups = []
+        for fingerprint, _resource in fingerprints_with_resources:
+            if not fingerprint:
+                lookups.append(None)
+                continue
+            indexed_elements_count, bah128 = split_fingerprint(fingerprint)
+            high, low = split_bah128(bah128)
+            if exact_match:
+                count_range = (indexed_elements_count, indexed_elements_count)
+            else:
+                count_range = bah128_ranges(indexed_elements_count)
+            lookups.append((bah128, high, low, count_range))
+
+        # Step 1 and 2: find fingerprints with matching chunks and calculate
+        # their Hamming distance
+        resident_index = get_resident_index(cls)
+        if resident_index is not None:
+            candidates_by_lookup = cls._get_resident_candidates(
+                resident_index,
+                lookups,
+                hamming_distance_threshold,
             )
+        else:
+            candidates_by_lookup = cls._get_candidates(lookups, hamming_distance_threshold)
 
-        if TRACE:
-            for hamming_distance, matches in hamming_distances_and_matches:
-                for match in matches:
-                    dct = model_to_dict(match)
-                    logger_debug(
-                        cls.__name__,
-                        'match:',
-                        'step_3_hamming_distance:',
-                        hamming_distance,
-                        'step_3_matched_package:',
-                        dct
-                    )
+        matched_resources_by_package_and_path = cls._get_matched_resources(
+            fingerprints_with_resources,
+            candidates_by_lookup,
+        )
 
-        # Step 4: use file heuristics to rank matches from step 3
+        # Step 3: order matches from lowest Hamming distance to highest Hamming
+        # distance, then step 4: use file heuristics to rank matches
+        results = []
+        for (_, resource), candidates in zip(fingerprints_with_resources, candidates_by_lookup):
+            matches = []
+            for hd, candidate in sorted(candidates, key=lambda c: (c[0], c[1].pk)):
+                # a candidate can be shared between lookups: attach the match
+                # attributes to a copy
+                match = copy.copy(candidate)
+                match.hamming_distance = hd
+                matches.append(match)
 
-        # If we are not given resource data, return the matches we have
-        if not (resource and hamming_distances_and_matches):
-            remaining_matches = cls.objects.none()
-            if hamming_distances_and_matches:
-                for _, matches in hamming_distances_and_matches:
-                    remaining_matches |= matches
-            return remaining_matches
+            if resource and matches:
+                matches = rank_matches(resource, matches, matched_resources_by_package_and_path)
+            results.append(matches)
 
-        resource_size = resource.size
-        matches_by_rank_attributes = defaultdict(list)
-        for hamming_distance, matches in hamming_distances_and_matches:
-            for match in matches:
-                matched_resource = match.package.resources.get(path=match.path)
-
-                if TRACE:
-                    logger_debug(
-                        cls.__name__,
-                        'match:',
-                        'step_4_matched_resource:',
-                        matched_resource
-                    )
+        return results
 
-                # Compute size and name difference
-                if matched_resource.is_file:
-                    size_difference = abs(resource_size - matched_resource.size)
-                else:
-                    # TODO: index number of files in a directory so we can use
-                    # that for size comparison. For now, we are going to
-                    # disregard size as a factor.
-                    size_difference = 0
-                name_sequence_matcher = SequenceMatcher(a=resource.name, b=matched_resource.name)
-                name_difference = 1 - name_sequence_matcher.ratio()
-                rank_attributes = (hamming_distance, size_difference, name_difference)
-                matches_by_rank_attributes[rank_attributes].append(match)
-
-                if TRACE:
-                    logger_debug(
-                        cls.__name__,
-                        'match:',
-                        'step_4_size_difference:',
-                        size_difference,
-                        'step_4_name_difference:',
-                        name_difference
-                    )
+    @classmethod
+    def _get_resident_candidates(cls, resident_index, lookups, hamming_distance_threshold=8):
+        """
+        Return a list of lists of (hamming distance, candidate) for each lookup
+        of `lookups` using the `resident_index`, for candidates at a Hamming
+        distance lower than `hamming_distance_threshold`.
 
-        # Order these from low to high (low being low difference/very similar)), first by hamming distance, then by size difference, and finally by name difference.
-        ranked_attributes = sorted(matches_by_rank_attributes)
-        best_ranked_attributes = ranked_attributes[0]
-        ranked_matches = matches_by_rank_attributes[best_ranked_attributes]
+        The candidates are checked again with their current database rows: the
+        rows deleted or updated since they were loaded in the `resident_index`
+        are discarded from it.
+        """
+        hamming_distances_and_pks = []
+        for lookup in lookups:
+            if not lookup:
+                hamming_distances_and_pks.append([])
+                continue
+            bah128, _high, _low, count_range = lookup
+            hamming_distances_and_pks.append(
+                resident_index.search(
+                    bah128,
+                    count_range=count_range,
+                    hamming_distance_threshold=hamming_distance_threshold,
+                )
+            )
 
-        if TRACE:
-            dct = model_to_dict(match)
-            logger_debug(
-                cls.__name__,
-                'match:',
-                'step_4_best_match:',
-                dct
+        pks = set(pk for results in hamming_distances_and_pks for _, pk in results)
+        candidates_by_pk = cls.objects.select_related('package').in_bulk(pks)
+
+        stale_pks = set()
+        candidates_by_lookup = []
+        for lookup, results in zip(lookups, hamming_distances_and_pks):
+            candidates = []
+            if lookup:
+                _bah128, high, low, (low_count, high_count) = lookup
+                for indexed_hd, pk in results:
+                    candidate = candidates_by_pk.get(pk)
+                    if candidate is not None:
+                        hd = hamming_distance(high, low, *candidate.get_halves())
+                        if (
+                            hd == indexed_hd
+                            and low_count <= candidate.indexed_elements_count <= high_count
+                        ):
+                            candidates.append((hd, candidate))
+                            continue
+                    # the row was deleted or updated since it was loaded
+                    stale_pks.add(pk)
+            candidates_by_lookup.append(candidates)
+
+        if stale_pks:
+            resident_index.discard(stale_pks)
+        return candidates_by_lookup
+
+    @classmethod
+    def _get_candidates_queryset(cls, lookups):
+        """
+        Return a query set of the candidates that share at least one chunk
+        with a lookup of `lookups` and have an indexed_elements_count within
+        the range of this lookup.
+
+        The lookups are grouped by range of indexed_elements_count: the chunks
+        of a group are only looked up within the range of this group, such
+        that each lookup fetches the same candidates as a query of its own.
+        """
+        chunks_by_position_by_range = defaultdict(lambda: [set(), set(), set(), set()])
+        for lookup in filter(None, lookups):
+            _, high, low, count_range = lookup
+            chunks_by_position = chunks_by_position_by_range[tuple(count_range)]
+            for chunks, chunk in zip(chunks_by_position, get_chunks(high, low)):
+                chunks.add(chunk)
+
+        candidates_lookups = models.Q()
+        for count_range, chunks_by_position in chunks_by_position_by_range.items():
+            # Rows with the compact columns are looked up by band. Rows indexed
+            # before these columns existed and not yet backfilled are looked
+            # up by chunk.
+            bands_lookups = models.Q()
+            chunks_lookups = models.Q()
+            for position, chunks in enumerate(chunks_by_position, 1):
+                bands = [to_signed(chunk, 32) for chunk in chunks]
+                bands_lookups |= models.Q(**{f'band{position}__in': bands})
+                chunks = [chunk.to_bytes(4, 'big') for chunk in chunks]
+                chunks_lookups |= models.Q(**{f'chunk{position}__in': chunks})
+
+            candidates_lookups |= models.Q(
+                bands_lookups | (models.Q(band1__isnull=True) & chunks_lookups),
+                indexed_elements_count__range=count_range,
             )
 
-        matches = cls.objects.filter(pk__in=[match.pk for match in ranked_matches])
-        return matches
+        return cls.objects.select_related('package').filter(candidates_lookups)
+
+    @classmethod
+    def _get_candidates(cls, lookups, hamming_distance_threshold=8):
+        """
+        Return a list of lists of (hamming distance, candidate) for each lookup
+        of `lookups` using a single database query, for candidates at a Hamming
+        distance lower than `hamming_distance_threshold`.
+        """
+        if not any(lookups):
+            return [[] for _ in lookups]
+
+        candidates = cls._get_candidates_queryset(lookups)
+
+        # {pk: (candidate, high, low)}
+        candidates_by_pk = {}
+        # One mapping per chunk position of {chunk value: [candidate pks]}
+        pks_by_chunk = [defaultdict(list) for _ in range(4)]
+        for candidate in candidates:
+            candidate_high, candidate_low = candidate.get_halves()
+            candidates_by_pk[candidate.pk] = candidate, candidate_high, candidate_low
+            for pks, chunk in zip(pks_by_chunk, get_chunks(candidate_high, candidate_low)):
+                pks[chunk].append(candidate.pk)
+
+        candidates_by_lookup = []
+        for lookup in lookups:
+            results = []
+            candidates_by_lookup.append(results)
+            if not lookup:
+                continue
+
+            _, high, low, (low_count, high_count) = lookup
+            pks = set()
+            for position, chunk in enumerate(get_chunks(high, low)):
+                pks.update(pks_by_chunk[position].get(chunk, []))
+
+            for pk in pks:
+                candidate, candidate_high, candidate_low = candidates_by_pk[pk]
+                if not low_count <= candidate.indexed_elements_count <= high_count:
+                    continue
+                hd = hamming_distance(high, low, candidate_high, candidate_low)
+                if hd < hamming_distance_threshold:
+                    results.append((hd, candidate))
+
+        return candidates_by_lookup
+
+    @classmethod
+    def _get_matched_resources(cls, fingerprints_with_resources, candidates_by_lookup):
+        """
+        Return a mapping of {(package_id, path): Resource} of the Resources of
+        the candidates to rank against a resource, fetched in one query.
+        """
+        package_ids = set()
+        paths = set()
+        for (_, resource), candidates in zip(fingerprints_with_resources, candidates_by_lookup):
+            if not resource:
+                continue
+            for _, candidate in candidates:
+                package_ids.add(candidate.package_id)
+                paths.add(candidate.path)
+
+        if not package_ids:
+            return {}
+
+        matched_resources = Resource.objects.filter(
+            package_id__in=package_ids,
+            path__in=paths,
+        ).only('package_id', 'path', 'name', 'size', 'is_file')
+        return {
+            (matched_resource.package_id, matched_resource.path): matched_resource
+            for matched_resource in matched_resources
+        }
 
     def get_chunks(self):
         chunk1 = binascii.hexlify(self.chunk1)
@@ -404,11 +764,18 @@ class ApproximateMatchingHashMixin(models.Model):
         chunk4 = binascii.hexlify(self.chunk4)
         return chunk1, chunk2, chunk3, chunk4
 
+    def get_halves(self):
+        """
+        Return a tuple of two unsigned 64-bit integers (high, low) of the
+        128-bit fingerprint of this row.
+        """
+        if self.fingerprint_high is None:
+            return get_halves(self.chunk1, self.chunk2, self.chunk3, self.chunk4)
+        return to_unsigned(self.fingerprint_high, 64), to_unsigned(self.fingerprint_low, 64)
+
     def fingerprint(self):
-        indexed_element_count_as_hex_bytes = b'%08x' % self.indexed_elements_count
-        chunk1, chunk2, chunk3, chunk4 = self.get_chunks()
-        fingerprint = indexed_element_count_as_hex_bytes + chunk1 + chunk2 + chunk3 + chunk4
-        return fingerprint.decode('utf-8')
+        high, low = self.get_halves()
+        return f'{self.indexed_elements_count:08x}{high:016x}{low:016x}'
 
 
 class ApproximateDirectoryStructureIndex(ApproximateMatchingHashMixin):
@@ -0,0 +1,77 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# purldb is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/nexB/purldb for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from matchcode.models import ApproximateDirectoryContentIndex
+from packagedb.models import Package
+
+
+class ApproximateDirectoryContentIndexAPITestCase(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.package1 = Package.objects.create(
+            download_url='https://test-url.com/package1.tar.gz',
+            type='type1',
+            name='name1',
+        )
+        self.package2 = Package.objects.create(
+            download_url='https://test-url.com/package2.tar.gz',
+            type='type2',
+            name='name2',
+        )
+        self.fingerprint1 = '000000020f1fb6d5c2e2e4d56b1c34bb05a5dcae'
+        # 1 bit away from fingerprint1
+        self.fingerprint2 = '000000020f1fb6d5c2e2e4d56b1c34bb05a5dcaf'
+        ApproximateDirectoryContentIndex.index(self.fingerprint1, 'package1/dir', self.package1)
+        ApproximateDirectoryContentIndex.index(self.fingerprint2, 'package2/dir', self.package2)
+        self.match_url = reverse('api:approximatedirectorycontentindex-match')
+
+    def test_api_approximate_directory_content_index_match_get(self):
+        response = self.client.get(self.match_url, data={'fingerprint': self.fingerprint1})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        results = sorted(
+            (result['matched_fingerprint'], result['similarity_score'])
+            for result in response.data
+        )
+        expected = [
+            (self.fingerprint1, 1.0),
+            (self.fingerprint2, 127 / 128),
+        ]
+        self.assertEqual(expected, results)
+
+    def test_api_approximate_directory_content_index_match_post(self):
+        data = {'fingerprints': [self.fingerprint1, self.fingerprint2, self.fingerprint1]}
+        response = self.client.post(self.match_url, data=data, format='json')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        results = sorted(
+            (result['fingerprint'], result['matched_fingerprint'], result['similarity_score'])
+            for result in response.data
+        )
+        expected = [
+            (self.fingerprint1, self.fingerprint1, 1.0),
+            (self.fingerprint1, self.fingerprint2, 127 / 128),
+            (self.fingerprint2, self.fingerprint1, 127 / 128),
+            (self.fingerprint2, self.fingerprint2, 1.0),
+        ]
+        self.assertEqual(expected, results)
+
+    def test_api_approximate_directory_content_index_match_post_invalid_body(self):
+        for data in ([self.fingerprint1], 'fingerprint', {'fingerprints': {'a': self.fingerprint1}}, {'fingerprints': [1]}):
+            response = self.client.post(self.match_url, data=data, format='json')
+            self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    def test_api_approximate_directory_content_index_match_post_no_fingerprints(self):
+        response = self.client.post(self.match_url, data={}, format='json')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(None, response.data)
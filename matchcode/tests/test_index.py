@@ -0,0 +1,272 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# purldb is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/nexB/purldb for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import os
+
+from django.test import override_settings
+from matchcode_toolkit.fingerprinting import split_fingerprint
+from matchcode_toolkit.halohash import byte_hamming_distance
+
+from matchcode.index import ResidentFingerprintIndex
+from matchcode.index import clear_resident_indexes
+from matchcode.index import get_fingerprint_columns
+from matchcode.index import get_resident_index
+from matchcode.index import load_resident_indexes
+from matchcode.index import split_bah128
+from matchcode.models import ApproximateDirectoryContentIndex
+from matchcode.models import ApproximateDirectoryStructureIndex
+from matchcode.models import bah128_ranges
+from matchcode.utils import MatchcodeTestCase
+from matchcode.utils import index_package_directories
+from matchcode.utils import load_resources_from_scan
+from packagedb.models import Package
+
+
+class ResidentFingerprintIndexTestCase(MatchcodeTestCase):
+    BASE_DIR = os.path.join(os.path.dirname(__file__), 'testfiles')
+
+    def setUp(self):
+        super(MatchcodeTestCase, self).setUp()
+        clear_resident_indexes()
+        self.addCleanup(clear_resident_indexes)
+
+        self.test_package1, _ = Package.objects.get_or_create(
+            filename='async-0.2.10.tgz',
+            sha1='b6bbe0b0674b9d719708ca38de8c237cb526c3d1',
+            md5='fd313a0e8cc2343569719e80cd7a67ac',
+            size=15772,
+            name='async',
+            version='0.2.10',
+            download_url='https://registry.npmjs.org/async/-/async-0.2.10.tgz',
+            type='npm',
+        )
+        load_resources_from_scan(self.get_test_loc('models/directory-matching/async-0.2.10.tgz-i.json'), self.test_package1)
+        index_package_directories(self.test_package1)
+
+        self.test_package2, _ = Package.objects.get_or_create(
+            filename='async-0.2.9.tgz',
+            sha1='df63060fbf3d33286a76aaf6d55a2986d9ff8619',
+            md5='895ac62ba7c61086cffdd50ab03c0447',
+            size=15672,
+            name='async',
+            version='0.2.9',
+            download_url='https://registry.npmjs.org/async/-/async-0.2.9.tgz',
+            type='npm',
+        )
+        load_resources_from_scan(self.get_test_loc('models/directory-matching/async-0.2.9-i.json'), self.test_package2)
+        index_package_directories(self.test_package2)
+
+    def test_ResidentFingerprintIndex_search(self):
+        index = ResidentFingerprintIndex(ApproximateDirectoryContentIndex)
+        fingerprint = '00000007af7d63765c78fa516b5353f5ffa7df45'
+        _, bah128 = split_fingerprint(fingerprint)
+        high, low = split_bah128(bah128)
+        # same fingerprint
+        index.add(1, 7, high, low)
+        # 3 bits away, in the first chunk
+        index.add(2, 7, high ^ (0b111 << 60), low)
+        # one bit away in every chunk: no chunk in common
+        index.add(3, 7, high ^ (1 << 32 | 1), low ^ (1 << 32 | 1))
+        # same fingerprint, but too many indexed elements
+        index.add(4, 100, high, low)
+
+        results = sorted(index.search(bah128, count_range=bah128_ranges(7)))
+        self.assertEqual([(0, 1), (3, 2)], results)
+
+        results = sorted(index.search(bah128, count_range=bah128_ranges(7), hamming_distance_threshold=3))
+        self.assertEqual([(0, 1)], results)
+
+        # the same results once the rows are moved from the delta to the
+        # sorted arrays
+        index.build()
+        self.assertEqual(len(index), index.sorted_count)
+        results = sorted(index.search(bah128, count_range=bah128_ranges(7)))
+        self.assertEqual([(0, 1), (3, 2)], results)
+
+    def test_ResidentFingerprintIndex_from_db_matches_database_search(self):
+        for model_class in (ApproximateDirectoryContentIndex, ApproximateDirectoryStructureIndex):
+            index = ResidentFingerprintIndex.from_db(model_class)
+            self.assertEqual(model_class.objects.count(), len(index))
+
+            for indexed in model_class.objects.all():
+                fingerprint = indexed.fingerprint()
+                indexed_elements_count, bah128 = split_fingerprint(fingerprint)
+                results = index.search(bah128, count_range=bah128_ranges(indexed_elements_count))
+                self.assertIn((0, indexed.pk), results)
+                for hd, pk in results:
+                    _, match_bah128 = split_fingerprint(model_class.objects.get(pk=pk).fingerprint())
+                    self.assertEqual(byte_hamming_distance(bah128, match_bah128), hd)
+
+    def test_get_resident_index_is_disabled_by_default(self):
+        with override_settings(MATCHCODE_RESIDENT_INDEX=False):
+            self.assertIsNone(get_resident_index(ApproximateDirectoryContentIndex))
+
+    def test_ApproximateDirectoryContentIndex_match_with_resident_index(self):
+        fingerprint = ApproximateDirectoryContentIndex.objects.first().fingerprint()
+        with override_settings(MATCHCODE_RESIDENT_INDEX=False):
+            expected = sorted(
+                (match.package.download_url, match.path)
+                for match in ApproximateDirectoryContentIndex.match(fingerprint)
+            )
+
+        with override_settings(MATCHCODE_RESIDENT_INDEX=True):
+            self.assertIsNotNone(get_resident_index(ApproximateDirectoryContentIndex))
+            results = sorted(
+                (match.package.download_url, match.path)
+                for match in ApproximateDirectoryContentIndex.match(fingerprint)
+            )
+
+        self.assertTrue(expected)
+        self.assertEqual(expected, results)
+
+    def test_ResidentFingerprintIndex_refresh_loads_new_rows(self):
+        model_class = ApproximateDirectoryContentIndex
+        indexed = list(model_class.objects.order_by('pk'))
+        new_row = indexed[-1]
+        fingerprint = new_row.fingerprint()
+        indexed_elements_count, bah128 = split_fingerprint(fingerprint)
+        count_range = bah128_ranges(indexed_elements_count)
+
+        # load an index without the last row, as if it was indexed later
+        index = ResidentFingerprintIndex(model_class)
+        index.load_rows(model_class.objects.filter(pk__lt=new_row.pk))
+        index.build()
+        self.assertNotIn((0, new_row.pk), index.search(bah128, count_range))
+
+        self.assertEqual(1, index.refresh())
+        self.assertEqual(model_class.objects.count(), len(index))
+        self.assertIn((0, new_row.pk), index.search(bah128, count_range))
+
+        # nothing new: nothing is loaded twice
+        self.assertEqual(0, index.refresh())
+        self.assertEqual(model_class.objects.count(), len(index))
+
+    def test_ResidentFingerprintIndex_refresh_loads_rows_committed_late(self):
+        model_class = ApproximateDirectoryContentIndex
+        indexed = list(model_class.objects.order_by('pk'))
+        late_row = indexed[-2]
+
+        # a row with a smaller pk than the largest pk loaded was committed late
+        index = ResidentFingerprintIndex(model_class)
+        index.load_rows(model_class.objects.exclude(pk=late_row.pk))
+        index.build()
+        self.assertEqual(len(indexed) - 1, len(index))
+
+        self.assertEqual(1, index.refresh())
+        self.assertEqual(sorted(row.pk for row in indexed), sorted(index.pks))
+
+    def copy_indexed_rows(self, model_class):
+        """
+        Copy the `model_class` rows of test_package1 for a new package, as if
+        they were indexed by another process.
+        """
+        package = Package.objects.create(
+            filename='async-0.2.10-copy.tgz',
+            sha1='0000000000000000000000000000000000000001',
+            name='async-copy',
+            version='0.2.10',
+            download_url='https://registry.npmjs.org/async/-/async-0.2.10-copy.tgz',
+            type='npm',
+        )
+        for row in model_class.objects.filter(package=self.test_package1):
+            row.pk = None
+            row.package = package
+            row.save()
+        return package
+
+    @override_settings(MATCHCODE_RESIDENT_INDEX=True)
+    def test_get_resident_index_is_refreshed_after_the_refresh_interval(self):
+        model_class = ApproximateDirectoryContentIndex
+        index = get_resident_index(model_class)
+        self.assertEqual(model_class.objects.count(), len(index))
+
+        self.copy_indexed_rows(model_class)
+        with override_settings(MATCHCODE_RESIDENT_INDEX_REFRESH_INTERVAL=3600):
+            with self.assertNumQueries(0):
+                self.assertIs(index, get_resident_index(model_class))
+            self.assertLess(len(index), model_class.objects.count())
+
+        with override_settings(MATCHCODE_RESIDENT_INDEX_REFRESH_INTERVAL=-1):
+            self.assertIs(index, get_resident_index(model_class))
+            self.assertEqual(model_class.objects.count(), len(index))
+
+    @override_settings(
+        MATCHCODE_RESIDENT_INDEX=True,
+        MATCHCODE_RESIDENT_INDEX_REFRESH_INTERVAL=3600,
+    )
+    def test_get_resident_index_is_not_refreshed_by_another_thread_refreshing(self):
+        model_class = ApproximateDirectoryContentIndex
+        index = get_resident_index(model_class)
+        self.copy_indexed_rows(model_class)
+
+        index.refreshing = True
+        with override_settings(MATCHCODE_RESIDENT_INDEX_REFRESH_INTERVAL=-1):
+            with self.assertNumQueries(0):
+                self.assertIs(index, get_resident_index(model_class))
+        self.assertLess(len(index), model_class.objects.count())
+
+    @override_settings(MATCHCODE_RESIDENT_INDEX=True)
+    def test_ApproximateDirectoryContentIndex_match_with_resident_index_skips_deleted_rows(self):
+        model_class = ApproximateDirectoryContentIndex
+        index = get_resident_index(model_class)
+        indexed = model_class.objects.filter(package=self.test_package1).first()
+        fingerprint = indexed.fingerprint()
+        self.assertIn(indexed.pk, [match.pk for match in model_class.match(fingerprint)])
+
+        deleted_pk = indexed.pk
+        indexed.delete()
+        self.assertNotIn(deleted_pk, [match.pk for match in model_class.match(fingerprint)])
+        self.assertIn(deleted_pk, index.deleted_pks)
+        _, bah128 = split_fingerprint(fingerprint)
+        results = index.search(bah128, count_range=bah128_ranges(indexed.indexed_elements_count))
+        self.assertNotIn(deleted_pk, [pk for _, pk in results])
+
+    @override_settings(MATCHCODE_RESIDENT_INDEX=True)
+    def test_ApproximateDirectoryContentIndex_match_with_resident_index_skips_updated_rows(self):
+        model_class = ApproximateDirectoryContentIndex
+        index = get_resident_index(model_class)
+        indexed = model_class.objects.filter(package=self.test_package1).first()
+        fingerprint = indexed.fingerprint()
+
+        # the fingerprint of the row is updated with far away chunks
+        high, low = indexed.get_halves()
+        columns = get_fingerprint_columns(high ^ 0xFF00FF00FF00FF00, low ^ 0xFF00FF00FF00FF00)
+        model_class.objects.filter(pk=indexed.pk).update(**columns)
+
+        self.assertNotIn(indexed.pk, [match.pk for match in model_class.match(fingerprint)])
+        self.assertIn(indexed.pk, index.deleted_pks)
+
+    @override_settings(MATCHCODE_RESIDENT_INDEX=True)
+    def test_get_resident_index_is_loaded_again_with_too_many_deleted_rows(self):
+        model_class = ApproximateDirectoryContentIndex
+        index = get_resident_index(model_class)
+        deleted_pks = list(model_class.objects.filter(package=self.test_package1).values_list('pk', flat=True))
+        model_class.objects.filter(pk__in=deleted_pks).delete()
+        index.discard(deleted_pks)
+
+        index.max_deleted_size = len(deleted_pks) - 1
+        reloaded = get_resident_index(model_class)
+        self.assertIsNot(index, reloaded)
+        self.assertFalse(reloaded.deleted_pks)
+        self.assertEqual(model_class.objects.count(), len(reloaded))
+        self.assertIs(reloaded, get_resident_index(model_class))
+
+    def test_load_resident_indexes(self):
+        with override_settings(MATCHCODE_RESIDENT_INDEX=False):
+            load_resident_indexes()
+            self.assertIsNone(get_resident_index(ApproximateDirectoryContentIndex))
+
+        with override_settings(
+            MATCHCODE_RESIDENT_INDEX=True,
+            MATCHCODE_RESIDENT_INDEX_REFRESH_INTERVAL=3600,
+        ):
+            load_resident_indexes()
+            with self.assertNumQueries(0):
+                index = get_resident_index(ApproximateDirectoryStructureIndex)
+            self.assertEqual(ApproximateDirectoryStructureIndex.objects.count(), len(index))
@@ -14,6 +14,7 @@ from matchcode.match import APPROXIMATE_DIRECTORY_STRUCTURE_MATCH
 from matchcode.match import APPROXIMATE_FILE_MATCH
 from matchcode.match import EXACT_FILE_MATCH
 from matchcode.match import EXACT_PACKAGE_ARCHIVE_MATCH
+from matchcode.match import get_package_paths
 from matchcode.match import path_suffixes
 from matchcode.match import run_do_match_from_scan
 from matchcode.models import ApproximateResourceContentIndex
@@ -186,6 +187,15 @@ class MatchNestedPackagesTestCase(MatchcodeTestCase):
         expected = self.get_test_loc('match/nested/nested-directory-content-match-expected.json')
         self.check_codebase(vc, expected, regen=FIXTURES_REGEN)
 
+    def test_get_package_paths_loads_paths_once_per_package(self):
+        package_paths_by_package_id = {}
+        with self.assertNumQueries(1):
+            package_paths = get_package_paths(self.test_package1, package_paths_by_package_id)
+            cached_package_paths = get_package_paths(self.test_package1, package_paths_by_package_id)
+        self.assertIs(package_paths, cached_package_paths)
+        expected = set(self.test_package1.resources.values_list('path', flat=True))
+        self.assertEqual(expected, package_paths)
+
 
 class MatchUtilityFunctionsTestCase(MatchcodeTestCase):
     def test_path_suffixes(self):
@@ -0,0 +1,63 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# purldb is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/nexB/purldb for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+from django.apps import apps
+from django.db import connection
+
+from matchcode_toolkit.fingerprinting import create_halohash_chunks
+
+from matchcode.index import to_signed
+from minecode.utils_test import TestMigrations
+
+
+class TestBackfillFingerprintColumns(TestMigrations):
+    app_name = "matchcode"
+    migrate_from = "0003_approximatematchinghash_compact_fingerprint"
+    migrate_to = "0004_backfill_fingerprint_columns"
+
+    fingerprint = "a23a49e4cd40718d1297be719e6564a4"
+
+    def setUpBeforeMigration(self, apps):
+        # using get_model to avoid circular import
+        Package = apps.get_model("packagedb", "Package")
+        ApproximateResourceContentIndex = apps.get_model("matchcode", "ApproximateResourceContentIndex")
+        package = Package.objects.create(
+            download_url="http://example.com/example.tar.gz",
+            type="generic",
+            name="example",
+            version="1.0.0",
+        )
+        chunk1, chunk2, chunk3, chunk4 = create_halohash_chunks(self.fingerprint)
+        # a row indexed before the compact fingerprint columns existed
+        ApproximateResourceContentIndex.objects.create(
+            indexed_elements_count=10,
+            chunk1=chunk1,
+            chunk2=chunk2,
+            chunk3=chunk3,
+            chunk4=chunk4,
+            package=package,
+            path="example/file.c",
+        )
+        # the migrations run in the transaction of this test: check the
+        # deferred foreign keys now such that the tables can be altered
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+    def test_backfill_fingerprint_columns(self):
+        # using get_model to avoid circular import
+        ApproximateResourceContentIndex = apps.get_model("matchcode", "ApproximateResourceContentIndex")
+        arci = ApproximateResourceContentIndex.objects.get()
+        self.assertEqual(b"\xa2\x3a\x49\xe4", bytes(arci.chunk1))
+        self.assertEqual(to_signed(0xa23a49e4cd40718d, 64), arci.fingerprint_high)
+        self.assertEqual(0x1297be719e6564a4, arci.fingerprint_low)
+        self.assertEqual(to_signed(0xa23a49e4, 32), arci.band1)
+        self.assertEqual(to_signed(0xcd40718d, 32), arci.band2)
+        self.assertEqual(0x1297be71, arci.band3)
+        self.assertEqual(to_signed(0x9e6564a4, 32), arci.band4)
+        self.assertEqual(f"0000000a{self.fingerprint}", arci.fingerprint())
@@ -16,18 +16,24 @@ from matchcode_toolkit.fingerprinting import compute_codebase_directory_fingerpr
 from matchcode_toolkit.fingerprinting import get_file_fingerprint_hashes
 from matchcode_toolkit.fingerprinting import hexstring_to_binarray
 
+from matchcode.index import get_fingerprint_columns
+from matchcode.index import split_bah128
+from matchcode.index import to_signed
 from matchcode.models import ApproximateDirectoryContentIndex
 from matchcode.models import ApproximateDirectoryStructureIndex
 from matchcode.models import ApproximateResourceContentIndex
 from matchcode.models import ExactFileIndex
 from matchcode.models import ExactPackageArchiveIndex
+from matchcode.models import bah128_ranges
 from matchcode.models import create_halohash_chunks
 from matchcode.tests import FIXTURES_REGEN
 from matchcode.utils import MatchcodeTestCase
 from matchcode.utils import index_package_directories
 from matchcode.utils import index_package_files_sha1
 from matchcode.utils import index_packages_sha1
+from matchcode.utils import index_resource_fingerprints
 from matchcode.utils import load_resources_from_scan
+from minecode.utils import bulk_insert
 from packagedb.models import Package
 from packagedb.models import Resource
 
@@ -146,6 +152,31 @@ class ExactFileIndexModelTestCase(BaseModelTest):
             in self.test_package1.index_error
         )
 
+    def test_ExactFileIndex_bulk_index(self):
+        sha1s = [
+            'b6bbe0b067469d719708ca38de5c237cb526c3d2',
+            'b6bbe0b067469d719708ca38de5c237cb526c3d3',
+            'b6bbe0b067469d719708ca38de5c237cb526c3d2',
+            '',
+        ]
+        with self.assertNumQueries(4):
+            inserted = ExactFileIndex.bulk_index(sha1s, self.test_package1)
+        self.assertEqual(2, inserted)
+        self.assertEqual(2, ExactFileIndex.objects.filter(package=self.test_package1).count())
+
+        # Test bulk index of existing sha1
+        inserted = ExactFileIndex.bulk_index(sha1s, self.test_package1)
+        self.assertEqual(0, inserted)
+        self.assertEqual(2, ExactFileIndex.objects.filter(package=self.test_package1).count())
+
+        # Test bulk index of invalid sha1
+        inserted = ExactFileIndex.bulk_index(['not a sha1'], self.test_package1)
+        self.assertEqual(0, inserted)
+        self.assertTrue(
+            "Error('Non-hexadecimal digit found')"
+            in self.test_package1.index_error
+        )
+
     def test_ExactFileIndex_match(self):
         scan_location = self.get_test_loc('models/match-test.json')
         codebase = VirtualCodebase(
@@ -321,6 +352,71 @@ class ApproximateDirectoryMatchingIndexModelTestCase(MatchcodeTestCase):
         expected = self.get_test_loc('models/directory-matching/async-0.2.9-i-expected-content.json')
         self.check_codebase(codebase, expected, regen=FIXTURES_REGEN)
 
+    def test_ApproximateDirectoryContentIndex_match_many(self):
+        scan_location = self.get_test_loc('models/directory-matching/async-0.2.9-i.json')
+        vc = VirtualCodebase(location=scan_location)
+        codebase = compute_codebase_directory_fingerprints(vc)
+
+        fingerprints_with_resources = []
+        for resource in codebase.walk(topdown=True):
+            if resource.is_file:
+                continue
+            fp = resource.extra_data.get('directory_content', '')
+            fingerprints_with_resources.append((fp, resource))
+            fingerprints_with_resources.append((fp, None))
+        # empty fingerprints do not match
+        fingerprints_with_resources.append(('', None))
+
+        expected = []
+        for fp, resource in fingerprints_with_resources:
+            matches = ApproximateDirectoryContentIndex.match(fingerprint=fp, resource=resource)
+            expected.append(sorted(match.pk for match in matches))
+
+        with self.assertNumQueries(2):
+            results = ApproximateDirectoryContentIndex.match_many(fingerprints_with_resources, batch_size=100)
+        self.assertEqual(expected, [sorted(match.pk for match in matches) for matches in results])
+        self.assertTrue(any(expected))
+
+        for matches in results:
+            for match in matches:
+                self.assertEqual(0, match.hamming_distance)
+
+        exact_results = ApproximateDirectoryContentIndex.match_many(fingerprints_with_resources, exact_match=True)
+        expected_exact = [
+            sorted(match.pk for match in ApproximateDirectoryContentIndex.match(fingerprint=fp, exact_match=True))
+            for fp, _ in fingerprints_with_resources
+        ]
+        self.assertEqual(expected_exact, [sorted(match.pk for match in matches) for matches in exact_results])
+
+
+    def test_ApproximateDirectoryContentIndex_get_candidates_queryset_uses_the_range_of_each_lookup(self):
+        package = Package.objects.create(
+            filename='foo-1.0.tgz',
+            type='npm',
+            name='foo',
+            version='1.0',
+            download_url='https://registry.npmjs.org/foo/-/foo-1.0.tgz',
+        )
+        bah128 = 'ffffffffeeeeeeeeddddddddcccccccc'
+        other_bah128 = '0123456789abcdef0123456789abcdef'
+        small, _ = ApproximateDirectoryContentIndex.index(f'0000000a{bah128}', 'foo/small', package)
+        # the same fingerprint with as many elements as the other lookup
+        large, _ = ApproximateDirectoryContentIndex.index(f'00000064{bah128}', 'foo/large', package)
+
+        lookups = [
+            (bah128, *split_bah128(bah128), bah128_ranges(10)),
+            None,
+            (other_bah128, *split_bah128(other_bah128), bah128_ranges(100)),
+        ]
+        candidates = ApproximateDirectoryContentIndex._get_candidates_queryset(lookups)
+        self.assertEqual([small.pk], [candidate.pk for candidate in candidates.filter(package=package)])
+
+        lookups.append((bah128, *split_bah128(bah128), bah128_ranges(100)))
+        candidates = ApproximateDirectoryContentIndex._get_candidates_queryset(lookups)
+        self.assertEqual(
+            sorted([small.pk, large.pk]),
+            sorted(candidate.pk for candidate in candidates.filter(package=package))
+        )
 
 class ApproximateResourceMatchingIndexModelTestCase(MatchcodeTestCase):
     BASE_DIR = os.path.join(os.path.dirname(__file__), 'testfiles')
@@ -406,6 +502,70 @@ class ApproximateResourceMatchingIndexModelTestCase(MatchcodeTestCase):
             in self.test_package.index_error
         )
 
+    def test_ApproximateResourceContentIndex_bulk_index(self):
+        fingerprints_and_paths = [
+            ('000018fba23a39e4cd40718d1297be719e6564a4', 'foo/bar'),
+            ('000018fba23a39e4cd40718d1297be719e6564a4', 'foo/baz'),
+            ('000018fba23a39e4cd40718d1297be719e6564a4', 'foo/baz'),
+            # already indexed in setUp
+            (self.test_resource_fingerprint, self.test_resource.path),
+            ('', 'foo/empty'),
+        ]
+        inserted = ApproximateResourceContentIndex.bulk_index(
+            fingerprints_and_paths,
+            self.test_package
+        )
+        self.assertEqual(2, inserted)
+        indexed = ApproximateResourceContentIndex.objects.filter(package=self.test_package)
+        self.assertEqual(
+            sorted(['foo/bar', 'foo/baz', self.test_resource.path]),
+            sorted(indexed.values_list('path', flat=True))
+        )
+        for arci in indexed:
+            if arci.path.startswith('foo/'):
+                self.assertEqual('000018fba23a39e4cd40718d1297be719e6564a4', arci.fingerprint())
+
+        # Test bulk index of existing fingerprints
+        inserted = ApproximateResourceContentIndex.bulk_index(
+            fingerprints_and_paths,
+            self.test_package
+        )
+        self.assertEqual(0, inserted)
+
+        # Test bulk index of invalid fingerprint
+        inserted = ApproximateResourceContentIndex.bulk_index(
+            [('not a fingerprint', 'foo/bar')],
+            self.test_package
+        )
+        self.assertEqual(0, inserted)
+        self.assertTrue(
+            "ValueError: invalid literal for int() with base 16: 'not a fi'"
+            in self.test_package.index_error
+        )
+
+    def test_bulk_insert_counts_only_inserted_rows(self):
+        # the same row as indexed in setUp, as if inserted concurrently
+        indexed = ApproximateResourceContentIndex.objects.get(package=self.test_package)
+        objs = [
+            ApproximateResourceContentIndex(
+                indexed_elements_count=indexed.indexed_elements_count,
+                chunk1=indexed.chunk1,
+                chunk2=indexed.chunk2,
+                chunk3=indexed.chunk3,
+                chunk4=indexed.chunk4,
+                path=path,
+                package=self.test_package,
+                **get_fingerprint_columns(*indexed.get_halves()),
+            )
+            for path in [indexed.path, 'foo/bar', 'foo/baz']
+        ]
+        inserted = bulk_insert(ApproximateResourceContentIndex, objs, batch_size=2)
+        self.assertEqual(2, inserted)
+        self.assertEqual(
+            3,
+            ApproximateResourceContentIndex.objects.filter(package=self.test_package).count()
+        )
+
     def test_ApproximateResourceContentIndex_match(self):
         scan_location = self.get_test_loc('match/approximate-file-matching/approximate-match-test.json')
         codebase = VirtualCodebase(
@@ -439,6 +599,125 @@ class ApproximateResourceMatchingIndexModelTestCase(MatchcodeTestCase):
         expected_results_loc = self.get_test_loc('match/approximate-file-matching/index-modified.js-expected.json')
         self.check_expected_results(results, expected_results_loc, regen=True)
 
+    def test_ApproximateResourceContentIndex_match_query_count_does_not_depend_on_candidates(self):
+        fingerprint = self.test_resource_fingerprint
+        for i in range(20):
+            package = Package.objects.create(
+                type='generic',
+                name='inflate',
+                version=f'1.0.{i + 1}',
+                download_url=f'inflate.com/inflate-1.0.{i + 1}.tar.gz',
+            )
+            resource = Resource.objects.create(
+                path=f'inflate-{i}.c',
+                name=f'inflate-{i}.c',
+                size=55466 + i,
+                is_file=True,
+                package=package,
+            )
+            ApproximateResourceContentIndex.index(fingerprint, resource.path, package)
+
+            # one query for the candidates and one for their Resources
+            with self.assertNumQueries(2):
+                matches = ApproximateResourceContentIndex.match(
+                    fingerprint=fingerprint,
+                    resource=self.test_resource,
+                )
+
+        self.assertEqual(1, len(matches))
+        match = matches[0]
+        self.assertEqual(self.test_package.pk, match.package_id)
+        self.assertEqual(0, match.hamming_distance)
+        self.assertEqual(0, match.size_difference)
+        self.assertEqual(0, match.name_difference)
+
+    def test_ApproximateResourceContentIndex_index_fingerprint_columns(self):
+        arci = ApproximateResourceContentIndex.objects.get(
+            package=self.test_package,
+            path=self.test_resource.path,
+        )
+        # a23a49e4cd40718d has its most significant bit set
+        self.assertEqual(to_signed(0xa23a49e4cd40718d, 64), arci.fingerprint_high)
+        self.assertEqual(0x1297be719e6564a4, arci.fingerprint_low)
+        self.assertEqual(to_signed(0xa23a49e4, 32), arci.band1)
+        self.assertEqual(to_signed(0xcd40718d, 32), arci.band2)
+        self.assertEqual(0x1297be71, arci.band3)
+        self.assertEqual(to_signed(0x9e6564a4, 32), arci.band4)
+        self.assertEqual(self.test_resource_fingerprint, arci.fingerprint())
+
+    def test_ApproximateResourceContentIndex_match_rows_without_fingerprint_columns(self):
+        # rows indexed before the compact fingerprint columns existed
+        ApproximateResourceContentIndex.objects.update(
+            fingerprint_high=None,
+            fingerprint_low=None,
+            band1=None,
+            band2=None,
+            band3=None,
+            band4=None,
+        )
+        arci = ApproximateResourceContentIndex.objects.get(path=self.test_resource.path)
+        self.assertEqual(self.test_resource_fingerprint, arci.fingerprint())
+
+        for exact_match in (False, True):
+            matches = ApproximateResourceContentIndex.match(
+                self.test_resource_fingerprint,
+                exact_match=exact_match,
+            )
+            self.assertEqual([arci.pk], [match.pk for match in matches])
+
+        # indexing again backfills the existing row
+        ApproximateResourceContentIndex.index(
+            self.test_resource_fingerprint,
+            self.test_resource.path,
+            self.test_package,
+        )
+        arci.refresh_from_db()
+        self.assertEqual(to_signed(0xa23a49e4, 32), arci.band1)
+
+        for arci in ApproximateResourceContentIndex.objects.all():
+            matches = ApproximateResourceContentIndex.match(arci.fingerprint(), exact_match=True)
+            self.assertEqual([arci.pk], [match.pk for match in matches])
+
+
+    def test_index_resource_fingerprints_indexes_resource_halo1(self):
+        package = Package.objects.create(
+            filename='foo-1.0.tgz',
+            type='npm',
+            name='foo',
+            version='1.0',
+            download_url='https://registry.npmjs.org/foo/-/foo-1.0.tgz',
+        )
+        halo1 = '00000010af7d63765c78fa516b5353f5ffa7df45'
+        directory_structure = '00000002b1a2d4cd8b5ed0b5e5f6ee62f0f0ed3c'
+        codebase = VirtualCodebase(
+            location={
+                'files': [
+                    {
+                        'path': 'package',
+                        'type': 'directory',
+                        'extra_data': {'directory_structure': directory_structure},
+                    },
+                    {
+                        'path': 'package/index.js',
+                        'type': 'file',
+                        'extra_data': {'halo1': halo1},
+                    },
+                ]
+            }
+        )
+        _, _, indexed_arci = index_resource_fingerprints(codebase, package)
+        self.assertEqual(1, indexed_arci)
+        arci = ApproximateResourceContentIndex.objects.get(
+            package=package,
+            path='package/index.js',
+        )
+        self.assertEqual(halo1, arci.fingerprint())
+        self.assertFalse(
+            ApproximateResourceContentIndex.objects.filter(
+                package=package,
+                path='package',
+            ).exists()
+        )
 
 class MatchcodeModelUtilsTestCase(MatchcodeTestCase):
     def test_create_halohash_chunks(self):
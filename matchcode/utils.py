@@ -143,6 +143,8 @@ def index_packages_sha1():
 def index_package_files_sha1(package, scan_location):
     """
     Index for SHA1 the package files found in the JSON scan at scan_location
+
+    Return the number of ExactFileIndex created.
     """
     from matchcode.models import ExactFileIndex
 
@@ -152,15 +154,8 @@ def index_package_files_sha1(package, scan_location):
         resource_attributes=resource_attributes
     )
 
-    for resource in vc.walk(topdown=True):
-        sha1 = resource.sha1
-        if not sha1:
-            continue
-        sha1_in_bin = hexstring_to_binarray(sha1)
-        package_file, created = ExactFileIndex.objects.get_or_create(
-            sha1=sha1_in_bin,
-            package=package,
-        )
+    sha1s = (resource.sha1 for resource in vc.walk(topdown=True))
+    return ExactFileIndex.bulk_index(sha1s=sha1s, package=package)
 
 
 def _create_virtual_codebase_from_package_resources(package):
@@ -220,40 +215,35 @@ def index_resource_fingerprints(codebase, package):
     from matchcode.models import ApproximateDirectoryStructureIndex
     from matchcode.models import ApproximateResourceContentIndex
 
-    indexed_adci = 0
-    indexed_adsi = 0
-    indexed_arci = 0
+    directory_content_fingerprints = []
+    directory_structure_fingerprints = []
+    resource_content_fingerprints = []
     for resource in codebase.walk(topdown=False):
         directory_content_fingerprint = resource.extra_data.get('directory_content', '')
         directory_structure_fingerprint = resource.extra_data.get('directory_structure', '')
         resource_content_fingerprint = resource.extra_data.get('halo1', '')
 
         if directory_content_fingerprint:
-            _, adci_created = ApproximateDirectoryContentIndex.index(
-                fingerprint=directory_content_fingerprint,
-                resource_path=resource.path,
-                package=package,
-            )
-            if adci_created:
-                indexed_adci += 1
+            directory_content_fingerprints.append((directory_content_fingerprint, resource.path))
 
         if directory_structure_fingerprint:
-            _, adsi_created = ApproximateDirectoryStructureIndex.index(
-                fingerprint=directory_structure_fingerprint,
-                resource_path=resource.path,
-                package=package,
-            )
-            if adsi_created:
-                indexed_adsi += 1
+            directory_structure_fingerprints.append((directory_structure_fingerprint, resource.path))
 
         if resource_content_fingerprint:
-            _, arci_created = ApproximateResourceContentIndex.index(
-                fingerprint=directory_structure_fingerprint,
-                resource_path=resource.path,
-                package=package,
-            )
-            if arci_created:
-                indexed_arci += 1
+            resource_content_fingerprints.append((resource_content_fingerprint, resource.path))
+
+    indexed_adci = ApproximateDirectoryContentIndex.bulk_index(
+        fingerprints_and_paths=directory_content_fingerprints,
+        package=package,
+    )
+    indexed_adsi = ApproximateDirectoryStructureIndex.bulk_index(
+        fingerprints_and_paths=directory_structure_fingerprints,
+        package=package,
+    )
+    indexed_arci = ApproximateResourceContentIndex.bulk_index(
+        fingerprints_and_paths=resource_content_fingerprints,
+        package=package,
+    )
 
     return indexed_adci, indexed_adsi, indexed_arci
 
@@ -20,18 +20,33 @@
 # ScanCode.io is a free software code scanning tool from nexB Inc. and others.
 # Visit https://github.com/nexB/scancode.io for support and download.
 
+from bisect import bisect_left
 from collections import defaultdict
-
+from concurrent import futures
+from functools import partial
+from functools import reduce
+from itertools import groupby
+from operator import or_
+
+from django.core.validators import EMPTY_VALUES
+from django.db import connections
+from django.db import transaction
 from django.db.models import Q
 from django.template.defaultfilters import pluralize
+from packageurl import normalize_qualifiers
 
 from scanpipe import pipes
+from scanpipe.models import PURL_FIELDS
+from scanpipe.models import DiscoveredPackage
+from scanpipe.models import scanpipe_app
 from scanpipe.pipes import LoopProgress
 from scanpipe.pipes import flag
 from scanpipe.pipes import js
+from scanpipe.pipes.scancode import get_max_workers
 
 from matchcode.models import ApproximateDirectoryContentIndex
 from matchcode.models import ApproximateResourceContentIndex
+from minecode.utils import get_batches
 from packagedb.models import Package
 from packagedb.models import Resource
 
@@ -45,9 +60,10 @@ def get_project_resources_qs(project, resources):
 
     Return None if `resources` is empty or None.
     """
+    paths = set()
     lookups = Q()
     for resource in resources or []:
-        lookups |= Q(path=resource.path)
+        paths.add(resource.path)
         if resource.is_archive:
             # This is done to capture the extracted contents of the archive we
             # matched to. Generally, the archive contents are in a directory
@@ -63,8 +79,66 @@ def get_project_resources_qs(project, resources):
             # and its descendants.
             path = f"{resource.path}/"
             lookups |= Q(path__startswith=path)
-    if lookups:
-        return project.codebaseresources.filter(lookups)
+    if paths:
+        return project.codebaseresources.filter(Q(path__in=paths) | lookups)
+
+
+def get_package_data(package, package_data_by_purldb_urls):
+    """
+    Return the data of a PurlDB ``package`` as a mapping. The data of each
+    package is serialized once and cached in ``package_data_by_purldb_urls``,
+    a mapping of package data by PurlDB package uuid.
+    """
+    key = str(package.uuid)
+    package_data = package_data_by_purldb_urls.get(key)
+    if package_data is None:
+        package_data = package.to_dict()
+        package_data_by_purldb_urls[key] = package_data
+    return package_data
+
+
+def can_run_in_worker_processes():
+    """
+    Return True if PurlDB lookups can run in worker processes. Each worker
+    process opens its own database connections: the connections of this
+    process are closed before forking, which is not possible inside a
+    transaction.
+    """
+    return not any(connection.in_atomic_block for connection in connections.all())
+
+
+def match_in_shards(lookup_func, shards):
+    """
+    Yield the results of calling ``lookup_func`` on each shard of the
+    ``shards`` iterable, in the order of ``shards``.
+
+    The shards are processed in a pool of worker processes when
+    multiprocessing is enabled with the ``SCANCODEIO_PROCESSES`` setting.
+    Otherwise they are processed one at a time in this process, as they are
+    iterated.
+
+    ``lookup_func`` must be a picklable callable that only reads from the
+    database. The shards are all loaded in memory before starting the pool and
+    the results are merged in the order of the shards, such that the database
+    updates made from these results by the caller are the same whether the
+    lookups run in a pool or not.
+    """
+    max_workers = get_max_workers(keep_available=1)
+    if max_workers <= 1 or not can_run_in_worker_processes():
+        for shard in shards:
+            yield lookup_func(shard)
+        return
+
+    shards = list(shards)
+    if len(shards) <= 1:
+        for shard in shards:
+            yield lookup_func(shard)
+        return
+
+    # Do not share the connections of this process with the forked workers.
+    connections.close_all()
+    with futures.ProcessPoolExecutor(min(max_workers, len(shards))) as executor:
+        yield from executor.map(lookup_func, shards)
 
 
 def create_package_from_purldb_data(project, resources, package_data, status):
@@ -102,33 +176,77 @@ def create_package_from_purldb_data(project, resources, package_data, status):
     return package, matched_resources_count
 
 
-def match_purldb_package(
-    project, resources_by_sha1, enhance_package_data=True, **kwargs
-):
+def get_purldb_package_matches(resources_by_sha1):
     """
     Given a mapping of lists of CodebaseResources by their sha1 values,
-    `resources_by_sha1`, send those sha1 values to purldb packages API endpoint,
-    process the matched Package data, then return the number of
-    CodebaseResources that were matched to a Package.
+    `resources_by_sha1`, look up those sha1 values in the PurlDB packages and
+    return a mapping of lists of matched CodebaseResources by PurlDB Package.
     """
-    match_count = 0
     sha1_list = list(resources_by_sha1.keys())
     results = Package.objects.using('packagedb').filter(sha1__in=sha1_list)
-    # Process matched Package data
+    resources_by_package = {}
     for package in results:
-        package_data = package.to_dict()
-        sha1 = package_data["sha1"]
-        resources = resources_by_sha1.get(sha1) or []
+        resources = resources_by_sha1.get(package.sha1) or []
+        if resources:
+            resources_by_package[package] = resources
+    return resources_by_package
+
+
+def get_purldb_resource_matches(resources_by_sha1):
+    """
+    Given a mapping of lists of CodebaseResources by their sha1 values,
+    `resources_by_sha1`, look up those sha1 values in the PurlDB resources and
+    return a mapping of lists of matched CodebaseResources by PurlDB Package.
+    """
+    sha1_list = list(resources_by_sha1.keys())
+    results = (
+        Resource.objects.using('packagedb')
+        .filter(sha1__in=sha1_list)
+        .select_related('package')
+    )
+    # Group the matched CodebaseResources by PurlDB Package, such that each
+    # Package is processed once
+    resources_by_package_id = defaultdict(dict)
+    packages_by_id = {}
+    for resource in results:
+        resources = resources_by_sha1.get(resource.sha1) or []
         if not resources:
             continue
-        _, matched_resources_count = create_package_from_purldb_data(
-            project=project,
-            resources=resources,
-            package_data=package_data,
-            status=flag.MATCHED_TO_PURLDB_PACKAGE,
-        )
-        match_count += matched_resources_count
-    return match_count
+        packages_by_id[resource.package_id] = resource.package
+        for codebase_resource in resources:
+            resources_by_package_id[resource.package_id][codebase_resource.pk] = codebase_resource
+
+    return {
+        packages_by_id[package_id]: list(resources.values())
+        for package_id, resources in resources_by_package_id.items()
+    }
+
+
+def match_purldb_package(
+    project,
+    resources_by_sha1,
+    package_data_by_purldb_urls=None,
+    enhance_package_data=True,
+    **kwargs,
+):
+    """
+    Given a mapping of lists of CodebaseResources by their sha1 values,
+    `resources_by_sha1`, look up those sha1 values in the PurlDB packages,
+    process the matched Package data, then return the number of
+    CodebaseResources that were matched to a Package.
+
+    `package_data_by_purldb_urls` is a mapping of package data by their purldb
+    package uuid. This is intended to be used as a cache, to avoid serializing
+    package data we serialized before.
+    """
+    if package_data_by_purldb_urls is None:
+        package_data_by_purldb_urls = {}
+    return create_packages_from_purldb_matches(
+        project=project,
+        resources_by_package=get_purldb_package_matches(resources_by_sha1),
+        package_data_by_purldb_urls=package_data_by_purldb_urls,
+        status=flag.MATCHED_TO_PURLDB_PACKAGE,
+    )
 
 
 def match_purldb_resource(
@@ -136,34 +254,229 @@ def match_purldb_resource(
 ):
     """
     Given a mapping of lists of CodebaseResources by their sha1 values,
-    `resources_by_sha1`, send those sha1 values to purldb resources API
-    endpoint, process the matched Package data, then return the number of
+    `resources_by_sha1`, look up those sha1 values in the PurlDB resources,
+    process the matched Package data, then return the number of
     CodebaseResources that were matched to a Package.
 
     `package_data_by_purldb_urls` is a mapping of package data by their purldb
-    package instance URLs. This is intended to be used as a cache, to avoid
-    retrieving package data we retrieved before.
+    package uuid. This is intended to be used as a cache, to avoid serializing
+    package data we serialized before.
     """
-    package_data_by_purldb_urls = package_data_by_purldb_urls or {}
-    match_count = 0
-    sha1_list = list(resources_by_sha1.keys())
-    results = Resource.objects.using('packagedb').filter(sha1__in=sha1_list)
-    # Process match results
-    for resource in results:
-        # Get package data
-        package_data = resource.package.to_dict()
-        sha1 = resource.sha1
-        resources = resources_by_sha1.get(sha1) or []
-        if not resources:
+    if package_data_by_purldb_urls is None:
+        package_data_by_purldb_urls = {}
+    return create_packages_from_purldb_matches(
+        project=project,
+        resources_by_package=get_purldb_resource_matches(resources_by_sha1),
+        package_data_by_purldb_urls=package_data_by_purldb_urls,
+        status=flag.MATCHED_TO_PURLDB_RESOURCE,
+    )
+
+
+def get_discovered_package_key(package_data):
+    """
+    Return a tuple of the package_uid and Package URL fields used to look up
+    the DiscoveredPackage of a ``package_data`` mapping in a project.
+    """
+    purl_data = DiscoveredPackage.extract_purl_data(package_data)
+    package_uid = package_data.get("package_uid") or ""
+    return (package_uid, *(purl_data[field_name] for field_name in PURL_FIELDS))
+
+
+def get_discovered_packages_by_key(project, keys):
+    """
+    Return a mapping of the existing DiscoveredPackages of `project` by their
+    key from get_discovered_package_key(), for the `keys` list of keys.
+    """
+    lookups = [
+        Q(package_uid=package_uid, **dict(zip(PURL_FIELDS, purl_values)))
+        for package_uid, *purl_values in keys
+    ]
+    discovered_packages_by_key = {}
+    for discovered_package in project.discoveredpackages.filter(reduce(or_, lookups)):
+        key = (
+            discovered_package.package_uid,
+            *(getattr(discovered_package, field_name) for field_name in PURL_FIELDS),
+        )
+        discovered_packages_by_key.setdefault(key, discovered_package)
+    return discovered_packages_by_key
+
+
+def make_discovered_package(project, package_data):
+    """
+    Return a new unsaved DiscoveredPackage of `project` from `package_data`,
+    the same way as DiscoveredPackage.create_from_data, or None if a required
+    field value is missing.
+    """
+    required_fields = ["type", "name"]
+    missing_values = [
+        field_name
+        for field_name in required_fields
+        if not package_data.get(field_name)
+    ]
+    if missing_values:
+        message = (
+            f"No values for the following required fields: "
+            f"{', '.join(missing_values)}"
+        )
+        project.add_warning(
+            description=message, model=DiscoveredPackage, details=package_data
+        )
+        return
+
+    package_data = package_data.copy()
+    qualifiers = package_data.get("qualifiers")
+    if qualifiers:
+        package_data["qualifiers"] = normalize_qualifiers(qualifiers, encode=True)
+
+    model_fields = DiscoveredPackage.model_fields()
+    discovered_package = DiscoveredPackage(
+        project=project,
+        **{
+            field_name: value
+            for field_name, value in package_data.items()
+            if field_name in model_fields and value not in EMPTY_VALUES
+        },
+    )
+    if scanpipe_app.policies_enabled:
+        discovered_package.compliance_alert = discovered_package.compute_compliance_alert()
+    return discovered_package
+
+
+def update_discovered_package(discovered_package, package_data):
+    """
+    Set the empty fields of `discovered_package` from `package_data`, the same
+    way as DiscoveredPackage.update_from_data, without saving.
+    Return a list of the names of the updated fields.
+    """
+    model_fields = DiscoveredPackage.model_fields()
+    updated_fields = []
+    for field_name, value in package_data.items():
+        if (
+            value in EMPTY_VALUES
+            or field_name not in model_fields
+            or field_name in PURL_FIELDS
+        ):
             continue
-        _, matched_resources_count = create_package_from_purldb_data(
-            project=project,
-            resources=resources,
-            package_data=package_data,
-            status=flag.MATCHED_TO_PURLDB_RESOURCE,
+        if not getattr(discovered_package, field_name, None):
+            setattr(discovered_package, field_name, value)
+            updated_fields.append(field_name)
+
+    license_expression_field = discovered_package.license_expression_field
+    if scanpipe_app.policies_enabled and license_expression_field in updated_fields:
+        discovered_package.compliance_alert = discovered_package.compute_compliance_alert()
+        updated_fields.append("compliance_alert")
+
+    datasource_id = package_data.get("datasource_id")
+    if datasource_id and datasource_id not in discovered_package.datasource_ids:
+        discovered_package.datasource_ids = [
+            *discovered_package.datasource_ids, datasource_id
+        ]
+        updated_fields.append("datasource_ids")
+
+    return updated_fields
+
+
+def create_packages_from_purldb_matches(
+    project, resources_by_package, package_data_by_purldb_urls, status
+):
+    """
+    Create a DiscoveredPackage for each PurlDB Package of the
+    `resources_by_package` mapping of lists of matched CodebaseResources by
+    PurlDB Package and assign these CodebaseResources to it with `status`.
+
+    This is the same as calling create_package_from_purldb_data for each
+    PurlDB Package, but the DiscoveredPackages, their CodebaseResources and
+    the statuses are saved with a few bulk queries.
+
+    Return the number of CodebaseResources that were matched to a Package.
+    """
+    if not resources_by_package:
+        return 0
+
+    # list of (package data, DiscoveredPackage key, matched CodebaseResources)
+    matches = []
+    for package, resources in resources_by_package.items():
+        package_data = get_package_data(package, package_data_by_purldb_urls).copy()
+        # Do not re-use uuid from PurlDB as DiscoveredPackage.uuid is unique
+        # and a PurlDB match can be found in different projects.
+        package_data.pop("uuid", None)
+        package_data.pop("dependencies", None)
+        matches.append((package_data, get_discovered_package_key(package_data), resources))
+
+    discovered_packages_by_key = get_discovered_packages_by_key(
+        project, [key for _, key, _ in matches]
+    )
+    new_packages = []
+    updated_packages = {}
+    update_fields = set()
+    # list of (DiscoveredPackage or None, CodebaseResource pks)
+    assignments = []
+    for package_data, key, resources in matches:
+        discovered_package = discovered_packages_by_key.get(key)
+        if discovered_package:
+            updated_fields = update_discovered_package(discovered_package, package_data)
+            if updated_fields and discovered_package.pk:
+                updated_packages[discovered_package.pk] = discovered_package
+                update_fields.update(updated_fields)
+        else:
+            discovered_package = make_discovered_package(project, package_data)
+            if discovered_package:
+                update_discovered_package(discovered_package, package_data)
+                new_packages.append(discovered_package)
+                discovered_packages_by_key[key] = discovered_package
+
+        resources_qs = get_project_resources_qs(project, resources)
+        resource_pks = []
+        if resources_qs is not None:
+            resource_pks = list(resources_qs.values_list("pk", flat=True))
+        assignments.append((discovered_package, resource_pks))
+
+    DiscoveredPackage.objects.bulk_create(new_packages)
+    if updated_packages:
+        DiscoveredPackage.objects.bulk_update(
+            updated_packages.values(), fields=sorted(update_fields)
         )
-        match_count += matched_resources_count
-    return match_count
+
+    DiscoveredPackageResource = DiscoveredPackage.codebase_resources.through
+    DiscoveredPackageResource.objects.bulk_create(
+        [
+            DiscoveredPackageResource(
+                discoveredpackage_id=discovered_package.pk,
+                codebaseresource_id=resource_pk,
+            )
+            for discovered_package, resource_pks in assignments
+            if discovered_package
+            for resource_pk in resource_pks
+        ],
+        ignore_conflicts=True,
+    )
+
+    # Do not count the CodebaseResources already matched to purldb
+    purldb_statuses = [
+        flag.MATCHED_TO_PURLDB_PACKAGE,
+        flag.MATCHED_TO_PURLDB_RESOURCE,
+        flag.MATCHED_TO_PURLDB_DIRECTORY,
+    ]
+    matched_resource_pks = {
+        resource_pk
+        for _, resource_pks in assignments
+        for resource_pk in resource_pks
+    }
+    return (
+        project.codebaseresources
+        .filter(pk__in=matched_resource_pks)
+        .exclude(status__in=purldb_statuses)
+        .update(status=status)
+    )
+
+
+# Mapping of {matcher function: (lookup function, status)} for the matcher
+# functions of match_purldb_resources() whose PurlDB lookups can run in worker
+# processes. See match_in_shards().
+PURLDB_LOOKUPS_BY_MATCHER = {
+    match_purldb_package: (get_purldb_package_matches, flag.MATCHED_TO_PURLDB_PACKAGE),
+    match_purldb_resource: (get_purldb_resource_matches, flag.MATCHED_TO_PURLDB_RESOURCE),
+}
 
 
 def match_purldb_resource_approximately(project, resource):
@@ -254,6 +567,30 @@ def match_purldb_resources(
     )
 
 
+def get_resources_by_sha1_shards(resources, chunk_size=1000):
+    """
+    Yield mappings of lists of CodebaseResources by their sha1 values for
+    each chunk of `chunk_size` CodebaseResources of the `resources` iterable.
+    """
+    for resources_batch in get_batches(resources, chunk_size):
+        resources_by_sha1 = defaultdict(list)
+        for to_resource in resources_batch:
+            resources_by_sha1[to_resource.sha1].append(to_resource)
+            if to_resource.path.endswith(".map"):
+                for js_sha1 in js.source_content_sha1_list(to_resource):
+                    resources_by_sha1[js_sha1].append(to_resource)
+        yield resources_by_sha1
+
+
+def lookup_sha1s_in_purldb(lookup_func, resources_by_sha1):
+    """
+    Return a tuple of the number of sha1s of `resources_by_sha1` and a list of
+    (PurlDB Package, matched CodebaseResources) tuples from `lookup_func`.
+    """
+    resources_by_package = lookup_func(resources_by_sha1)
+    return len(resources_by_sha1), list(resources_by_package.items())
+
+
 def _match_purldb_resources(
     project, resources, matcher_func, chunk_size=1000, logger=None
 ):
@@ -262,19 +599,28 @@ def _match_purldb_resources(
     progress = LoopProgress(resource_count, logger)
     total_matched_count = 0
     total_sha1_count = 0
-    processed_resources_count = 0
-    resources_by_sha1 = defaultdict(list)
     package_data_by_purldb_urls = {}
 
-    for to_resource in progress.iter(resource_iterator):
-        resources_by_sha1[to_resource.sha1].append(to_resource)
-        if to_resource.path.endswith(".map"):
-            for js_sha1 in js.source_content_sha1_list(to_resource):
-                resources_by_sha1[js_sha1].append(to_resource)
-        processed_resources_count += 1
+    # CodebaseResources are ordered by path: each shard is a range of paths
+    shards = get_resources_by_sha1_shards(
+        resources=progress.iter(resource_iterator),
+        chunk_size=chunk_size,
+    )
 
-        if processed_resources_count % chunk_size == 0:
-            resources_by_sha1, matched_count, sha1_count = match_sha1s_to_purldb(
+    if matcher_func in PURLDB_LOOKUPS_BY_MATCHER:
+        lookup_func, status = PURLDB_LOOKUPS_BY_MATCHER[matcher_func]
+        results = match_in_shards(partial(lookup_sha1s_in_purldb, lookup_func), shards)
+        for sha1_count, resources_by_package in results:
+            total_matched_count += create_packages_from_purldb_matches(
+                project=project,
+                resources_by_package=dict(resources_by_package),
+                package_data_by_purldb_urls=package_data_by_purldb_urls,
+                status=status,
+            )
+            total_sha1_count += sha1_count
+    else:
+        for resources_by_sha1 in shards:
+            _, matched_count, sha1_count = match_sha1s_to_purldb(
                 project=project,
                 resources_by_sha1=resources_by_sha1,
                 matcher_func=matcher_func,
@@ -283,23 +629,34 @@ def _match_purldb_resources(
             total_matched_count += matched_count
             total_sha1_count += sha1_count
 
-    if resources_by_sha1:
-        resources_by_sha1, matched_count, sha1_count = match_sha1s_to_purldb(
-            project=project,
-            resources_by_sha1=resources_by_sha1,
-            matcher_func=matcher_func,
-            package_data_by_purldb_urls=package_data_by_purldb_urls,
-        )
-        total_matched_count += matched_count
-        total_sha1_count += sha1_count
-
     logger(
         f"{total_matched_count:,d} resources matched in PurlDB "
         f"using {total_sha1_count:,d} SHA1s"
     )
 
 
-def match_purldb_resources_approximately(project, logger=None):
+def get_approximate_resource_matches(resources, batch_size=1000):
+    """
+    Match by approximation the ``resources`` CodebaseResources in the PurlDB.
+    Return a list of (CodebaseResource, matched PurlDB Package) tuples for the
+    matched CodebaseResources.
+    """
+    fingerprints_with_resources = [
+        (resource.extra_data.get("halo1", ""), resource)
+        for resource in resources
+    ]
+    results = ApproximateResourceContentIndex.match_many(
+        fingerprints_with_resources,
+        batch_size=batch_size,
+    )
+    return [
+        (resource, matches[0].package)
+        for resource, matches in zip(resources, results)
+        if matches
+    ]
+
+
+def match_purldb_resources_approximately(project, logger=None, batch_size=1000):
     # Get table of resources to match on
     resources = (
         project.codebaseresources.filter(is_text=True)
@@ -317,11 +674,23 @@ def match_purldb_resources_approximately(project, logger=None):
 
     resource_iterator = resources.iterator(chunk_size=2000)
     progress = LoopProgress(resource_count, logger)
+    resource_iterator = progress.iter(resource_iterator)
 
-    for resource in progress.iter(resource_iterator):
-        match_purldb_resource_approximately(
-            project,
-            resource,
+    package_data_by_purldb_urls = {}
+    # Match resources by batches to avoid making queries for every resource
+    results = match_in_shards(
+        partial(get_approximate_resource_matches, batch_size=batch_size),
+        get_batches(resource_iterator, batch_size),
+    )
+    for matched_resources in results:
+        resources_by_package = defaultdict(list)
+        for resource, package in matched_resources:
+            resources_by_package[package].append(resource)
+        create_packages_from_purldb_matches(
+            project=project,
+            resources_by_package=resources_by_package,
+            package_data_by_purldb_urls=package_data_by_purldb_urls,
+            status=flag.APPROXIMATE_MATCHED_TO_PURLDB_RESOURCE,
         )
 
     matched_count = (
@@ -335,7 +704,38 @@ def match_purldb_resources_approximately(project, logger=None):
     )
 
 
-def match_purldb_directories(project, exact_directory_match=False, logger=None):
+class PathTrie:
+    """
+    A prefix tree of resource paths, by path segment, used to keep track of the
+    directories claimed by a match.
+    """
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, path):
+        """Claim ``path`` and all its descendants."""
+        node = self.root
+        for segment in path.strip("/").split("/"):
+            node = node.setdefault(segment, {})
+        # A None key marks a claimed path
+        node[None] = True
+
+    def is_claimed(self, path):
+        """Return True if ``path`` or one of its ancestors is claimed."""
+        node = self.root
+        for segment in path.strip("/").split("/"):
+            node = node.get(segment)
+            if node is None:
+                return False
+            if None in node:
+                return True
+        return False
+
+
+def match_purldb_directories(
+    project, exact_directory_match=False, logger=None, batch_size=1000
+):
     """Match directory CodebaseResources from `project` against the PurlDB."""
     # If we are able to get match results for a directory fingerprint, then that
     # means every resource and directory under that directory is part of a
@@ -346,7 +746,6 @@ def match_purldb_directories(project, exact_directory_match=False, logger=None):
     directories = (
         project.codebaseresources.directories()
         .no_status(status=flag.MATCHED_TO_PURLDB_PACKAGE)
-        .order_by("path")
     )
     directory_count = directories.count()
 
@@ -356,17 +755,43 @@ def match_purldb_directories(project, exact_directory_match=False, logger=None):
             f"director{pluralize(directory_count, 'y,ies')} against PurlDB"
         )
 
-    directory_iterator = directories.iterator(chunk_size=2000)
+    # Directories are matched top-down, one depth level at a time. Matched
+    # directory paths are claimed in `claimed_paths` and the directories under
+    # a claimed path are skipped. The directories of the same depth cannot
+    # claim each other: they are matched in batches, and these batches can be
+    # matched in worker processes.
+    directories = sorted(
+        directories.iterator(chunk_size=2000),
+        key=lambda directory: (directory.path.count("/"), directory.path),
+    )
     progress = LoopProgress(directory_count, logger)
+    claimed_paths = PathTrie()
+    package_data_by_purldb_urls = {}
+    lookup_func = partial(get_directory_matches, exact_match=exact_directory_match)
 
-    for directory in progress.iter(directory_iterator):
-        directory.refresh_from_db()
-        if directory.status != flag.MATCHED_TO_PURLDB_DIRECTORY:
-            match_purldb_directory(
-                project,
-                directory,
-                exact_directory_match
-            )
+    directories_by_depth = groupby(
+        progress.iter(directories),
+        key=lambda directory: directory.path.count("/"),
+    )
+    for _depth, depth_directories in directories_by_depth:
+        directories_to_match = []
+        for directory in depth_directories:
+            if directory.status == flag.MATCHED_TO_PURLDB_DIRECTORY:
+                claimed_paths.add(directory.path)
+            elif not claimed_paths.is_claimed(directory.path):
+                directories_to_match.append(directory)
+
+        results = match_in_shards(
+            lookup_func,
+            get_batches(directories_to_match, batch_size),
+        )
+        for matched_directories in results:
+            for directory, package in matched_directories:
+                package_data = get_package_data(package, package_data_by_purldb_urls)
+                create_package_from_purldb_data(
+                    project, [directory], package_data, flag.MATCHED_TO_PURLDB_DIRECTORY
+                )
+                claimed_paths.add(directory.path)
 
     matched_count = (
         project.codebaseresources.directories()
@@ -379,6 +804,27 @@ def match_purldb_directories(project, exact_directory_match=False, logger=None):
     )
 
 
+def get_directory_matches(directories, exact_match=False):
+    """
+    Match the ``directories`` CodebaseResources in the PurlDB. Return a list
+    of (CodebaseResource, matched PurlDB Package) tuples for the matched
+    directories.
+    """
+    fingerprints_with_resources = [
+        (directory.extra_data.get("directory_content", ""), directory)
+        for directory in directories
+    ]
+    results = ApproximateDirectoryContentIndex.match_many(
+        fingerprints_with_resources,
+        exact_match=exact_match,
+    )
+    return [
+        (directory, matches[0].package)
+        for directory, matches in zip(directories, results)
+        if matches
+    ]
+
+
 def match_purldb_resources_post_process(project, logger=None):
     """Choose the best package for PurlDB matched resources."""
     extract_directories = (
@@ -398,55 +844,129 @@ def match_purldb_resources_post_process(project, logger=None):
             f"{flag.MATCHED_TO_PURLDB_RESOURCE} archives."
         )
 
-    resource_iterator = extract_directories.iterator(chunk_size=2000)
+    # The packages of all the matched resources are loaded once and the best
+    # package of each resource is chosen in memory for each extract directory.
+    # The changed package assignments are saved at the end.
+    resource_packages = get_resource_packages(resources)
+    packages_by_resource_id = {
+        resource_id: list(package_ids)
+        for _, resource_id, package_ids in resource_packages
+    }
+    resource_paths = [path for path, _, _ in resource_packages]
+
+    directory_paths = extract_directories.values_list("path", flat=True)
+    resource_iterator = directory_paths.iterator(chunk_size=2000)
     progress = LoopProgress(resource_count, logger)
     map_count = 0
 
-    for directory in progress.iter(resource_iterator):
+    for directory_path in progress.iter(resource_iterator):
         map_count += _match_purldb_resources_post_process(
-            directory.path, resources
+            directory_path, resource_packages, resource_paths, packages_by_resource_id
         )
 
+    save_resource_packages(resource_packages, packages_by_resource_id)
+
     logger(f"{map_count:,d} resource processed")
 
 
+def get_resource_packages(resources):
+    """
+    Return a list of (path, resource id, tuple of DiscoveredPackage ids)
+    tuples sorted by path for the ``resources`` CodebaseResource queryset,
+    using a single query. The DiscoveredPackage ids of a resource are sorted
+    by DiscoveredPackage uuid.
+    """
+    links = (
+        resources.order_by("path", "discovered_packages__uuid")
+        .values_list("path", "id", "discovered_packages__id")
+        .iterator(chunk_size=2000)
+    )
+    resource_packages = []
+    for (path, resource_id), resource_links in groupby(
+        links, key=lambda link: link[:2]
+    ):
+        package_ids = tuple(
+            package_id for _, _, package_id in resource_links if package_id
+        )
+        resource_packages.append((path, resource_id, package_ids))
+    # The database collation may not sort paths as Python does
+    resource_packages.sort()
+    return resource_packages
+
+
 def _match_purldb_resources_post_process(
-    directory_path, codebase_resources
+    directory_path, resource_packages, resource_paths, packages_by_resource_id
 ):
+    """
+    Assign each resource of the ``directory_path`` extract directory to the
+    package that has the most resources in this directory, among its packages.
+
+    ``resource_packages`` and ``resource_paths`` are the sorted resources from
+    get_resource_packages() and their paths. ``packages_by_resource_id`` is a
+    mapping of the current lists of DiscoveredPackage ids by resource id that is
+    updated in place.
+
+    Return the number of resources of the extract directory.
+    """
     # Exclude the content of nested archive.
-    interesting_codebase_resources = (
-        codebase_resources.filter(path__startswith=directory_path)
-        .filter(status=flag.MATCHED_TO_PURLDB_RESOURCE)
-        .exclude(path__regex=rf"^{directory_path}.*-extract\/.*$")
-    )
+    interesting_resource_ids = []
+    start = bisect_left(resource_paths, directory_path)
+    for index in range(start, len(resource_packages)):
+        path, resource_id, _ = resource_packages[index]
+        if not path.startswith(directory_path):
+            break
+        if "-extract/" in path[len(directory_path):]:
+            continue
+        interesting_resource_ids.append(resource_id)
 
-    if not interesting_codebase_resources:
+    if not interesting_resource_ids:
         return 0
 
     packages_map = {}
-
-    for resource in interesting_codebase_resources:
-        for package in resource.discovered_packages.all():
-            if package in packages_map:
-                packages_map[package].append(resource)
-            else:
-                packages_map[package] = [resource]
+    for resource_id in interesting_resource_ids:
+        for package_id in packages_by_resource_id[resource_id]:
+            packages_map.setdefault(package_id, []).append(resource_id)
 
     # Rank the packages by most number of matched resources.
-    ranked_packages = dict(
-        sorted(packages_map.items(), key=lambda item: len(item[1]), reverse=True)
+    ranked_packages = sorted(
+        packages_map.items(), key=lambda item: len(item[1]), reverse=True
     )
 
-    for resource in interesting_codebase_resources:
-        resource.discovered_packages.clear()
+    for resource_id in interesting_resource_ids:
+        packages_by_resource_id[resource_id] = []
 
-    for package, resources in ranked_packages.items():
-        unmapped_resources = [
-            resource
-            for resource in resources
-            if not resource.discovered_packages.exists()
-        ]
-        if unmapped_resources:
-            package.add_resources(unmapped_resources)
+    for package_id, resource_ids in ranked_packages:
+        for resource_id in resource_ids:
+            package_ids = packages_by_resource_id[resource_id]
+            if not package_ids:
+                package_ids.append(package_id)
+
+    return len(interesting_resource_ids)
+
+
+def save_resource_packages(resource_packages, packages_by_resource_id, batch_size=5000):
+    """
+    Save the DiscoveredPackage assignments of ``packages_by_resource_id`` for
+    the resources whose packages changed from their ``resource_packages``
+    original packages, in bulk.
+    """
+    ResourcePackage = DiscoveredPackage.codebase_resources.through
+    changed_resource_ids = []
+    new_links = []
+    for _, resource_id, package_ids in resource_packages:
+        new_package_ids = packages_by_resource_id[resource_id]
+        if list(package_ids) == new_package_ids:
+            continue
+        changed_resource_ids.append(resource_id)
+        new_links.extend(
+            ResourcePackage(codebaseresource_id=resource_id, discoveredpackage_id=package_id)
+            for package_id in new_package_ids
+        )
+
+    if not changed_resource_ids:
+        return
 
-    return interesting_codebase_resources.count()
+    with transaction.atomic():
+        for resource_ids in get_batches(changed_resource_ids, batch_size):
+            ResourcePackage.objects.filter(codebaseresource_id__in=resource_ids).delete()
+        ResourcePackage.objects.bulk_create(new_links, batch_size=batch_size)
@@ -1,9 +1,19 @@
 import io
+import logging
+import os
+import time
 import uuid
 from pathlib import Path
+from unittest import mock
+from unittest import skipUnless
 
+from django.db import connection
+from django.db import transaction
 from django.test import TestCase
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from scanpipe import pipes
+from scanpipe.models import CodebaseResource
 from scanpipe.models import Project
 from scanpipe.pipes import flag
 from scanpipe.pipes.input import copy_inputs
@@ -18,6 +28,8 @@ from matchcode_pipeline.pipes import matching
 from packagedb.models import Package
 from packagedb.models import Resource
 
+logger = logging.getLogger(__name__)
+
 
 class MatchingPipesTest(TestCase):
     data_location = Path(__file__).parent.parent / "data"
@@ -137,6 +149,46 @@ class MatchingPipesTest(TestCase):
             self.assertEqual("matched-to-purldb-directory", resource.status)
             self.assertEqual(package, resource.discovered_packages.get())
 
+    def test_matchcode_pipeline_pipes_matching_match_purldb_directories_skips_claimed_subtrees(self):
+        to_1 = make_resource_directory(
+            self.project1,
+            "package.jar-extract",
+            extra_data={"directory_content": "00000003238f6ed2c218090d4da80b3b42160e69"},
+        )
+        # The subdirectory also matches, but is claimed by its parent
+        to_2 = make_resource_directory(
+            self.project1,
+            "package.jar-extract/sub",
+            extra_data={"directory_content": "00000003238f6ed2c218090d4da80b3b42160e69"},
+        )
+        to_3 = make_resource_file(self.project1, "package.jar-extract/sub/a.class")
+
+        with mock.patch.object(
+            ApproximateDirectoryContentIndex,
+            "match_many",
+            wraps=ApproximateDirectoryContentIndex.match_many,
+        ) as match_many:
+            matching.match_purldb_directories(self.project1, logger=io.StringIO().write)
+
+        self.assertEqual(1, match_many.call_count)
+        (fingerprints_with_resources,), _ = match_many.call_args
+        self.assertEqual([to_1], [resource for _, resource in fingerprints_with_resources])
+
+        package = self.project1.discoveredpackages.get()
+        for resource in [to_1, to_2, to_3]:
+            resource.refresh_from_db()
+            self.assertEqual("matched-to-purldb-directory", resource.status)
+            self.assertEqual(package, resource.discovered_packages.get())
+
+    def test_matchcode_pipeline_pipes_matching_path_trie(self):
+        claimed_paths = matching.PathTrie()
+        claimed_paths.add("foo/bar")
+        self.assertTrue(claimed_paths.is_claimed("foo/bar"))
+        self.assertTrue(claimed_paths.is_claimed("foo/bar/baz.c"))
+        self.assertFalse(claimed_paths.is_claimed("foo"))
+        self.assertFalse(claimed_paths.is_claimed("foo/bar-extract"))
+        self.assertFalse(claimed_paths.is_claimed("foo/baz/bar"))
+
 
     def test_matchcode_pipeline_pipes_matching_match_purldb_resources_post_process(self):
         to_map = self.data_location / "d2d-javascript" / "to" / "main.js.map"
@@ -202,6 +254,53 @@ class MatchingPipesTest(TestCase):
         self.assertEqual(2, package1_resource_count)
         self.assertEqual(0, package2_resource_count)
 
+    def test_matchcode_pipeline_pipes_matching_match_purldb_resources_post_process_query_count(self):
+        def make_archive(index):
+            archive_path = f"lib/archive{index}.jar-extract"
+            make_resource_directory(self.project1, archive_path)
+            resources = [
+                make_resource_file(
+                    self.project1,
+                    f"{archive_path}/{name}",
+                    status=flag.MATCHED_TO_PURLDB_RESOURCE,
+                )
+                for name in ("a.class", "b.class", "nested.jar-extract/c.class")
+            ]
+            a, b, nested = resources
+            package_data = package_data1.copy()
+            package_data["version"] = f"{index}.0"
+            package_data.pop("package_uid", None)
+            package1, _ = matching.create_package_from_purldb_data(
+                self.project1, [a, b], package_data, flag.MATCHED_TO_PURLDB_RESOURCE
+            )
+            package_data = package_data2.copy()
+            package_data["version"] = f"{index}.0"
+            package_data.pop("package_uid", None)
+            package2, _ = matching.create_package_from_purldb_data(
+                self.project1, [b, nested], package_data, flag.MATCHED_TO_PURLDB_RESOURCE
+            )
+            return resources, package1, package2
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                matching.match_purldb_resources_post_process(
+                    self.project1, logger=io.StringIO().write
+                )
+            return len(queries)
+
+        archives = [make_archive(1)]
+        one_archive_query_count = count_queries()
+        archives.extend(make_archive(index) for index in range(2, 6))
+        self.assertEqual(one_archive_query_count, count_queries())
+
+        for (a, b, nested), package1, package2 in archives:
+            # b is in both packages and is assigned to the package with the
+            # most resources in the archive
+            self.assertEqual([package1], list(a.discovered_packages.all()))
+            self.assertEqual([package1], list(b.discovered_packages.all()))
+            # The content of the nested archive is not refined
+            self.assertEqual([package2], list(nested.discovered_packages.all()))
+
     def test_matchcode_pipeline_pipes_matching_match_purldb_resource_approximately(self):
         resource = make_resource_file(
             self.project1,
@@ -227,3 +326,233 @@ class MatchingPipesTest(TestCase):
         resource.refresh_from_db()
         self.assertEqual("approximate-matched-to-purldb-resource", resource.status)
         self.assertEqual(package, resource.discovered_packages.get())
+
+    def test_matchcode_pipeline_pipes_matching_match_purldb_resource_groups_by_package(self):
+        Resource.objects.create(path="a.class", sha1="aaaa", package=self.package1)
+        Resource.objects.create(path="b.class", sha1="bbbb", package=self.package1)
+        to_1 = make_resource_file(self.project1, "a.class", sha1="aaaa")
+        to_2 = make_resource_file(self.project1, "b.class", sha1="bbbb")
+
+        package_data_by_purldb_urls = {}
+        matched_count = matching.match_purldb_resource(
+            self.project1,
+            resources_by_sha1={"aaaa": [to_1], "bbbb": [to_2]},
+            package_data_by_purldb_urls=package_data_by_purldb_urls,
+        )
+        self.assertEqual(2, matched_count)
+        self.assertEqual([str(self.package1.uuid)], list(package_data_by_purldb_urls))
+
+        package = self.project1.discoveredpackages.get()
+        for resource in [to_1, to_2]:
+            resource.refresh_from_db()
+            self.assertEqual(flag.MATCHED_TO_PURLDB_RESOURCE, resource.status)
+            self.assertEqual(package, resource.discovered_packages.get())
+
+    def test_matchcode_pipeline_pipes_matching_create_packages_from_purldb_matches_in_bulk(self):
+        purldb_packages = []
+        resources_by_package = {}
+        for i in range(5):
+            purldb_package = Package.objects.create(
+                type="maven",
+                name=f"package{i}",
+                version="1.0",
+                download_url=f"https://example.com/package{i}.jar",
+            )
+            purldb_packages.append(purldb_package)
+            resources_by_package[purldb_package] = [
+                make_resource_file(self.project1, f"package{i}/{name}.class")
+                for name in ("a", "b")
+            ]
+        # an existing DiscoveredPackage is reused and its empty fields are set
+        existing = pipes.update_or_create_package(
+            self.project1,
+            {
+                "type": "maven",
+                "name": "package0",
+                "version": "1.0",
+                "package_uid": purldb_packages[0].package_uid,
+            },
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            matched_count = matching.create_packages_from_purldb_matches(
+                project=self.project1,
+                resources_by_package=resources_by_package,
+                package_data_by_purldb_urls={},
+                status=flag.MATCHED_TO_PURLDB_RESOURCE,
+            )
+        self.assertEqual(10, matched_count)
+        # one lookup of the existing packages and of the resources of each
+        # package, then bulk queries to save the packages and their resources
+        self.assertLessEqual(len(queries), len(purldb_packages) + 6)
+
+        self.assertEqual(5, self.project1.discoveredpackages.count())
+        existing.refresh_from_db()
+        self.assertEqual("https://example.com/package0.jar", existing.download_url)
+        for purldb_package, resources in resources_by_package.items():
+            package = self.project1.discoveredpackages.get(name=purldb_package.name)
+            self.assertEqual(
+                sorted(resource.path for resource in resources),
+                sorted(package.codebase_resources.values_list("path", flat=True)),
+            )
+            for resource in resources:
+                resource.refresh_from_db()
+                self.assertEqual(flag.MATCHED_TO_PURLDB_RESOURCE, resource.status)
+
+
+def get_shard_and_pid(shard):
+    return shard, os.getpid()
+
+
+@mock.patch.object(matching, "get_max_workers", return_value=2)
+class MatchingPipesWorkerProcessesTest(TransactionTestCase):
+    databases = {"packagedb", "default"}
+
+    def setUp(self):
+        self.project1 = Project.objects.create(name="Analysis")
+        self.package1 = Package.objects.create(
+            type=package_data1["type"],
+            namespace=package_data1["namespace"],
+            name=package_data1["name"],
+            version=package_data1["version"],
+            sha1="abcdef",
+            download_url="https://example.com/package1.jar",
+        )
+        self.package2 = Package.objects.create(
+            type=package_data2["type"],
+            namespace=package_data2["namespace"],
+            name=package_data2["name"],
+            version=package_data2["version"],
+            download_url="https://example.com/package2.zip",
+        )
+        Resource.objects.create(path="b.class", sha1="b" * 40, package=self.package2)
+        ApproximateDirectoryContentIndex.index(
+            fingerprint="00000003238f6ed2c218090d4da80b3b42160e69",
+            resource_path="package.jar-extract",
+            package=self.package1,
+        )
+
+    def test_matchcode_pipeline_pipes_matching_match_in_shards(self, get_max_workers):
+        results = list(matching.match_in_shards(get_shard_and_pid, [1, 2, 3]))
+        self.assertEqual([1, 2, 3], [shard for shard, _ in results])
+        self.assertNotIn(os.getpid(), [pid for _, pid in results])
+
+    def test_matchcode_pipeline_pipes_matching_match_in_shards_in_transaction(self, get_max_workers):
+        with transaction.atomic():
+            results = list(matching.match_in_shards(get_shard_and_pid, [1, 2, 3]))
+        self.assertEqual([(1, os.getpid()), (2, os.getpid()), (3, os.getpid())], results)
+
+    def test_matchcode_pipeline_pipes_matching_match_purldb_resources_in_worker_processes(self, get_max_workers):
+        to_1 = make_resource_file(self.project1, "a/a.class", sha1="b" * 40)
+        to_2 = make_resource_file(self.project1, "b/b.class", sha1="b" * 40)
+        to_3 = make_resource_file(self.project1, "c/c.class", sha1="c" * 40)
+
+        buffer = io.StringIO()
+        matching.match_purldb_resources(
+            self.project1,
+            matcher_func=matching.match_purldb_resource,
+            chunk_size=1,
+            logger=buffer.write,
+        )
+        self.assertIn("2 resources matched in PurlDB using 3 SHA1s", buffer.getvalue())
+
+        package = self.project1.discoveredpackages.get()
+        self.assertEqual(package_data2["name"], package.name)
+        for resource in [to_1, to_2]:
+            resource.refresh_from_db()
+            self.assertEqual(flag.MATCHED_TO_PURLDB_RESOURCE, resource.status)
+            self.assertEqual(package, resource.discovered_packages.get())
+        to_3.refresh_from_db()
+        self.assertEqual("", to_3.status)
+
+    def test_matchcode_pipeline_pipes_matching_match_purldb_directories_in_worker_processes(self, get_max_workers):
+        fingerprint = "00000003238f6ed2c218090d4da80b3b42160e69"
+        to_1 = make_resource_directory(
+            self.project1, "a", extra_data={"directory_content": fingerprint}
+        )
+        to_2 = make_resource_directory(
+            self.project1, "a/sub", extra_data={"directory_content": fingerprint}
+        )
+        to_3 = make_resource_directory(
+            self.project1, "b", extra_data={"directory_content": fingerprint}
+        )
+        to_4 = make_resource_directory(self.project1, "c")
+
+        matching.match_purldb_directories(
+            self.project1,
+            logger=io.StringIO().write,
+            batch_size=1,
+        )
+
+        package = self.project1.discoveredpackages.get()
+        self.assertEqual(package_data1["name"], package.name)
+        for resource in [to_1, to_2, to_3]:
+            resource.refresh_from_db()
+            self.assertEqual(flag.MATCHED_TO_PURLDB_DIRECTORY, resource.status)
+        to_4.refresh_from_db()
+        self.assertEqual("", to_4.status)
+
+
+@skipUnless(os.environ.get("MATCHCODE_BENCHMARK"), "Set MATCHCODE_BENCHMARK=1 to run benchmarks")
+class MatchingPipesBenchmarkTest(TestCase):
+    """
+    Benchmark PurlDB matching on a synthetic project. The number of files is
+    set with the MATCHCODE_BENCHMARK_FILE_COUNT environment variable.
+    """
+    databases = {"packagedb", "default"}
+
+    def setUp(self):
+        self.file_count = int(os.environ.get("MATCHCODE_BENCHMARK_FILE_COUNT", 100_000))
+        self.project1 = Project.objects.create(name="Benchmark")
+        packages = Package.objects.bulk_create(
+            Package(
+                type="maven",
+                name=f"package{i}",
+                version="1.0",
+                download_url=f"https://example.com/package{i}-1.0.jar",
+            )
+            for i in range(100)
+        )
+
+        codebase_resources = []
+        purldb_resources = []
+        for i in range(self.file_count):
+            sha1 = f"{i:040x}"
+            path = f"dir{i // 1000}/file{i}.class"
+            codebase_resources.append(
+                CodebaseResource(
+                    project=self.project1,
+                    path=path,
+                    name=f"file{i}.class",
+                    type=CodebaseResource.Type.FILE,
+                    sha1=sha1,
+                )
+            )
+            # Only half of the files are known by the PurlDB
+            if i % 2:
+                purldb_resources.append(
+                    Resource(path=path, sha1=sha1, package=packages[i % len(packages)])
+                )
+        CodebaseResource.objects.bulk_create(codebase_resources, batch_size=5000)
+        Resource.objects.bulk_create(purldb_resources, batch_size=5000)
+
+    def test_matchcode_pipeline_pipes_matching_match_purldb_resources_benchmark(self):
+        buffer = io.StringIO()
+        start = time.perf_counter()
+        matching.match_purldb_resources(
+            self.project1,
+            matcher_func=matching.match_purldb_resource,
+            logger=buffer.write,
+        )
+        duration = time.perf_counter() - start
+        logger.info(
+            f"match_purldb_resources: {self.file_count:,d} files "
+            f"in {duration:.2f}s ({self.file_count / duration:,.0f} files/s)"
+        )
+
+        matched_count = (
+            self.project1.codebaseresources
+            .filter(status=flag.MATCHED_TO_PURLDB_RESOURCE)
+            .count()
+        )
+        self.assertEqual(self.file_count // 2, matched_count)
@@ -43,6 +43,14 @@ if not MATCHCODEIO_REQUIRE_AUTHENTICATION:
         "rest_framework.permissions.AllowAny",
     )
 
+# Load the approximate matching fingerprints in memory for faster lookups
+MATCHCODE_RESIDENT_INDEX = env.bool("MATCHCODE_RESIDENT_INDEX", default=False)
+
+# Refresh the in-memory fingerprints with the new database rows every N seconds
+MATCHCODE_RESIDENT_INDEX_REFRESH_INTERVAL = env.int(
+    "MATCHCODE_RESIDENT_INDEX_REFRESH_INTERVAL", default=60
+)
+
 INSTALLED_APPS += [
     'clearcode',
     'clearindex',
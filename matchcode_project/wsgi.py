@@ -23,3 +23,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "matchcode_project.settings")
 
 application = get_wsgi_application()
+
+# Load the resident matching indexes when the worker starts, if enabled
+from matchcode.index import load_resident_indexes  # NOQA
+
+load_resident_indexes()
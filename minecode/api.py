@@ -7,7 +7,6 @@
 # See https://aboutcode.org for more information about nexB OSS projects.
 #
 
-from django.db import transaction
 from django.utils import timezone
 from packageurl import PackageURL
 from rest_framework import serializers, status, viewsets
@@ -22,7 +21,7 @@ from minecode import priority_router
 from minecode.models import PriorityResourceURI, ResourceURI, ScannableURI
 from minecode.permissions import IsScanQueueWorkerAPIUser
 from minecode.utils import validate_uuid
-from minecode.utils import get_temp_file
+from minecode.utils import save_uploaded_file
 
 
 class ResourceURISerializer(serializers.ModelSerializer):
@@ -104,24 +103,26 @@ class ScannableURIViewSet(viewsets.ModelViewSet):
         """
         Return download url for next Package on scan queue
         """
-        with transaction.atomic():
-            scannable_uri = ScannableURI.objects.get_next_scannable()
-            if scannable_uri:
-                response = {
-                    'scannable_uri_uuid': scannable_uri.uuid,
-                    'download_url': scannable_uri.uri,
-                    'pipelines': scannable_uri.pipelines,
-                }
-                scannable_uri.scan_status = ScannableURI.SCAN_SUBMITTED
-                scannable_uri.scan_date = timezone.now()
-                scannable_uri.save()
-            else:
-                response = {
-                    'scannable_uri_uuid': '',
-                    'download_url': '',
-                    'pipelines': [],
-                }
-            return Response(response)
+        # Claim the next ScannableURI and mark it as submitted in one query
+        scannable_uris = ScannableURI.objects.get_next_batch(
+            1,
+            scan_status=ScannableURI.SCAN_SUBMITTED,
+            scan_date=timezone.now(),
+        )
+        if scannable_uris:
+            scannable_uri = scannable_uris[0]
+            response = {
+                'scannable_uri_uuid': scannable_uri.uuid,
+                'download_url': scannable_uri.uri,
+                'pipelines': scannable_uri.pipelines,
+            }
+        else:
+            response = {
+                'scannable_uri_uuid': '',
+                'download_url': '',
+                'pipelines': [],
+            }
+        return Response(response)
 
     @action(detail=False, methods=['post'])
     def update_status(self, request, *args, **kwargs):
@@ -135,7 +136,8 @@ class ScannableURIViewSet(viewsets.ModelViewSet):
         If `scan_status` is 'scanned', then a `scan_results_file`,
         `scan_summary_file`, and `project_extra_data` mapping are expected.
         `scan_results_file`, `scan_summary_file`, and `project_extra_data` are
-        then used to update Package data and its Resources.
+        then used to update Package data and its Resources. The files can be
+        compressed with gzip or zstd.
         """
         scannable_uri_uuid = request.data.get('scannable_uri_uuid')
         scan_status = request.data.get('scan_status')
@@ -201,19 +203,17 @@ class ScannableURIViewSet(viewsets.ModelViewSet):
             scan_summary_file = request.data.get('scan_summary_file')
             project_extra_data = request.data.get('project_extra_data')
 
-            # Save results to temporary files
-            scan_results_location = get_temp_file(
+            # Save results to temporary files, without reading them in memory
+            scan_results_location = save_uploaded_file(
+                scan_results_file,
                 file_name='scan_results',
                 extension='.json'
             )
-            scan_summary_location = get_temp_file(
+            scan_summary_location = save_uploaded_file(
+                scan_summary_file,
                 file_name='scan_summary',
                 extension='.json'
             )
-            with open(scan_results_location, 'wb') as f:
-                f.write(scan_results_file.read())
-            with open(scan_summary_location, 'wb') as f:
-                f.write(scan_summary_file.read())
 
             scannable_uri.process_scan_results(
                 scan_results_location=scan_results_location,
@@ -230,8 +230,9 @@ class ScannableURIViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def statistics(self, request, *args, **kwargs):
         """
-        Return a scan queue statistics.
+        Return a scan queue statistics. These are refreshed periodically by
+        the scheduler.
         """
-        response = ScannableURI.objects.statistics()
+        response = ScannableURI.objects.cached_statistics()
         return Response(response)
 
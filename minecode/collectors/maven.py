@@ -1,19 +1,34 @@
 from dateutil.parser import parse as dateutil_parse
+import javaproperties
 from minecode.visitors.maven import get_artifacts, is_worthy_artifact, build_url_and_filename
+from minecode.visitors.maven import get_index_increments
+from minecode.visitors.maven import get_index_state
 from packagedcode.maven import get_urls
 from minecode.utils import fetch_http, get_temp_file
 from packagedcode.models import PackageData
 
 
 MAVEN_INDEX_URL = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.gz'
+MAVEN_INDEX_PROPERTIES_URL = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.properties'
+MAVEN_INDEX_INCREMENT_URL = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.{index}.gz'
 
 
 class MavenNexusCollector:
     """
     Download and process a Nexus Maven index file.
     WARNING: Processing is rather long: a full index is ~600MB.
+
+    When the `chain_id` and `last_incremental` id of the indexes processed by
+    an earlier run are provided, only the new incremental indexes are
+    processed, unless the full index must be processed again. The `state` of
+    the indexes processed is available once the packages are collected.
     """
 
+    def __init__(self, chain_id=None, last_incremental=None):
+        self.chain_id = chain_id
+        self.last_incremental = last_incremental
+        self.state = {}
+
     def fetch_index(self, uri=MAVEN_INDEX_URL, timeout=10):
         """
         Return a temporary location where the fetched content was saved.
@@ -27,15 +42,46 @@ class MavenNexusCollector:
             tmp.write(content)
         return temp_file
 
+    def fetch_index_properties(self, uri=MAVEN_INDEX_PROPERTIES_URL, timeout=10):
+        """
+        Return a mapping of the properties of the Nexus index properties file.
+        """
+        content = fetch_http(uri, timeout=timeout)
+        return javaproperties.loads(content.decode('utf-8')) or {}
+
+    def get_index_uris(self):
+        """
+        Return a list of the URIs of the indexes to process, and update the
+        `state` of the indexes processed.
+        """
+        properties = self.fetch_index_properties()
+        increments = get_index_increments(
+            properties,
+            chain_id=self.chain_id,
+            last_incremental=self.last_incremental,
+        )
+        self.state = get_index_state(properties, increments)
+        if increments is None:
+            return [MAVEN_INDEX_URL]
+        return [MAVEN_INDEX_INCREMENT_URL.format(index=index) for index in increments]
+
     def get_packages(self, content=None):
         """
         Yield Package objects from maven index
         """
         if content:
-            index_location = content
+            index_locations = [content]
         else:
-            index_location = self.fetch_index()
+            # fetch each index when it is processed
+            index_locations = (self.fetch_index(uri) for uri in self.get_index_uris())
 
+        for index_location in index_locations:
+            yield from self.get_packages_from_index(index_location)
+
+    def get_packages_from_index(self, index_location):
+        """
+        Yield Package objects from the maven index at `index_location`
+        """
         artifacts = get_artifacts(index_location, worthyness=is_worthy_artifact)
 
         for artifact in artifacts:
@@ -2,10 +2,13 @@
 # Copyright (c) 2018 by nexB, Inc. http://www.nexb.com/ - All rights reserved.
 #
 
+from collections import Counter
 import logging
 import sys
+import time
 import traceback
 
+from django.db import transaction
 from packagedcode.utils import combine_expressions
 
 from matchcode.models import ApproximateDirectoryContentIndex
@@ -13,15 +16,16 @@ from matchcode.models import ApproximateDirectoryStructureIndex
 from matchcode.models import ApproximateResourceContentIndex
 from matchcode.models import ExactFileIndex
 from minecode.management.commands import get_error_message
-from minecode.model_utils import update_or_create_resource
+from minecode.model_utils import bulk_update_or_create_resources
 from minecode.models import ScannableURI
+from minecode.utils import get_batches
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(stream=sys.stdout)
 logger.setLevel(logging.INFO)
 
 
-def index_package_files(package, scan_data, reindex=False):
+def index_package_files(package, scan_data, reindex=False, batch_size=1000):
     """
     Index scan data for `package` Package.
 
@@ -29,6 +33,10 @@ def index_package_files(package, scan_data, reindex=False):
 
     If `reindex` is True, then all fingerprints related to `package` will be
     deleted and recreated from `scan_data`.
+
+    The `files` of `scan_data` can be an iterator, such as the one returned
+    by iter_json_list_items(): files are consumed and indexed in bulk by
+    batches of `batch_size`, in a single transaction.
     """
     if reindex:
         logger.info(f'Deleting fingerprints and Resources related to {package.package_url}')
@@ -41,41 +49,26 @@ def index_package_files(package, scan_data, reindex=False):
     scan_index_errors = []
     try:
         logger.info(f'Indexing Resources and fingerprints related to {package.package_url} from scan data')
-        for resource in scan_data.get('files', []):
-            r, _, _ = update_or_create_resource(package, resource)
-            path = r.path
-            sha1 = r.sha1
-            if sha1:
-                _, _ = ExactFileIndex.index(
-                    sha1=sha1,
-                    package=package
-                )
-
-            resource_extra_data = resource.get('extra_data', {})
-            directory_content_fingerprint = resource_extra_data.get('directory_content', '')
-            directory_structure_fingerprint = resource_extra_data.get('directory_structure', '')
-            halo1 = resource_extra_data.get('halo1', '')
-
-            if directory_content_fingerprint:
-                _, _ = ApproximateDirectoryContentIndex.index(
-                    fingerprint=directory_content_fingerprint,
-                    resource_path=path,
-                    package=package,
-                )
-
-            if directory_structure_fingerprint:
-                _, _ = ApproximateDirectoryStructureIndex.index(
-                    fingerprint=directory_structure_fingerprint,
-                    resource_path=path,
-                    package=package,
-                )
-
-            if halo1:
-                _, _ = ApproximateResourceContentIndex.index(
-                    fingerprint=halo1,
-                    resource_path=path,
-                    package=package,
-                )
+        start = time.perf_counter()
+        counts = Counter()
+        with transaction.atomic():
+            for resources_data in get_batches(scan_data.get('files', []), batch_size):
+                counts.update(index_resources(package, resources_data, batch_size=batch_size))
+
+        duration = time.perf_counter() - start
+        rows_count = sum(
+            count for kind, count in counts.items()
+            if kind not in ('created', 'updated')
+        )
+        logger.info(
+            f'Indexed {counts["resources"]} Resources for {package.package_url}: '
+            f'{counts["created"]} created, {counts["updated"]} updated, '
+            f'{counts[ExactFileIndex.__name__]} ExactFileIndex, '
+            f'{counts[ApproximateDirectoryContentIndex.__name__]} ApproximateDirectoryContentIndex, '
+            f'{counts[ApproximateDirectoryStructureIndex.__name__]} ApproximateDirectoryStructureIndex, '
+            f'{counts[ApproximateResourceContentIndex.__name__]} ApproximateResourceContentIndex '
+            f'in {duration:.2f}s ({rows_count / (duration or 1):,.0f} rows/s)'
+        )
 
     except Exception as e:
         msg = get_error_message(e)
@@ -85,6 +78,70 @@ def index_package_files(package, scan_data, reindex=False):
     return scan_index_errors
 
 
+def index_resources(package, resources_data, batch_size=1000):
+    """
+    Create or update the Resources of `package` from the list of Resource
+    data `resources_data` and index their fingerprints, in bulk.
+
+    Return a mapping of counts of indexed rows by kind.
+    """
+    resources, created, updated = bulk_update_or_create_resources(
+        package,
+        resources_data,
+        batch_size=batch_size,
+    )
+
+    sha1s = []
+    directory_content_fingerprints = []
+    directory_structure_fingerprints = []
+    resource_content_fingerprints = []
+    for resource, resource_data in zip(resources, resources_data):
+        path = resource.path
+        sha1 = resource.sha1
+        if sha1:
+            sha1s.append(sha1)
+
+        resource_extra_data = resource_data.get('extra_data', {})
+        directory_content_fingerprint = resource_extra_data.get('directory_content', '')
+        directory_structure_fingerprint = resource_extra_data.get('directory_structure', '')
+        halo1 = resource_extra_data.get('halo1', '')
+
+        if directory_content_fingerprint:
+            directory_content_fingerprints.append((directory_content_fingerprint, path))
+
+        if directory_structure_fingerprint:
+            directory_structure_fingerprints.append((directory_structure_fingerprint, path))
+
+        if halo1:
+            resource_content_fingerprints.append((halo1, path))
+
+    return {
+        'resources': len(resources),
+        'created': created,
+        'updated': updated,
+        ExactFileIndex.__name__: ExactFileIndex.bulk_index(
+            sha1s=sha1s,
+            package=package,
+            batch_size=batch_size,
+        ),
+        ApproximateDirectoryContentIndex.__name__: ApproximateDirectoryContentIndex.bulk_index(
+            fingerprints_and_paths=directory_content_fingerprints,
+            package=package,
+            batch_size=batch_size,
+        ),
+        ApproximateDirectoryStructureIndex.__name__: ApproximateDirectoryStructureIndex.bulk_index(
+            fingerprints_and_paths=directory_structure_fingerprints,
+            package=package,
+            batch_size=batch_size,
+        ),
+        ApproximateResourceContentIndex.__name__: ApproximateResourceContentIndex.bulk_index(
+            fingerprints_and_paths=resource_content_fingerprints,
+            package=package,
+            batch_size=batch_size,
+        ),
+    }
+
+
 def index_package(scannable_uri, package, scan_data, summary_data, project_extra_data, reindex=False):
     scan_index_errors = []
     try:
@@ -7,14 +7,15 @@
 # See https://aboutcode.org for more information about nexB OSS projects.
 #
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dateutil.parser import parse as dateutil_parse
+from itertools import repeat
 import logging
 import signal
 import sys
 import time
 
-import requests
-
 from django.db import transaction
 from django.utils import timezone
 from packageurl import PackageURL
@@ -27,7 +28,8 @@ from minecode.visitors.maven import get_classifier_from_artifact_url
 from minecode.visitors.maven import collect_links_from_text
 from minecode.visitors.maven import filter_only_directories
 from minecode.visitors.maven import get_artifact_sha1
-from minecode.model_utils import merge_or_create_package
+from minecode.model_utils import merge_or_create_packages
+from minecode.utils import get_http_session
 from packagedcode.models import PackageData
 from minecode.visitors.maven import determine_namespace_name_version_from_url
 
@@ -43,6 +45,16 @@ if TRACE:
 # sleep duration in seconds when the queue is empty
 SLEEP_WHEN_EMPTY = 10
 
+# number of ImportableURIs claimed at once from the queue
+BATCH_SIZE = 10
+
+# number of version pages or artifact SHA1 fetched concurrently for an
+# ImportableURI
+MAX_WORKERS = 8
+
+# timeout in seconds of each HTTP request
+TIMEOUT = 10
+
 MUST_STOP = False
 
 
@@ -72,54 +84,89 @@ class Command(VerboseCommand):
         sleeping = False
         processed_counter = 0
 
-        while True:
-            if MUST_STOP:
-                logger.info('Graceful exit of the request queue.')
-                break
-
-            with transaction.atomic():
-                importable_uri = ImportableURI.objects.get_next_request()
-
-            if not importable_uri:
-                # Only log a single message when we go to sleep
-                if not sleeping:
-                    sleeping = True
-                    logger.info('No more processable request, sleeping...')
-
-                time.sleep(SLEEP_WHEN_EMPTY)
-                continue
-
-            sleeping = False
-
-            # process request
-            logger.info('Processing {}'.format(importable_uri))
-            try:
-                errors = process_request(importable_uri)
-            except Exception as e:
-                errors = 'Error: Failed to process ImportableURI: {}\n'.format(
-                    repr(importable_uri))
-                errors += get_error_message(e)
-            finally:
-                if errors:
-                    importable_uri.processing_error = errors
-                    logger.error(errors)
-                importable_uri.processed_date = timezone.now()
-                importable_uri.wip_date = None
-                importable_uri.save()
-                processed_counter += 1
+        # claimed ImportableURIs waiting to be processed
+        importable_uris = deque()
+
+        try:
+            while True:
+                if MUST_STOP:
+                    logger.info('Graceful exit of the request queue.')
+                    break
+
+                if not importable_uris:
+                    importable_uris.extend(ImportableURI.objects.get_next_batch(BATCH_SIZE))
+
+                if not importable_uris:
+                    # Only log a single message when we go to sleep
+                    if not sleeping:
+                        sleeping = True
+                        logger.info('No more processable request, sleeping...')
+
+                    time.sleep(SLEEP_WHEN_EMPTY)
+                    continue
+
+                sleeping = False
+                importable_uri = importable_uris.popleft()
+
+                # process request
+                logger.info('Processing {}'.format(importable_uri))
+                try:
+                    errors = process_request(importable_uri)
+                except Exception as e:
+                    errors = 'Error: Failed to process ImportableURI: {}\n'.format(
+                        repr(importable_uri))
+                    errors += get_error_message(e)
+                finally:
+                    if errors:
+                        importable_uri.processing_error = errors
+                        logger.error(errors)
+                    importable_uri.processed_date = timezone.now()
+                    importable_uri.wip_date = None
+                    importable_uri.save()
+                    processed_counter += 1
+        finally:
+            # Put back in the queue the claimed requests we did not process
+            if importable_uris:
+                unprocessed_pks = [importable_uri.pk for importable_uri in importable_uris]
+                ImportableURI.objects.filter(pk__in=unprocessed_pks).update(wip_date=None)
 
         return processed_counter
 
 
-def process_request(importable_uri):
+def get_version_artifacts(uri, name, version, timeout=TIMEOUT):
+    """
+    Return a list of (artifact URL, timestamp, classifier) tuples for the
+    artifacts of the `version` of the package `name` at `uri`.
+    """
+    version_page_url = f'{uri}/{version}'
+    timestamps_by_artifact_links = get_artifact_links(version_page_url, timeout=timeout)
+    return [
+        (
+            artifact_link,
+            timestamp,
+            get_classifier_from_artifact_url(artifact_link, version_page_url, name, version),
+        )
+        for artifact_link, timestamp in timestamps_by_artifact_links.items()
+    ]
+
+
+def process_request(importable_uri, max_workers=MAX_WORKERS, timeout=TIMEOUT):
+    """
+    Create or update the Packages of each artifact of each version of the
+    `importable_uri` Maven package page.
+
+    The version pages and the artifacts SHA1 are fetched concurrently with up
+    to `max_workers` requests, each with a `timeout` in seconds, and the
+    Packages are saved in one transaction.
+    """
     uri = importable_uri.uri
     uri = uri.rstrip('/')
     data = importable_uri.data
     if not data:
         # collect data again if we don't have it
-        response = requests.get(uri)
+        response = get_http_session().get(uri, timeout=timeout)
         if response:
-            data = requests.text
+            data = response.text
 
     purl = importable_uri.package_url
     if purl:
@@ -130,37 +177,60 @@ def process_request(importable_uri):
         namespace, name, _ = determine_namespace_name_version_from_url(uri)
 
     timestamps_by_directory_links = collect_links_from_text(data, filter_only_directories)
-    # Go into each version directory
-    for directory_link in timestamps_by_directory_links.keys():
-        version = directory_link.rstrip('/')
-        version_page_url = f'{uri}/{version}'
-        timestamps_by_artifact_links = get_artifact_links(version_page_url)
-        for artifact_link, timestamp in timestamps_by_artifact_links.items():
-            sha1 = get_artifact_sha1(artifact_link)
-            classifier = get_classifier_from_artifact_url(artifact_link, version_page_url, name, version)
-            qualifiers = None
-            if classifier:
-                qualifiers = f'classifier={classifier}'
-            release_date = dateutil_parse(timestamp)
-            package_data = PackageData(
-                type='maven',
-                namespace=namespace,
-                name=name,
-                version=version,
-                qualifiers=qualifiers,
-                download_url=artifact_link,
-                sha1=sha1,
-                release_date=release_date,
-            )
-            package, created, merged, map_error = merge_or_create_package(
-                scanned_package=package_data,
-                visit_level=50
-            )
-            if created:
-                logger.info(f'Created package {package}')
-            if merged:
-                logger.info(f'Updated package {package}')
-            if map_error:
-                logger.error(f'Error encountered: {map_error}')
-                importable_uri.processing_error = map_error
-                importable_uri.save()
+    versions = [directory_link.rstrip('/') for directory_link in timestamps_by_directory_links]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Go into each version directory
+        artifacts_by_version = executor.map(
+            get_version_artifacts,
+            repeat(uri),
+            repeat(name),
+            versions,
+            repeat(timeout),
+        )
+        artifacts = [
+            (version, artifact_link, timestamp, classifier)
+            for version, version_artifacts in zip(versions, artifacts_by_version)
+            for artifact_link, timestamp, classifier in version_artifacts
+        ]
+        sha1s = executor.map(
+            get_artifact_sha1,
+            [artifact_link for _, artifact_link, _, _ in artifacts],
+            repeat(timeout),
+        )
+        sha1s = list(sha1s)
+
+    packages_data = []
+    for (version, artifact_link, timestamp, classifier), sha1 in zip(artifacts, sha1s):
+        qualifiers = None
+        if classifier:
+            qualifiers = f'classifier={classifier}'
+        release_date = dateutil_parse(timestamp)
+        package_data = PackageData(
+            type='maven',
+            namespace=namespace,
+            name=name,
+            version=version,
+            qualifiers=qualifiers,
+            download_url=artifact_link,
+            sha1=sha1,
+            release_date=release_date,
+        )
+        packages_data.append(package_data)
+
+    with transaction.atomic():
+        results = merge_or_create_packages(
+            scanned_packages=packages_data,
+            visit_level=50,
+            batch_size=max(len(packages_data), 1),
+        )
+
+    for package, created, merged, map_error in results:
+        if created:
+            logger.info(f'Created package {package}')
+        if merged:
+            logger.info(f'Updated package {package}')
+        if map_error:
+            logger.error(f'Error encountered: {map_error}')
+            importable_uri.processing_error = map_error
+            importable_uri.save()
@@ -24,8 +24,33 @@ if TRACE:
 
 
 class Command(VerboseCommand):
-    help = 'Run a Package request queue.'
+    help = 'Crawl a Maven repository and add its packages to the import queue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--root-url',
+            dest='root_url',
+            default='https://repo.maven.apache.org/maven2',
+            action='store',
+            help='URL of the root of the Maven repository to crawl.')
+
+        parser.add_argument(
+            '--threads',
+            dest='threads',
+            default=8,
+            action='store',
+            help='Number of pages fetched concurrently.')
+
+        parser.add_argument(
+            '--batch-size',
+            dest='batch_size',
+            default=100,
+            action='store',
+            help='Number of pages claimed at once from the crawl frontier.')
 
     def handle(self, *args, **options):
-        maven_root_url = 'https://repo.maven.apache.org/maven2'
-        crawl_maven_repo_from_root(root_url=maven_root_url)
+        crawl_maven_repo_from_root(
+            root_url=options['root_url'],
+            max_workers=int(options['threads']),
+            batch_size=int(options['batch_size']),
+        )
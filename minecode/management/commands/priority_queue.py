@@ -7,12 +7,12 @@
 # See https://aboutcode.org for more information about nexB OSS projects.
 #
 
+from collections import deque
 import logging
 import signal
 import sys
 import time
 
-from django.db import transaction
 from django.utils import timezone
 
 # UnusedImport here!
@@ -37,6 +37,9 @@ if TRACE:
 # sleep duration in seconds when the queue is empty
 SLEEP_WHEN_EMPTY = 10
 
+# number of PriorityResourceURIs claimed at once from the queue
+BATCH_SIZE = 10
+
 MUST_STOP = False
 
 
@@ -66,41 +69,51 @@ class Command(VerboseCommand):
         sleeping = False
         processed_counter = 0
 
-        while True:
-            if MUST_STOP:
-                logger.info('Graceful exit of the request queue.')
-                break
-
-            with transaction.atomic():
-                priority_resource_uri = PriorityResourceURI.objects.get_next_request()
-
-            if not priority_resource_uri:
-                # Only log a single message when we go to sleep
-                if not sleeping:
-                    sleeping = True
-                    logger.info('No more processable request, sleeping...')
-
-                time.sleep(SLEEP_WHEN_EMPTY)
-                continue
-
-            sleeping = False
-
-            # process request
-            logger.info('Processing {}'.format(priority_resource_uri))
-            try:
-                errors = process_request(priority_resource_uri)
-            except Exception as e:
-                errors = 'Error: Failed to process PriorityResourceURI: {}\n'.format(
-                    repr(priority_resource_uri))
-                errors += get_error_message(e)
-            finally:
-                if errors:
-                    priority_resource_uri.processing_error = errors
-                    logger.error(errors)
-                priority_resource_uri.processed_date = timezone.now()
-                priority_resource_uri.wip_date = None
-                priority_resource_uri.save()
-                processed_counter += 1
+        # claimed PriorityResourceURIs waiting to be processed
+        priority_resource_uris = deque()
+
+        try:
+            while True:
+                if MUST_STOP:
+                    logger.info('Graceful exit of the request queue.')
+                    break
+
+                if not priority_resource_uris:
+                    priority_resource_uris.extend(PriorityResourceURI.objects.get_next_batch(BATCH_SIZE))
+
+                if not priority_resource_uris:
+                    # Only log a single message when we go to sleep
+                    if not sleeping:
+                        sleeping = True
+                        logger.info('No more processable request, sleeping...')
+
+                    time.sleep(SLEEP_WHEN_EMPTY)
+                    continue
+
+                sleeping = False
+                priority_resource_uri = priority_resource_uris.popleft()
+
+                # process request
+                logger.info('Processing {}'.format(priority_resource_uri))
+                try:
+                    errors = process_request(priority_resource_uri)
+                except Exception as e:
+                    errors = 'Error: Failed to process PriorityResourceURI: {}\n'.format(
+                        repr(priority_resource_uri))
+                    errors += get_error_message(e)
+                finally:
+                    if errors:
+                        priority_resource_uri.processing_error = errors
+                        logger.error(errors)
+                    priority_resource_uri.processed_date = timezone.now()
+                    priority_resource_uri.wip_date = None
+                    priority_resource_uri.save()
+                    processed_counter += 1
+        finally:
+            # Put back in the queue the claimed requests we did not process
+            if priority_resource_uris:
+                unprocessed_pks = [priority_resource_uri.pk for priority_resource_uri in priority_resource_uris]
+                PriorityResourceURI.objects.filter(pk__in=unprocessed_pks).update(wip_date=None)
 
         return processed_counter
 
@@ -8,11 +8,14 @@
 #
 
 
+from concurrent import futures
+from functools import partial
 import logging
 import signal
 import sys
 import time
 
+from django.db import connections
 from django.db import transaction
 from django.utils import timezone
 
@@ -25,8 +28,7 @@ from minecode import map_router
 from minecode.models import ResourceURI
 from minecode.management.commands import get_error_message
 from minecode.management.commands import VerboseCommand
-from minecode.model_utils import merge_or_create_package
-from minecode.models import ScannableURI
+from minecode.model_utils import merge_or_create_packages
 
 
 TRACE = True
@@ -67,6 +69,21 @@ class Command(VerboseCommand):
             action='store_true',
             help='Do not loop forever. Exit when the queue is empty.')
 
+        parser.add_argument(
+            '--processes',
+            dest='processes',
+            default=0,
+            action='store',
+            help='Number of processes used to run the mappers. '
+                 '0 means run the mappers in this process.')
+
+        parser.add_argument(
+            '--batch-size',
+            dest='batch_size',
+            default=MAP_BATCH_SIZE,
+            action='store',
+            help='Number of mappable ResourceURIs claimed and mapped at once.')
+
     def handle(self, *args, **options):
         """
         Get the next available candidate ResourceURI and start the processing.
@@ -76,6 +93,8 @@ class Command(VerboseCommand):
 
         logger.setLevel(self.get_verbosity(**options))
         exit_on_empty = options.get('exit_on_empty')
+        processes = int(options.get('processes') or 0)
+        batch_size = int(options.get('batch_size') or MAP_BATCH_SIZE)
 
         sleeping = False
 
@@ -84,7 +103,7 @@ class Command(VerboseCommand):
                 logger.info('Graceful exit of the map loop.')
                 break
 
-            mappables = ResourceURI.objects.get_mappables()[:MAP_BATCH_SIZE]
+            mappables = ResourceURI.objects.get_next_mappable_batch(batch_size)
 
             if not mappables:
                 if exit_on_empty:
@@ -101,9 +120,90 @@ class Command(VerboseCommand):
 
             sleeping = False
 
-            for resource_uri in mappables:
-                logger.info('Mapping {}'.format(resource_uri))
-                map_uri(resource_uri)
+            map_uris(mappables, processes=processes)
+
+
+def map_uris(resource_uris, processes=0, _map_router=map_router):
+    """
+    Map a list of claimed `resource_uris` ResourceURIs.
+
+    Run the mappers in up to `processes` worker processes, then save the mapped
+    packages of each ResourceURI. A ResourceURI whose mapping or saving failed,
+    including when its worker process crashed, is flagged with a map error such
+    that it is not claimed again. Only the ResourceURIs that were never mapped,
+    for instance when interrupted, are put back in the queue.
+    `_map_router` is the Router to use for routing. Used for tests only.
+    """
+    for resource_uri in resource_uris:
+        logger.info('Mapping {}'.format(resource_uri))
+
+    unmapped = list(resource_uris)
+    try:
+        get_packages = partial(get_mapped_packages, _map_router=_map_router)
+        if (
+            processes > 1
+            and len(resource_uris) > 1
+            # forked processes cannot share a database transaction
+            and not any(conn.in_atomic_block for conn in connections.all())
+        ):
+            # Close the database connections such that the forked processes do not
+            # share them: mappers open their own connection if they need one.
+            connections.close_all()
+            with futures.ProcessPoolExecutor(min(processes, len(resource_uris))) as executor:
+                submitted = [executor.submit(get_packages, resource_uri) for resource_uri in resource_uris]
+                mapped = [
+                    get_future_mapped_packages(future, resource_uri)
+                    for future, resource_uri in zip(submitted, resource_uris)
+                ]
+        else:
+            mapped = [get_packages(resource_uri) for resource_uri in resource_uris]
+
+        # save each ResourceURI on its own such that an error does not roll
+        # back the ResourceURIs already saved
+        for resource_uri, (mapped_scanned_packages, error) in zip(resource_uris, mapped):
+            try:
+                save_mapped_packages(resource_uri, mapped_scanned_packages, error)
+            except Exception as e:
+                msg = 'Error: Failed to save mapped packages of ResourceURI: {}\n'.format(
+                    repr(resource_uri))
+                msg += get_error_message(e)
+                logger.error(msg)
+                save_map_error(resource_uri, msg)
+            unmapped.remove(resource_uri)
+    finally:
+        # Put back in the queue the claimed ResourceURIs we did not map
+        if unmapped:
+            unmapped_pks = [resource_uri.pk for resource_uri in unmapped]
+            ResourceURI.objects.filter(pk__in=unmapped_pks).update(wip_date=None)
+
+
+def get_future_mapped_packages(future, resource_uri):
+    """
+    Return the (list of mapped packages, error message or None) tuple of a
+    ResourceURI mapped in a worker process `future`, with an error message if
+    the worker process failed.
+    """
+    try:
+        return future.result()
+    except Exception as e:
+        msg = 'Error: Failed to map in a worker process while processing ResourceURI: {}\n'.format(
+            repr(resource_uri))
+        msg += get_error_message(e)
+        logger.error(msg)
+        return [], msg
+
+
+def save_map_error(resource_uri, error):
+    """
+    Flag a ResourceURI as mapped with a map `error` such that it is not
+    claimed again for mapping.
+    """
+    ResourceURI.objects.filter(pk=resource_uri.pk).update(
+        last_map_date=timezone.now(),
+        wip_date=None,
+        map_error=error,
+        has_map_error=True,
+    )
 
 
 def map_uri(resource_uri, _map_router=map_router):
@@ -111,6 +211,17 @@ def map_uri(resource_uri, _map_router=map_router):
     Call a mapper for a ResourceURI.
     `_map_router` is the Router to use for routing. Used for tests only.
     """
+    mapped_scanned_packages, error = get_mapped_packages(resource_uri, _map_router)
+    save_mapped_packages(resource_uri, mapped_scanned_packages, error)
+
+
+def get_mapped_packages(resource_uri, _map_router=map_router):
+    """
+    Call a mapper for a ResourceURI and return a tuple of (list of mapped
+    packages, error message or None). The mapped packages are not saved such
+    that this can run in a worker process.
+    `_map_router` is the Router to use for routing. Used for tests only.
+    """
     # FIXME: returning a string or sequence is UGLY
     try:
         mapped_scanned_packages = _map_router.process(
@@ -125,19 +236,27 @@ def map_uri(resource_uri, _map_router=map_router):
         if not mapped_scanned_packages:
             msg = 'No visited scanned packages returned.'
             logger.error(msg)
-            resource_uri.last_map_date = timezone.now()
-            resource_uri.map_error = msg
-            resource_uri.save()
-            return
+            return [], msg
 
     except Exception as e:
         msg = 'Error: Failed to map while processing ResourceURI: {}\n'.format(
             repr(resource_uri))
         msg += get_error_message(e)
         logger.error(msg)
-        # we had an error, so mapped_scanned_packages is an error string
+        return [], msg
+
+    return mapped_scanned_packages, None
+
+
+def save_mapped_packages(resource_uri, mapped_scanned_packages, error=None):
+    """
+    Save the `mapped_scanned_packages` mapped from a ResourceURI, or the mapping
+    `error`, and flag the ResourceURI as mapped.
+    """
+    if error:
         resource_uri.last_map_date = timezone.now()
-        resource_uri.map_error = msg
+        resource_uri.wip_date = None
+        resource_uri.map_error = error
         resource_uri.save()
         return
 
@@ -148,29 +267,20 @@ def map_uri(resource_uri, _map_router=map_router):
 
     try:
         with transaction.atomic():
-            # iterate the ScanCode Package objects returned by the mapper
-            # and either save these as new packagedb.Packages or update and
-            # existing one
-
-            for scanned_package in mapped_scanned_packages:
-                visit_level = resource_uri.mining_level
-                package, package_created, _, m_err = merge_or_create_package(scanned_package, visit_level)
+            # save the ScanCode Package objects returned by the mapper either
+            # as new packagedb.Packages added to the scan queue or as updates
+            # of existing ones
+            results = merge_or_create_packages(
+                mapped_scanned_packages,
+                visit_level=resource_uri.mining_level,
+                add_to_scan_queue=True,
+            )
+            for _package, _created, _merged, m_err in results:
                 map_error += m_err
-                if package_created:
-                    # Add this Package to the scan queue
-                    package_uri = scanned_package.download_url
-                    _, scannable_uri_created = ScannableURI.objects.get_or_create(
-                        uri=package_uri,
-                        package=package,
-                    )
-                    if scannable_uri_created:
-                        logger.debug(' + Inserted ScannableURI\t: {}'.format(package_uri))
 
     except Exception as e:
         msg = 'Error: Failed to map while processing ResourceURI: {}\n'.format(
             repr(resource_uri))
-        msg += 'While processing scanned_package: {}\n'.format(
-            repr(scanned_package))
         msg += get_error_message(e)
         logger.error(msg)
         # this is enough to save the error to the ResourceURI which is done at last
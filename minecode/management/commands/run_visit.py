@@ -9,6 +9,12 @@
 
 
 from collections import Counter
+from collections import deque
+from concurrent import futures
+from functools import partial
+import heapq
+import inspect
+import itertools
 import logging
 import signal
 import sys
@@ -16,6 +22,7 @@ import time
 
 # FIXME: why use Django cache for this? any benefits and side effects?
 from django.core.cache import cache as visit_delay_by_hostname
+from django.db import connections
 from django.db import transaction
 from django.utils import timezone
 from django.utils.encoding import smart_str
@@ -27,12 +34,16 @@ import reppy.cache
 from minecode import mappers  # NOQA
 from minecode import visitors  # NOQA
 from minecode import visit_router
+from minecode.visitors import HttpVisitor
 
 from minecode.management.commands import get_error_message
 from minecode.management.commands import VerboseCommand
 
 from minecode.models import ResourceURI
 from minecode.route import NoRouteAvailable
+from minecode.utils import NotModified
+from minecode.utils import bulk_insert
+from minecode.utils import get_batches
 
 
 logger = logging.getLogger(__name__)
@@ -47,6 +58,12 @@ if TRACE:
 # sleep duration in seconds when the queue is empty
 SLEEP_WHEN_EMPTY = 10
 
+# number of ResourceURIs claimed at once from the queue
+BATCH_SIZE = 10
+
+# number of new ResourceURIs inserted at once after a visit
+INSERT_BATCH_SIZE = 1000
+
 # Create a global cache for robots.txt. Note that this is process specific and does
 # not span multiple workers
 robots = reppy.cache.RobotsCache()
@@ -115,6 +132,23 @@ class Command(VerboseCommand):
             action='store_true',
             help='Ignore throttling politeness.')
 
+        parser.add_argument(
+            '--batch-size',
+            dest='batch_size',
+            default=BATCH_SIZE,
+            type=int,
+            action='store',
+            help='Number of ResourceURIs claimed at once from the queue.')
+
+        parser.add_argument(
+            '--threads',
+            dest='threads',
+            default=0,
+            type=int,
+            action='store',
+            help='Number of visits run concurrently in threads, across hosts. '
+                 '0 means visit one URI at a time.')
+
     def handle(self, *args, **options):
         """
         Get the next available candidate ResourceURI and start the
@@ -128,13 +162,21 @@ class Command(VerboseCommand):
         max_loops = options.get('max_loops', 0)
         ignore_robots = options.get('ignore_robots')
         ignore_throttle = options.get('ignore_throttle')
+        batch_size = int(options.get('batch_size') or BATCH_SIZE)
+        threads = int(options.get('threads') or 0)
+
+        if threads:
+            visit_function = partial(visit_uris_concurrently, threads=threads)
+        else:
+            visit_function = visit_uris
 
-        visited_counter, inserted_counter = visit_uris(
+        visited_counter, inserted_counter = visit_function(
             ignore_robots=ignore_robots,
             ignore_throttle=ignore_throttle,
             exit_on_empty=exit_on_empty,
             max_loops=max_loops,
             max_uris=max_uris,
+            batch_size=batch_size,
         )
 
         self.stdout.write('Visited {} URIs'.format(visited_counter))
@@ -143,14 +185,14 @@ class Command(VerboseCommand):
 
 def visit_uris(ignore_robots=False, ignore_throttle=False,
                exit_on_empty=False, max_loops=0, max_uris=0,
-               user_agent=USER_AGENT):
+               user_agent=USER_AGENT, batch_size=BATCH_SIZE):
     """
     Run an infinite visit loop. Return a tuple of (visited, inserted)
     counts.
 
-    Get the next available candidate ResourceURI and start processing.
-    Loop forever and sleeps a short while if there are no ResourceURI
-    left to visit.
+    Get the next available candidate ResourceURIs, claimed by batches of
+    `batch_size`, and start processing. Loop forever and sleeps a short while
+    if there are no ResourceURI left to visit.
 
     Process throttles and robots.txt politeness
     """
@@ -162,63 +204,339 @@ def visit_uris(ignore_robots=False, ignore_throttle=False,
 
     sleeping = False
 
-    while True:
-        if MUST_STOP:
-            logger.info('Graceful exit of the visit loop.')
-            break
+    # claimed ResourceURIs waiting for their visit
+    resource_uris = deque()
 
-        with transaction.atomic():
-            resource_uri = ResourceURI.objects.get_next_visitable()
+    try:
+        while True:
+            if MUST_STOP:
+                logger.info('Graceful exit of the visit loop.')
+                break
+
+            if not resource_uris:
+                resource_uris.extend(ResourceURI.objects.get_next_batch(batch_size))
+
+            if not resource_uris:
+                if exit_on_empty:
+                    logger.info('exit-on-empty requested: No more visitable resource, exiting...')
+                    break
+
+                # Only log a single message when we go to sleep
+                if not sleeping:
+                    sleeping = True
+                    logger.info('No more visitable resource, sleeping...')
+
+                time.sleep(SLEEP_WHEN_EMPTY)
+                continue
 
-        if not resource_uri:
-            if exit_on_empty:
-                logger.info('exit-on-empty requested: No more visitable resource, exiting...')
+            sleeping = False
+            resource_uri = resource_uris.popleft()
+
+            if not ignore_robots and robots.disallowed(resource_uri.uri, user_agent):
+                msg = 'Denied by robots.txt'
+                logger.error(msg)
+                resource_uri.last_visit_date = timezone.now()
+                resource_uri.wip_date = None
+                resource_uri.visit_error = msg
+                resource_uri.save()
+                continue
+
+            if not ignore_throttle:
+                sleep_time = get_sleep_time(resource_uri)
+                if sleep_time:
+                    logger.debug('Respecting revisit delay: wait for {} for {}'.format(sleep_time, resource_uri.uri))
+                    time.sleep(sleep_time)
+                # Set new value in cache 'visit_delay_by_hostname' right before making the request
+                # TODO: The cache logic should move closer to the requests calls
+                uri_hostname = reppy.Utility.hostname(resource_uri.uri)
+                visit_delay_by_hostname.set(uri_hostname, timezone.now())
+
+            # visit proper
+            logger.info('Visiting {}'.format(resource_uri))
+            visited_counter += 1
+
+            inserted_counter += visit_uri(
+                resource_uri=resource_uri, max_uris=max_uris,
+                uri_counter_by_visitor=uri_counter_by_visitor)
+
+            if max_loops and int(visited_counter) > int(max_loops):
+                logger.info('Stopping visits after max_loops: {} visit loops.'.format(max_loops))
                 break
+    finally:
+        # Put back in the queue the claimed ResourceURIs we did not visit
+        if resource_uris:
+            unvisited_pks = [resource_uri.pk for resource_uri in resource_uris]
+            ResourceURI.objects.filter(pk__in=unvisited_pks).update(wip_date=None)
+
+    return visited_counter, inserted_counter
 
-            # Only log a single message when we go to sleep
-            if not sleeping:
-                sleeping = True
-                logger.info('No more visitable resource, sleeping...')
 
-            time.sleep(SLEEP_WHEN_EMPTY)
-            continue
+class TokenBucket(object):
+    """
+    A token bucket filled with `rate` tokens per second up to `capacity` tokens.
 
-        sleeping = False
+    Tokens are reserved in advance: a reservation always succeeds and returns
+    the number of seconds to wait until its token is available, such that
+    successive reservations are spaced by 1 / `rate` seconds once the bucket
+    is empty.
+    """
 
-        if not ignore_robots and robots.disallowed(resource_uri.uri, user_agent):
-            msg = 'Denied by robots.txt'
-            logger.error(msg)
-            resource_uri.last_visit_date = timezone.now()
-            resource_uri.wip_date = None
-            resource_uri.visit_error = msg
-            resource_uri.save()
-            continue
-
-        if not ignore_throttle:
-            sleep_time = get_sleep_time(resource_uri)
-            if sleep_time:
-                logger.debug('Respecting revisit delay: wait for {} for {}'.format(sleep_time, resource_uri.uri))
-                time.sleep(sleep_time)
-            # Set new value in cache 'visit_delay_by_hostname' right before making the request
-            # TODO: The cache logic should move closer to the requests calls
-            uri_hostname = reppy.Utility.hostname(resource_uri.uri)
-            visit_delay_by_hostname.set(uri_hostname, timezone.now())
-
-        # visit proper
-        logger.info('Visiting {}'.format(resource_uri))
-        visited_counter += 1
-
-        inserted_counter += visit_uri(
-            resource_uri=resource_uri, max_uris=max_uris,
-            uri_counter_by_visitor=uri_counter_by_visitor)
-
-        if max_loops and int(visited_counter) > int(max_loops):
-            logger.info('Stopping visits after max_loops: {} visit loops.'.format(max_loops))
-            break
+    def __init__(self, rate, capacity=1, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+
+    def reserve(self):
+        """
+        Reserve a token and return the number of seconds to wait before using
+        it.
+        """
+        now = self.clock()
+        elapsed = now - self.updated
+        self.updated = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0
+        return -self.tokens / self.rate
+
+
+class HostScheduler(object):
+    """
+    Schedule visits politely with one TokenBucket per URI hostname, refilled
+    at the rate of the robots.txt crawl delay of this hostname, or of
+    `minimum_delay_between_visits` seconds when there is no crawl delay.
+
+    This is an in-process replacement for the blocking sleeps of get_sleep_time.
+    """
+
+    def __init__(self, ignore_robots=False, ignore_throttle=False,
+                 minimum_delay_between_visits=1, user_agent=USER_AGENT,
+                 clock=time.monotonic):
+        self.ignore_robots = ignore_robots
+        self.ignore_throttle = ignore_throttle
+        self.minimum_delay_between_visits = minimum_delay_between_visits
+        self.user_agent = user_agent
+        self.clock = clock
+        self.buckets_by_hostname = {}
+
+    def get_delay(self, uri):
+        """
+        Return the delay in seconds to respect between two visits of the
+        hostname of `uri`.
+        """
+        delay = None
+        if not self.ignore_robots:
+            delay = robots.delay(url=uri, agent=self.user_agent)
+        return delay or self.minimum_delay_between_visits
+
+    def is_allowed(self, uri):
+        """
+        Return True if `uri` can be visited per the robots.txt of its hostname.
+        """
+        return self.ignore_robots or not robots.disallowed(uri, self.user_agent)
+
+    def schedule(self, uri):
+        """
+        Return the time, per this scheduler clock, at which `uri` can be visited.
+        """
+        now = self.clock()
+        if self.ignore_throttle:
+            return now
+
+        hostname = reppy.Utility.hostname(uri)
+        bucket = self.buckets_by_hostname.get(hostname)
+        if not bucket:
+            bucket = TokenBucket(rate=1 / self.get_delay(uri), clock=self.clock)
+            self.buckets_by_hostname[hostname] = bucket
+        return now + bucket.reserve()
+
+
+def visit_uris_concurrently(threads, ignore_robots=False, ignore_throttle=False,
+                            exit_on_empty=False, max_loops=0, max_uris=0,
+                            user_agent=USER_AGENT, batch_size=BATCH_SIZE,
+                            scheduler=None):
+    """
+    Run an infinite visit loop with up to `threads` visits in flight at once.
+    Return a tuple of (visited, inserted) counts.
+
+    The claimed ResourceURIs are scheduled with a HostScheduler to respect
+    the robots.txt rules and the per-hostname throttling: the loop never
+    sleeps for a host and starts the visits of other hosts in the meantime.
+    Loop forever and sleeps a short while if there are no ResourceURI left to
+    visit.
+    """
+    global MUST_STOP
+
+    if not scheduler:
+        scheduler = HostScheduler(
+            ignore_robots=ignore_robots,
+            ignore_throttle=ignore_throttle,
+            user_agent=user_agent,
+        )
+
+    visited_counter = 0
+    inserted_counter = 0
+    uri_counter_by_visitor = Counter()
+
+    sleeping = False
+    queue_is_empty = False
+    stop_visits = False
+
+    # heap of (visit time, sequence, ResourceURI) for the scheduled ResourceURIs
+    scheduled = []
+    sequence = itertools.count()
+    in_flight = set()
+
+    # database connections of the worker threads, kept open across visits
+    thread_connections = []
+    executor = futures.ThreadPoolExecutor(
+        max_workers=threads,
+        thread_name_prefix='run_visit',
+        initializer=_init_visit_thread,
+        initargs=(thread_connections,),
+    )
+    try:
+        while True:
+            if MUST_STOP:
+                logger.info('Graceful exit of the visit loop.')
+                break
+
+            done = {future for future in in_flight if future.done()}
+            for future in done:
+                in_flight.discard(future)
+                inserted_counter += future.result() or 0
+            if done:
+                # visits may have inserted new URIs to visit
+                queue_is_empty = False
+
+            if stop_visits:
+                if not in_flight:
+                    break
+                futures.wait(in_flight, return_when=futures.FIRST_COMPLETED)
+                continue
+
+            # Keep enough scheduled ResourceURIs to start visiting other hosts
+            # while some hosts are throttled.
+            if not queue_is_empty and len(scheduled) < threads:
+                resource_uris = ResourceURI.objects.get_next_batch(batch_size)
+                queue_is_empty = not resource_uris
+                for resource_uri in resource_uris:
+                    if not scheduler.is_allowed(resource_uri.uri):
+                        msg = 'Denied by robots.txt'
+                        logger.error(msg)
+                        resource_uri.last_visit_date = timezone.now()
+                        resource_uri.wip_date = None
+                        resource_uri.visit_error = msg
+                        resource_uri.save()
+                        continue
+                    visit_time = scheduler.schedule(resource_uri.uri)
+                    heapq.heappush(scheduled, (visit_time, next(sequence), resource_uri))
+
+            if not scheduled and not in_flight:
+                if exit_on_empty:
+                    logger.info('exit-on-empty requested: No more visitable resource, exiting...')
+                    break
+
+                # Only log a single message when we go to sleep
+                if not sleeping:
+                    sleeping = True
+                    logger.info('No more visitable resource, sleeping...')
+
+                time.sleep(SLEEP_WHEN_EMPTY)
+                queue_is_empty = False
+                continue
+
+            sleeping = False
+
+            # start the visits that are due
+            now = scheduler.clock()
+            while scheduled and scheduled[0][0] <= now and len(in_flight) < threads:
+                _, _, resource_uri = heapq.heappop(scheduled)
+                logger.info('Visiting {}'.format(resource_uri))
+                visited_counter += 1
+                in_flight.add(executor.submit(
+                    _visit_uri_in_thread,
+                    resource_uri=resource_uri,
+                    max_uris=max_uris,
+                    uri_counter_by_visitor=uri_counter_by_visitor,
+                ))
+
+                if max_loops and int(visited_counter) > int(max_loops):
+                    logger.info('Stopping visits after max_loops: {} visit loops.'.format(max_loops))
+                    stop_visits = True
+                    break
+
+            if stop_visits:
+                continue
+
+            # wait for a visit to complete or for the next scheduled visit
+            timeout = None
+            if scheduled and len(in_flight) < threads:
+                timeout = max(0, scheduled[0][0] - scheduler.clock())
+            elif not scheduled and not queue_is_empty and len(in_flight) < threads:
+                timeout = 0
+
+            if in_flight:
+                futures.wait(in_flight, timeout=timeout, return_when=futures.FIRST_COMPLETED)
+            elif timeout:
+                time.sleep(timeout)
+
+    finally:
+        executor.shutdown(wait=True)
+        # Each worker thread uses its own database connection
+        for connection in thread_connections:
+            connection.close()
+            connection.dec_thread_sharing()
+
+        for future in in_flight:
+            if future.done():
+                inserted_counter += future.result() or 0
+
+        # Put back in the queue the claimed ResourceURIs we did not visit
+        if scheduled:
+            unvisited_pks = [resource_uri.pk for _, _, resource_uri in scheduled]
+            ResourceURI.objects.filter(pk__in=unvisited_pks).update(wip_date=None)
 
     return visited_counter, inserted_counter
 
 
+def _init_visit_thread(thread_connections):
+    """
+    Initialize a visit worker thread, collecting its database connections in
+    the shared `thread_connections` list such that they are reused across the
+    visits of this thread and closed by the main thread at shutdown.
+    """
+    for connection in connections.all():
+        connection.inc_thread_sharing()
+        thread_connections.append(connection)
+
+
+def _visit_uri_in_thread(resource_uri, max_uris, uri_counter_by_visitor):
+    """
+    Visit `resource_uri` in a worker thread and return the count of inserted
+    URIs.
+
+    Note: the `uri_counter_by_visitor` Counter is shared by all the threads and
+    the `max_uris` limit is therefore approximate.
+    """
+    # Drop the connections of this thread that became unusable after errors
+    for connection in connections.all(initialized_only=True):
+        if connection.errors_occurred:
+            if connection.is_usable():
+                connection.errors_occurred = False
+            else:
+                connection.close()
+
+    return visit_uri(
+        resource_uri=resource_uri,
+        max_uris=max_uris,
+        uri_counter_by_visitor=uri_counter_by_visitor,
+    )
+
+
 def visit_uri(resource_uri, max_uris=0, uri_counter_by_visitor=None, _visit_router=visit_router):
     """
     Call a visitor for a single ResourceURI. Process up to `max_uris` records.
@@ -235,7 +553,7 @@ def visit_uri(resource_uri, max_uris=0, uri_counter_by_visitor=None, _visit_rout
         uri_counter_by_visitor = Counter()
 
     visit_errors = []
-    new_uris_to_visit = visited_data = visit_error = None
+    new_uris_to_visit = visited_data = visit_error = visitor = visitor_key = None
 
     try:
         # Get the visitor class names
@@ -251,12 +569,24 @@ def visit_uri(resource_uri, max_uris=0, uri_counter_by_visitor=None, _visit_rout
         if TRACE:
             logger.debug('visit_uri: uri: {}'.format(uri_to_visit))
 
+        if inspect.isclass(visitor):
+            visitor = visitor()
+        if isinstance(visitor, HttpVisitor):
+            # make a conditional request with the validators of the last visit
+            visitor.etag = resource_uri.etag
+            visitor.last_modified = resource_uri.last_modified
+
         # TODO: Consider pass a full visitors.URI plain object rather than a plain string
-        new_uris_to_visit, visited_data, visit_error = _visit_router.process(uri_to_visit)
+        new_uris_to_visit, visited_data, visit_error = visitor(uri_to_visit)
         if TRACE:
             new_uris_to_visit = list(new_uris_to_visit or [])
             logger.debug('visit_uri: new_uris_to_visit: {}'.format(new_uris_to_visit))
 
+    except NotModified:
+        # The content did not change since the last visit: the data and the
+        # URIs collected then are still current.
+        logger.debug(' = Not modified.')
+
     except NoRouteAvailable:
         logger.error('No route available.')
         # TODO: For now, when a route is not yet supported, we keep a value for
@@ -293,8 +623,85 @@ def visit_uri(resource_uri, max_uris=0, uri_counter_by_visitor=None, _visit_rout
     try:
         # NOTE: new_uris_to_visit here is an iterable of visitors.URI
         # objects, NEITHER strings NOR ResourceURI models
-        # TODO: use batching for inserts or create for more efficient DB processing
-        for vuri_count, vuri in enumerate(new_uris_to_visit):
+        inserted_count, skipped_count = insert_visited_uris(
+            new_uris_to_visit,
+            visit_errors=visit_errors,
+            max_uris=max_uris,
+            uri_counter_by_visitor=uri_counter_by_visitor,
+            visitor_key=visitor_key,
+        )
+        logger.debug(' Skipped\t: {} URI(s) already pending visit.'.format(skipped_count))
+
+    except Exception as e:
+        msg = 'Visit error for URI: {}'.format(uri_to_visit)
+        msg += '\n'.format(uri_to_visit)
+        msg += get_error_message(e)
+        visit_errors.append(msg)
+        logger.error(msg)
+
+    finally:
+        # Flag the processed resource_uri as completed and attach data.
+        resource_uri.last_visit_date = timezone.now()
+        resource_uri.wip_date = None
+        if visited_data:
+            logger.debug(' + Data collected.')
+            resource_uri.data = visited_data
+        if visit_errors:
+            logger.debug(' ! Errors.')
+            resource_uri.visit_error = '\n'.join(visit_errors)[:5000]
+        if isinstance(visitor, HttpVisitor):
+            # a failed visit must not be skipped as not modified on a revisit
+            if visit_errors:
+                resource_uri.etag = resource_uri.last_modified = None
+            else:
+                resource_uri.etag = visitor.etag
+                resource_uri.last_modified = visitor.last_modified
+        resource_uri.save()
+
+    logger.debug(' Inserted\t: {} new URI(s).'.format(inserted_count))
+    return inserted_count
+
+
+def insert_visited_uris(new_uris_to_visit, visit_errors, max_uris=0,
+                        uri_counter_by_visitor=None, visitor_key=None,
+                        batch_size=INSERT_BATCH_SIZE):
+    """
+    Insert new ResourceURIs for the `new_uris_to_visit` iterable of
+    visitors.URI collected from a visit, by batches of `batch_size`.
+    Return a tuple of (inserted, skipped) counts.
+
+    A pre-visited URI is always inserted with a last visit date. Other URIs
+    are only inserted if the same URI is not already pending a visit, either
+    in the database or earlier in `new_uris_to_visit`.
+
+    Append error messages to the `visit_errors` list and stop after 10
+    errors. Stop after inserting more than `max_uris` URIs for `visitor_key`
+    as tracked in the `uri_counter_by_visitor` Counter.
+
+    Note: a row ignored on a conflict with an existing row that has the same
+    canonical URI and last visit date is not counted as inserted.
+    """
+    if uri_counter_by_visitor is None:
+        uri_counter_by_visitor = Counter()
+
+    inserted_count = 0
+    skipped_count = 0
+    # the URIs pending a visit that were seen in this visit
+    pending_uris = set()
+    vuri_count = 0
+
+    for vuris in get_batches(new_uris_to_visit, batch_size):
+        batch_uris = {smart_str(vuri.uri) for vuri in vuris if not vuri.visited}
+        pending_uris.update(
+            ResourceURI.objects
+            .filter(uri__in=batch_uris - pending_uris, last_visit_date=None)
+            .values_list('uri', flat=True)
+        )
+
+        new_resource_uris = []
+        max_uris_reached = False
+        for vuri in vuris:
+            vuri_count += 1
             # FIXME: should we really do this smart_str here??
             uri_str = smart_str(vuri.uri)
             visited_uri = vuri.to_dict()
@@ -312,24 +719,22 @@ def visit_uri(resource_uri, max_uris=0, uri_counter_by_visitor=None, _visit_rout
                 if pre_visited:
                     # set last visit date for this pre-visited URI
                     visited_uri['last_visit_date'] = timezone.now()
-                    new_uri = ResourceURI(**visited_uri)
-                    new_uri.save()
                     logger.debug(' + Inserted pre-visited:\t{}'.format(uri_str))
-                    inserted_count += 1
-                    if max_uris:
-                        uri_counter_by_visitor[visitor_key] += 1
                 else:
                     # if not pre-visited only insert if not existing
-                    if not ResourceURI.objects.filter(uri=vuri.uri, last_visit_date=None).exists():
-                        visited_uri['last_visit_date'] = None
-                        new_uri = ResourceURI(**visited_uri)
-                        new_uri.save()
-                        logger.debug(' + Inserted new:\t{}'.format(uri_str))
-                        inserted_count += 1
-                        if max_uris:
-                            uri_counter_by_visitor[visitor_key] += 1
-                    else:
+                    if uri_str in pending_uris:
                         logger.debug(' + NOT Inserted:\t{}'.format(uri_str))
+                        skipped_count += 1
+                        continue
+                    visited_uri['last_visit_date'] = None
+                    pending_uris.add(uri_str)
+                    logger.debug(' + Inserted new:\t{}'.format(uri_str))
+
+                new_uri = ResourceURI(**visited_uri)
+                new_uri.set_computed_fields()
+                new_resource_uris.append(new_uri)
+                if max_uris:
+                    uri_counter_by_visitor[visitor_key] += 1
 
             except Exception as e:
                 # FIXME: is catching all expections here correct?
@@ -346,28 +751,45 @@ def visit_uri(resource_uri, max_uris=0, uri_counter_by_visitor=None, _visit_rout
 
             if max_uris and int(uri_counter_by_visitor[visitor_key]) > int(max_uris):
                 logger.info(' ! Breaking after processing max-uris: {} URIs.'.format(max_uris))
+                max_uris_reached = True
                 break
 
-    except Exception as e:
-        msg = 'Visit error for URI: {}'.format(uri_to_visit)
-        msg += '\n'.format(uri_to_visit)
-        msg += get_error_message(e)
-        visit_errors.append(msg)
-        logger.error(msg)
+        inserted_count += insert_resource_uris(new_resource_uris, visit_errors)
 
-    finally:
-        # Flag the processed resource_uri as completed and attach data.
-        resource_uri.last_visit_date = timezone.now()
-        resource_uri.wip_date = None
-        if visited_data:
-            logger.debug(' + Data collected.')
-            resource_uri.data = visited_data
-        if visit_errors:
-            logger.debug(' ! Errors.')
-            resource_uri.visit_error = '\n'.join(visit_errors)[:5000]
-        resource_uri.save()
+        if max_uris_reached or len(visit_errors) > 10:
+            break
 
-    logger.debug(' Inserted\t: {} new URI(s).'.format(inserted_count))
+    return inserted_count, skipped_count
+
+
+def insert_resource_uris(resource_uris, visit_errors):
+    """
+    Insert the list of new `resource_uris` ResourceURI, ignoring the rows that
+    conflict with an existing row, and return the number of rows inserted.
+
+    The rows are inserted in bulk. If this fails, they are inserted again one
+    at a time such that only the rows that fail are lost, appending an error
+    message for each of these to the `visit_errors` list.
+    """
+    try:
+        with transaction.atomic():
+            return bulk_insert(ResourceURI, resource_uris)
+    except Exception as e:
+        logger.error(
+            'ERROR while inserting {} URIs from a visit in bulk: inserting one at a time.\n{}'.format(
+                len(resource_uris), get_error_message(e)))
+
+    inserted_count = 0
+    for resource_uri in resource_uris:
+        try:
+            with transaction.atomic():
+                inserted_count += bulk_insert(ResourceURI, [resource_uri])
+        except Exception as e:
+            msg = 'ERROR while inserting URI from a visit: {}'.format(resource_uri.uri)
+            msg += '\n'
+            msg += get_error_message(e)
+            visit_errors.append(msg)
+            logger.error(msg)
     return inserted_count
 
 
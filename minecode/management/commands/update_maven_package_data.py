@@ -19,6 +19,7 @@ from packageurl import normalize_qualifiers
 
 from minecode.collectors.maven import MavenNexusCollector
 from minecode.management.commands import VerboseCommand
+from minecode.models import CollectorState
 from minecode.models import ProcessingError
 from packagedb.models import Package
 
@@ -30,6 +31,9 @@ logger = logging.getLogger(__name__)
 logging.basicConfig(stream=sys.stdout)
 logger.setLevel(logging.INFO)
 
+# name of the saved state of the Maven index collector
+MAVEN_NEXUS_COLLECTOR = 'maven-nexus-collector'
+
 
 def update_packages(packages, fields_to_update):
     try:
@@ -156,7 +160,15 @@ def process_packages(
         if dpc > 0:
             logger.info(f'Deleted {deleted_packages_count:,} Duplicate Maven Packages')
 
-    return unsaved_existing_packages, unsaved_existing_packages_lowercased, unsaved_new_packages, packages_to_delete
+    return (
+        unsaved_existing_packages,
+        unsaved_existing_packages_lowercased,
+        unsaved_new_packages,
+        packages_to_delete,
+        updated_packages_count,
+        created_packages_count,
+        deleted_packages_count,
+    )
 
 
 def update_package_fields(package, maven_package, field_names):
@@ -260,7 +272,12 @@ class Command(VerboseCommand):
         packages_to_delete = []
 
         logger.info('Updating or Adding new Packages from Maven Index')
-        collector = MavenNexusCollector()
+        # process only the indexes published since the last completed run
+        collector_state, _ = CollectorState.objects.get_or_create(name=MAVEN_NEXUS_COLLECTOR)
+        collector = MavenNexusCollector(
+            chain_id=collector_state.state.get('chain_id'),
+            last_incremental=collector_state.state.get('last_incremental'),
+        )
         for i, maven_package in enumerate(collector.get_packages()):
             if not i % 1000:
                 logger.info(f'Processed {i:,} Maven Artifacts')
@@ -364,3 +381,7 @@ class Command(VerboseCommand):
             created_packages_count=created_packages_count,
             deleted_packages_count=deleted_packages_count,
         )
+
+        # save the state only once all the packages of the indexes are processed
+        collector_state.state = collector.state
+        collector_state.save()
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-18 05:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minecode', '0037_processingerror'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resourceuri',
+            name='etag',
+            field=models.CharField(blank=True, help_text='ETag HTTP header value of the last visit. Used to make a conditional request when this URI is visited again.', max_length=1024, null=True),
+        ),
+        migrations.AddField(
+            model_name='resourceuri',
+            name='last_modified',
+            field=models.CharField(blank=True, help_text='Last-Modified HTTP header value of the last visit. Used to make a conditional request when this URI is visited again.', max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-18 05:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minecode', '0039_crawlableuri'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParentPOM',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('repository_url', models.CharField(help_text='Base URL of the Maven repository of this POM.', max_length=2048)),
+                ('namespace', models.CharField(help_text='Maven groupId of this POM.', max_length=255)),
+                ('name', models.CharField(help_text='Maven artifactId of this POM.', max_length=255)),
+                ('version', models.CharField(help_text='Maven version of this POM.', max_length=255)),
+                ('text', models.TextField(help_text='Text content of this POM.')),
+                ('parent_namespace', models.CharField(blank=True, help_text='Maven groupId of the parent of this POM.', max_length=255, null=True)),
+                ('parent_name', models.CharField(blank=True, help_text='Maven artifactId of the parent of this POM.', max_length=255, null=True)),
+                ('parent_version', models.CharField(blank=True, help_text='Maven version of the parent of this POM.', max_length=255, null=True)),
+                ('fetched_date', models.DateTimeField(help_text='Timestamp set to the date of when this POM was fetched.')),
+            ],
+            options={
+                'verbose_name': 'Parent POM',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='parentpom',
+            constraint=models.UniqueConstraint(fields=('repository_url', 'namespace', 'name', 'version'), name='unique_parent_pom'),
+        ),
+    ]
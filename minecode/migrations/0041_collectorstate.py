@@ -0,0 +1,53 @@
+# Generated by Django 5.0.6 on 2026-10-18 06:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("minecode", "0040_parentpom"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CollectorState",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        help_text="Name of the collector of this state.",
+                        max_length=100,
+                        unique=True,
+                    ),
+                ),
+                (
+                    "state",
+                    models.JSONField(
+                        blank=True,
+                        default=dict,
+                        help_text="Mapping of the state saved by the collector.",
+                    ),
+                ),
+                (
+                    "updated_date",
+                    models.DateTimeField(
+                        auto_now=True,
+                        help_text="Timestamp set to the date of when this state was saved.",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Collector state",
+            },
+        ),
+    ]
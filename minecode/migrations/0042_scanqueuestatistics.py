@@ -0,0 +1,45 @@
+# Generated by Django 5.0.6 on 2026-10-18 06:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("minecode", "0041_collectorstate"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScanQueueStatistics",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "statistics",
+                    models.JSONField(
+                        blank=True,
+                        default=dict,
+                        help_text="Mapping of the scan queue statistics.",
+                    ),
+                ),
+                (
+                    "computed_date",
+                    models.DateTimeField(
+                        help_text="Timestamp set to the date of when these statistics were computed."
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Scan queue statistics",
+                "verbose_name_plural": "Scan queue statistics",
+            },
+        ),
+    ]
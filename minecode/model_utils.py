@@ -1,8 +1,11 @@
 import copy
+from functools import reduce
 import logging
+from operator import or_
 import sys
 
 from minecode.models import ScannableURI
+from minecode.models import get_canonical
 from commoncode import fileutils
 from packageurl import normalize_qualifiers
 
@@ -16,6 +19,8 @@ from packagedb.serializers import DependentPackageSerializer
 from packagedb.serializers import PartySerializer
 from packagedcode.models import PackageData
 from minecode.utils import stringify_null_purl_fields
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 
 TRACE = False
@@ -66,11 +71,15 @@ def add_package_to_scan_queue(package, pipelines=DEFAULT_PIPELINES, priority=0,
         logger.debug(' + Inserted ScannableURI\t: {}'.format(uri))
 
 
-def merge_packages(existing_package, new_package_data, replace=False):
+def merge_packages(existing_package, new_package_data, replace=False, save=True):
     """
     Merge the data from the `new_package_data` mapping into the
     `existing_package` Package model object.
 
+    If `save` is False, the updated `existing_package` is not saved and the
+    caller is responsible for saving it. Parties and dependencies are always
+    saved.
+
     When an `existing_package` field has no value one side and and the
     new_package field has a value, the existing_package field is always
     set to this value.
@@ -213,7 +222,8 @@ def merge_packages(existing_package, new_package_data, replace=False):
             updated_fields.append(entry)
             setattr(existing_package, existing_field, new_value)
             existing_package.last_modified_date = timezone.now()
-            existing_package.save()
+            if save:
+                existing_package.save()
 
         if TRACE:
             logger.debug('  Nothing done')
@@ -221,6 +231,131 @@ def merge_packages(existing_package, new_package_data, replace=False):
     return updated_fields
 
 
+def get_package_data(scanned_package, mining_level):
+    """
+    Return a mapping of Package model fields to create a new Package from a
+    ``scanned_package`` PackageData collected with a ``mining_level``.
+    """
+    package_uri = scanned_package.download_url
+    package_content = scanned_package.extra_data.get('package_content')
+
+    return dict(
+        # FIXME: we should get the file_name in the
+        # PackageData object instead.
+        filename=fileutils.file_name(package_uri),
+        # TODO: update the PackageDB model
+        release_date=scanned_package.release_date,
+        mining_level=mining_level,
+        type=scanned_package.type,
+        namespace=scanned_package.namespace,
+        name=scanned_package.name,
+        version=scanned_package.version,
+        qualifiers=normalize_qualifiers(scanned_package.qualifiers, encode=True),
+        subpath=scanned_package.subpath,
+        primary_language=scanned_package.primary_language,
+        description=scanned_package.description,
+        keywords=scanned_package.keywords,
+        homepage_url=scanned_package.homepage_url,
+        download_url=scanned_package.download_url,
+        size=scanned_package.size,
+        sha1=scanned_package.sha1,
+        md5=scanned_package.md5,
+        sha256=scanned_package.sha256,
+        sha512=scanned_package.sha512,
+        bug_tracking_url=scanned_package.bug_tracking_url,
+        code_view_url=scanned_package.code_view_url,
+        vcs_url=scanned_package.vcs_url,
+        copyright=scanned_package.copyright,
+        holder=scanned_package.holder,
+        declared_license_expression=scanned_package.declared_license_expression,
+        license_detections=scanned_package.license_detections,
+        other_license_expression=scanned_package.other_license_expression,
+        other_license_detections=scanned_package.other_license_detections,
+        extracted_license_statement=scanned_package.extracted_license_statement,
+        notice_text=scanned_package.notice_text,
+        source_packages=scanned_package.source_packages,
+        package_content=package_content,
+    )
+
+
+def merge_scanned_package(stored_package, scanned_package, visit_level, mining_level, save=True):
+    """
+    Update the existing ``stored_package`` Package from a ``scanned_package``
+    PackageData. Based on the ``visit_level`` compared to the mining level of
+    ``stored_package``, the fields are either replaced or only set when empty.
+    The new mining level is set to ``mining_level`` when fields are replaced.
+
+    If ``save`` is False, ``stored_package`` is not saved and the caller is
+    responsible for saving it.
+
+    Return a set of the names of the ``stored_package`` model fields that
+    were updated.
+    """
+    # Here we have a pre-existing package that we are updating.
+    # Based on the mining levels, we replace or merge fields
+    # differently
+
+    existing_level = stored_package.mining_level
+
+    if visit_level < existing_level:
+        # if the level of the new visit is lower than the level
+        # of the current package, then existing package data
+        # wins and is more important. Its attributes can only be
+        # updated if there was a null values and there is a non-
+        # null values in the new package data from the visit.
+        updated_fields = merge_packages(
+            existing_package=stored_package,
+            new_package_data=scanned_package.to_dict(),
+            replace=False,
+            save=save)
+        # for a foreign key, such as dependencies and parties, we will adopt the
+        # same logic. In this case, parties or dependencies coming from a scanned
+        # package are only added if there is no parties or dependencies in the
+        # existing stored package
+    else:
+        # if the level of the new visit is higher or equal to
+        # the level of the existing package, then new package
+        # data from the visit is more important and wins and its
+        # non-null values replace the values of the existing
+        # package which is updated in the DB.
+        updated_fields = merge_packages(
+            existing_package=stored_package,
+            new_package_data=scanned_package.to_dict(),
+            replace=True,
+            save=save)
+        # for a foreign key, such as dependencies and parties, we will adopt the
+        # same logic. In this case, parties or dependencies coming from a scanned
+        # package will override existing values. If there are parties in the scanned
+        # package and the existing package, the existing package parties should be
+        # deleted first and then the new package's parties added.
+
+        stored_package.mining_level = mining_level
+
+    # parties and dependencies are saved in their own tables
+    updated_field_names = {
+        entry['field'] for entry in updated_fields
+        if entry['field'] not in ('parties', 'dependencies')
+    }
+    updated_field_names.add('last_modified_date')
+    if visit_level >= existing_level:
+        updated_field_names.add('mining_level')
+
+    if updated_fields:
+        data = {
+            'updated_fields': updated_fields,
+        }
+        stored_package.append_to_history('Package field values have been updated.', data=data)
+        updated_field_names.add('history')
+
+    # TODO: append updated_fields information to the package's history
+
+    stored_package.last_modified_date = timezone.now()
+    if save:
+        stored_package.save()
+
+    return updated_field_names
+
+
 def merge_or_create_package(scanned_package, visit_level, override=False):
     """
     Update Package from ``scanned_package`` instance if `visit_level` is greater
@@ -271,54 +406,7 @@ def merge_or_create_package(scanned_package, visit_level, override=False):
         pass
 
     if stored_package:
-        # Here we have a pre-existing package that we are updating.
-        # Based on the mining levels, we replace or merge fields
-        # differently
-
-        existing_level = stored_package.mining_level
-
-        if visit_level < existing_level:
-            # if the level of the new visit is lower than the level
-            # of the current package, then existing package data
-            # wins and is more important. Its attributes can only be
-            # updated if there was a null values and there is a non-
-            # null values in the new package data from the visit.
-            updated_fields = merge_packages(
-                existing_package=stored_package,
-                new_package_data=scanned_package.to_dict(),
-                replace=False)
-            # for a foreign key, such as dependencies and parties, we will adopt the
-            # same logic. In this case, parties or dependencies coming from a scanned
-            # package are only added if there is no parties or dependencies in the
-            # existing stored package
-        else:
-            # if the level of the new visit is higher or equal to
-            # the level of the existing package, then new package
-            # data from the visit is more important and wins and its
-            # non-null values replace the values of the existing
-            # package which is updated in the DB.
-            updated_fields = merge_packages(
-                existing_package=stored_package,
-                new_package_data=scanned_package.to_dict(),
-                replace=True)
-            # for a foreign key, such as dependencies and parties, we will adopt the
-            # same logic. In this case, parties or dependencies coming from a scanned
-            # package will override existing values. If there are parties in the scanned
-            # package and the existing package, the existing package parties should be
-            # deleted first and then the new package's parties added.
-
-            stored_package.mining_level = mining_level
-
-        if updated_fields:
-            data = {
-                'updated_fields': updated_fields,
-            }
-            stored_package.append_to_history('Package field values have been updated.', data=data)
-
-        # TODO: append updated_fields information to the package's history
-
-        stored_package.last_modified_date = timezone.now()
-        stored_package.save()
+        merge_scanned_package(stored_package, scanned_package, visit_level, mining_level)
         logger.debug(' + Updated package\t: {}'.format(package_uri))
         package = stored_package
         merged = True
@@ -337,45 +425,7 @@ def merge_or_create_package(scanned_package, visit_level, override=False):
             version=scanned_package.version,
         )
         existing_related_package = existing_related_packages.first()
-        package_content = scanned_package.extra_data.get('package_content')
-
-        package_data = dict(
-            # FIXME: we should get the file_name in the
-            # PackageData object instead.
-            filename=fileutils.file_name(package_uri),
-            # TODO: update the PackageDB model
-            release_date=scanned_package.release_date,
-            mining_level=mining_level,
-            type=scanned_package.type,
-            namespace=scanned_package.namespace,
-            name=scanned_package.name,
-            version=scanned_package.version,
-            qualifiers=normalize_qualifiers(scanned_package.qualifiers, encode=True),
-            subpath=scanned_package.subpath,
-            primary_language=scanned_package.primary_language,
-            description=scanned_package.description,
-            keywords=scanned_package.keywords,
-            homepage_url=scanned_package.homepage_url,
-            download_url=scanned_package.download_url,
-            size=scanned_package.size,
-            sha1=scanned_package.sha1,
-            md5=scanned_package.md5,
-            sha256=scanned_package.sha256,
-            sha512=scanned_package.sha512,
-            bug_tracking_url=scanned_package.bug_tracking_url,
-            code_view_url=scanned_package.code_view_url,
-            vcs_url=scanned_package.vcs_url,
-            copyright=scanned_package.copyright,
-            holder=scanned_package.holder,
-            declared_license_expression=scanned_package.declared_license_expression,
-            license_detections=scanned_package.license_detections,
-            other_license_expression=scanned_package.other_license_expression,
-            other_license_detections=scanned_package.other_license_detections,
-            extracted_license_statement=scanned_package.extracted_license_statement,
-            notice_text=scanned_package.notice_text,
-            source_packages=scanned_package.source_packages,
-            package_content=package_content,
-        )
+        package_data = get_package_data(scanned_package, mining_level)
 
         stringify_null_purl_fields(package_data)
 
@@ -438,6 +488,274 @@ def merge_or_create_package(scanned_package, visit_level, override=False):
     return package, created, merged, map_error
 
 
+def get_unique_download_url_batches(scanned_packages, batch_size):
+    """
+    Yield lists of up to `batch_size` PackageData from the `scanned_packages`
+    iterable such that a download URL is never repeated in a list.
+    """
+    batch = []
+    download_urls = set()
+    for scanned_package in scanned_packages:
+        download_url = getattr(scanned_package, 'download_url', None)
+        if len(batch) == batch_size or (download_url and download_url in download_urls):
+            yield batch
+            batch = []
+            download_urls = set()
+        batch.append(scanned_package)
+        if download_url:
+            download_urls.add(download_url)
+    if batch:
+        yield batch
+
+
+def merge_or_create_packages(scanned_packages, visit_level, add_to_scan_queue=False, batch_size=1000):
+    """
+    Update or create Packages from the ``scanned_packages`` iterable of
+    PackageData, the same way as merge_or_create_package, processing them by
+    batches of up to ``batch_size`` PackageData.
+
+    Return a list of (package, created, merged, map_error) tuples, one for
+    each PackageData of ``scanned_packages`` in the same order.
+
+    If ``add_to_scan_queue`` is True, add the created Packages to the scan
+    queue.
+    """
+    results = []
+    for scanned_packages_batch in get_unique_download_url_batches(scanned_packages, batch_size):
+        with transaction.atomic():
+            results.extend(
+                _merge_or_create_packages(
+                    scanned_packages=scanned_packages_batch,
+                    visit_level=visit_level,
+                    add_to_scan_queue=add_to_scan_queue,
+                )
+            )
+    return results
+
+
+def get_purl_key(package):
+    """
+    Return a tuple of the purl fields used to find the Packages related to a
+    `package` Package or PackageData.
+    """
+    return package.type, package.namespace, package.name, package.version
+
+
+def _merge_or_create_packages(scanned_packages, visit_level, add_to_scan_queue=False):
+    """
+    Update or create Packages from the ``scanned_packages`` list of PackageData
+    with unique download URLs. See merge_or_create_packages for details.
+
+    Existing and related Packages are fetched with a few queries and the
+    updates are computed in memory then saved with bulk queries.
+    """
+    mining_level = visit_level
+    results = [None] * len(scanned_packages)
+    package_uris = []
+    for position, scanned_package in enumerate(scanned_packages):
+        if not isinstance(scanned_package, PackageData):
+            msg = 'Not a ScanCode PackageData type:' + repr(scanned_package)
+            logger.error(msg)
+            raise RuntimeError(msg)
+
+        if not scanned_package.download_url:
+            # TODO: there could be valid cases where we have no download URL
+            # and still want to create a package???
+            msg = 'No download_url for package:' + repr(scanned_package)
+            logger.error(msg)
+            results[position] = None, False, False, msg + '\n'
+            continue
+
+        package_uris.append((position, scanned_package))
+
+    # Check if we already have existing PackageDB records to update
+    # FIXME: also consider the Package URL fields!!!
+    stored_packages_by_download_url = {}
+    stored_packages = Package.objects.filter(
+        download_url__in=[scanned_package.download_url for _, scanned_package in package_uris]
+    )
+    for stored_package in stored_packages:
+        stored_packages_by_download_url.setdefault(stored_package.download_url, stored_package)
+
+    updated_packages = []
+    # names of the fields updated in any of the updated Packages
+    update_fields = set()
+    new_packages = []
+    for position, scanned_package in package_uris:
+        stored_package = stored_packages_by_download_url.get(scanned_package.download_url)
+        if stored_package:
+            update_fields |= merge_scanned_package(
+                stored_package, scanned_package, visit_level, mining_level, save=False
+            )
+            logger.debug(' + Updated package\t: {}'.format(scanned_package.download_url))
+            updated_packages.append(stored_package)
+            results[position] = stored_package, False, True, ''
+        else:
+            new_packages.append((position, scanned_package))
+
+    if updated_packages:
+        Package.objects.bulk_update(updated_packages, fields=sorted(update_fields))
+
+    if not new_packages:
+        return results
+
+    # Find the first existing Package with the same purl of each new Package,
+    # to use its package_set values
+    purl_keys = {get_purl_key(scanned_package) for _, scanned_package in new_packages}
+    purl_lookups = [
+        Q(**dict(zip(('type', 'namespace', 'name', 'version'), purl_key)))
+        for purl_key in purl_keys
+    ]
+    related_packages_by_purl_key = {}
+    for related_package in Package.objects.filter(reduce(or_, purl_lookups)).order_by('id'):
+        related_packages_by_purl_key.setdefault(get_purl_key(related_package), related_package)
+
+    # {package id: list of PackageSet} for the existing and new related Packages
+    package_sets_by_package = {id(package): [] for package in related_packages_by_purl_key.values()}
+    related_package_ids_by_pk = {
+        package.pk: id(package) for package in related_packages_by_purl_key.values()
+    }
+    package_set_memberships = (
+        Package.package_sets.through.objects
+        .filter(package_id__in=related_package_ids_by_pk)
+        .values_list('package_id', 'packageset_id')
+        .order_by('packageset_id')
+    )
+    for package_pk, package_set_pk in package_set_memberships:
+        package_sets_by_package[related_package_ids_by_pk[package_pk]].append(PackageSet(pk=package_set_pk))
+
+    created_time = timezone.now()
+    created_packages = []
+    parties = []
+    dependencies = []
+    new_package_sets = []
+    # list of (PackageSet, Package) to add
+    new_memberships = []
+    for position, scanned_package in new_packages:
+        package_uri = scanned_package.download_url
+        package_data = get_package_data(scanned_package, mining_level)
+        stringify_null_purl_fields(package_data)
+
+        created_package = Package(**package_data)
+        created_package.append_to_history('New Package created from URI: {}'.format(package_uri))
+
+        # This is used in the case of Maven packages created from the priority queue
+        for h in scanned_package.extra_data.get('history', []):
+            created_package.append_to_history(h)
+
+        created_package.created_date = created_time
+        created_package.last_modified_date = created_time
+
+        created_package_sets = package_sets_by_package[id(created_package)] = []
+        existing_related_package = related_packages_by_purl_key.get(get_purl_key(scanned_package))
+        if existing_related_package:
+            related_package_sets = package_sets_by_package[id(existing_related_package)]
+            if (
+                not related_package_sets
+                or created_package.package_content == PackageContentType.BINARY
+            ):
+                # Binary packages can only be part of one set
+                package_set = PackageSet()
+                new_package_sets.append(package_set)
+                new_memberships.append((package_set, existing_related_package))
+                new_memberships.append((package_set, created_package))
+                related_package_sets.append(package_set)
+                created_package_sets.append(package_set)
+            else:
+                for package_set in list(related_package_sets):
+                    new_memberships.append((package_set, created_package))
+                    created_package_sets.append(package_set)
+
+        # A new Package is also a related Package of the next new Packages
+        related_packages_by_purl_key.setdefault(get_purl_key(created_package), created_package)
+
+        for party in scanned_package.parties:
+            parties.append(Party(
+                package=created_package,
+                type=party.type,
+                role=party.role,
+                name=party.name,
+                email=party.email,
+                url=party.url,
+            ))
+
+        for dependency in scanned_package.dependencies:
+            dependencies.append(DependentPackage(
+                package=created_package,
+                purl=dependency.purl,
+                extracted_requirement=dependency.extracted_requirement,
+                scope=dependency.scope,
+                is_runtime=dependency.is_runtime,
+                is_optional=dependency.is_optional,
+                is_resolved=dependency.is_resolved,
+            ))
+
+        created_packages.append(created_package)
+        results[position] = created_package, True, False, ''
+        logger.debug(' + Inserted package\t: {}'.format(package_uri))
+
+    Package.objects.bulk_create(created_packages)
+    PackageSet.objects.bulk_create(new_package_sets)
+    Package.package_sets.through.objects.bulk_create(
+        [
+            Package.package_sets.through(package_id=package.pk, packageset_id=package_set.pk)
+            for package_set, package in new_memberships
+        ],
+        ignore_conflicts=True,
+    )
+    Party.objects.bulk_create(parties)
+    DependentPackage.objects.bulk_create(dependencies)
+
+    if add_to_scan_queue:
+        scannable_uris = []
+        for package in created_packages:
+            scannable_uri = ScannableURI(uri=package.download_url, package=package)
+            scannable_uri.canonical = get_canonical(scannable_uri.uri)
+            scannable_uri.normalize_fields()
+            scannable_uris.append(scannable_uri)
+        ScannableURI.objects.bulk_create(scannable_uris)
+
+    return results
+
+
+def get_resource_extra_data(resource_data):
+    """
+    Return the extra_data of the Resource data `resource_data` without the
+    directory fingerprints, which are stored in the matchcode indexes.
+    """
+    extra_data = copy.deepcopy(resource_data.get('extra_data', {}))
+    extra_data.pop("directory_content", None)
+    extra_data.pop("directory_structure", None)
+    return extra_data
+
+
+def make_resource(package, resource_data, extra_data):
+    """
+    Return a new unsaved purldb Resource of `package` from the Resource data
+    `resource_data` and its `extra_data`.
+    """
+    return Resource(
+        package=package,
+        path=resource_data.get('path'),
+        is_file=resource_data.get('type') == 'file',
+        name=resource_data.get('name'),
+        extension=resource_data.get('extension'),
+        size=resource_data.get('size'),
+        md5=resource_data.get('md5'),
+        sha1=resource_data.get('sha1'),
+        sha256=resource_data.get('sha256'),
+        mime_type=resource_data.get('mime_type'),
+        file_type=resource_data.get('file_type'),
+        programming_language=resource_data.get('programming_language'),
+        is_binary=resource_data.get('is_binary'),
+        is_text=resource_data.get('is_text'),
+        is_archive=resource_data.get('is_archive'),
+        is_media=resource_data.get('is_media'),
+        is_key_file=resource_data.get('is_key_file'),
+        extra_data=extra_data,
+    )
+
+
 def update_or_create_resource(package, resource_data):
     """
     Using Resource data from `resource_data`, create or update the
@@ -452,35 +770,55 @@ def update_or_create_resource(package, resource_data):
     resource = None
     path = resource_data.get('path')
 
-    extra_data = copy.deepcopy(resource_data.get('extra_data', {}))
-    extra_data.pop("directory_content", None)
-    extra_data.pop("directory_structure", None)
+    extra_data = get_resource_extra_data(resource_data)
 
     try:
         resource = Resource.objects.get(package=package, path=path)
         updated = True
     except Resource.DoesNotExist:
-        resource = Resource(
-            package=package,
-            path=path,
-            is_file=resource_data.get('type') == 'file',
-            name=resource_data.get('name'),
-            extension=resource_data.get('extension'),
-            size=resource_data.get('size'),
-            md5=resource_data.get('md5'),
-            sha1=resource_data.get('sha1'),
-            sha256=resource_data.get('sha256'),
-            mime_type=resource_data.get('mime_type'),
-            file_type=resource_data.get('file_type'),
-            programming_language=resource_data.get('programming_language'),
-            is_binary=resource_data.get('is_binary'),
-            is_text=resource_data.get('is_text'),
-            is_archive=resource_data.get('is_archive'),
-            is_media=resource_data.get('is_media'),
-            is_key_file=resource_data.get('is_key_file'),
-            extra_data=extra_data,
-        )
+        resource = make_resource(package, resource_data, extra_data)
         created = True
     _ = resource.set_scan_results(resource_data, save=True)
     resource.update_extra_data(extra_data)
     return resource, created, updated
+
+
+def bulk_update_or_create_resources(package, resources_data, batch_size=1000):
+    """
+    Using the list of Resource data `resources_data`, create or update the
+    corresponding purldb Resources from `package` in bulk. This is the bulk
+    equivalent of calling update_or_create_resource() for each item of
+    `resources_data`, using three queries.
+
+    Return a 3-tuple of the list of corresponding purldb Resources of
+    `resources_data`, and the numbers of created and updated Resources.
+    """
+    paths = set(resource_data.get('path') for resource_data in resources_data)
+    resources_by_path = {
+        resource.path: resource
+        for resource in Resource.objects.filter(package=package, path__in=paths)
+    }
+    updated_resources_by_path = dict(resources_by_path)
+    created_resources = []
+
+    resources = []
+    for resource_data in resources_data:
+        path = resource_data.get('path')
+        extra_data = get_resource_extra_data(resource_data)
+        resource = resources_by_path.get(path)
+        if not resource:
+            resource = make_resource(package, resource_data, extra_data)
+            resources_by_path[path] = resource
+            created_resources.append(resource)
+        resource.set_scan_results(resource_data)
+        resource.extra_data.update(extra_data)
+        resources.append(resource)
+
+    Resource.objects.bulk_create(created_resources, batch_size=batch_size)
+    if updated_resources_by_path:
+        Resource.objects.bulk_update(
+            updated_resources_by_path.values(),
+            fields=Resource.scan_fields() + ['extra_data'],
+            batch_size=batch_size,
+        )
+    return resources, len(created_resources), len(updated_resources_by_path)
@@ -13,7 +13,11 @@ import logging
 import sys
 
 from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
 from django.db import models
+from django.db import router
+from django.db import transaction
 from django.utils import timezone
 import django_rq
 
@@ -56,6 +60,110 @@ def get_canonical(uri):
     return normalized.unicode
 
 
+def claim_batch(queryset, size, **values):
+    """
+    Return a list of up to `size` model instances from the `queryset` query set
+    of queued rows, claimed atomically by setting the fields `values` mapping
+    of {field name: value} on these rows. The instances are returned in the
+    `queryset` order and carry the updated `values`.
+
+    The rows are claimed with a single UPDATE ... RETURNING statement that
+    updates the rows selected with a SELECT ... FOR UPDATE SKIP LOCKED LIMIT
+    subquery.
+
+    Note: the tables using this are queues that can be sorted by priority and
+    track the status of the processing of each row. We ignore locked rows by
+    using SKIP LOCKED: these rows are being updated in other workers and
+    therefore there is nothing to do with these. Per Postgres doc:
+    With SKIP LOCKED, any selected rows that cannot be immediately locked are
+    skipped. Skipping locked rows provides an inconsistent view of the data, so
+    this is not suitable for general purpose work, but can be used to avoid lock
+    contention with multiple consumers accessing a queue-like table.
+    """
+    model = queryset.model
+    ordering = queryset.query.order_by
+    if queryset.query.combinator:
+        # Combined queries (such as UNION) cannot be locked: lock the rows of
+        # the model table selected with a subquery instead.
+        queryset = model.objects.filter(pk__in=queryset.values('pk'))
+
+    using = router.db_for_write(model)
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    table = quote_name(model._meta.db_table)
+    pk_column = quote_name(model._meta.pk.column)
+
+    set_columns = []
+    set_params = []
+    for name, value in values.items():
+        field = model._meta.get_field(name)
+        set_columns.append(f'{quote_name(field.column)} = %s')
+        set_params.append(field.get_db_prep_save(value, connection=connection))
+    set_columns = ', '.join(set_columns)
+
+    # The candidates are numbered in the `queryset` order: their ordering
+    # columns are selected to number them with the same ORDER BY.
+    order_names = []
+    order_by = []
+    for name in ordering:
+        field = get_ordering_field(model, name)
+        descending = name.startswith('-')
+        if not field.primary_key and field.name not in order_names:
+            order_names.append(field.name)
+        order_by.append(quote_name(field.column) + (' DESC' if descending else ''))
+    order_by = ', '.join(order_by or [pk_column])
+
+    candidates = (
+        queryset
+        .order_by(*ordering)
+        .select_for_update(skip_locked=True)
+        .values('pk', *order_names)
+    )[:size]
+
+    with transaction.atomic(using=using):
+        candidates_sql, candidates_params = candidates.query.get_compiler(using=using).as_sql()
+        # The position of each candidate is kept to return the claimed rows in
+        # the queue order: the rows returned by UPDATE are not ordered.
+        sql = f"""
+            WITH candidates AS ({candidates_sql}),
+            positions AS (
+                SELECT {pk_column}, row_number() OVER (ORDER BY {order_by}) AS claim_position
+                FROM candidates
+            ),
+            claimed AS (
+                UPDATE {table} SET {set_columns}
+                FROM positions
+                WHERE {table}.{pk_column} = positions.{pk_column}
+                RETURNING {table}.*, positions.claim_position
+            )
+            SELECT * FROM claimed ORDER BY claim_position
+        """
+        params = (*candidates_params, *set_params)
+        return list(model.objects.db_manager(using).raw(sql, params))
+
+
+def get_ordering_field(model, name):
+    """
+    Return the `model` field of an ordering `name` such as "priority" or
+    "-priority". Raise a ValueError if `name` is not the name of a concrete
+    non-relational field, optionally prefixed with "-", as claim_batch()
+    cannot order the claimed rows by expressions or related fields.
+    """
+    if isinstance(name, str):
+        field_name = name[1:] if name.startswith('-') else name
+        try:
+            field = model._meta.pk if field_name == 'pk' else model._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            field = None
+        if field and field.concrete and not field.is_relation:
+            return field
+
+    raise ValueError(
+        f'Cannot claim {model.__name__} rows ordered by {name!r}: '
+        'only plain field names can be used to order a queue.'
+    )
+
+
 class BaseURI(models.Model):
     """
     A base abstract model to store URI for crawling, scanning and indexing.
@@ -286,38 +394,25 @@ class ResourceURIManager(models.Manager):
         being "in_progress" by setting the wip_date field.
         Return None when there is no candidate left to visit.
 
-        NOTE: this method can only be called from within a
-        transaction.atomic block.
-
         Note: the ResourceURI table is used as a queue that can be
         sorted by priority and tracks the status of visits of each
         ResourceURI. ResourceURI that have not yet been visited are
         sorted by decreasing priority.
         """
+        resource_uris = self.get_next_batch(1)
+        if resource_uris:
+            return resource_uris[0]
 
-        # We use select_for_update to ensure an atomic query. We ignore
-        # locked rows by using skip_locked=True available since Django
-        # 1.11.
-
-        # Locked row are being updated in other workers and therefore
-        # there is nothing to do with these. This is a great way to get
-        # an efficient queue in a model.
-
-        # Per Postgres doc:
-        # With SKIP LOCKED, any selected rows that cannot be immediately
-        # locked are skipped. Skipping locked rows provides an
-        # inconsistent view of the data, so this is not suitable for
-        # general purpose work, but can be used to avoid lock contention
-        # with multiple consumers accessing a queue-like table.
-        resource_uri = self.get_visitables().select_for_update(skip_locked=True).first()
-        if not resource_uri:
-            return
-
-        # Mark the URI as wip: Callers mark this done by resetting
+    def get_next_batch(self, n):
+        """
+        Return a list of up to `n` next ResourceURI candidates for visit,
+        sorted by decreasing priority, and mark them as being "in_progress" by
+        setting the wip_date field in a single atomic query.
+        Return an empty list when there is no candidate left to visit.
+        """
+        # Mark the URIs as wip: Callers mark this done by resetting
         # wip_date to null
-        resource_uri.wip_date = timezone.now()
-        resource_uri.save(update_fields=['wip_date'])
-        return resource_uri
+        return claim_batch(self.get_visitables(), n, wip_date=timezone.now())
 
     def never_mapped(self):
         """
@@ -356,6 +451,17 @@ class ResourceURIManager(models.Manager):
         qs = qs.order_by('-priority')
         return qs
 
+    def get_next_mappable_batch(self, n):
+        """
+        Return a list of up to `n` next ResourceURI candidates for mapping,
+        sorted by decreasing priority, and mark them as being "in_progress" by
+        setting the wip_date field in a single atomic query.
+        Return an empty list when there is no candidate left to map.
+        """
+        # Mark the URIs as wip: Callers mark this done by resetting
+        # wip_date to null
+        return claim_batch(self.get_mappables(), n, wip_date=timezone.now())
+
 
 class ResourceURI(BaseURI):
     """
@@ -407,6 +513,22 @@ class ResourceURI(BaseURI):
         help_text='Timestamp set to the date of the last visit.  Used to track visit status.',
     )
 
+    etag = models.CharField(
+        max_length=1024,
+        null=True,
+        blank=True,
+        help_text='ETag HTTP header value of the last visit. Used to make '
+                  'a conditional request when this URI is visited again.',
+    )
+
+    last_modified = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        help_text='Last-Modified HTTP header value of the last visit. Used to '
+                  'make a conditional request when this URI is visited again.',
+    )
+
     is_visitable = models.BooleanField(
         db_index=True,
         default=False,
@@ -502,14 +624,21 @@ class ResourceURI(BaseURI):
         self.is_visitable = visit_router.is_routable(uri)
         self.is_mappable = map_router.is_routable(uri)
 
-    def save(self, *args, **kwargs):
+    def set_computed_fields(self):
         """
-        Save, adding defaults for computed fields and validating fields.
+        Set defaults for computed fields and validate fields. This is done on
+        save() and must be called before a bulk_create() that bypasses save().
         """
         self._set_defauts()
         self.normalize_fields()
         self.has_map_error = True if self.map_error else False
         self.has_visit_error = True if self.visit_error else False
+
+    def save(self, *args, **kwargs):
+        """
+        Save, adding defaults for computed fields and validating fields.
+        """
+        self.set_computed_fields()
         super(ResourceURI, self).save(*args, **kwargs)
 
 
@@ -532,12 +661,18 @@ class ScannableURIManager(models.Manager):
         Return the next ScannableURI candidate for scan and mark it as
         being "processed" by setting the wip_date field.
         Return None when there is no candidate left to scan.
-
-        NOTE: this method can only be called from within a
-        transaction.atomic block.
         """
         return self.__get_next_candidate(self.get_scannables())
 
+    def get_next_batch(self, n, **values):
+        """
+        Return a list of up to `n` next ScannableURI candidates for scan and
+        mark them as being "processed" by setting the wip_date field and the
+        optional fields `values` in a single atomic query.
+        Return an empty list when there is no candidate left to scan.
+        """
+        return self.__get_next_candidates(self.get_scannables(), n, **values)
+
     def __get_next_candidate(self, qs):
         """
         Return and "lock" the next candidate ScannableURI from the `qs` query
@@ -545,46 +680,28 @@ class ScannableURIManager(models.Manager):
 
         Mark it as being "processed" by setting the wip_date field. Return None
         when there is no candidate left.
+        """
+        candidate_uris = self.__get_next_candidates(qs, 1)
+        if candidate_uris:
+            return candidate_uris[0]
+
+    def __get_next_candidates(self, qs, n, **values):
+        """
+        Return and "lock" a list of up to `n` next candidate ScannableURIs from
+        the `qs` query set.
+
+        Mark them as being "processed" by setting the wip_date field and the
+        optional fields `values`.
 
         Note: this table is used as a queue that can be
         sorted by priority and tracks the status of scan requests.
         URI that have not yet been requested for scan are
         sorted by decreasing priority.
         """
-        # FIXME: use a shared function for this
-
-        # We use select_for_update to ensure an atomic query. We ignore
-        # locked rows by using skip_locked=True available since Django
-        # 1.11.
-
-        # Locked row are being updated in other workers and therefore
-        # there is nothing to do with these. This is a great way to get
-        # an efficient queue in a model.
-
-        # Per Postgres doc:
-        # With SKIP LOCKED, any selected rows that cannot be immediately
-        # locked are skipped. Skipping locked rows provides an
-        # inconsistent view of the data, so this is not suitable for
-        # general purpose work, but can be used to avoid lock contention
-        # with multiple consumers accessing a queue-like table.
-        candidate_uris = qs.select_for_update(skip_locked=True)
-
-        # keep the top record if there is one
-        candidate_uris = candidate_uris[:1]
-
-        # This force the evaluation of the query but only once
-        # (previously exists then get was evaluating two QS)
-        candidate_uris = list(candidate_uris)
-        if not candidate_uris:
-            return
-
-        canidate_uri = candidate_uris[0]
-
-        # Mark the URI as wip: Callers mark this done by resetting
+        # Mark the URIs as wip: Callers mark this done by resetting
         # wip_date to null
-        canidate_uri.wip_date = timezone.now()
-        canidate_uri.save(update_fields=['wip_date'])
-        return canidate_uri
+        values.setdefault('wip_date', timezone.now())
+        return claim_batch(qs, n, **values)
 
     def get_processables(self):
         """
@@ -610,9 +727,6 @@ class ScannableURIManager(models.Manager):
         Return the next ScannableURI candidate for visit and mark it as
         being "in_progress" by setting the wip_date field.
         Return None when there is no candidate left to visit.
-
-        NOTE: this method can only be called from within a
-        transaction.atomic block.
         """
         return self.__get_next_candidate(self.get_processables())
 
@@ -620,15 +734,44 @@ class ScannableURIManager(models.Manager):
         """
         Return a statistics mapping with summary counts of ScannableURI grouped by status.
         """
-        statuses = list(self.values('scan_status').annotate(count=models.Count('scan_status')).order_by('scan_status'),)
-        for stat in statuses:
-            stat['scan_status'] = ScannableURI.SCAN_STATUSES_BY_CODE[stat['scan_status']]
+        processable_statuses = [
+            ScannableURI.SCAN_SUBMITTED,
+            ScannableURI.SCAN_IN_PROGRESS,
+            ScannableURI.SCAN_COMPLETED,
+        ]
+        # All the counts are computed at once in a single pass over the table
+        counts = (
+            self.order_by('scan_status')
+            .values('scan_status')
+            .annotate(
+                count=models.Count('id'),
+                processables=models.Count('id', filter=models.Q(
+                    scan_status__in=processable_statuses,
+                    wip_date=None,
+                    scan_error=None,
+                )),
+                scannables=models.Count('id', filter=models.Q(
+                    scan_status=ScannableURI.SCAN_NEW,
+                    scan_error=None,
+                )),
+            )
+        )
+
+        statuses = []
         stats = {
-            'total': self.count(),
-            'processables': self.get_processables().count(),
-            'scannables': self.get_scannables().count(),
+            'total': 0,
+            'processables': 0,
+            'scannables': 0,
             'by_status': statuses,
         }
+        for count in counts:
+            statuses.append(dict(
+                scan_status=ScannableURI.SCAN_STATUSES_BY_CODE[count['scan_status']],
+                count=count['count'],
+            ))
+            stats['total'] += count['count']
+            stats['processables'] += count['processables']
+            stats['scannables'] += count['scannables']
 
         most_recent = dict(
             most_recent_submitted=self._recent(scan_status=ScannableURI.SCAN_SUBMITTED),
@@ -641,22 +784,88 @@ class ScannableURIManager(models.Manager):
         stats.update(most_recent)
         return stats
 
+    def refresh_statistics(self):
+        """
+        Compute the statistics mapping and save it as the ScanQueueStatistics
+        summary read by cached_statistics(). Return the statistics mapping.
+
+        This is called periodically by the scheduled
+        refresh_scan_queue_statistics task.
+        """
+        stats = self.statistics()
+        ScanQueueStatistics.objects.update_or_create(
+            pk=ScanQueueStatistics.SUMMARY_PK,
+            defaults=dict(statistics=stats, computed_date=timezone.now()),
+        )
+        return stats
+
+    def cached_statistics(self):
+        """
+        Return the statistics mapping as last saved by refresh_statistics(),
+        such that the statistics of a large queue are not computed on each
+        request. The statistics are computed once if they were never saved.
+        """
+        stats = (
+            ScanQueueStatistics.objects
+            .filter(pk=ScanQueueStatistics.SUMMARY_PK)
+            .values_list('statistics', flat=True)
+            .first()
+        )
+        if stats is None:
+            stats = self.refresh_statistics()
+        return stats
+
     def _recent(self, scan_status, extra_value=None, most_recent=10):
         """
-        Yield mappings of the ``most_recent`` PURL and download URL with a given
-        ``scan_status``.
+        Return a list of mappings of the ``most_recent`` PURL and download URL
+        with a given ``scan_status``.
         Include an optional ``extra value`` field name.
         """
-        recent_uris = self.filter(scan_status=scan_status).order_by('-scan_date')[:most_recent]
+        recent_uris = (
+            self.filter(scan_status=scan_status)
+            .order_by('-scan_date')
+            .select_related('package')
+        )[:most_recent]
+
+        recents = []
         for scauri in recent_uris:
             recent = dict(
-                # this is NOT a field requiring this loop
+                # this is NOT a field requiring this loop, but the package
+                # is fetched in the same query
                 package_url=scauri.package.package_url,
                 download_url=scauri.package.download_url,
             )
             if extra_value:
                 recent[extra_value] = getattr(scauri, extra_value)
-            yield recent
+            recents.append(recent)
+        return recents
+
+
+class ScanQueueStatistics(models.Model):
+    """
+    The statistics of the ScannableURI scan queue, as last computed by the
+    scheduled refresh_scan_queue_statistics task. This single-row summary is
+    shared by all the web workers.
+    """
+    # the primary key of the single summary row
+    SUMMARY_PK = 1
+
+    statistics = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text='Mapping of the scan queue statistics.',
+    )
+
+    computed_date = models.DateTimeField(
+        help_text='Timestamp set to the date of when these statistics were computed.',
+    )
+
+    class Meta:
+        verbose_name = 'Scan queue statistics'
+        verbose_name_plural = 'Scan queue statistics'
+
+    def __str__(self):
+        return f'Scan queue statistics computed on {self.computed_date}'
 
 
 class ScannableURI(BaseURI):
@@ -823,7 +1032,8 @@ class ScannableURI(BaseURI):
             )
             return
 
-        job = django_rq.enqueue(
+        queue = django_rq.get_queue('scan_results')
+        job = queue.enqueue(
             tasks.process_scan_results,
             scannable_uri_uuid=self.uuid,
             scan_results_location=scan_results_location,
@@ -893,16 +1103,20 @@ class PriorityResourceURIManager(models.Manager):
         as being "in_progress" by setting the wip_date field.
 
         Return None when there is no request left to visit.
+        """
+        priority_resource_uris = self.get_next_batch(1)
+        if priority_resource_uris:
+            return priority_resource_uris[0]
 
-        NOTE: this method can only be called from within a transaction.atomic
-        block.
+    def get_next_batch(self, n):
         """
-        priority_resource_uri = self.get_requests().select_for_update(skip_locked=True).first()
-        if not priority_resource_uri:
-            return
-        priority_resource_uri.wip_date = timezone.now()
-        priority_resource_uri.save(update_fields=['wip_date'])
-        return priority_resource_uri
+        Return a list of up to `n` next PriorityResourceURI requests for processing, in
+        request order, and mark them as being "in_progress" by setting the
+        wip_date field in a single atomic query.
+
+        Return an empty list when there is no request left to visit.
+        """
+        return claim_batch(self.get_requests(), n, wip_date=timezone.now())
 
 
 class PriorityResourceURI(BaseURI):
@@ -1060,19 +1274,192 @@ class ImportableURIManager(models.Manager):
         as being "in_progress" by setting the wip_date field.
 
         Return None when there is no request left to visit.
+        """
+        importable_uris = self.get_next_batch(1)
+        if importable_uris:
+            return importable_uris[0]
 
-        NOTE: this method can only be called from within a transaction.atomic
-        block.
+    def get_next_batch(self, n):
         """
-        importable_uri = self.get_requests().select_for_update(skip_locked=True).first()
-        if not importable_uri:
-            return
-        importable_uri.wip_date = timezone.now()
-        importable_uri.save(update_fields=['wip_date'])
-        return importable_uri
+        Return a list of up to `n` next ImportableURI requests for processing, in
+        request order, and mark them as being "in_progress" by setting the
+        wip_date field in a single atomic query.
 
-# TODO: have a second queue for crawling maven repo, that tracks which pages and namespaces we visited
-# when we hit the point of a package page, we add it to the queue that creates skinny packages for the package we visited.
+        Return an empty list when there is no request left to visit.
+        """
+        return claim_batch(self.get_requests(), n, wip_date=timezone.now())
+
+# TODO: Use the QuerySet.as_manager() for more flexibility and chaining.
+class CrawlableURIManager(models.Manager):
+
+    def insert_links(self, timestamps_by_links, root_uri, depth):
+        """
+        Queue for crawling the directory page URIs of the `timestamps_by_links`
+        mapping of {URI: listing timestamp} found at `depth` when crawling the
+        repository at `root_uri`. Return the number of URIs queued.
+
+        A URI that was crawled with the same non-empty listing timestamp is not
+        queued again as its subtree has not changed since it was crawled. A URI
+        that failed to be crawled is not queued again either: it is reset with
+        reset_crawl_errors() when the next crawl starts.
+        """
+        existing_uris = {
+            crawlable_uri.uri: crawlable_uri
+            for crawlable_uri in self.filter(uri__in=list(timestamps_by_links))
+        }
+
+        new_uris = []
+        changed_uris = []
+        for uri, timestamp in timestamps_by_links.items():
+            crawlable_uri = existing_uris.get(uri)
+            if not crawlable_uri:
+                new_uris.append(
+                    self.model(
+                        uri=uri,
+                        root_uri=root_uri,
+                        depth=depth,
+                        listing_timestamp=timestamp,
+                    )
+                )
+                continue
+
+            if crawlable_uri.crawled_date and (
+                # a page that failed is retried when the next crawl starts
+                crawlable_uri.has_crawl_error
+                or (timestamp and timestamp == crawlable_uri.crawled_timestamp)
+            ):
+                continue
+
+            if crawlable_uri.crawled_date or crawlable_uri.listing_timestamp != timestamp:
+                crawlable_uri.listing_timestamp = timestamp
+                crawlable_uri.depth = depth
+                crawlable_uri.crawled_date = None
+                changed_uris.append(crawlable_uri)
+
+        self.bulk_create(new_uris, ignore_conflicts=True)
+        self.bulk_update(changed_uris, ['listing_timestamp', 'depth', 'crawled_date'])
+        return len(new_uris) + len(changed_uris)
+
+    def in_progress(self):
+        """
+        Limit the QuerySet to CrawlableURI being crawled.
+        """
+        return self.filter(wip_date__isnull=False)
+
+    def get_requests(self, root_uri):
+        """
+        Return a query set of the CrawlableURIs of the repository at `root_uri`
+        left to crawl, ordered breadth-first.
+        """
+        return self.filter(
+            root_uri=root_uri,
+            crawled_date__isnull=True,
+            wip_date__isnull=True,
+        ).order_by('depth', 'id')
+
+    def get_next_batch(self, root_uri, n):
+        """
+        Return a list of up to `n` next CrawlableURIs of the repository at
+        `root_uri` to crawl, breadth-first, and mark them as being
+        "in_progress" by setting the wip_date field in a single atomic query.
+
+        Return an empty list when there is no URI left to crawl.
+        """
+        return claim_batch(self.get_requests(root_uri), n, wip_date=timezone.now())
+
+    def reset_in_progress(self, root_uri):
+        """
+        Reset the CrawlableURIs of the repository at `root_uri` that were left
+        in progress by an interrupted crawl such that they are crawled again.
+        Return the number of reset URIs.
+        """
+        return self.in_progress().filter(
+            root_uri=root_uri,
+            crawled_date__isnull=True,
+        ).update(wip_date=None)
+
+    def reset_crawl_errors(self, root_uri):
+        """
+        Reset the CrawlableURIs of the repository at `root_uri` that failed to
+        be crawled such that they are crawled again, even if the listing
+        timestamp of their parent page did not change. Return the number of
+        reset URIs.
+        """
+        return self.filter(
+            root_uri=root_uri,
+            has_crawl_error=True,
+            crawled_date__isnull=False,
+        ).update(crawled_date=None)
+
+
+class CrawlableURI(BaseURI):
+    """
+    A directory page of a Maven repository to crawl. This is the persistent
+    frontier of a breadth-first crawl of the repository at `root_uri`: the
+    directory pages found on a crawled page are queued here, and the package
+    pages found are added to the ImportableURI queue.
+
+    The processing life cycle is:
+     - when the page is claimed for crawling, the "wip_date" is set.
+     - once the page is crawled, the "wip_date" is reset. The "crawled_date"
+       and "crawled_timestamp" are set.
+    """
+    root_uri = models.CharField(
+        max_length=2048,
+        db_index=True,
+        help_text='URI of the root of the repository crawled.',
+    )
+
+    depth = models.PositiveIntegerField(
+        default=0,
+        db_index=True,
+        help_text='Depth of this URI from the root of the repository.',
+    )
+
+    listing_timestamp = models.CharField(
+        max_length=50,
+        null=True,
+        blank=True,
+        help_text='Timestamp of this URI in the listing of its parent page.',
+    )
+
+    crawled_timestamp = models.CharField(
+        max_length=50,
+        null=True,
+        blank=True,
+        help_text='Listing timestamp of this URI when it was last crawled.',
+    )
+
+    crawled_date = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text='Timestamp set to the date of when this URI was last crawled.',
+    )
+
+    has_crawl_error = models.BooleanField(
+        db_index=True,
+        default=False,
+        help_text='When set to True (Yes), this field indicates that '
+                  'an error has occured when crawling this URI.'
+    )
+
+    crawl_error = models.TextField(
+        null=True,
+        blank=True,
+        help_text='Crawl errors messages. When present this means the crawl failed.',
+    )
+
+    objects = CrawlableURIManager()
+
+    class Meta:
+        verbose_name = 'Crawlable URI'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['uri'],
+                name='unique_crawlable_uri',
+            ),
+        ]
 
 
 class ImportableURI(BaseURI):
@@ -1135,6 +1522,113 @@ class ImportableURI(BaseURI):
         super(ImportableURI, self).save(*args, **kwargs)
 
 
+class ParentPOM(models.Model):
+    """
+    A Maven parent POM fetched from a Maven repository. This is a persistent
+    cache of the parent POMs fetched when resolving the ancestry of the POMs of
+    Maven packages, as the same few parent POMs are the parents of most Maven
+    packages.
+    """
+    repository_url = models.CharField(
+        max_length=2048,
+        help_text='Base URL of the Maven repository of this POM.',
+    )
+
+    namespace = models.CharField(
+        max_length=255,
+        help_text='Maven groupId of this POM.',
+    )
+
+    name = models.CharField(
+        max_length=255,
+        help_text='Maven artifactId of this POM.',
+    )
+
+    version = models.CharField(
+        max_length=255,
+        help_text='Maven version of this POM.',
+    )
+
+    text = models.TextField(
+        help_text='Text content of this POM.',
+    )
+
+    parent_namespace = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        help_text='Maven groupId of the parent of this POM.',
+    )
+
+    parent_name = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        help_text='Maven artifactId of the parent of this POM.',
+    )
+
+    parent_version = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        help_text='Maven version of the parent of this POM.',
+    )
+
+    fetched_date = models.DateTimeField(
+        help_text='Timestamp set to the date of when this POM was fetched.',
+    )
+
+    class Meta:
+        verbose_name = 'Parent POM'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['repository_url', 'namespace', 'name', 'version'],
+                name='unique_parent_pom',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.namespace}:{self.name}:{self.version}'
+
+    @property
+    def parent_gav(self):
+        """
+        Return a (namespace, name, version) tuple for the parent of this POM or
+        None if this POM has no parent.
+        """
+        if self.parent_name:
+            return self.parent_namespace, self.parent_name, self.parent_version
+
+
+class CollectorState(models.Model):
+    """
+    The state saved by a collector at the end of a run, such that the next run
+    processes only what changed since, such as the last Maven index processed.
+    """
+    name = models.CharField(
+        max_length=100,
+        unique=True,
+        help_text='Name of the collector of this state.',
+    )
+
+    state = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text='Mapping of the state saved by the collector.',
+    )
+
+    updated_date = models.DateTimeField(
+        auto_now=True,
+        help_text='Timestamp set to the date of when this state was saved.',
+    )
+
+    class Meta:
+        verbose_name = 'Collector state'
+
+    def __str__(self):
+        return self.name
+
+
 class ProcessingError(BaseURI):
     service = models.CharField(
         max_length=100,
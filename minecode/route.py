@@ -8,6 +8,7 @@
 #
 
 
+from functools import lru_cache
 from functools import wraps
 import inspect
 import re
@@ -70,6 +71,135 @@ class Rule(object):
         return self.pattern_match(string)
 
 
+# regex characters that are not a literal character when not escaped
+REGEX_SPECIAL_CHARS = frozenset('.^$*+?{}[]()|\\')
+
+# regex characters that make the preceding character optional or repeated
+REGEX_QUANTIFIERS = frozenset('*+?{')
+
+
+def get_literal_prefix(pattern):
+    r"""
+    Return the literal string that any string matched by the regex `pattern`
+    must start with. This is the empty string if the `pattern` does not start
+    with a literal (such as ".+/repomd.xml") or if it uses a top-level
+    alternation.
+
+    For example:
+    >>> get_literal_prefix(r'https?://repo1\.maven\.org/.*')
+    'http'
+    >>> get_literal_prefix(r'pkg:npm/.*')
+    'pkg:npm/'
+    >>> get_literal_prefix(r'.+/repomd.xml')
+    ''
+    """
+    if has_top_level_alternation(pattern):
+        return ''
+
+    prefix = []
+    length = len(pattern)
+    i = 0
+    while i < length:
+        char = pattern[i]
+        if char == '\\':
+            escaped = pattern[i + 1:i + 2]
+            # a class like \d or \w or an anchor like \b is not a literal
+            if not escaped or escaped.isalnum():
+                break
+            char = escaped
+            i += 2
+        elif char in REGEX_SPECIAL_CHARS:
+            break
+        else:
+            i += 1
+
+        if i < length and pattern[i] in REGEX_QUANTIFIERS:
+            # this last character is optional or repeated: it is not part of
+            # the literal prefix
+            break
+        prefix.append(char)
+
+    return ''.join(prefix)
+
+
+def has_top_level_alternation(pattern):
+    """
+    Return True if the regex `pattern` contains a "|" alternation outside of
+    any group or character set.
+    """
+    depth = 0
+    in_set = False
+    escaped = False
+    for char in pattern:
+        if escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif in_set:
+            if char == ']':
+                in_set = False
+        elif char == '[':
+            in_set = True
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == '|' and not depth:
+            return True
+    return False
+
+
+class RuleIndex(object):
+    """
+    An index of Rules keyed by the literal prefix of their pattern.
+
+    Only the Rules with a literal prefix that is a prefix of a string can
+    match that string, so a lookup tries a few Rules instead of every Rule of
+    a Router. Rules without a literal prefix are always tried.
+    """
+
+    def __init__(self, rules=()):
+        rules = list(rules)
+        rules_by_prefix = {}
+        for rule in rules:
+            prefix = get_literal_prefix(rule.pattern)
+            rules_by_prefix.setdefault(prefix, []).append(rule)
+
+        # mapping of {literal prefix: [candidate Rules]} where the candidates
+        # are all the Rules whose literal prefix is a prefix of this prefix,
+        # kept in the order of `rules`
+        self.candidates_by_prefix = {}
+        for prefix in rules_by_prefix:
+            self.candidates_by_prefix[prefix] = [
+                rule for rule in rules
+                if prefix.startswith(get_literal_prefix(rule.pattern))
+            ]
+        # the lengths of the literal prefixes, longest first
+        self.prefix_lengths = sorted(
+            set(len(prefix) for prefix in rules_by_prefix),
+            reverse=True,
+        )
+
+    def get_candidates(self, string):
+        """
+        Return a list of the Rules that may match `string`.
+        """
+        candidates_by_prefix = self.candidates_by_prefix
+        # the candidates of the longest matching prefix include the
+        # candidates of all the shorter matching prefixes
+        for length in self.prefix_lengths:
+            candidates = candidates_by_prefix.get(string[:length])
+            if candidates is not None:
+                return candidates
+        return []
+
+    def get_matches(self, string):
+        """
+        Return a list of the Rules that match `string`.
+        """
+        return [rule for rule in self.get_candidates(string) if rule.match(string)]
+
+
 class RouteAlreadyDefined(TypeError):
     """
     Raised when this route Rule already exists in the route map.
@@ -101,13 +231,31 @@ class Router(object):
     Multiple routers can co-exist as needed, such as a router to collect,
     another to fetch, etc.
     """
-    def __init__(self, route_map=None):
+    def __init__(self, route_map=None, cache_size=10000):
         """
         'route_map' is an ordered mapping of pattern -> Rule.
+        'cache_size' is the maximum number of resolved strings to cache.
         """
         self.route_map = route_map or dict()
-        # lazy cached pre-compiled regex match() for all route patterns
-        self._is_routable = None
+        self.cache_size = cache_size
+        self._reset()
+
+    def _reset(self):
+        """
+        Reset the lazily built index of rules and the caches of resolved
+        strings. This must be called when the route map is changed.
+        """
+        self._index = None
+        self._resolve_cached = lru_cache(maxsize=self.cache_size)(self._resolve)
+        self._is_routable_cached = lru_cache(maxsize=self.cache_size)(self._is_routable)
+
+    def __getstate__(self):
+        # the index and caches are rebuilt when unpickled
+        return {'route_map': self.route_map, 'cache_size': self.cache_size}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
 
     def __repr__(self):
         return repr(self.route_map)
@@ -126,6 +274,15 @@ class Router(object):
         if pattern in self.route_map:
             raise RouteAlreadyDefined(pattern)
         self.route_map[pattern] = Rule(pattern, endpoint)
+        self._reset()
+
+    def get_index(self):
+        """
+        Return a RuleIndex for the rules of this router, built on first use.
+        """
+        if self._index is None:
+            self._index = RuleIndex(self.route_map.values())
+        return self._index
 
     def route(self, *patterns):
         """
@@ -172,10 +329,13 @@ class Router(object):
         check when there are hundreds rules: if multiple routes are
         possible for a string (typically a URI), a MultipleRoutesDefined
         TypeError is raised.
+
+        Resolved endpoints are cached.
         """
-        # TODO: we could improve the performance of this by using a single
-        # regex and named groups if this ever becomes a bottleneck.
-        candidates = [r for r in self.route_map.values() if r.match(string)]
+        return self._resolve_cached(string)
+
+    def _resolve(self, string):
+        candidates = self.get_index().get_matches(string)
 
         if not candidates:
             raise NoRouteAvailable(string)
@@ -196,10 +356,8 @@ class Router(object):
         """
         if not string:
             return
+        return self._is_routable_cached(string)
 
-        if not self._is_routable:
-            # build an alternation regex
-            routables = '^(' + '|'.join(pat for pat in self.route_map) + ')$'
-            self._is_routable = re.compile(routables, re.UNICODE).match
-
-        return bool(self._is_routable(string))
+    def _is_routable(self, string):
+        index = self.get_index()
+        return any(rule.match(string) for rule in index.get_candidates(string))
@@ -13,6 +13,8 @@ from commoncode.fileutils import delete
 
 from minecode.indexing import index_package
 from minecode.models import ScannableURI
+from minecode.utils import iter_json_list_items
+from minecode.utils import open_decompressed
 
 
 def process_scan_results(
@@ -27,12 +29,14 @@ def process_scan_results(
     ScannableURI with UUID `scannable_uri_uuid`.
 
     `scan_results_location` and `scan_summary_location` are deleted after the
-    indexing process has finished.
+    indexing process has finished. These files can be compressed with gzip or
+    zstd.
     """
 
-    with open(scan_results_location) as f:
-        scan_data = json.load(f)
-    with open(scan_summary_location) as f:
+    # The files of the scan results are read and indexed incrementally, such
+    # that large scans are not loaded in memory.
+    scan_data = {'files': iter_json_list_items(scan_results_location, 'files')}
+    with open_decompressed(scan_summary_location) as f:
         summary_data = json.load(f)
     project_extra_data = json.loads(project_extra_data)
 
@@ -62,3 +66,11 @@ def process_scan_results(
     # Clean up after indexing has ended
     delete(scan_results_location)
     delete(scan_summary_location)
+
+
+def refresh_scan_queue_statistics():
+    """
+    Compute and save the scan queue statistics served by the API. This is run
+    periodically by the scheduler.
+    """
+    ScannableURI.objects.refresh_statistics()
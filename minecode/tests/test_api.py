@@ -7,10 +7,12 @@
 # See https://aboutcode.org for more information about nexB OSS projects.
 #
 
+import gzip
 import json
 import os
 
 from django.contrib.auth.models import Group, User
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -124,6 +126,10 @@ class ScannableURIAPITestCase(JsonBasedTesting, TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data.get('scannable_uri_uuid'), self.scannable_uri1.uuid)
         self.assertEqual(response.data.get('download_url'), self.scannable_uri1.uri)
+        self.scannable_uri1.refresh_from_db()
+        self.assertEqual(ScannableURI.SCAN_SUBMITTED, self.scannable_uri1.scan_status)
+        self.assertTrue(self.scannable_uri1.scan_date)
+        self.assertTrue(self.scannable_uri1.wip_date)
 
         response = self.scan_queue_worker_client.get('/api/scan_queue/get_next_download_url/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -241,6 +247,31 @@ class ScannableURIAPITestCase(JsonBasedTesting, TestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(expected_response, response.data)
 
+    def test_api_scannable_uri_update_status_with_gzipped_scan_files(self):
+        scan_file_location = self.get_test_loc('scancodeio/get_scan_data.json')
+        summary_file_location = self.get_test_loc('scancodeio/scan_summary_response.json')
+        project_extra_data = {'sha1': 'sha1', 'size': 100}
+        with open(scan_file_location, 'rb') as scan_file:
+            scan_results = gzip.compress(scan_file.read())
+        with open(summary_file_location, 'rb') as summary_file:
+            scan_summary = gzip.compress(summary_file.read())
+
+        data = {
+            'scannable_uri_uuid': self.scannable_uri2.uuid,
+            'scan_status': 'scanned',
+            'project_extra_data': json.dumps(project_extra_data),
+            'scan_results_file': SimpleUploadedFile('scan_results.json.gz', scan_results),
+            'scan_summary_file': SimpleUploadedFile('scan_summary.json.gz', scan_summary),
+        }
+        response = self.scan_queue_worker_client.post('/api/scan_queue/update_status/', data=data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.scannable_uri2.refresh_from_db()
+        self.assertEqual(ScannableURI.SCAN_INDEXED, self.scannable_uri2.scan_status)
+        self.package2.refresh_from_db()
+        self.assertEqual('sha1', self.package2.sha1)
+        self.assertEqual('apache-2.0', self.package2.declared_license_expression)
+        self.assertEqual(64, Resource.objects.all().count())
+
     def test_api_scannable_uri_update_status_update_finished_scannable_uri(self):
         scannable_uri_uuid = self.scannable_uri3.uuid
         for scan_status in [
@@ -35,7 +35,7 @@ class BitbucketVisitorTest(JsonBasedTesting):
         uri = 'https://api.bitbucket.org/2.0/repositories?pagelen=10'
         test_loc = self.get_test_loc('bitbucket/visit/index-repositories.json')
 
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, data, _ = BitbucketIndexVisitor(uri)
 
@@ -49,7 +49,7 @@ class BitbucketVisitorTest(JsonBasedTesting):
         uri = 'https://api.bitbucket.org/2.0/repositories/bastiand/mercurialeclipse/'
         test_loc = self.get_test_loc('bitbucket/visit/singlerepo.json')
 
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, data, _ = BitbucketSingleRepoVisitor(uri)
 
@@ -63,7 +63,7 @@ class BitbucketVisitorTest(JsonBasedTesting):
         uri = 'https://api.bitbucket.org/2.0/repositories/bastiand/mercurialeclipse/refs/tags?pagelen=2'
         test_loc = self.get_test_loc('bitbucket/visit/paginated_tags.json')
 
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, data, _ = BitbucketDetailsVisitorPaginated(uri)
 
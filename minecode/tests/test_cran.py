@@ -29,7 +29,7 @@ class CranVistorTest(JsonBasedTesting):
     def test_visit_metacpan_api_projects(self):
         uri = 'https://cloud.r-project.org/web/packages/available_packages_by_date.html'
         test_loc = self.get_test_loc('cran/CRAN_Packages_By_Date.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = cran.CranPackagesVisitors(uri)
         expected_loc = self.get_test_loc('cran/expected_cran_pacakges.json')
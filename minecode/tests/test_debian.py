@@ -162,7 +162,7 @@ class DebianReleaseTest(BaseDebianTest):
     def test_visit_debian_release(self):
         uri = 'http://ftp.debian.org/debian/dists/Debian8.3/Release'
         test_loc = self.get_test_loc('debian/release/visited_Release')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = debian_visitor.DebianReleaseVisitor(uri)
         result = json.loads(data)
@@ -284,7 +284,7 @@ class DebianSourcesTest(BaseDebianTest):
     def test_DebianSourcesVisitor(self):
         uri = 'http://ftp.debian.org/debian/dists/jessie-backports/main/source/Sources.gz'
         test_loc = self.get_test_loc('debian/sources/Sources.gz')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = debian_visitor.DebianSourcesVisitor(uri)
         expected_loc = self.get_test_loc('debian/sources/Sources.gz-expected.json')
@@ -294,7 +294,7 @@ class DebianSourcesTest(BaseDebianTest):
     def test_DebianSourcesVisitor_with_invalid_file(self):
         uri = 'http://ftp.debian.org/debian/dists/jessie-backports/main/source/invalid_files/Sources.gz'
         test_loc = self.get_test_loc('debian/invalid_files/ls-lR.gz')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _ = debian_visitor.DebianSourcesVisitor(uri)
         self.assertEqual(0, len(list(uris)))
@@ -347,7 +347,7 @@ class DebianLSLRTest(BaseDebianTest):
         uri = 'http://ftp.debian.org/debian/ls-lR.gz'
         test_loc = self.get_test_loc('debian/lslr/ls-lR_debian')
         temp_gz_location = self.get_tmp_gz_file(test_loc)
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, temp_gz_location)
             uris, _, _ = debian_visitor.DebianDirectoryIndexVisitor(uri)
         expected_loc = self.get_test_loc('debian/lslr/ls-lR_debian.gz-expected.json')
@@ -357,7 +357,7 @@ class DebianLSLRTest(BaseDebianTest):
         uri = 'http://archive.ubuntu.com/ubuntu/ls-lR.gz'
         test_loc = self.get_test_loc('debian/lslr/ls-lR_ubuntu')
         temp_gz_location = self.get_tmp_gz_file(test_loc)
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, temp_gz_location)
             uris, _, _ = debian_visitor.DebianDirectoryIndexVisitor(uri)
         expected_loc = self.get_test_loc(
@@ -371,7 +371,7 @@ class DebianDescriptionTest(BaseDebianTest):
     def test_DebianDescriptionVisitor(self):
         uri = 'http://ftp.debian.org/debian/pool/main/7/7kaa/7kaa_2.14.3-1.dsc'
         test_loc = self.get_test_loc('debian/dsc/7kaa_2.14.3-1.dsc')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = debian_visitor.DebianDescriptionVisitor(uri)
         result = json.loads(data)
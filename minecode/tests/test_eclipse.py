@@ -30,7 +30,7 @@ class EclipseVistorTest(JsonBasedTesting):
     def test_visit_eclipse_projects(self):
         uri = 'https://projects.eclipse.org/list-of-projects'
         test_loc = self.get_test_loc('eclipse/projects.eclipse.org.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = eclipse.EclipseProjectVisitors(uri)
         expected_loc = self.get_test_loc('eclipse/eclipse_projects_expected')
@@ -39,7 +39,7 @@ class EclipseVistorTest(JsonBasedTesting):
     def test_visit_eclipse_project(self):
         uri = 'https://projects.eclipse.org/projects/modeling.m2t.acceleo'
         test_loc = self.get_test_loc('eclipse/Acceleo_projects.eclipse.org.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = eclipse.EclipseSingleProjectVisitor(uri)
         with open(self.get_test_loc('eclipse/acceleo_expected.html'), 'rb') as data_file:
@@ -48,7 +48,7 @@ class EclipseVistorTest(JsonBasedTesting):
     def test_visit_eclipse_git_repo(self):
         uri = 'http://git.eclipse.org/c'
         test_loc = self.get_test_loc('eclipse/Eclipse_Git_repositories.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = eclipse.EclipseGitVisitor(uri)
         expected_loc = self.get_test_loc('eclipse/eclipse_git_repos_expected')
@@ -57,7 +57,7 @@ class EclipseVistorTest(JsonBasedTesting):
     def test_visit_eclipse_packages(self):
         uri = 'http://www.eclipse.org/downloads/packages/all'
         test_loc = self.get_test_loc('eclipse/All_Releases_Packages.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = eclipse.EclipsePackagesVisitor(uri)
         expected_loc = self.get_test_loc('eclipse/eclipse_packages_expected')
@@ -66,7 +66,7 @@ class EclipseVistorTest(JsonBasedTesting):
     def test_visit_eclipse_package_releases(self):
         uri = 'http://www.eclipse.org/downloads/packages/release/Neon/R'
         test_loc = self.get_test_loc('eclipse/Neon_R.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = eclipse.EclipseReleaseVisitor(uri)
         expected_loc = self.get_test_loc('eclipse/Neon_R-expected.json')
@@ -75,7 +75,7 @@ class EclipseVistorTest(JsonBasedTesting):
     def test_visit_eclipse_projects_json(self):
         uri = 'http://projects.eclipse.org/json/projects/all'
         test_loc = self.get_test_loc('eclipse/birt.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, data, _error = eclipse.EclipseProjectsJsonVisitor(uri)
 
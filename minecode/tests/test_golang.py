@@ -31,7 +31,7 @@ class GoLangVisitorTest(JsonBasedTesting):
     def test_GoLangGoDocAPIVisitor(self):
         uri = 'https://api.godoc.org/packages'
         test_loc = self.get_test_loc('golang/packages.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = GodocIndexVisitor(uri)
         expected_loc = self.get_test_loc('golang/packages_expected_uris.json')
@@ -40,7 +40,7 @@ class GoLangVisitorTest(JsonBasedTesting):
     def test_GodocSearchVisitor(self):
         uri = 'https://api.godoc.org/search?q=github.com/golang'
         test_loc = self.get_test_loc('golang/godoc_search.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = GodocSearchVisitor(uri)
         expected_loc = self.get_test_loc('golang/godoc_search_expected_uris.json')
@@ -49,7 +49,7 @@ class GoLangVisitorTest(JsonBasedTesting):
     def test_GodocSearchVisitor_with_non_github_urls(self):
         uri = 'https://api.godoc.org/search?q=github.com/golang*'
         test_loc = self.get_test_loc('golang/godoc_search_off_github.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = GodocSearchVisitor(uri)
         expected_loc = self.get_test_loc('golang/godoc_search_off_github_expected_uris.json')
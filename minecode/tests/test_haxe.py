@@ -27,7 +27,7 @@ class HaxeVistorTest(JsonBasedTesting):
     def test_visit_haxe_projects(self):
         uri = 'https://lib.haxe.org/all'
         test_loc = self.get_test_loc('haxe/all_haxelibs.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = haxe.HaxeProjectsVisitor(uri)
         expected_loc = self.get_test_loc('haxe/all_haxelibs.html-expected')
@@ -36,7 +36,7 @@ class HaxeVistorTest(JsonBasedTesting):
     def test_visit_haxe_versions(self):
         uri = 'https://lib.haxe.org/p/openfl/versions'
         test_loc = self.get_test_loc('haxe/all_versions_openfl.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = haxe.HaxeVersionsVisitor(uri)
         expected_loc = self.get_test_loc('haxe/all_versions_openfl.html-expected')
@@ -45,7 +45,7 @@ class HaxeVistorTest(JsonBasedTesting):
     def test_visit_haxe_package_json(self):
         uri = 'https://lib.haxe.org/p/openfl/8.5.1/raw-files/openfl/package.json'
         test_loc = self.get_test_loc('haxe/openfl-8.5.1-package.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = haxe.HaxePackageJsonVisitor(uri)
         expected_loc = self.get_test_loc('haxe/openfl-8.5.1-package.json-expected')
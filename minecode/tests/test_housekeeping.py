@@ -99,7 +99,7 @@ class PackageLicenseCheckTest(JsonBasedTesting, DjangoTestCase):
 
         resource_uri = ResourceURI.objects.insert(uri=uri)
 
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             # visit test proper: this should insert all the test_uris
             visit_uri(resource_uri)
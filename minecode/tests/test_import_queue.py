@@ -0,0 +1,92 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# purldb is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/nexB/purldb for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+from unittest import mock
+
+from django.test import TestCase as DjangoTestCase
+from minecode.utils_test import JsonBasedTesting
+from minecode.models import ImportableURI
+from minecode.management.commands import import_queue
+from packagedb.models import Package
+
+
+class ImportQueueTests(JsonBasedTesting, DjangoTestCase):
+
+    package_page = '''
+        <a href="../">../</a>
+        <a href="1.0/" title="1.0/">1.0/</a>         2005-09-20 05:53         -
+        <a href="2.0/" title="2.0/">2.0/</a>         2006-09-20 05:53         -
+        <a href="maven-metadata.xml" title="maven-metadata.xml">maven-metadata.xml</a>         2006-09-20 05:53       300
+    '''
+
+    def get_artifact_links(self, url, timeout=None):
+        version = url.rstrip('/').rpartition('/')[-1]
+        return {
+            f'{url}/lib-{version}.jar': '2005-09-20 05:53',
+            f'{url}/lib-{version}-sources.jar': '2005-09-20 05:53',
+        }
+
+    def get_artifact_sha1(self, artifact_url, timeout=None):
+        # a fake SHA1 made from the artifact file name
+        file_name = artifact_url.rpartition('/')[-1]
+        return file_name.encode('utf-8').hex()[:40].ljust(40, '0')
+
+    @mock.patch('minecode.management.commands.import_queue.get_artifact_sha1')
+    @mock.patch('minecode.management.commands.import_queue.get_artifact_links')
+    def test_process_request(self, mock_get_artifact_links, mock_get_artifact_sha1):
+        mock_get_artifact_links.side_effect = self.get_artifact_links
+        mock_get_artifact_sha1.side_effect = self.get_artifact_sha1
+
+        importable_uri = ImportableURI.objects.create(
+            uri='https://repo1.maven.org/maven2/org/example/lib/',
+            data=self.package_page,
+            package_url='pkg:maven/org.example/lib',
+        )
+        import_queue.process_request(importable_uri, max_workers=2)
+
+        self.assertEqual(2, mock_get_artifact_links.call_count)
+        self.assertEqual(4, mock_get_artifact_sha1.call_count)
+
+        results = sorted(
+            (package.purl, package.download_url, package.sha1)
+            for package in Package.objects.all()
+        )
+        expected = sorted(
+            (purl, download_url, self.get_artifact_sha1(download_url))
+            for purl, download_url in [
+                ('pkg:maven/org.example/lib@1.0', 'https://repo1.maven.org/maven2/org/example/lib/1.0/lib-1.0.jar'),
+                ('pkg:maven/org.example/lib@1.0?classifier=sources', 'https://repo1.maven.org/maven2/org/example/lib/1.0/lib-1.0-sources.jar'),
+                ('pkg:maven/org.example/lib@2.0', 'https://repo1.maven.org/maven2/org/example/lib/2.0/lib-2.0.jar'),
+                ('pkg:maven/org.example/lib@2.0?classifier=sources', 'https://repo1.maven.org/maven2/org/example/lib/2.0/lib-2.0-sources.jar'),
+            ]
+        )
+        self.assertEqual(expected, results)
+        importable_uri.refresh_from_db()
+        self.assertIsNone(importable_uri.processing_error)
+
+    @mock.patch('minecode.management.commands.import_queue.get_artifact_sha1')
+    @mock.patch('minecode.management.commands.import_queue.get_artifact_links')
+    def test_process_request_fetches_missing_data_with_a_timeout(self, mock_get_artifact_links, mock_get_artifact_sha1):
+        mock_get_artifact_links.side_effect = self.get_artifact_links
+        mock_get_artifact_sha1.side_effect = self.get_artifact_sha1
+
+        importable_uri = ImportableURI.objects.create(
+            uri='https://repo1.maven.org/maven2/org/example/lib/',
+            package_url='pkg:maven/org.example/lib',
+        )
+        with mock.patch('requests.Session.get') as mock_http_get:
+            mock_http_get.return_value = mock.Mock(text=self.package_page)
+            import_queue.process_request(importable_uri, max_workers=2, timeout=5)
+
+        mock_http_get.assert_called_once_with('https://repo1.maven.org/maven2/org/example/lib', timeout=5)
+        for call in mock_get_artifact_links.call_args_list:
+            self.assertEqual(5, call.kwargs['timeout'])
+        for call in mock_get_artifact_sha1.call_args_list:
+            self.assertEqual(5, call.args[-1])
+        self.assertEqual(4, Package.objects.count())
@@ -9,6 +9,9 @@
 
 import json
 import os
+import random
+import time
+from unittest import skipUnless
 
 from matchcode.models import ApproximateDirectoryContentIndex
 from matchcode.models import ApproximateDirectoryStructureIndex
@@ -17,6 +20,8 @@ from matchcode.models import ExactFileIndex
 from minecode import indexing
 from minecode.models import ScannableURI
 from minecode.tests import FIXTURES_REGEN
+from minecode.utils import get_temp_file
+from minecode.utils import iter_json_list_items
 from minecode.utils_test import JsonBasedTesting
 from minecode.utils_test import MiningTestCase
 from packagedb.models import Package
@@ -70,6 +75,27 @@ class IndexingTest(MiningTestCase, JsonBasedTesting):
         expected_resources_loc = self.get_test_loc('indexing/scancodeio_wagon-api-20040705.181715-expected.json')
         self.check_expected_results(resource_data, expected_resources_loc, regen=FIXTURES_REGEN)
 
+    def test_indexing_index_package_files_streaming_by_batches(self):
+        scan_data_loc = self.get_test_loc('indexing/scancodeio_wagon-api-20040705.181715.json')
+        scan_data = {'files': iter_json_list_items(scan_data_loc, 'files')}
+
+        indexing_errors = indexing.index_package_files(self.package1, scan_data, batch_size=10)
+        self.assertEqual(0, len(indexing_errors))
+
+        self.assertEqual(11, ApproximateDirectoryContentIndex.objects.count())
+        self.assertEqual(11, ApproximateDirectoryStructureIndex.objects.count())
+        self.assertEqual(2, ApproximateResourceContentIndex.objects.count())
+        self.assertEqual(45, ExactFileIndex.objects.count())
+        self.assertEqual(64, Resource.objects.filter(package=self.package1).count())
+
+        # Indexing again updates the existing Resources and fingerprints
+        scan_data = {'files': iter_json_list_items(scan_data_loc, 'files')}
+        indexing_errors = indexing.index_package_files(self.package1, scan_data, batch_size=10)
+        self.assertEqual(0, len(indexing_errors))
+        self.assertEqual(11, ApproximateDirectoryContentIndex.objects.count())
+        self.assertEqual(45, ExactFileIndex.objects.count())
+        self.assertEqual(64, Resource.objects.filter(package=self.package1).count())
+
     def test_indexing_index_package(self):
         scan_data_loc = self.get_test_loc('indexing/scancodeio_wagon-api-20040705.181715.json')
         with open(scan_data_loc, 'rb') as f:
@@ -173,3 +199,53 @@ class IndexingTest(MiningTestCase, JsonBasedTesting):
         extra_data = result.first().extra_data
         expected_extra_data = scan_data["files"][0]["extra_data"]
         self.assertEqual(expected_extra_data, extra_data)
+
+
+@skipUnless(os.environ.get('MATCHCODE_BENCHMARK'), 'Set MATCHCODE_BENCHMARK=1 to run benchmarks')
+class IndexingBenchmarkTest(MiningTestCase):
+    """
+    Benchmark the indexing of a synthetic scan. The number of files is set
+    with the MATCHCODE_BENCHMARK_FILE_COUNT environment variable.
+    """
+
+    def setUp(self):
+        self.file_count = int(os.environ.get('MATCHCODE_BENCHMARK_FILE_COUNT', 100_000))
+        self.package1 = Package.objects.create(
+            download_url='https://example.com/benchmark-1.0.tar.gz',
+            type='generic',
+            name='benchmark',
+            version='1.0',
+        )
+        randomizer = random.Random(42)
+        files = [
+            {
+                'path': f'benchmark/dir{i // 100}/file{i}.c',
+                'type': 'file',
+                'name': f'file{i}.c',
+                'extension': '.c',
+                'size': i,
+                'sha1': f'{i:040x}',
+                'is_binary': False,
+                'is_text': True,
+                'is_archive': False,
+                'is_media': False,
+                'is_key_file': False,
+                'extra_data': {'halo1': f'{i % 1000:08x}{randomizer.getrandbits(128):032x}'},
+            }
+            for i in range(self.file_count)
+        ]
+        self.scan_location = get_temp_file('benchmark', extension='.json')
+        with open(self.scan_location, 'w') as f:
+            json.dump({'headers': [], 'files': files}, f)
+
+    def test_indexing_index_package_files_benchmark(self):
+        scan_data = {'files': iter_json_list_items(self.scan_location, 'files')}
+        start = time.perf_counter()
+        indexing_errors = indexing.index_package_files(self.package1, scan_data)
+        duration = time.perf_counter() - start
+        print(
+            f'\nindex_package_files: {self.file_count:,d} files '
+            f'in {duration:.2f}s ({self.file_count / duration:,.0f} files/s)'
+        )
+        self.assertEqual([], indexing_errors)
+        self.assertEqual(self.file_count, Resource.objects.filter(package=self.package1).count())
@@ -7,6 +7,7 @@
 # See https://aboutcode.org for more information about nexB OSS projects.
 #
 
+from datetime import timedelta
 from operator import itemgetter
 import json
 import os
@@ -14,8 +15,10 @@ import re
 
 from mock import patch
 from unittest import mock
+from unittest import skipUnless
 
 from django.test import TestCase as DjangoTestCase
+from django.utils import timezone
 
 from minecode.management.commands.run_map import map_uri
 from minecode.management.commands.run_visit import visit_uri
@@ -73,6 +76,28 @@ class MavenMiscTest(JsonBasedTesting, DjangoTestCase):
         expected_loc = self.get_test_loc('maven/index/buggy/expected_entries.json')
         self.check_expected_results(result, expected_loc, regen=FIXTURES_REGEN)
 
+    def test_decode_entries_is_the_same_as_decode_entry(self):
+        index = self.get_test_loc('maven/index/increment/nexus-maven-repository-index.445.gz')
+        for fields in ((), frozenset(maven_visitor.ENTRY_FIELDS)):
+            with maven_visitor.GzipFileWithTrailing(index, 'rb') as nexus_index:
+                jstream = maven_visitor.java_stream.DataInputStream(nexus_index)
+                maven_visitor.decode_index_header(jstream)
+                expected = []
+                while True:
+                    try:
+                        entry = maven_visitor.decode_entry(jstream, fields)
+                    except EOFError:
+                        break
+                    if entry:
+                        expected.append(entry)
+
+            # use small chunks such that many entries span two chunks
+            for chunk_size in (7, 1024):
+                with maven_visitor.GzipFileWithTrailing(index, 'rb') as nexus_index:
+                    nexus_index.read(9)
+                    results = list(maven_visitor.decode_entries(nexus_index, fields, chunk_size=chunk_size))
+                self.assertEqual(expected, results)
+
     def test_get_artifacts_full(self):
         index = self.get_test_loc('maven/index/nexus-maven-repository-index.gz')
 
@@ -196,13 +221,30 @@ class MavenMiscTest(JsonBasedTesting, DjangoTestCase):
         self.assertEqual(expected, maven_visitor.build_maven_xml_url(**test))
 
 
+@skipUnless(os.environ.get('MINECODE_BENCHMARK'), 'Set MINECODE_BENCHMARK to run benchmarks')
+class MavenIndexBenchmarkTest(JsonBasedTesting):
+    """
+    Benchmark the decoding of the entries of a Maven index. The index to decode
+    is set with the MINECODE_BENCHMARK_MAVEN_INDEX environment variable and
+    defaults to a small test index.
+    """
+    test_data_dir = os.path.join(os.path.dirname(__file__), 'testfiles')
+
+    def test_benchmark_get_entries(self):
+        index = os.environ.get('MINECODE_BENCHMARK_MAVEN_INDEX')
+        if not index:
+            index = self.get_test_loc('maven/index/increment/nexus-maven-repository-index.445.gz')
+        entries_count, _entries_per_second = maven_visitor._entries_benchmark(index)
+        self.assertTrue(entries_count)
+
+
 class MavenVisitorTest(JsonBasedTesting, DjangoTestCase):
     test_data_dir = os.path.join(os.path.dirname(__file__), 'testfiles')
 
     def test_MavenNexusIndexVisitor_uris(self):
         uri = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.gz'
         test_loc = self.get_test_loc('maven/index/nexus-maven-repository-index.gz')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _errors = maven_visitor.MavenNexusIndexVisitor(uri)
         expected_loc = self.get_test_loc('maven/index/expected_uris.json')
@@ -211,16 +253,106 @@ class MavenVisitorTest(JsonBasedTesting, DjangoTestCase):
     def test_MavenNexusIndexPropertiesVisitor(self):
         uri = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.properties'
         test_loc = self.get_test_loc('maven/index/increment/nexus-maven-repository-index.properties')
-        with patch('requests.get') as mock_http_get:
+        # the state of an earlier visit, such that only the new increments are yielded
+        previous_state = dict(chain_id='1318453614498', last_incremental=511)
+        ResourceURI.objects.create(uri=uri, data=json.dumps(previous_state), last_visit_date=timezone.now())
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
-            uris, _data, _errors = maven_visitor.MavenNexusPropertiesVisitor(uri)
+            uris, data, _errors = maven_visitor.MavenNexusPropertiesVisitor(uri)
         expected_loc = self.get_test_loc('maven/index/increment/expected_properties_uris.json')
         self.check_expected_uris(uris, expected_loc, data_is_json=True, regen=FIXTURES_REGEN)
+        expected_state = {
+            'chain_id': '1318453614498',
+            'last_incremental': 541,
+            'timestamp': '20181029012159.470 +0000',
+            'increments': list(range(512, 542)),
+        }
+        self.assertEqual(expected_state, json.loads(data))
+
+    def test_MavenNexusIndexPropertiesVisitor_first_visit_yields_full_index(self):
+        uri = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.properties'
+        test_loc = self.get_test_loc('maven/index/increment/nexus-maven-repository-index.properties')
+        with patch('requests.Session.get') as mock_http_get:
+            mock_http_get.return_value = mocked_requests_get(uri, test_loc)
+            uris, data, _errors = maven_visitor.MavenNexusPropertiesVisitor(uri)
+        expected = ['https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.gz']
+        self.assertEqual(expected, [u.uri for u in uris])
+        self.assertEqual(541, json.loads(data)['last_incremental'])
+
+    def test_MavenNexusIndexPropertiesVisitor_revisit_yields_new_increments(self):
+        uri = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.properties'
+        test_loc = self.get_test_loc('maven/index/increment/nexus-maven-repository-index.properties')
+        state = dict(chain_id='1318453614498', last_incremental=539, timestamp=None)
+        ResourceURI.objects.create(uri=uri, data=json.dumps(state), last_visit_date=timezone.now())
+        with patch('requests.Session.get') as mock_http_get:
+            mock_http_get.return_value = mocked_requests_get(uri, test_loc)
+            uris, _data, _errors = maven_visitor.MavenNexusPropertiesVisitor(uri)
+        expected = [
+            'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.540.gz',
+            'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.541.gz',
+        ]
+        self.assertEqual(expected, [u.uri for u in uris])
+
+    def visit_properties_after_state(self, state):
+        uri = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.properties'
+        test_loc = self.get_test_loc('maven/index/increment/nexus-maven-repository-index.properties')
+        ResourceURI.objects.create(uri=uri, data=json.dumps(state), last_visit_date=timezone.now())
+        with patch('requests.Session.get') as mock_http_get:
+            mock_http_get.return_value = mocked_requests_get(uri, test_loc)
+            uris, data, _errors = maven_visitor.MavenNexusPropertiesVisitor(uri)
+        return [u.uri for u in uris], json.loads(data)
+
+    def test_MavenNexusIndexPropertiesVisitor_revisit_retries_failed_increments(self):
+        state = dict(chain_id='1318453614498', last_incremental=541, increments=[538, 539, 540, 541])
+        base_url = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index'
+        # an earlier failure of 538 followed by a successful visit
+        ResourceURI.objects.create(uri=f'{base_url}.538.gz', last_visit_date=timezone.now(), visit_error='Error')
+        ResourceURI.objects.create(uri=f'{base_url}.538.gz', last_visit_date=timezone.now())
+        ResourceURI.objects.create(uri=f'{base_url}.539.gz', last_visit_date=timezone.now(), map_error='Error')
+        ResourceURI.objects.create(uri=f'{base_url}.540.gz', last_visit_date=timezone.now(), visit_error='Error')
+
+        uris, new_state = self.visit_properties_after_state(state)
+        expected = [f'{base_url}.539.gz', f'{base_url}.540.gz', f'{base_url}.541.gz']
+        self.assertEqual(expected, uris)
+        self.assertEqual([539, 540, 541], new_state['increments'])
+        self.assertEqual(541, new_state['last_incremental'])
+
+    def test_MavenNexusIndexPropertiesVisitor_revisit_retries_failed_full_index(self):
+        state = dict(chain_id='1318453614498', last_incremental=541, increments=None)
+        full_index_uri = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.gz'
+        ResourceURI.objects.create(uri=full_index_uri, last_visit_date=timezone.now(), visit_error='Error')
+        uris, new_state = self.visit_properties_after_state(state)
+        self.assertEqual([full_index_uri], uris)
+        self.assertIsNone(new_state['increments'])
+
+    def test_MavenNexusIndexPropertiesVisitor_revisit_without_new_increments(self):
+        state = dict(chain_id='1318453614498', last_incremental=541, increments=[])
+        full_index_uri = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.gz'
+        # an old failure of the full index is not retried
+        ResourceURI.objects.create(uri=full_index_uri, last_visit_date=timezone.now(), visit_error='Error')
+        uris, new_state = self.visit_properties_after_state(state)
+        self.assertEqual([], uris)
+        self.assertEqual(541, new_state['last_incremental'])
+
+    def test_get_index_increments(self):
+        properties = {
+            'nexus.index.chain-id': '1',
+            'nexus.index.incremental-0': '12',
+            'nexus.index.incremental-1': '11',
+            'nexus.index.incremental-2': '10',
+        }
+        self.assertIsNone(maven_visitor.get_index_increments(properties))
+        self.assertIsNone(maven_visitor.get_index_increments(properties, chain_id='2', last_incremental=10))
+        # increment 9 is not available anymore
+        self.assertIsNone(maven_visitor.get_index_increments(properties, chain_id='1', last_incremental=8))
+        self.assertEqual([10, 11, 12], maven_visitor.get_index_increments(properties, chain_id='1', last_incremental=9))
+        self.assertEqual([12], maven_visitor.get_index_increments(properties, chain_id='1', last_incremental=11))
+        self.assertEqual([], maven_visitor.get_index_increments(properties, chain_id='1', last_incremental=12))
 
     def test_MavenNexusIndexVisitor_uris_increment(self):
         uri = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.445.gz'
         test_loc = self.get_test_loc('maven/index/increment/nexus-maven-repository-index.445.gz')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _errors = maven_visitor.MavenNexusIndexVisitor(uri)
         expected_loc = self.get_test_loc('maven/index/increment/expected_uris.json')
@@ -229,7 +361,7 @@ class MavenVisitorTest(JsonBasedTesting, DjangoTestCase):
     def test_MavenNexusIndexVisitor_uris_buggy(self):
         uri = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.gz'
         test_loc = self.get_test_loc('maven/index/buggy/nexus-maven-repository-index.gz')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _errors = maven_visitor.MavenNexusIndexVisitor(uri)
         expected_loc = self.get_test_loc('maven/index/buggy/expected_uris.json')
@@ -241,7 +373,7 @@ class MavenVisitorTest(JsonBasedTesting, DjangoTestCase):
 
         before = [p.id for p in ResourceURI.objects.all()]
         test_loc = self.get_test_loc('maven/index/buggy/nexus-maven-repository-index.gz')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             visit_uri(resource_uri)
 
@@ -259,7 +391,7 @@ class MavenVisitorTest(JsonBasedTesting, DjangoTestCase):
     def test_MavenPOMVisitor_data(self):
         uri = 'https://repo1.maven.org/maven2/classworlds/classworlds/1.1-alpha-2/classworlds-1.1-alpha-2.pom'
         test_loc = self.get_test_loc('maven/pom/classworlds-1.1-alpha-2.pom')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, data, _ = maven_visitor.MavenPOMVisitor(uri)
         self.assertEqual(None, uris)
@@ -278,7 +410,7 @@ class MavenEnd2EndTest(JsonBasedTesting, DjangoTestCase):
 
         resource_uri = ResourceURI.objects.insert(uri=uri)
         test_index = self.get_test_loc('maven/index/nexus-maven-repository-index.gz')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_index)
             visit_uri(resource_uri)
 
@@ -329,7 +461,7 @@ class MavenEnd2EndTest(JsonBasedTesting, DjangoTestCase):
 
         resource_uri = ResourceURI.objects.insert(uri=uri)
 
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             # visit test proper: this should insert all the test_uris
             visit_uri(resource_uri)
@@ -401,8 +533,11 @@ class MavenEnd2EndTest(JsonBasedTesting, DjangoTestCase):
         before_pkg = [p.id for p in packagedb.models.Package.objects.all()]
 
         resource_uri = ResourceURI.objects.insert(uri=uri)
+        # the state of an earlier visit, such that only the new increments are visited
+        resource_uri.data = json.dumps(dict(chain_id='1318453614498', last_incremental=531))
+        resource_uri.save()
 
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             # visit test proper: this should insert all the test_uris
             visit_uri(resource_uri)
@@ -421,7 +556,7 @@ class MavenEnd2EndTest(JsonBasedTesting, DjangoTestCase):
         test_loc = self.get_test_loc('maven/end2end_index/nexus-maven-repository-index.163.gz')
 
         resource_uri = ResourceURI.objects.get(uri=uri)
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             # visit test proper: this should insert all the test_uris
             visit_uri(resource_uri)
@@ -442,7 +577,7 @@ class MavenXmlMetadataVisitorTest(JsonBasedTesting):
     def test_visit_maven_medatata_xml_file(self):
         uri = 'https://repo1.maven.org/maven2/st/digitru/identity-core/maven-metadata.xml'
         test_loc = self.get_test_loc('maven/maven-metadata/maven-metadata.xml')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = maven_visitor.MavenMetaDataVisitor(uri)
         expected_loc = self.get_test_loc('maven/maven-metadata/expected_maven_xml.json')
@@ -455,7 +590,7 @@ class MavenHtmlIndexVisitorTest(JsonBasedTesting):
     def test_visit_maven_medatata_html_index_jcenter_1(self):
         uri = 'http://jcenter.bintray.com/'
         test_loc = self.get_test_loc('maven/html/jcenter.bintray.com.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = maven_visitor.MavenMetaDataVisitor(uri)
         expected_loc = self.get_test_loc('maven/html/visitor_expected_jcenter.bintray.com2.html.json')
@@ -464,7 +599,7 @@ class MavenHtmlIndexVisitorTest(JsonBasedTesting):
     def test_visit_maven_medatata_html_index_jcenter_2(self):
         uri = 'http://jcenter.bintray.com/Action/app/'
         test_loc = self.get_test_loc('maven/html/app.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = maven_visitor.MavenMetaDataVisitor(uri)
         expected_loc = self.get_test_loc('maven/html/visitor_expected_app.html.json')
@@ -473,7 +608,7 @@ class MavenHtmlIndexVisitorTest(JsonBasedTesting):
     def test_visit_maven_medatata_html_index_jcenter_3(self):
         uri = "http://jcenter.bintray.com/'com/virtualightning'/stateframework-compiler/"
         test_loc = self.get_test_loc('maven/html/stateframework-compiler.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = maven_visitor.MavenMetaDataVisitor(uri)
         expected_loc = self.get_test_loc('maven/html/visitor_expected_stateframework-compiler.html.json')
@@ -487,7 +622,7 @@ class MavenMapperVisitAndMapTest(JsonBasedTesting, DjangoTestCase):
     def test_visit_and_build_package_from_pom_axis(self):
         uri = 'https://repo1.maven.org/maven2/axis/axis/1.4/axis-1.4.pom'
         test_loc = self.get_test_loc('maven/mapper/axis-1.4.pom')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = maven_visitor.MavenPOMVisitor(uri)
         package = maven_mapper.get_package(data).to_dict()
@@ -497,7 +632,7 @@ class MavenMapperVisitAndMapTest(JsonBasedTesting, DjangoTestCase):
     def test_visit_and_build_package_from_pom_commons_pool(self):
         uri = 'https://repo1.maven.org/maven2/commons-pool/commons-pool/1.5.7/commons-pool-1.5.7.pom'
         test_loc = self.get_test_loc('maven/mapper/commons-pool-1.5.7.pom')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = maven_visitor.MavenPOMVisitor(uri)
         package = maven_mapper.get_package(data).to_dict()
@@ -507,7 +642,7 @@ class MavenMapperVisitAndMapTest(JsonBasedTesting, DjangoTestCase):
     def test_visit_and_build_package_from_pom_struts(self):
         uri = 'https://repo1.maven.org/maven2/struts-menu/struts-menu/2.4.2/struts-menu-2.4.2.pom'
         test_loc = self.get_test_loc('maven/mapper/struts-menu-2.4.2.pom')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = maven_visitor.MavenPOMVisitor(uri)
         package = maven_mapper.get_package(data).to_dict()
@@ -517,7 +652,7 @@ class MavenMapperVisitAndMapTest(JsonBasedTesting, DjangoTestCase):
     def test_visit_and_build_package_from_pom_mysql(self):
         uri = 'https://repo1.maven.org/maven2/mysql/mysql-connector-java/5.1.27/mysql-connector-java-5.1.27.pom'
         test_loc = self.get_test_loc('maven/mapper/mysql-connector-java-5.1.27.pom')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = maven_visitor.MavenPOMVisitor(uri)
         package = maven_mapper.get_package(data).to_dict()
@@ -527,7 +662,7 @@ class MavenMapperVisitAndMapTest(JsonBasedTesting, DjangoTestCase):
     def test_visit_and_build_package_from_pom_xbean(self):
         uri = 'https://repo1.maven.org/maven2/xbean/xbean-jmx/2.0/xbean-jmx-2.0.pom'
         test_loc = self.get_test_loc('maven/mapper/xbean-jmx-2.0.pom')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = maven_visitor.MavenPOMVisitor(uri)
         package = maven_mapper.get_package(data).to_dict()
@@ -537,7 +672,7 @@ class MavenMapperVisitAndMapTest(JsonBasedTesting, DjangoTestCase):
     def test_visit_and_build_package_from_pom_maven_all(self):
         uri = 'https://repo1.maven.org/maven2/date/yetao/maven/maven-all/1.0-RELEASE/maven-all-1.0-RELEASE.pom'
         test_loc = self.get_test_loc('maven/mapper/maven-all-1.0-RELEASE.pom')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = maven_visitor.MavenPOMVisitor(uri)
         package = maven_mapper.get_package(data).to_dict()
@@ -547,7 +682,7 @@ class MavenMapperVisitAndMapTest(JsonBasedTesting, DjangoTestCase):
     def test_visit_and_build_package_from_pom_with_unicode(self):
         uri = 'https://repo1.maven.org/maven2/edu/psu/swe/commons/commons-jaxrs/1.21/commons-jaxrs-1.21.pom'
         test_loc = self.get_test_loc('maven/mapper/commons-jaxrs-1.21.pom')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _ = maven_visitor.MavenPOMVisitor(uri)
         package = maven_mapper.get_package(data).to_dict()
@@ -657,7 +792,7 @@ class MavenMapperGetPackageTest(JsonBasedTesting, DjangoTestCase):
     def test_MavenNexusIndexVisitor_uris_increment_contain_correct_purl(self):
         uri = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.457.gz'
         test_loc = self.get_test_loc('maven/index/increment2/nexus-maven-repository-index.457.gz')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _errors = maven_visitor.MavenNexusIndexVisitor(uri)
         uris = [u for i, u in enumerate(uris) if i % 500 == 0]
@@ -667,7 +802,7 @@ class MavenMapperGetPackageTest(JsonBasedTesting, DjangoTestCase):
     def test_MavenNexusIndexVisitor_then_get_mini_package_from_index_data(self):
         uri = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.457.gz'
         test_loc = self.get_test_loc('maven/index/increment2/nexus-maven-repository-index.457.gz')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _errors = maven_visitor.MavenNexusIndexVisitor(uri)
         results = []
@@ -878,6 +1013,83 @@ class MavenPriorityQueueTests(JsonBasedTesting, DjangoTestCase):
             self.check_expected_results(merged_package.to_dict(), expected_loc, regen=regen)
 
 
+class MavenParentPOMCacheTest(JsonBasedTesting, DjangoTestCase):
+    test_data_dir = os.path.join(os.path.dirname(__file__), 'testfiles')
+
+    def setUp(self):
+        maven_visitor.clear_parent_pom_cache()
+        self.addCleanup(maven_visitor.clear_parent_pom_cache)
+        self.pom_texts_by_name = {}
+        for name, loc in [
+            ('apache', 'maven/pom/apache-18.pom'),
+            ('pulsar', 'maven/pom/pulsar-2.5.1.pom'),
+            ('pulsar-client-1x-base', 'maven/pom/pulsar-client-1x-base-2.5.1.pom'),
+            ('pulsar-client-1x', 'maven/pom/pulsar-client-1x-2.5.1.pom'),
+        ]:
+            with open(self.get_test_loc(loc)) as f:
+                self.pom_texts_by_name[name] = f.read()
+
+    def get_pom_text(self, namespace, name, version, **kwargs):
+        return self.pom_texts_by_name.get(name)
+
+    @mock.patch('minecode.visitors.maven.get_pom_text')
+    def test_get_ancestry_fetches_parent_poms_once(self, mock_get_pom_text):
+        from minecode.models import ParentPOM
+
+        mock_get_pom_text.side_effect = self.get_pom_text
+        pom_text = self.pom_texts_by_name['pulsar-client-1x']
+        expected = [
+            self.pom_texts_by_name['apache'],
+            self.pom_texts_by_name['pulsar'],
+            self.pom_texts_by_name['pulsar-client-1x-base'],
+        ]
+        self.assertEqual(expected, list(maven_visitor.get_ancestry(pom_text)))
+        self.assertEqual(3, mock_get_pom_text.call_count)
+        self.assertEqual(3, ParentPOM.objects.count())
+
+        # cached in memory
+        self.assertEqual(expected, list(maven_visitor.get_ancestry(pom_text)))
+        self.assertEqual(3, mock_get_pom_text.call_count)
+
+        # cached in the database
+        maven_visitor.clear_parent_pom_cache()
+        with self.assertNumQueries(3):
+            self.assertEqual(expected, list(maven_visitor.get_ancestry(pom_text)))
+        self.assertEqual(3, mock_get_pom_text.call_count)
+
+    @mock.patch('minecode.visitors.maven.get_pom_text')
+    def test_get_parent_pom_package_is_a_copy(self, mock_get_pom_text):
+        mock_get_pom_text.side_effect = self.get_pom_text
+        parent_pom = maven_visitor.get_parent_pom('org.apache', 'apache', '18')
+        package = parent_pom.get_package()
+        self.assertEqual('apache', package.name)
+        package.name = 'changed'
+        self.assertEqual('apache', parent_pom.get_package().name)
+
+    @mock.patch('minecode.visitors.maven.get_pom_text')
+    def test_get_parent_pom_fetches_expired_snapshot_again(self, mock_get_pom_text):
+        from minecode.models import ParentPOM
+
+        mock_get_pom_text.side_effect = self.get_pom_text
+        maven_visitor.get_parent_pom('org.apache', 'apache', '18')
+        maven_visitor.get_parent_pom('org.apache', 'apache', '19-SNAPSHOT')
+        self.assertEqual(2, mock_get_pom_text.call_count)
+
+        ParentPOM.objects.update(fetched_date=timezone.now() - timedelta(days=30))
+        maven_visitor.clear_parent_pom_cache()
+        maven_visitor.get_parent_pom('org.apache', 'apache', '18')
+        maven_visitor.get_parent_pom('org.apache', 'apache', '19-SNAPSHOT')
+        self.assertEqual(3, mock_get_pom_text.call_count)
+
+    @mock.patch('minecode.visitors.maven.get_pom_text')
+    def test_get_parent_pom_cache_is_bounded(self, mock_get_pom_text):
+        mock_get_pom_text.side_effect = self.get_pom_text
+        with self.settings(MINECODE_MAVEN_PARENT_POM_CACHE_SIZE=1):
+            maven_visitor.get_parent_pom('org.apache', 'apache', '18')
+            maven_visitor.get_parent_pom('org.apache.pulsar', 'pulsar', '2.5.1')
+        self.assertEqual(1, len(maven_visitor._parent_poms))
+
+
 class MavenCrawlerFunctionsTest(JsonBasedTesting, DjangoTestCase):
     test_data_dir = os.path.join(os.path.dirname(__file__), 'testfiles')
 
@@ -1147,7 +1359,7 @@ class MavenCrawlerFunctionsTest(JsonBasedTesting, DjangoTestCase):
         }
         self.assertEqual(expected, maven_visitor.get_directory_links(url))
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_get_artifact_links(self, mock_request_get):
         mock_request_get.return_value.ok = True
         mock_request_get.return_value.text = '''
@@ -1162,14 +1374,129 @@ class MavenCrawlerFunctionsTest(JsonBasedTesting, DjangoTestCase):
             'https://repo1.maven.org/maven2/xml-apis/xml-apis/1.0.b2/xml-apis-1.0.b2.jar': '2005-09-20 05:53',
         }
         self.assertEqual(expected, maven_visitor.get_artifact_links(url))
+        mock_request_get.assert_called_once_with(url, timeout=10)
 
     def test_crawl_to_package(self):
         pass
 
-    def test_crawl_maven_repo_from_root(self):
-        pass
+    def get_crawled_pages(self):
+        return {
+            'https://repo.example.com/maven2/': '''
+                <a href="../">../</a>
+                <a href="org/" title="org/">org/</a>         2020-01-01 00:00         -
+                <a href="com/" title="com/">com/</a>         2020-01-01 00:00         -
+                <a href="archetype-catalog.xml" title="archetype-catalog.xml">archetype-catalog.xml</a>         2020-01-01 00:00      1024
+            ''',
+            'https://repo.example.com/maven2/org/': '''
+                <a href="../">../</a>
+                <a href="example/" title="example/">example/</a>         2020-01-01 00:00         -
+            ''',
+            'https://repo.example.com/maven2/org/example/': '''
+                <a href="../">../</a>
+                <a href="lib/" title="lib/">lib/</a>         2020-01-01 00:00         -
+            ''',
+            'https://repo.example.com/maven2/org/example/lib/': '''
+                <a href="../">../</a>
+                <a href="1.0/" title="1.0/">1.0/</a>         2020-01-01 00:00         -
+                <a href="maven-metadata.xml" title="maven-metadata.xml">maven-metadata.xml</a>         2020-01-01 00:00       300
+            ''',
+        }
 
-    @mock.patch('requests.get')
+    def mock_session_get(self, pages):
+        def get(url, **kwargs):
+            response = mock.MagicMock()
+            if url in pages:
+                response.text = pages[url]
+            else:
+                response.raise_for_status.side_effect = Exception('404 Not Found')
+            return response
+        return get
+
+    @mock.patch('requests.Session.get')
+    def test_crawl_maven_repo_from_root(self, mock_session_get):
+        from minecode.models import CrawlableURI
+        from minecode.models import ImportableURI
+
+        mock_session_get.side_effect = self.mock_session_get(self.get_crawled_pages())
+        root_url = 'https://repo.example.com/maven2'
+        crawled_count = maven_visitor.crawl_maven_repo_from_root(root_url, max_workers=2, batch_size=2)
+        self.assertEqual(5, crawled_count)
+
+        importable_uri = ImportableURI.objects.get()
+        self.assertEqual('https://repo.example.com/maven2/org/example/lib/', importable_uri.uri)
+        self.assertEqual('pkg:maven/org.example/lib', importable_uri.package_url)
+
+        crawlable_uris = CrawlableURI.objects.order_by('depth', 'uri')
+        expected = [
+            ('https://repo.example.com/maven2/', 0, False),
+            ('https://repo.example.com/maven2/com/', 1, True),
+            ('https://repo.example.com/maven2/org/', 1, False),
+            ('https://repo.example.com/maven2/org/example/', 2, False),
+            ('https://repo.example.com/maven2/org/example/lib/', 3, False),
+        ]
+        results = [(c.uri, c.depth, c.has_crawl_error) for c in crawlable_uris]
+        self.assertEqual(expected, results)
+        self.assertFalse(CrawlableURI.objects.in_progress().exists())
+
+        # the next crawl skips the unchanged subtrees but retries the failed page
+        crawled_count = maven_visitor.crawl_maven_repo_from_root(root_url)
+        self.assertEqual(2, crawled_count)
+
+    @mock.patch('requests.Session.get')
+    def test_crawl_maven_repo_from_root_resumes_interrupted_crawl(self, mock_session_get):
+        from minecode.models import CrawlableURI
+
+        mock_session_get.side_effect = self.mock_session_get(self.get_crawled_pages())
+        root_url = 'https://repo.example.com/maven2/'
+        CrawlableURI.objects.create(
+            uri=root_url,
+            root_uri=root_url,
+            crawled_date=timezone.now(),
+        )
+        CrawlableURI.objects.create(
+            uri='https://repo.example.com/maven2/org/',
+            root_uri=root_url,
+            depth=1,
+            wip_date=timezone.now(),
+        )
+        crawled_count = maven_visitor.crawl_maven_repo_from_root(root_url)
+        # the root is not crawled again
+        self.assertEqual(3, crawled_count)
+        self.assertFalse(CrawlableURI.objects.get_requests(root_url).exists())
+
+    @mock.patch('requests.Session.get')
+    def test_crawl_maven_repo_from_root_retries_failed_deep_page(self, mock_session_get):
+        from minecode.models import CrawlableURI
+        from minecode.models import ImportableURI
+
+        pages = self.get_crawled_pages()
+        failing_url = 'https://repo.example.com/maven2/org/example/'
+        failing_page = pages.pop(failing_url)
+        mock_session_get.side_effect = self.mock_session_get(pages)
+        root_url = 'https://repo.example.com/maven2/'
+        # root, com/, org/ and the failing org/example/
+        self.assertEqual(4, maven_visitor.crawl_maven_repo_from_root(root_url))
+        self.assertTrue(CrawlableURI.objects.get(uri=failing_url).has_crawl_error)
+        self.assertFalse(ImportableURI.objects.exists())
+
+        # the parent org/ page is unchanged and is not crawled again, but the
+        # failed org/example/ page is retried
+        pages[failing_url] = failing_page
+        mock_session_get.side_effect = self.mock_session_get(pages)
+        # root, com/, org/example/ and org/example/lib/
+        self.assertEqual(4, maven_visitor.crawl_maven_repo_from_root(root_url))
+        crawled_urls = [call.args[0] for call in mock_session_get.call_args_list[-4:]]
+        self.assertNotIn('https://repo.example.com/maven2/org/', crawled_urls)
+        self.assertFalse(CrawlableURI.objects.get(uri=failing_url).has_crawl_error)
+        importable_uri = ImportableURI.objects.get()
+        self.assertEqual('https://repo.example.com/maven2/org/example/lib/', importable_uri.uri)
+
+    def test_get_package_url_from_package_page_url(self):
+        url = 'https://repo1.maven.org/maven2/net/shibboleth/parent/'
+        package_url = maven_visitor.get_package_url_from_package_page_url(url, 'https://repo1.maven.org/maven2/')
+        self.assertEqual('pkg:maven/net.shibboleth/parent', str(package_url))
+
+    @mock.patch('requests.Session.get')
     def test_get_artifact_sha1(self, mock_request_get):
         sha1 = '3136ca936f64c9d68529f048c2618bd356bf85c9'
         mock_request_get.return_value.ok = True
@@ -1188,3 +1515,59 @@ class MavenCrawlerFunctionsTest(JsonBasedTesting, DjangoTestCase):
             package_version
         )
         self.assertEqual('onejar', classifier)
+
+
+class UpdateMavenPackageDataStateTest(DjangoTestCase):
+
+    def get_collector_class(self, state, packages=()):
+        instances = []
+
+        class MockMavenNexusCollector:
+            def __init__(self, chain_id=None, last_incremental=None):
+                self.chain_id = chain_id
+                self.last_incremental = last_incremental
+                self.state = {}
+                instances.append(self)
+
+            def get_packages(self):
+                self.state = state
+                yield from packages
+
+        return MockMavenNexusCollector, instances
+
+    def test_update_maven_package_data_saves_and_reuses_the_collector_state(self):
+        from django.core import management
+        from minecode.models import CollectorState
+
+        state = dict(chain_id='1318453614498', last_incremental=531, timestamp='20240101')
+        collector_class, instances = self.get_collector_class(state)
+        with mock.patch(
+            'minecode.management.commands.update_maven_package_data.MavenNexusCollector',
+            collector_class,
+        ):
+            management.call_command('update_maven_package_data')
+            self.assertEqual((None, None), (instances[0].chain_id, instances[0].last_incremental))
+            self.assertEqual(state, CollectorState.objects.get().state)
+
+            management.call_command('update_maven_package_data')
+            self.assertEqual(('1318453614498', 531), (instances[1].chain_id, instances[1].last_incremental))
+
+    def test_update_maven_package_data_does_not_save_the_state_of_a_failed_run(self):
+        from django.core import management
+        from minecode.models import CollectorState
+
+        state = dict(chain_id='1318453614498', last_incremental=531, timestamp='20240101')
+
+        def failing_packages():
+            raise Exception('Failed to fetch index')
+            yield
+
+        collector_class, _ = self.get_collector_class(state, packages=failing_packages())
+        with mock.patch(
+            'minecode.management.commands.update_maven_package_data.MavenNexusCollector',
+            collector_class,
+        ):
+            with self.assertRaises(Exception):
+                management.call_command('update_maven_package_data')
+
+        self.assertFalse(CollectorState.objects.exclude(state={}).exists())
@@ -9,10 +9,17 @@
 
 import os
 
+from django.db import connection
 from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from packagedcode.maven import _parse
+from packagedcode.models import PackageData
+from packagedcode.models import Party
 
+from minecode.model_utils import bulk_update_or_create_resources
 from minecode.model_utils import merge_or_create_package
+from minecode.model_utils import merge_or_create_packages
+from minecode.models import ScannableURI
 from minecode.model_utils import update_or_create_resource
 from minecode.utils_test import JsonBasedTesting
 from minecode.utils_test import MiningTestCase
@@ -100,6 +107,169 @@ class ModelUtilsTestCase(MiningTestCase, JsonBasedTesting):
         self.check_expected_results(updated_fields, expected_updated_fields_loc, regen=FIXTURES_REGEN)
 
 
+    def test_merge_or_create_packages_create_package(self):
+        results = merge_or_create_packages([self.scanned_package], visit_level=50)
+        self.assertEqual(1, Package.objects.all().count())
+        package, created, merged, map_error = results[0]
+        self.assertEqual(package, Package.objects.all().first())
+        self.assertTrue(created)
+        self.assertFalse(merged)
+        self.assertEqual('', map_error)
+        package = Package.objects.get(pk=package.pk)
+        self.assertTrue(package.created_date)
+        self.assertTrue(package.last_modified_date)
+        expected_loc = self.get_test_loc('model_utils/created_package.json')
+        self.check_expected_results(
+            package.to_dict(),
+            expected_loc,
+            fields_to_remove=['package_sets'],
+            regen=False,
+        )
+
+    def test_merge_or_create_packages_merge_package(self):
+        Package.objects.create(
+            type='maven',
+            namespace='org.apache.pulsar',
+            name='pulsar',
+            version='2.5.1',
+            download_url='https://repo1.maven.org/maven2/org/apache/pulsar/pulsar/2.5.1/pulsar-2.5.1.jar',
+        )
+        results = merge_or_create_packages([self.scanned_package], visit_level=50)
+        self.assertEqual(1, Package.objects.all().count())
+        package, created, merged, map_error = results[0]
+        self.assertFalse(created)
+        self.assertTrue(merged)
+        self.assertEqual('', map_error)
+        package = Package.objects.get(pk=package.pk)
+        expected_loc = self.get_test_loc('model_utils/after_merge.json')
+        self.check_expected_results(
+            package.to_dict(),
+            expected_loc,
+            fields_to_remove=['package_sets'],
+            regen=False,
+        )
+        history = package.get_history()
+        self.assertEqual(1, len(history))
+        self.assertEqual('Package field values have been updated.', history[0]['message'])
+
+    def test_merge_or_create_packages_updates_only_the_merged_fields(self):
+        download_url = 'https://repo1.maven.org/maven2/org/example/foo/1.0/foo-1.0.jar'
+        Package.objects.create(
+            type='maven',
+            namespace='org.example',
+            name='foo',
+            version='1.0',
+            download_url=download_url,
+            mining_level=50,
+        )
+        scanned_package = PackageData(
+            type='maven',
+            namespace='org.example',
+            name='foo',
+            version='1.0',
+            download_url=download_url,
+            description='Foo description',
+        )
+        with CaptureQueriesContext(connection) as queries:
+            merge_or_create_packages([scanned_package], visit_level=10)
+
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(1, len(updates))
+        updated_columns = updates[0].split(' SET ')[1].split(' WHERE ')[0]
+        for column in ('"description"', '"history"', '"last_modified_date"'):
+            self.assertIn(column, updated_columns)
+        for column in ('"name"', '"download_url"', '"sha1"', '"keywords"', '"mining_level"'):
+            self.assertNotIn(column, updated_columns)
+
+        package = Package.objects.get(download_url=download_url)
+        self.assertEqual('Foo description', package.description)
+        self.assertEqual(50, package.mining_level)
+
+    def test_merge_or_create_packages_batch(self):
+        jar_url = 'https://repo1.maven.org/maven2/org/example/foo/1.0/foo-1.0.jar'
+        sources_url = 'https://repo1.maven.org/maven2/org/example/foo/1.0/foo-1.0-sources.jar'
+        scanned_packages = [
+            PackageData(
+                type='maven', namespace='org.example', name='foo', version='1.0',
+                download_url=jar_url,
+                parties=[Party(type='person', role='developer', name='Jane')],
+            ),
+            PackageData(
+                type='maven', namespace='org.example', name='foo', version='1.0',
+                download_url=sources_url,
+            ),
+            PackageData(
+                type='maven', namespace='org.example', name='foo', version='1.0',
+                download_url=jar_url, description='Foo',
+            ),
+            PackageData(type='maven', namespace='org.example', name='bar', version='1.0'),
+        ]
+        results = merge_or_create_packages(scanned_packages, visit_level=50, add_to_scan_queue=True)
+
+        self.assertEqual(
+            [(True, False), (True, False), (False, True), (False, False)],
+            [(created, merged) for _, created, merged, _ in results],
+        )
+        self.assertEqual(results[0][0], results[2][0])
+        self.assertIsNone(results[3][0])
+        self.assertIn('No download_url for package', results[3][3])
+
+        self.assertEqual(2, Package.objects.count())
+        jar = Package.objects.get(download_url=jar_url)
+        sources = Package.objects.get(download_url=sources_url)
+        self.assertEqual('Foo', jar.description)
+        self.assertEqual(['Jane'], [party.name for party in jar.parties.all()])
+        self.assertEqual(1, jar.package_sets.count())
+        self.assertEqual(list(jar.package_sets.all()), list(sources.package_sets.all()))
+        self.assertEqual(
+            sorted([jar_url, sources_url]),
+            sorted(ScannableURI.objects.values_list('uri', flat=True)),
+        )
+
+    def test_merge_or_create_packages_uses_existing_package_sets(self):
+        existing = Package.objects.create(
+            type='maven', namespace='org.example', name='foo', version='1.0',
+            download_url='https://repo1.maven.org/maven2/org/example/foo/1.0/foo-1.0.pom',
+        )
+        _, created, _, _ = merge_or_create_package(
+            PackageData(
+                type='maven', namespace='org.example', name='foo', version='1.0',
+                download_url='https://repo1.maven.org/maven2/org/example/foo/1.0/foo-1.0.jar',
+            ),
+            visit_level=50,
+        )
+        self.assertTrue(created)
+        self.assertEqual(1, existing.package_sets.count())
+
+        results = merge_or_create_packages(
+            [
+                PackageData(
+                    type='maven', namespace='org.example', name='foo', version='1.0',
+                    download_url='https://repo1.maven.org/maven2/org/example/foo/1.0/foo-1.0-sources.jar',
+                ),
+            ],
+            visit_level=50,
+        )
+        package = results[0][0]
+        self.assertEqual(list(existing.package_sets.all()), list(package.package_sets.all()))
+        self.assertEqual(3, existing.package_sets.get().packages.count())
+
+    def test_merge_or_create_packages_queries(self):
+        scanned_packages = [
+            PackageData(
+                type='maven', namespace='org.example', name=f'foo{i}', version='1.0',
+                download_url=f'https://repo1.maven.org/maven2/org/example/foo{i}/1.0/foo{i}-1.0.jar',
+            )
+            for i in range(100)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            merge_or_create_packages(scanned_packages, visit_level=50, add_to_scan_queue=True)
+
+        self.assertEqual(100, Package.objects.count())
+        self.assertEqual(100, ScannableURI.objects.count())
+        self.assertLess(len(queries), 15)
+
+
 class UpdateORCreateResourceTest(TransactionTestCase):
     def setUp(self):
         self.package = Package.objects.create(download_url="test-pkg.com")
@@ -154,3 +324,41 @@ class UpdateORCreateResourceTest(TransactionTestCase):
 
         resource = Resource.objects.get(path="root/test_new.c")
         self.assertEqual(self.new_extra_data, resource.extra_data)
+
+    def test_bulk_update_or_create_resources(self):
+        resources_data = [
+            {"extra_data": self.new_extra_data, "path": self.resource_path},
+            {
+                "type": "file",
+                "name": "test_new",
+                "extension": ".c",
+                "is_binary": False,
+                "is_text": False,
+                "is_archive": False,
+                "is_media": False,
+                "is_key_file": False,
+                "extra_data": {"directory_content": "fingerprint"},
+                "path": "root/test_new.c",
+            },
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            resources, created, updated = bulk_update_or_create_resources(
+                self.package,
+                resources_data,
+            )
+        statements = [
+            query['sql'].split()[0] for query in queries
+            if query['sql'] not in ('BEGIN', 'COMMIT')
+        ]
+        self.assertEqual(['SELECT', 'INSERT', 'UPDATE'], statements)
+        self.assertEqual(1, created)
+        self.assertEqual(1, updated)
+        self.assertEqual([self.resource_path, "root/test_new.c"], [r.path for r in resources])
+
+        self.resource.refresh_from_db()
+        expected_extra_data = dict(self.old_extra_data, **self.new_extra_data)
+        self.assertEqual(expected_extra_data, self.resource.extra_data)
+
+        resource = Resource.objects.get(path="root/test_new.c")
+        self.assertTrue(resource.is_file)
+        self.assertEqual({}, resource.extra_data)
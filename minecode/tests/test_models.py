@@ -9,17 +9,26 @@
 
 
 from datetime import timedelta
+import threading
 
+from django.db import connection
+from django.db import transaction
+from django.db.models import F
 from django.test import TestCase
+from django.test import TransactionTestCase
 from django.utils import timezone
 
 from minecode import visitors
 from minecode import mappers
 
+from minecode.models import ImportableURI
+from minecode.models import PriorityResourceURI
 from minecode.models import ResourceURI
 from packagedb.models import Package
+from minecode.models import claim_batch
 from minecode.models import get_canonical
 from minecode.models import ScannableURI
+from minecode.tasks import refresh_scan_queue_statistics
 
 
 class ResourceURIModelTestCase(TestCase):
@@ -285,6 +294,62 @@ class ResourceURIManagerGetNextVisitableUnmappableURITestCase(TestCase):
         self.assertIsNone(ResourceURI.objects.get_next_visitable())
 
 
+    def test_get_next_batch(self):
+        resource2 = ResourceURI.objects.insert(uri='https://sourceforge.net/sitemap-1.xml', priority=0)
+
+        results = ResourceURI.objects.get_next_batch(2)
+        self.assertEqual([self.resource1, self.resource0], results)
+        self.assertTrue(all(result.wip_date for result in results))
+        self.assertEqual(2, ResourceURI.objects.in_progress().count())
+
+        self.assertEqual([resource2], ResourceURI.objects.get_next_batch(2))
+        self.assertEqual([], ResourceURI.objects.get_next_batch(2))
+
+    def test_get_next_batch_with_revisitables(self):
+        self.resource1.last_visit_date = timezone.now() - timedelta(hours=250)
+        self.resource1.save()
+
+        self.assertEqual([self.resource1, self.resource0], ResourceURI.objects.get_next_batch(10))
+        self.assertEqual([], ResourceURI.objects.get_next_batch(10))
+
+    def test_get_next_batch_returns_rows_in_queue_order(self):
+        for i, priority in enumerate([3, 10, 7, 0, 7, 42, 1, 10]):
+            ResourceURI.objects.insert(uri=f'https://sourceforge.net/sitemap-{i}.xml', priority=priority)
+        expected = list(ResourceURI.objects.get_visitables())
+
+        self.assertEqual(expected, ResourceURI.objects.get_next_batch(len(expected)))
+
+
+class ResourceURIManagerGetNextBatchConcurrencyTestCase(TransactionTestCase):
+
+    def test_get_next_batch_skips_locked_rows(self):
+        resource0 = ResourceURI.objects.insert(uri='https://sourceforge.net/sitemap.xml', priority=1)
+        resource1 = ResourceURI.objects.insert(uri='https://sourceforge.net/sitemap-0.xml', priority=2)
+
+        locked = threading.Event()
+        release = threading.Event()
+
+        def lock_resource1():
+            try:
+                with transaction.atomic():
+                    ResourceURI.objects.select_for_update().get(pk=resource1.pk)
+                    locked.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=lock_resource1)
+        thread.start()
+        try:
+            self.assertTrue(locked.wait(10))
+            self.assertEqual([resource0], ResourceURI.objects.get_next_batch(10))
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual([resource1], ResourceURI.objects.get_next_batch(10))
+
+
 class ResourceURIManagerGetNextVisitableMappableURITestCase(TestCase):
 
     def setUp(self):
@@ -375,6 +440,14 @@ class ResourceURIManagerGetMappablesTestCase(TestCase):
         resource1 = ResourceURI.objects.get(id=self.resource1.id)
         self.assertEqual([], list(ResourceURI.objects.get_mappables()))
 
+    def test_get_next_mappable_batch(self):
+        self.assertEqual([self.resource2], ResourceURI.objects.get_next_mappable_batch(1))
+        self.assertEqual([self.resource1], list(ResourceURI.objects.get_mappables()))
+        results = ResourceURI.objects.get_next_mappable_batch(10)
+        self.assertEqual([self.resource1], results)
+        self.assertTrue(results[0].wip_date)
+        self.assertEqual([], ResourceURI.objects.get_next_mappable_batch(10))
+
 
 class ScannableURIManagerTestCase(TestCase):
     def setUp(self):
@@ -420,6 +493,63 @@ class ScannableURIManagerTestCase(TestCase):
         self.assertTrue(result.wip_date)
 
 
+    def test_ScannableURIManager_get_next_batch(self):
+        scan_date = timezone.now()
+        results = ScannableURI.objects.get_next_batch(
+            10,
+            scan_status=ScannableURI.SCAN_SUBMITTED,
+            scan_date=scan_date,
+        )
+        self.assertEqual([self.scannable_uri1], results)
+        self.assertTrue(results[0].wip_date)
+
+        self.scannable_uri1.refresh_from_db()
+        self.assertEqual(ScannableURI.SCAN_SUBMITTED, self.scannable_uri1.scan_status)
+        self.assertEqual(scan_date, self.scannable_uri1.scan_date)
+        self.assertTrue(self.scannable_uri1.wip_date)
+        self.assertEqual([], ScannableURI.objects.get_next_batch(10))
+
+    def test_ScannableURIManager_statistics(self):
+        self.scannable_uri2.scan_date = timezone.now()
+        self.scannable_uri2.save()
+        # not processable
+        self.scannable_uri3.wip_date = timezone.now()
+        self.scannable_uri3.save()
+
+        with self.assertNumQueries(7):
+            stats = ScannableURI.objects.statistics()
+
+        expected_by_status = [
+            {'scan_status': 'new', 'count': 1},
+            {'scan_status': 'submitted', 'count': 1},
+            {'scan_status': 'in progress', 'count': 1},
+            {'scan_status': 'scanned', 'count': 1},
+        ]
+        self.assertEqual(4, stats['total'])
+        self.assertEqual(ScannableURI.objects.get_processables().count(), stats['processables'])
+        self.assertEqual(2, stats['processables'])
+        self.assertEqual(1, stats['scannables'])
+        self.assertEqual(expected_by_status, stats['by_status'])
+        expected_recent = [{'package_url': self.test_package2.package_url, 'download_url': self.test_uri2}]
+        self.assertEqual(expected_recent, stats['most_recent_submitted'])
+        self.assertEqual([], stats['most_recent_failed'])
+
+    def test_ScannableURIManager_cached_statistics(self):
+        # computed and saved once when never refreshed
+        stats = ScannableURI.objects.cached_statistics()
+        self.assertEqual(4, stats['total'])
+
+        ScannableURI.objects.create(uri='http://example.org', package=self.test_package1)
+        with self.assertNumQueries(1):
+            self.assertEqual(stats, ScannableURI.objects.cached_statistics())
+
+        # the statistics are computed again by the scheduled task
+        refresh_scan_queue_statistics()
+        stats = ScannableURI.objects.cached_statistics()
+        self.assertEqual(5, stats['total'])
+        self.assertEqual(stats, ScannableURI.objects.statistics())
+
+
 class ScannableURIModelTestCase(TestCase):
     def setUp(self):
         self.test_uri = 'http://example.com'
@@ -446,3 +576,58 @@ class ScannableURIModelTestCase(TestCase):
         scannable_uri.save()
         result = ScannableURI.objects.get(uri=self.test_uri)
         self.assertEqual('http://example.com/', result.canonical)
+
+
+class RequestQueueManagersGetNextBatchTestCase(TestCase):
+
+    def test_PriorityResourceURIManager_get_next_batch(self):
+        now = timezone.now()
+        priority_resource_uris = [
+            PriorityResourceURI.objects.insert(
+                uri=f'pkg:npm/foo@{i}',
+                request_date=now - timedelta(hours=i),
+            )
+            for i in range(3)
+        ]
+        results = PriorityResourceURI.objects.get_next_batch(2)
+        self.assertEqual(priority_resource_uris[:0:-1], results)
+        self.assertTrue(all(result.wip_date for result in results))
+        self.assertEqual([priority_resource_uris[0]], PriorityResourceURI.objects.get_next_batch(2))
+        self.assertEqual([], PriorityResourceURI.objects.get_next_batch(2))
+        self.assertIsNone(PriorityResourceURI.objects.get_next_request())
+
+    def test_ImportableURIManager_get_next_batch(self):
+        now = timezone.now()
+        importable_uris = [
+            ImportableURI.objects.insert(
+                uri=f'https://repo1.maven.org/maven2/org/foo/{i}/',
+                data='',
+                package_url=f'pkg:maven/org/foo@{i}',
+                request_date=now - timedelta(hours=i),
+            )
+            for i in range(3)
+        ]
+        results = ImportableURI.objects.get_next_batch(2)
+        self.assertEqual(importable_uris[:0:-1], results)
+        self.assertTrue(all(result.wip_date for result in results))
+        self.assertEqual([importable_uris[0]], ImportableURI.objects.get_next_batch(2))
+        self.assertEqual([], ImportableURI.objects.get_next_batch(2))
+        self.assertIsNone(ImportableURI.objects.get_next_request())
+
+    def test_claim_batch_rejects_orderings_that_are_not_field_names(self):
+        package = Package.objects.create(download_url='http://test.com/foo.zip', name='foo')
+        ScannableURI.objects.create(uri='http://test.com/foo.zip', package=package)
+        for ordering in [F('priority').desc(), 'package', 'package__name', '?']:
+            queryset = ScannableURI.objects.order_by(ordering)
+            with self.assertRaises(ValueError):
+                claim_batch(queryset, 1, wip_date=timezone.now())
+        self.assertFalse(ScannableURI.objects.filter(wip_date__isnull=False).exists())
+
+    def test_claim_batch_orders_by_field_names(self):
+        resource_uris = [
+            ResourceURI.objects.insert(uri=f'http://test.com/{i}', priority=priority)
+            for i, priority in enumerate([1, 3, 2])
+        ]
+        queryset = ResourceURI.objects.order_by('-priority', 'pk')
+        results = claim_batch(queryset, 2, wip_date=timezone.now())
+        self.assertEqual([resource_uris[1], resource_uris[2]], results)
@@ -29,7 +29,7 @@ class NugetVisitorsTest(JsonBasedTesting):
     def test_NugetQueryVisitor(self):
         uri = 'https://api-v2v3search-0.nuget.org/query'
         test_loc = self.get_test_loc('nuget/query.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _errors = nuget.NugetQueryVisitor(uri)
         expected_loc = self.get_test_loc('nuget/nuget_query_expected')
@@ -38,7 +38,7 @@ class NugetVisitorsTest(JsonBasedTesting):
     def test_PackagesPageVisitor(self):
         uri = 'https://api-v2v3search-0.nuget.org/query?skip=0'
         test_loc = self.get_test_loc('nuget/query_search.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _errors = nuget.PackagesPageVisitor(uri)
         expected_loc = self.get_test_loc('nuget/nuget_page_json_expected')
@@ -47,7 +47,7 @@ class NugetVisitorsTest(JsonBasedTesting):
     def test_NugetAPIJsonVisitor(self):
         uri = 'https://api.nuget.org/v3/registration1/entityframework/6.1.3.json'
         test_loc = self.get_test_loc('nuget/entityframework.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _errors = nuget.NugetAPIJsonVisitor(uri)
         expected_loc = self.get_test_loc('nuget/nuget_downlloadvisitor_json_expected')
@@ -56,7 +56,7 @@ class NugetVisitorsTest(JsonBasedTesting):
     def test_NugetHTMLPageVisitor(self):
         uri = 'https://www.nuget.org/packages?page=1'
         test_loc = self.get_test_loc('nuget/packages.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, _ = nuget.NugetHTMLPageVisitor(uri)
         expected_loc = self.get_test_loc('nuget/packages.html.expected.json')
@@ -65,7 +65,7 @@ class NugetVisitorsTest(JsonBasedTesting):
     def test_NugetHTMLPackageVisitor(self):
         uri = 'https://www.nuget.org/packages/log4net'
         test_loc = self.get_test_loc('nuget/log4net.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _errors = nuget.NugetHTMLPackageVisitor(uri)
         self.assertTrue(b'Apache-2.0 License ' in data)
@@ -97,7 +97,7 @@ class TestNugetMap(JsonBasedTesting):
     def test_build_packages_from_html(self):
         uri = 'https://www.nuget.org/packages/log4net'
         test_loc = self.get_test_loc('nuget/log4net.html')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, _errors = nuget.NugetHTMLPackageVisitor(uri)
             packages = mappers.nuget.build_packages_from_html(data, uri,)
@@ -74,7 +74,7 @@ class TestFoo(unittest.TestCase):
     def test_PypiPackageVisitor(self):
         uri = 'https://pypi.python.org/pypi/CAGE/json'
         test_loc = self.get_test_loc('pypi/cage.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _error = visitors.pypi.PypiPackageVisitor(uri)
 
@@ -84,7 +84,7 @@ class TestFoo(unittest.TestCase):
     def test_PypiPackageVisitor_2(self):
         uri = 'https://pypi.python.org/pypi/boolean.py/json'
         test_loc = self.get_test_loc('pypi/boolean.py.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, _errors = visitors.pypi.PypiPackageVisitor(uri)
 
@@ -94,7 +94,7 @@ class TestFoo(unittest.TestCase):
     def test_PypiPackageReleaseVisitor_cage12(self):
         uri = 'https://pypi.python.org/pypi/CAGE/1.1.2/json'
         test_loc = self.get_test_loc('pypi/cage_1.1.2.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, data, _error = visitors.pypi.PypiPackageReleaseVisitor(uri)
 
@@ -107,7 +107,7 @@ class TestFoo(unittest.TestCase):
     def test_PypiPackageReleaseVisitor_cage13(self):
         uri = 'https://pypi.python.org/pypi/CAGE/1.1.3/json'
         test_loc = self.get_test_loc('pypi/cage_1.1.3.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, data, _error = visitors.pypi.PypiPackageReleaseVisitor(uri)
 
@@ -120,7 +120,7 @@ class TestFoo(unittest.TestCase):
     def test_PypiPackageReleaseVisitor_boolean(self):
         uri = 'https://pypi.python.org/pypi/boolean.py/2.0.dev3/json'
         test_loc = self.get_test_loc('pypi/boolean.py-2.0.dev3.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, data, _error = visitors.pypi.PypiPackageReleaseVisitor(uri)
 
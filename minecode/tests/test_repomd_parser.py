@@ -57,7 +57,7 @@ class TestRepomdParser(JsonBasedTesting):
         }
 
         uri = 'http://archive.cloudera.com/cm5/redhat/6/x86_64/cm/5.3.2/repodata/repomd.xml'
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.side_effect = lambda * args, **kwargs: mocked_requests_get_for_uris(uri2loc, *args, **kwargs)
             _uris, packages, _error = collect_rpm_packages_from_repomd(uri)
 
@@ -77,7 +77,7 @@ class TestRepomdParser(JsonBasedTesting):
         }
 
         uri = 'http://vault.centos.org/3.8/updates/x86_64/repodata/repomd.xml'
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.side_effect = lambda * args, **kwargs: mocked_requests_get_for_uris(uri2loc, *args, **kwargs)
             uris, packages, _error = collect_rpm_packages_from_repomd(uri)
 
@@ -104,7 +104,7 @@ class TestRepomdParser(JsonBasedTesting):
         }
 
         uri = 'http://archive.cloudera.com/cm5/redhat/5/x86_64/cm/5.2.0/repodata/repomd.xml'
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.side_effect = lambda * args, **kwargs: mocked_requests_get_for_uris(uri2loc, *args, **kwargs)
             _uris, packages, _error = collect_rpm_packages_from_repomd(uri)
 
@@ -124,7 +124,7 @@ class TestRepomdParser(JsonBasedTesting):
         }
 
         uri = 'http://yum.postgresql.org/9.2/redhat/rhel-6-x86_64/repodata/repomd.xml'
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.side_effect = lambda * args, **kwargs: mocked_requests_get_for_uris(uri2loc, *args, **kwargs)
             uris, packages, error = collect_rpm_packages_from_repomd(uri)
         self.assertEqual(None, error)
@@ -151,7 +151,7 @@ class TestRepomdParser(JsonBasedTesting):
         }
 
         uri = 'http://download.opensuse.org/distribution/12.3/repo/oss/suse/repodata/repomd.xml'
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.side_effect = lambda * args, **kwargs: mocked_requests_get_for_uris(uri2loc, *args, **kwargs)
             _uris, packages, _error = collect_rpm_packages_from_repomd(uri)
 
@@ -171,7 +171,7 @@ class TestRepomdParser(JsonBasedTesting):
         }
 
         uri = 'http://pgpool.net/yum/rpms/3.4/redhat/rhel-6-x86_64/repodata/repomd.xml'
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.side_effect = lambda * args, **kwargs: mocked_requests_get_for_uris(uri2loc, *args, **kwargs)
             _uris, packages, _error = collect_rpm_packages_from_repomd(uri)
 
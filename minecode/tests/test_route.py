@@ -266,3 +266,62 @@ class RouteTest(TestCase):
         self.assertTrue(uris.is_routable('http://nexc.com'))
         self.assertTrue(uris.is_routable('http://dejb.com'))
         self.assertFalse(uris.is_routable('https://deja.com'))
+
+    def test_get_literal_prefix(self):
+        self.assertEqual('http', route.get_literal_prefix(r'https?://nexb\.com/.*'))
+        self.assertEqual('http', route.get_literal_prefix(r'https*://'))
+        self.assertEqual('http://nexb.com/', route.get_literal_prefix(r'http://nexb\.com/\d+'))
+        self.assertEqual('http://nexb.com/', route.get_literal_prefix(r'http://nexb\.com/(a|b)'))
+        self.assertEqual('pkg:npm/', route.get_literal_prefix(r'pkg:npm/.*'))
+        self.assertEqual('', route.get_literal_prefix(r'.+/repomd.xml'))
+        self.assertEqual('', route.get_literal_prefix(r'http://nexb\.com|http://deja\.com'))
+        self.assertEqual('', route.get_literal_prefix(r'(?s:http://nexb\.com/)\Z'))
+
+    def test_resolve_with_patterns_without_literal_prefix(self):
+        uris = route.Router()
+
+        @uris.route(r'http://nexb\.com/.*')
+        def myroute(uri):
+            pass
+
+        @uris.route(r'.*/repomd\.xml', r'http://deja\.com|http://dejacode\.com')
+        def myroute2(uri):
+            pass
+
+        self.assertEqual(myroute.__name__, uris.resolve('http://nexb.com/foo').__name__)
+        self.assertEqual(myroute2.__name__, uris.resolve('http://deja.com').__name__)
+        self.assertEqual(myroute2.__name__, uris.resolve('http://dejacode.com').__name__)
+        self.assertRaises(route.MultipleRoutesDefined, uris.resolve, 'http://nexb.com/repomd.xml')
+        self.assertTrue(uris.is_routable('http://deja.com/repomd.xml'))
+        self.assertFalse(uris.is_routable('http://nexb.org/'))
+
+    def test_resolve_cache_is_cleared_when_a_route_is_appended(self):
+        uris = route.Router()
+
+        @uris.route(r'http://nexb\.com/.*')
+        def myroute(uri):
+            pass
+
+        self.assertEqual(myroute.__name__, uris.resolve('http://nexb.com/foo').__name__)
+        self.assertFalse(uris.is_routable('http://deja.com/foo'))
+
+        @uris.route(r'http://nexb\.com/foo', r'http://deja\.com/.*')
+        def myroute2(uri):
+            pass
+
+        self.assertRaises(route.MultipleRoutesDefined, uris.resolve, 'http://nexb.com/foo')
+        self.assertTrue(uris.is_routable('http://deja.com/foo'))
+
+    def test_router_can_be_pickled(self):
+        import pickle
+        uris = route.Router()
+        uris.append(r'http://nexb\.com/.*', route_endpoint)
+        self.assertEqual(route_endpoint, uris.resolve('http://nexb.com/foo'))
+
+        unpickled = pickle.loads(pickle.dumps(uris))
+        self.assertEqual(route_endpoint, unpickled.resolve('http://nexb.com/foo'))
+        self.assertTrue(unpickled.is_routable('http://nexb.com/foo'))
+
+
+def route_endpoint(uri):
+    pass
@@ -9,13 +9,18 @@
 
 import os
 from io import StringIO
+from unittest import mock
 
 from django.core import management
+from django.db import DatabaseError
+from django.test import TransactionTestCase
 from django.utils import timezone
 
 from packagedcode.models import Package as ScannedPackage
 
+from minecode.management.commands import run_map
 from minecode.management.commands.run_map import map_uri
+from minecode.management.commands.run_map import map_uris
 from minecode.model_utils import merge_packages
 from minecode.models import ResourceURI
 from minecode.models import ScannableURI
@@ -627,3 +632,116 @@ class RunMapTest(JsonBasedTesting, MiningTestCase):
         with self.assertRaises(Exception) as e:
             merge_packages(existing_package, new_package_data)
             self.assertTrue('Mismatched sha1' in e.exception)
+
+
+def mock_maven_mapper(uri, resource_uri):
+    if 'failing' in uri:
+        raise Exception('Mapping failed')
+    name = uri.rstrip('/').rpartition('/')[-1]
+    return [ScannedPackage(
+        type='maven',
+        namespace='org.example',
+        name=name,
+        version='1.0',
+        download_url=f'{uri}/{name}-1.0.jar',
+    )]
+
+
+def crashing_maven_mapper(uri, resource_uri):
+    if 'failing' in uri:
+        # exit abruptly as a worker process crashing on this URI
+        os._exit(1)
+    return mock_maven_mapper(uri, resource_uri)
+
+
+mock_map_router = Router()
+mock_map_router.append('http://testmapuris.com/.*', mock_maven_mapper)
+
+
+class RunMapUrisTest(TransactionTestCase):
+
+    def setUp(self):
+        for name in ('foo', 'bar', 'baz', 'failing'):
+            ResourceURI.objects.insert(
+                uri=f'http://testmapuris.com/{name}',
+                last_visit_date=timezone.now(),
+            )
+        # bypass save() that would flag these URIs without route as not mappable
+        ResourceURI.objects.update(is_mappable=True)
+
+    def test_map_uris_in_worker_processes(self):
+        resource_uris = ResourceURI.objects.get_next_mappable_batch(10)
+        self.assertEqual(4, len(resource_uris))
+
+        map_uris(resource_uris, processes=2, _map_router=mock_map_router)
+
+        self.assertEqual(
+            ['bar', 'baz', 'foo'],
+            sorted(packagedb.models.Package.objects.values_list('name', flat=True)),
+        )
+        self.assertEqual(3, ScannableURI.objects.count())
+        self.assertEqual(0, ResourceURI.objects.in_progress().count())
+        self.assertEqual(4, ResourceURI.objects.mapped().count())
+        failed = ResourceURI.objects.get(uri='http://testmapuris.com/failing')
+        self.assertIn('Mapping failed', failed.map_error)
+        self.assertEqual([], ResourceURI.objects.get_next_mappable_batch(10))
+
+    def test_map_uris_puts_back_unmapped_uris_on_mapping_errors(self):
+        resource_uris = ResourceURI.objects.get_next_mappable_batch(10)
+        self.assertEqual(4, ResourceURI.objects.in_progress().count())
+
+        with mock.patch(
+            'minecode.management.commands.run_map.get_mapped_packages',
+            side_effect=KeyboardInterrupt,
+        ):
+            with self.assertRaises(KeyboardInterrupt):
+                map_uris(resource_uris, _map_router=mock_map_router)
+
+        self.assertEqual(0, ResourceURI.objects.in_progress().count())
+        self.assertEqual(0, ResourceURI.objects.mapped().count())
+        self.assertEqual(4, len(ResourceURI.objects.get_next_mappable_batch(10)))
+
+    def test_map_uris_puts_back_unmapped_uris_on_save_errors(self):
+        resource_uris = sorted(ResourceURI.objects.get_next_mappable_batch(10), key=lambda r: r.uri)
+        self.assertEqual(
+            ['bar', 'baz', 'failing', 'foo'],
+            [resource_uri.uri.rpartition('/')[-1] for resource_uri in resource_uris],
+        )
+
+        save_mapped_packages = run_map.save_mapped_packages
+
+        def failing_save(resource_uri, *args, **kwargs):
+            if resource_uri.uri.endswith('baz'):
+                raise DatabaseError('Failed to save')
+            return save_mapped_packages(resource_uri, *args, **kwargs)
+
+        with mock.patch.object(run_map, 'save_mapped_packages', side_effect=failing_save):
+            map_uris(resource_uris, _map_router=mock_map_router)
+
+        # baz is flagged with a map error and not claimed again
+        self.assertEqual(0, ResourceURI.objects.in_progress().count())
+        self.assertEqual(
+            ['http://testmapuris.com/baz', 'http://testmapuris.com/failing'],
+            sorted(ResourceURI.objects.unsuccessfully_mapped().values_list('uri', flat=True)),
+        )
+        baz = ResourceURI.objects.get(uri='http://testmapuris.com/baz')
+        self.assertIn('Failed to save', baz.map_error)
+        self.assertEqual(
+            ['bar', 'foo'],
+            sorted(packagedb.models.Package.objects.values_list('name', flat=True)),
+        )
+        self.assertEqual([], ResourceURI.objects.get_next_mappable_batch(10))
+
+    def test_map_uris_flags_uris_of_crashed_worker_processes_with_map_errors(self):
+        crashing_map_router = Router()
+        crashing_map_router.append('http://testmapuris.com/.*', crashing_maven_mapper)
+        resource_uris = ResourceURI.objects.get_next_mappable_batch(10)
+
+        map_uris(resource_uris, processes=2, _map_router=crashing_map_router)
+
+        self.assertEqual(0, ResourceURI.objects.in_progress().count())
+        self.assertEqual(4, ResourceURI.objects.mapped().count())
+        failed = ResourceURI.objects.get(uri='http://testmapuris.com/failing')
+        self.assertTrue(failed.has_map_error)
+        self.assertIn('worker process', failed.map_error)
+        self.assertEqual([], ResourceURI.objects.get_next_mappable_batch(10))
@@ -12,13 +12,30 @@ from operator import itemgetter
 from io import StringIO
 
 from collections import Counter
+from collections import defaultdict
+import threading
+import time
+from unittest.mock import patch
+
 from django.core import management
+from django.db import connection
+from django.db import connections
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.forms.models import model_to_dict
+from django.utils import timezone
 
 from minecode.utils_test import MiningTestCase
+from minecode.utils_test import MockResponse
+from minecode.management.commands.run_visit import HostScheduler
+from minecode.management.commands.run_visit import TokenBucket
+from minecode.management.commands.run_visit import insert_visited_uris
 from minecode.management.commands.run_visit import visit_uri
+from minecode.management.commands.run_visit import visit_uris
+from minecode.management.commands.run_visit import visit_uris_concurrently
 from minecode.models import ResourceURI
 from minecode.route import Router
+from minecode.visitors import HttpVisitor
 from minecode.visitors import URI
 
 
@@ -476,6 +493,26 @@ class RunVisitTest(MiningTestCase):
         expected = 'Visited 0 URIs\nInserted 0 new URIs\n'
         self.assertEqual(expected, output.getvalue())
 
+    def test_run_visit_command_with_threads(self):
+        output = StringIO()
+        management.call_command('run_visit', exit_on_empty=True, threads=2, stdout=output)
+        expected = 'Visited 0 URIs\nInserted 0 new URIs\n'
+        self.assertEqual(expected, output.getvalue())
+
+    def test_visit_uris_puts_back_in_queue_claimed_uris_not_visited(self):
+        for i in range(3):
+            ResourceURI.objects.insert(uri=f'http://undefined-route-{i}.com')
+        # bypass save() that would flag these URIs without route as not visitable
+        ResourceURI.objects.update(is_visitable=True)
+
+        visited_counter, _ = visit_uris(
+            ignore_robots=True, ignore_throttle=True, max_loops=1, batch_size=10)
+
+        self.assertEqual(2, visited_counter)
+        # URIs without route are left in progress by visit_uri
+        self.assertEqual(2, ResourceURI.objects.in_progress().count())
+        self.assertEqual(2, ResourceURI.objects.get_visitables().count())
+
     def test_visit_uri_always_inserts_new_uri(self):
         # test proper
         visit_uri(self.resource_uri, _visit_router=self.router2)
@@ -502,3 +539,222 @@ class RunVisitTest(MiningTestCase):
         ]
 
         self.assertEqual(expected, list(visited))
+
+    def test_visit_uri_makes_conditional_requests_on_revisit(self):
+        uri = 'https://nexb_visit.com/index.html'
+        router = Router()
+        router.append(uri, MockHttpVisitor)
+        resource_uri = ResourceURI.objects.insert(uri=uri)
+
+        headers = {'ETag': '"v1"', 'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT'}
+        with patch('requests.Session.get') as mock_http_get:
+            mock_http_get.return_value = MockResponse(b'index', 200, headers)
+            self.assertEqual(1, visit_uri(resource_uri, _visit_router=router))
+            self.assertNotIn('headers', mock_http_get.call_args.kwargs)
+
+        resource_uri.refresh_from_db()
+        self.assertEqual('index', resource_uri.data)
+        self.assertEqual('"v1"', resource_uri.etag)
+        self.assertEqual('Wed, 21 Oct 2015 07:28:00 GMT', resource_uri.last_modified)
+        first_visit_date = resource_uri.last_visit_date
+
+        with patch('requests.Session.get') as mock_http_get:
+            mock_http_get.return_value = MockResponse(b'', 304)
+            self.assertEqual(0, visit_uri(resource_uri, _visit_router=router))
+            request_headers = mock_http_get.call_args.kwargs['headers']
+            self.assertEqual('"v1"', request_headers['If-None-Match'])
+            self.assertEqual(headers['Last-Modified'], request_headers['If-Modified-Since'])
+
+        resource_uri.refresh_from_db()
+        self.assertEqual('index', resource_uri.data)
+        self.assertEqual('"v1"', resource_uri.etag)
+        self.assertFalse(resource_uri.has_visit_error)
+        self.assertGreater(resource_uri.last_visit_date, first_visit_date)
+
+        # validators are dropped after a failed visit
+        with patch('requests.Session.get') as mock_http_get:
+            mock_http_get.return_value = MockResponse(b'', 500)
+            visit_uri(resource_uri, _visit_router=router)
+
+        resource_uri.refresh_from_db()
+        self.assertTrue(resource_uri.has_visit_error)
+        self.assertIsNone(resource_uri.etag)
+        self.assertIsNone(resource_uri.last_modified)
+
+
+class MockHttpVisitor(HttpVisitor):
+
+    def get_uris(self, content):
+        yield URI(uri='http://test.com')
+
+    def dumps(self, content):
+        return content.decode('utf-8')
+
+
+class InsertVisitedUrisTest(MiningTestCase):
+
+    def test_insert_visited_uris_skips_uris_pending_visit(self):
+        ResourceURI.objects.insert(uri='http://test.com/pending')
+        vuris = [
+            URI(uri='http://test.com/pending'),
+            URI(uri='http://test.com/new'),
+            URI(uri='http://test.com/new'),
+            URI(uri='http://test.com/pending', visited=True, data='data'),
+            URI(uri='http://test.com/visited', visited=True),
+            URI(uri='http://test.com/visited', visited=True),
+        ]
+        visit_errors = []
+        inserted, skipped = insert_visited_uris(vuris, visit_errors=visit_errors, batch_size=4)
+
+        self.assertEqual((4, 2), (inserted, skipped))
+        self.assertEqual([], visit_errors)
+        self.assertEqual(1, ResourceURI.objects.filter(uri='http://test.com/new').count())
+        self.assertEqual(1, ResourceURI.objects.never_visited().filter(uri='http://test.com/pending').count())
+        self.assertEqual(1, ResourceURI.objects.visited().filter(uri='http://test.com/pending').count())
+        self.assertEqual(2, ResourceURI.objects.visited().filter(uri='http://test.com/visited').count())
+
+    def test_insert_visited_uris_queries_by_batch(self):
+        vuris = [URI(uri=f'http://test.com/{i}') for i in range(100)]
+        with CaptureQueriesContext(connection) as queries:
+            inserted, skipped = insert_visited_uris(vuris, visit_errors=[], batch_size=50)
+
+        self.assertEqual((100, 0), (inserted, skipped))
+        self.assertEqual(100, ResourceURI.objects.count())
+        # one lookup of pending URIs and one insert per batch
+        statements = [query['sql'].split()[0] for query in queries]
+        self.assertEqual(2, statements.count('SELECT'))
+        self.assertEqual(2, statements.count('INSERT'))
+
+    def test_insert_visited_uris_inserts_one_at_a_time_when_a_batch_fails(self):
+        too_long_uri = 'http://test.com/' + 'a' * 3000
+        vuris = [
+            URI(uri='http://test.com/1'),
+            URI(uri=too_long_uri),
+            URI(uri='http://test.com/2'),
+        ]
+        visit_errors = []
+        inserted, skipped = insert_visited_uris(vuris, visit_errors=visit_errors)
+
+        self.assertEqual((2, 0), (inserted, skipped))
+        self.assertEqual(1, len(visit_errors))
+        self.assertIn(too_long_uri, visit_errors[0])
+        self.assertEqual(
+            ['http://test.com/1', 'http://test.com/2'],
+            sorted(ResourceURI.objects.values_list('uri', flat=True))
+        )
+
+    def test_insert_visited_uris_does_not_count_conflicting_rows(self):
+        last_visit_date = timezone.now()
+        ResourceURI.objects.create(uri='http://test.com/visited', last_visit_date=last_visit_date)
+        vuri = URI(uri='http://test.com/visited', visited=True)
+        with patch('minecode.management.commands.run_visit.timezone.now', return_value=last_visit_date):
+            inserted, skipped = insert_visited_uris([vuri], visit_errors=[])
+
+        self.assertEqual((0, 0), (inserted, skipped))
+        self.assertEqual(1, ResourceURI.objects.filter(uri='http://test.com/visited').count())
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class HostSchedulerTest(MiningTestCase):
+
+    def test_TokenBucket_reserve(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=0.5, capacity=2, clock=clock)
+        self.assertEqual(0, bucket.reserve())
+        self.assertEqual(0, bucket.reserve())
+        self.assertEqual(2, bucket.reserve())
+        self.assertEqual(4, bucket.reserve())
+
+        clock.now = 10
+        self.assertEqual(0, bucket.reserve())
+
+    def test_HostScheduler_schedule_throttles_each_host(self):
+        clock = FakeClock()
+        scheduler = HostScheduler(
+            ignore_robots=True, minimum_delay_between_visits=2, clock=clock)
+        results = [
+            scheduler.schedule('http://example.com/1'),
+            scheduler.schedule('http://example.com/2'),
+            scheduler.schedule('http://example.org/1'),
+            scheduler.schedule('http://example.com/3'),
+            scheduler.schedule('http://example.org/2'),
+        ]
+        self.assertEqual([0, 2, 0, 4, 2], results)
+
+    def test_HostScheduler_schedule_ignore_throttle(self):
+        clock = FakeClock()
+        scheduler = HostScheduler(ignore_robots=True, ignore_throttle=True, clock=clock)
+        results = [scheduler.schedule('http://example.com/1') for _ in range(3)]
+        self.assertEqual([0, 0, 0], results)
+
+
+class VisitUrisConcurrentlyTest(TransactionTestCase):
+
+    def create_resource_uris(self, uris):
+        for uri in uris:
+            ResourceURI.objects.insert(uri=uri)
+        # bypass save() that would flag these URIs without route as not visitable
+        ResourceURI.objects.update(is_visitable=True)
+
+    def test_visit_uris_concurrently(self):
+        self.create_resource_uris([f'http://undefined-route-{i}.com' for i in range(5)])
+
+        visited_counter, inserted_counter = visit_uris_concurrently(
+            threads=2, ignore_robots=True, exit_on_empty=True, batch_size=2)
+
+        self.assertEqual(5, visited_counter)
+        self.assertEqual(0, inserted_counter)
+        # URIs without route are left in progress by visit_uri
+        self.assertEqual(5, ResourceURI.objects.in_progress().count())
+
+    def test_visit_uris_concurrently_reuses_and_closes_thread_connections(self):
+        self.create_resource_uris([f'http://undefined-route-{i}.com' for i in range(6)])
+        raw_connections_by_thread = defaultdict(set)
+        thread_connections = []
+
+        def mock_visit_uri(resource_uri, **kwargs):
+            ResourceURI.objects.filter(pk=resource_uri.pk).exists()
+            connection = connections['default']
+            raw_connections_by_thread[threading.get_ident()].add(id(connection.connection))
+            thread_connections.append(connection)
+            return 0
+
+        with patch('minecode.management.commands.run_visit.visit_uri', side_effect=mock_visit_uri):
+            visited_counter, _ = visit_uris_concurrently(
+                threads=2, ignore_robots=True, max_loops=5, batch_size=2)
+
+        self.assertEqual(6, visited_counter)
+        # one connection per thread, reused across visits
+        for raw_connections in raw_connections_by_thread.values():
+            self.assertEqual(1, len(raw_connections))
+        # and closed at shutdown
+        self.assertTrue(all(connection.connection is None for connection in thread_connections))
+
+    def test_visit_uris_concurrently_is_polite_with_each_host(self):
+        self.create_resource_uris([f'http://undefined-route.com/{i}' for i in range(3)])
+        scheduler = HostScheduler(ignore_robots=True, minimum_delay_between_visits=0.2)
+
+        start = time.monotonic()
+        visited_counter, _ = visit_uris_concurrently(
+            threads=3, exit_on_empty=True, scheduler=scheduler)
+
+        self.assertEqual(3, visited_counter)
+        self.assertGreaterEqual(time.monotonic() - start, 0.4)
+
+    def test_visit_uris_concurrently_puts_back_in_queue_claimed_uris_not_visited(self):
+        self.create_resource_uris([f'http://undefined-route-{i}.com' for i in range(4)])
+
+        visited_counter, _ = visit_uris_concurrently(
+            threads=2, ignore_robots=True, max_loops=1, batch_size=10)
+
+        self.assertEqual(2, visited_counter)
+        self.assertEqual(2, ResourceURI.objects.in_progress().count())
+        self.assertEqual(2, ResourceURI.objects.get_visitables().count())
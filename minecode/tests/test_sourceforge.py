@@ -27,7 +27,7 @@ class SourceforgeVisitorsTest(JsonBasedTesting):
     def test_visit_sf_sitemap_index_new(self):
         uri = 'http://sourceforge.net/sitemap.xml'
         test_loc = self.get_test_loc('sourceforge/sitemap.xml')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _data, error = sourceforge.SourceforgeSitemapIndexVisitor(uri)
 
@@ -38,7 +38,7 @@ class SourceforgeVisitorsTest(JsonBasedTesting):
     def test_visit_sf_sitemap_page_new(self):
         uri = 'http://sourceforge.net/sitemap-1.xml'
         test_loc = self.get_test_loc('sourceforge/sitemap-1.xml')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, error = sourceforge.SourceforgeSitemapPageVisitor(uri)
 
@@ -49,7 +49,7 @@ class SourceforgeVisitorsTest(JsonBasedTesting):
     def test_visit_sf_sitemap_page6(self):
         uri = 'https://sourceforge.net/sitemap-6.xml'
         test_loc = self.get_test_loc('sourceforge/sitemap-6.xml')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             uris, _, error = sourceforge.SourceforgeSitemapPageVisitor(uri)
 
@@ -60,7 +60,7 @@ class SourceforgeVisitorsTest(JsonBasedTesting):
     def test_visit_sf_project_json_api_new(self):
         uri = 'https://sourceforge.net/api/project/name/netwiki/json'
         test_loc = self.get_test_loc('sourceforge/netwiki.json')
-        with patch('requests.get') as mock_http_get:
+        with patch('requests.Session.get') as mock_http_get:
             mock_http_get.return_value = mocked_requests_get(uri, test_loc)
             _, data, error = sourceforge.SourceforgeProjectJsonVisitor(uri)
 
@@ -8,16 +8,35 @@
 #
 
 
+import gzip
+import io
+import json
 import os
+from unittest import skipUnless
+from unittest.mock import patch
 
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadedfile import TemporaryUploadedFile
 from django.test import TestCase as DjangoTestCase
+from django.test import override_settings
 
 from packagedcode import models as scan_models
 
 from minecode.utils_test import JsonBasedTesting
+from minecode.utils_test import MockResponse
+from minecode.utils import JSONStreamReader
+from minecode.utils import NotModified
+from minecode.utils import _http_sessions
+from minecode.utils import get_http_response
+from minecode.utils import get_http_session
+from minecode.utils import get_temp_file
 from minecode.utils import is_int
+from minecode.utils import iter_json_list_items
+from minecode.utils import open_decompressed
+from minecode.utils import save_uploaded_file
 from minecode.utils import stringify_null_purl_fields
 from minecode.utils import validate_uuid
+from minecode.utils import zstandard
 
 
 class UtilsTest(JsonBasedTesting, DjangoTestCase):
@@ -79,3 +98,133 @@ class UtilsTest(JsonBasedTesting, DjangoTestCase):
             [valid_uuid, True],
         ]:
             self.assertEqual(expected_result, validate_uuid(uuid))
+
+    def test_iter_json_list_items(self):
+        scan_data = {
+            'headers': [{'tool_name': 'scancode.io', 'notice': 'a "b" [c] {d} \\e\\'}],
+            'count': -12.5e3,
+            'files': [
+                {'path': 'a/b.c', 'size': 12345, 'extra_data': {'halo1': ''}},
+                {'path': 'a/"],}.c', 'size': 3.5e10, 'is_text': True},
+                None,
+            ],
+            'relations': [],
+        }
+        location = get_temp_file(extension='.json')
+        for indent in (None, 2):
+            with open(location, 'w') as f:
+                json.dump(scan_data, f, indent=indent)
+            # small reads split values between chunks
+            for read_size in (1, 3, 1024):
+                results = list(iter_json_list_items(location, 'files', read_size=read_size))
+                self.assertEqual(scan_data['files'], results)
+            self.assertEqual([], list(iter_json_list_items(location, 'packages')))
+
+    def test_JSONStreamReader_skip_large_value(self):
+        value = {'files': [{'path': f'{i}/"]}}\\', 'size': i} for i in range(1000)]}
+        content = json.dumps([value, 'next'])
+        reader = JSONStreamReader(io.StringIO(content), read_size=16)
+        reader.consume('[')
+        max_buffer_size = 0
+        read = reader.read
+
+        def tracked_read():
+            nonlocal max_buffer_size
+            result = read()
+            max_buffer_size = max(max_buffer_size, len(reader.buffer))
+            return result
+
+        reader.read = tracked_read
+        reader.skip()
+        reader.consume(',')
+        self.assertEqual('next', reader.decode())
+        # only the text of the current chunk is kept in memory
+        self.assertTrue(max_buffer_size < 64)
+
+    def test_iter_json_list_items_invalid_json(self):
+        location = get_temp_file(extension='.json')
+        for content in (
+            '{"headers": [1}, "files": [1]}',
+            '{"headers": "unterminated, "files": [1]}',
+            '{"files": [{"path": "a"]}',
+        ):
+            with open(location, 'w') as f:
+                f.write(content)
+            with self.assertRaises(ValueError):
+                list(iter_json_list_items(location, 'files', read_size=4))
+
+    def test_get_http_session_is_shared(self):
+        session = get_http_session()
+        self.assertIs(session, get_http_session())
+        adapter = session.get_adapter('https://repo1.maven.org/maven2/')
+        self.assertEqual(3, adapter.max_retries.total)
+        self.assertIn(503, adapter.max_retries.status_forcelist)
+
+    @override_settings(MINECODE_HTTP_POOL_MAXSIZE_BY_HOST={'repo1.maven.org': 20})
+    def test_get_http_session_with_pool_size_by_host(self):
+        _http_sessions.clear()
+        self.addCleanup(_http_sessions.clear)
+        session = get_http_session()
+        adapter = session.get_adapter('https://repo1.maven.org/maven2/')
+        self.assertEqual(20, adapter._pool_maxsize)
+        adapter = session.get_adapter('https://registry.npmjs.org/')
+        self.assertEqual(10, adapter._pool_maxsize)
+
+    def test_get_http_response_with_validators(self):
+        uri = 'https://example.com/index.html'
+        headers = {'ETag': '"abc"', 'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT'}
+        with patch('requests.Session.get') as mock_http_get:
+            mock_http_get.return_value = MockResponse(b'content', 200, headers)
+            response = get_http_response(uri)
+            self.assertEqual(b'content', response.content)
+            self.assertNotIn('headers', mock_http_get.call_args.kwargs)
+
+            mock_http_get.return_value = MockResponse(b'', 304)
+            with self.assertRaises(NotModified):
+                get_http_response(uri, etag='"abc"', last_modified=headers['Last-Modified'])
+            expected = {
+                'If-None-Match': '"abc"',
+                'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT',
+            }
+            self.assertEqual(expected, mock_http_get.call_args.kwargs['headers'])
+
+    def test_save_uploaded_file(self):
+        uploaded_file = SimpleUploadedFile('scan.json', b'{"files": []}')
+        location = save_uploaded_file(uploaded_file, file_name='scan', extension='.json')
+        with open(location, 'rb') as f:
+            self.assertEqual(b'{"files": []}', f.read())
+
+        uploaded_file = TemporaryUploadedFile('scan.json', 'application/json', 13, 'utf-8')
+        uploaded_file.write(b'{"files": []}')
+        uploaded_file.flush()
+        temporary_location = uploaded_file.temporary_file_path()
+        location = save_uploaded_file(uploaded_file, file_name='scan', extension='.json')
+        uploaded_file.close()
+        # the temporary upload is moved rather than copied
+        self.assertFalse(os.path.exists(temporary_location))
+        with open(location, 'rb') as f:
+            self.assertEqual(b'{"files": []}', f.read())
+
+    def test_open_decompressed(self):
+        content = '{"files": [{"path": "caf\u00e9.c"}]}'
+        location = get_temp_file(extension='.json')
+        with open(location, 'w', encoding='utf-8') as f:
+            f.write(content)
+        with open_decompressed(location) as f:
+            self.assertEqual(content, f.read())
+
+        location = get_temp_file(extension='.json.gz')
+        with gzip.open(location, 'wt', encoding='utf-8') as f:
+            f.write(content)
+        with open_decompressed(location) as f:
+            self.assertEqual(content, f.read())
+        self.assertEqual([{'path': 'caf\u00e9.c'}], list(iter_json_list_items(location, 'files')))
+
+    @skipUnless(zstandard, 'zstandard is not installed')
+    def test_open_decompressed_zstd(self):
+        content = '{"files": [{"path": "a.c"}]}'
+        location = get_temp_file(extension='.json.zst')
+        with open(location, 'wb') as f:
+            f.write(zstandard.ZstdCompressor().compress(content.encode('utf-8')))
+        with open_decompressed(location) as f:
+            self.assertEqual(content, f.read())
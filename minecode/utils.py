@@ -8,26 +8,42 @@
 #
 
 import copy
+import gzip
 import hashlib
+import io
+from itertools import islice
+import json
 import logging
 import os
+import re
 import tempfile
+import threading
 import uuid
 
 from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.db import connections
+from django.db import router
 from django.utils.encoding import force_str
 
 import arrow
 from arrow.parser import ParserError
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import InvalidSchema
 from requests.exceptions import ConnectionError
+from urllib3.util.retry import Retry
 
 from commoncode.fileutils import create_dir
 from extractcode.extract import extract
 
 from minecode.management.commands import get_settings
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 logger = logging.getLogger(__name__)
 # import sys
 # logging.basicConfig(level=logging.DEBUG, stream=sys.stdout)
@@ -207,6 +223,91 @@ def decode_fuzzy_date(s, _self=None):
     return ar.isoformat()
 
 
+class NotModified(Exception):
+    """
+    Raised when a conditional HTTP request returns a 304 Not Modified status.
+    """
+
+
+# HTTP statuses that are retried with a backoff
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# The shared HTTP session of the current process, keyed by process id
+_http_sessions = {}
+_http_sessions_lock = threading.Lock()
+
+
+def get_http_adapter(pool_connections=10, pool_maxsize=10, retries=3, backoff_factor=0.5):
+    """
+    Return an HTTPAdapter with connection pools for up to `pool_connections`
+    hosts, keeping up to `pool_maxsize` connections alive for each host, and
+    retrying failed requests up to `retries` times with a `backoff_factor`.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=HTTP_RETRY_STATUSES,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        # return the last response once the retries are exhausted
+        raise_on_status=False,
+    )
+    return HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry,
+    )
+
+
+def make_http_session():
+    """
+    Return a new requests Session configured with the MINECODE_HTTP_* settings.
+    """
+    pool_connections = settings.MINECODE_HTTP_POOL_CONNECTIONS
+    retries = settings.MINECODE_HTTP_RETRIES
+    backoff_factor = settings.MINECODE_HTTP_BACKOFF_FACTOR
+
+    session = requests.Session()
+    adapter = get_http_adapter(
+        pool_connections=pool_connections,
+        pool_maxsize=settings.MINECODE_HTTP_POOL_MAXSIZE,
+        retries=retries,
+        backoff_factor=backoff_factor,
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    for host, pool_maxsize in settings.MINECODE_HTTP_POOL_MAXSIZE_BY_HOST.items():
+        adapter = get_http_adapter(
+            pool_connections=1,
+            pool_maxsize=pool_maxsize,
+            retries=retries,
+            backoff_factor=backoff_factor,
+        )
+        session.mount(f'http://{host}/', adapter)
+        session.mount(f'https://{host}/', adapter)
+
+    return session
+
+
+def get_http_session():
+    """
+    Return the requests Session shared by all the threads of the current
+    process. Its connections are kept alive and reused across requests.
+
+    A new Session is created in a forked process as connections cannot be
+    shared across processes.
+    """
+    pid = os.getpid()
+    session = _http_sessions.get(pid)
+    if session is None:
+        with _http_sessions_lock:
+            session = _http_sessions.get(pid)
+            if session is None:
+                _http_sessions.clear()
+                session = _http_sessions[pid] = make_http_session()
+    return session
+
+
 def fetch_http(uri, timeout=10):
     """
     Fetch and return the content from an HTTP uri as raw byte string.
@@ -215,24 +316,39 @@ def fetch_http(uri, timeout=10):
     return get_http_response(uri, timeout).content
 
 
-def get_http_response(uri, timeout=10):
+def get_http_response(uri, timeout=10, etag=None, last_modified=None):
     """
     Fetch and return the response object from an HTTP uri.
     `timeout` is a timeout with precedence over REQUESTS_ARGS settings.
+
+    If an `etag` or a `last_modified` validator from an earlier response is
+    provided, the request is conditional and a NotModified exception is
+    raised if the content did not change since then.
     """
-    requests_args = getattr(settings, 'REQUESTS_ARGS', {})
+    requests_args = dict(getattr(settings, 'REQUESTS_ARGS', {}))
     requests_args['timeout'] = timeout
 
     if not uri.lower().startswith('http'):
         raise Exception('get_http_response: Not an HTTP URI: %(uri)r' % locals())
 
+    headers = dict(requests_args.pop('headers', None) or {})
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    if headers:
+        requests_args['headers'] = headers
+
     try:
-        response = requests.get(uri, **requests_args)
+        response = get_http_session().get(uri, **requests_args)
     except (ConnectionError, InvalidSchema) as e:
         logger.error('get_http_response: Download failed for %(uri)r' % locals())
         raise
 
     status = response.status_code
+    if status == 304:
+        raise NotModified(uri)
+
     if status != 200:
         raise Exception('get_http_response: Download failed for %(uri)r '
                         'with %(status)r' % locals())
@@ -250,7 +366,7 @@ def get_package_sha1(package, field="repository_download_url"):
     download_url = getattr(package, field)
 
     # Download archive from URL and calculate sha1
-    response = requests.get(download_url)
+    response = get_http_session().get(download_url)
     if response:
         sha1_hash = hashlib.new('sha1', response.content)
         sha1 = sha1_hash.hexdigest()
@@ -262,7 +378,7 @@ def fetch_and_write_file_from_url(url):
     Fetches a file from the `url` and returns the location for the
     temporary file. Return None if the url is not reachable.
     """
-    response = requests.get(url)
+    response = get_http_session().get(url)
     if not response.ok:
         return None
 
@@ -330,6 +446,51 @@ def get_temp_file(file_name='data', extension='.file', dir_name=''):
     return location
 
 
+def save_uploaded_file(uploaded_file, file_name='data', extension='.file'):
+    """
+    Save the Django `uploaded_file` UploadedFile to a new temporary file and
+    return its location. The upload is not loaded in memory: an upload that
+    was already written to a temporary file is moved and other uploads are
+    copied by chunks.
+    """
+    location = get_temp_file(file_name=file_name, extension=extension)
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        file_move_safe(uploaded_file.temporary_file_path(), location)
+    else:
+        with open(location, 'wb') as f:
+            for chunk in uploaded_file.chunks():
+                f.write(chunk)
+    return location
+
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+def open_decompressed(location):
+    """
+    Return a text file object open for reading the file at `location`,
+    decompressing it on the fly if it is compressed with gzip or zstd.
+    """
+    with open(location, 'rb') as f:
+        magic = f.read(4)
+
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.open(location, 'rt', encoding='utf-8')
+
+    if magic == ZSTD_MAGIC:
+        if not zstandard:
+            raise Exception(
+                f'Cannot decompress zstd file: {location!r}: '
+                'the "zstandard" package is not installed.'
+            )
+        compressed = open(location, 'rb')
+        reader = zstandard.ZstdDecompressor().stream_reader(compressed, closefd=True)
+        return io.TextIOWrapper(reader, encoding='utf-8')
+
+    return open(location, encoding='utf-8')
+
+
 def extract_file(location):
     """
     Extract file at location returning the extracted location.
@@ -415,3 +576,239 @@ class MemorySavingQuerysetIterator(object):
 
     def next(self):
         return self._generator.next()
+
+
+def get_batches(iterable, batch_size):
+    """
+    Yield lists of up to `batch_size` items from `iterable`.
+    """
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
+def bulk_insert(model_class, objs, batch_size=5000):
+    """
+    Insert the list of `objs` instances of `model_class` in batches of up to
+    `batch_size` rows and return the number of rows actually inserted.
+
+    Rows conflicting with an existing row, such as a row inserted concurrently,
+    are skipped and not counted: each batch is inserted with an
+    INSERT ... ON CONFLICT DO NOTHING statement which reports the number of
+    rows it inserted, unlike ``bulk_create(ignore_conflicts=True)``.
+    """
+    opts = model_class._meta
+    fields = [field for field in opts.concrete_fields if not field.primary_key]
+    using = router.db_for_write(model_class)
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    table = quote_name(opts.db_table)
+    columns = ', '.join(quote_name(field.column) for field in fields)
+    row_placeholders = '(' + ', '.join(['%s'] * len(fields)) + ')'
+    # stay below the maximum number of query parameters of PostgreSQL
+    batch_size = min(batch_size, 65535 // len(fields))
+
+    inserted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(objs), batch_size):
+            batch = objs[start:start + batch_size]
+            params = [
+                field.get_db_prep_save(field.pre_save(obj, add=True), connection=connection)
+                for obj in batch
+                for field in fields
+            ]
+            values = ', '.join([row_placeholders] * len(batch))
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) VALUES {values} ON CONFLICT DO NOTHING',
+                params,
+            )
+            inserted += cursor.rowcount
+    return inserted
+
+
+class JSONStreamReader(object):
+    """
+    Read JSON values one at a time from a text file object, keeping only the
+    text of the value being decoded in memory.
+    """
+    whitespace = re.compile(r'[ \t\n\r]*')
+    delimiters = ' \t\n\r,:]}'
+    scalar_end = re.compile(r'[ \t\n\r,:\]}]')
+    structural = re.compile(r'["\[\]{}]')
+    string_special = re.compile(r'["\\]')
+    decoder = json.JSONDecoder()
+
+    def __init__(self, fileobj, read_size=1024 * 1024):
+        self.fileobj = fileobj
+        self.read_size = read_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def read(self):
+        """
+        Append the next chunk of the file to the buffer, dropping the consumed
+        text. Return False at the end of the file.
+        """
+        data = self.fileobj.read(self.read_size)
+        if not data:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """
+        Return the next non-whitespace character without consuming it, or an
+        empty string at the end of the file.
+        """
+        while True:
+            self.pos = self.whitespace.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.read():
+                return ''
+
+    def consume(self, character):
+        """
+        Consume the next non-whitespace `character` or raise a ValueError.
+        """
+        found = self.peek()
+        if found != character:
+            raise ValueError(f'Invalid JSON: expected {character!r} but found {found!r}')
+        self.pos += 1
+
+    def scan(self, keep=True):
+        """
+        Return the end position in the buffer of the next JSON value, reading
+        more of the file as needed. Only the strings and brackets of the value
+        are checked: the value is validated when decoded.
+
+        If `keep` is False, the text scanned is dropped from the buffer such
+        that a value of any size is skipped in constant memory.
+        """
+        first = self.peek()
+        if not first:
+            raise ValueError('Invalid JSON: expected a value but found the end of the file')
+
+        end = self.pos
+        if first not in '"[{':
+            # a number, true, false or null ends at the next delimiter
+            while not (match := self.scalar_end.search(self.buffer, end)):
+                end = len(self.buffer)
+                if not keep:
+                    self.pos = end
+                shift = self.pos
+                if not self.read():
+                    return len(self.buffer)
+                end -= shift
+            return match.start()
+
+        closing = []
+        in_string = False
+        while True:
+            if in_string:
+                match = self.string_special.search(self.buffer, end)
+                if match and match.group() == '"':
+                    in_string = False
+                    end = match.end()
+                    if not closing:
+                        return end
+                    continue
+                if match and match.end() < len(self.buffer):
+                    # skip the escaped character
+                    end = match.end() + 1
+                    continue
+                # keep a trailing backslash to skip the character it escapes
+                end = match.start() if match else len(self.buffer)
+            else:
+                match = self.structural.search(self.buffer, end)
+                if match:
+                    character = match.group()
+                    end = match.end()
+                    if character == '"':
+                        in_string = True
+                    elif character == '[':
+                        closing.append(']')
+                    elif character == '{':
+                        closing.append('}')
+                    elif not closing or closing.pop() != character:
+                        raise ValueError(f'Invalid JSON: unexpected {character!r}')
+                    elif not closing:
+                        return end
+                    continue
+                end = len(self.buffer)
+
+            if not keep:
+                self.pos = end
+            shift = self.pos
+            if not self.read():
+                raise ValueError('Invalid JSON: unexpected end of the file in a value')
+            end -= shift
+
+    def decode(self):
+        """
+        Return the next JSON value.
+        """
+        self.peek()
+        try:
+            value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            # A complete value is followed by a delimiter: otherwise this may
+            # be the start of a number split between two chunks.
+            if self.eof or (end < len(self.buffer) and self.buffer[end] in self.delimiters):
+                self.pos = end
+                return value
+        except json.JSONDecodeError:
+            pass
+
+        # The value may be incomplete: read up to its end once and decode it,
+        # rather than decoding again after each read.
+        end = self.scan()
+        value, self.pos = self.decoder.raw_decode(self.buffer[:end], self.pos)
+        return value
+
+    def skip(self):
+        """
+        Skip the next JSON value without decoding it.
+        """
+        self.pos = self.scan(keep=False)
+
+
+def iter_json_list_items(location, key, read_size=1024 * 1024):
+    """
+    Yield the items of the list value of `key` in the top-level JSON object of
+    the file at `location`, one at a time, without loading the whole file in
+    memory. Use this for large JSON files such as the scan results of a
+    package, where `key` is "files".
+
+    The other top-level values are skipped. The file can be compressed with
+    gzip or zstd.
+    """
+    with open_decompressed(location) as f:
+        reader = JSONStreamReader(f, read_size=read_size)
+        reader.consume('{')
+        if reader.peek() == '}':
+            return
+
+        while True:
+            name = reader.decode()
+            reader.consume(':')
+            if name == key and reader.peek() == '[':
+                reader.consume('[')
+                if reader.peek() == ']':
+                    reader.consume(']')
+                else:
+                    while True:
+                        yield reader.decode()
+                        if reader.peek() != ',':
+                            break
+                        reader.consume(',')
+                    reader.consume(']')
+            else:
+                reader.skip()
+
+            if reader.peek() != ',':
+                break
+            reader.consume(',')
+        reader.consume('}')
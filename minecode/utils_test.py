@@ -169,9 +169,10 @@ def to_os_native_path(path):
 
 class MockResponse:
 
-    def __init__(self, content, status_code):
+    def __init__(self, content, status_code, headers=None):
         self.content = content
         self.status_code = status_code
+        self.headers = headers or {}
 
 
 def mocked_requests_get(url, location):
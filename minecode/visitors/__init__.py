@@ -15,7 +15,7 @@ import os
 import pkgutil
 import tempfile
 
-from minecode.utils import fetch_http
+from minecode.utils import get_http_response
 from minecode.utils import get_temp_file
 
 
@@ -188,13 +188,29 @@ class HttpVisitor(Visitor):
     """
     Abstract base class for HTTP-based visitors. Subclasses must implement the
     get_uris() method and use a routing decorator for the URIs they can handle.
+
+    When the `etag` or `last_modified` validators of an earlier visit are set,
+    the fetch is a conditional request that raises a NotModified exception if
+    the content did not change. They are updated from the fetched response.
     """
+    etag = None
+    last_modified = None
+
     def fetch(self, uri, timeout=10):
         """
         Fetch and return the content found at a remote uri.
         `timeout` is a default timeout.
         """
-        return fetch_http(uri, timeout=timeout)
+        response = get_http_response(
+            uri,
+            timeout=timeout,
+            etag=self.etag,
+            last_modified=self.last_modified,
+        )
+        headers = getattr(response, 'headers', None) or {}
+        self.etag = headers.get('ETag')
+        self.last_modified = headers.get('Last-Modified')
+        return response.content
 
 
 class NonPersistentHttpVisitor(HttpVisitor):
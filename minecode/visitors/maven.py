@@ -8,8 +8,11 @@
 #
 
 from collections import namedtuple
+from collections import OrderedDict
+from datetime import timedelta
 from typing import Dict
 from urllib.parse import urlparse
+import copy
 import gzip
 import hashlib
 import io
@@ -17,9 +20,14 @@ import json
 import logging
 import os
 import re
+import struct
+import sys
+import threading
 
 from bs4 import BeautifulSoup
 from dateutil import tz
+from django.conf import settings
+from django.utils import timezone
 import arrow
 import requests
 
@@ -40,6 +48,7 @@ from minecode.visitors import java_stream
 from minecode.visitors import HttpVisitor
 from minecode.visitors import NonPersistentHttpVisitor
 from minecode.visitors import URI
+from minecode.utils import get_http_session
 from minecode.utils import validate_sha1
 from packagedb.models import make_relationship
 from packagedb.models import PackageContentType
@@ -95,7 +104,8 @@ class GzipFileWithTrailing(gzip.GzipFile):
 class MavenSeed(seed.Seeder):
 
     def get_seeds(self):
-        yield 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.gz'
+        # The properties visitor yields the full index only when needed and
+        # otherwise only the new incremental indexes
         yield 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.properties'
         # yield 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.457.gz'
         # yield 'http://jcenter.bintray.com/'
@@ -136,9 +146,10 @@ def get_pom_text(namespace, name, version, qualifiers={}, base_url=MAVEN_BASE_UR
     return response.text
 
 
-def fetch_parent(pom_text, base_url=MAVEN_BASE_URL):
+def get_parent_gav(pom_text):
     """
-    Return the parent pom text of `pom_text`, or None if `pom_text` has no parent.
+    Return a (namespace, name, version) tuple for the parent of the POM
+    `pom_text`, or None if `pom_text` has no parent.
     """
     if not pom_text:
         return
@@ -149,17 +160,179 @@ def fetch_parent(pom_text, base_url=MAVEN_BASE_URL):
         and pom.parent.artifact_id
         and pom.parent.version.version
     ):
-        parent_namespace = pom.parent.group_id
-        parent_name = pom.parent.artifact_id
-        parent_version = str(pom.parent.version.version)
-        parent_pom_text = get_pom_text(
+        return (
+            pom.parent.group_id,
+            pom.parent.artifact_id,
+            str(pom.parent.version.version),
+        )
+
+
+class CachedPOM:
+    """
+    A parent POM `text` cached in memory, with the `parent_gav` of its own
+    parent and the PackageData parsed from it on first use.
+    """
+
+    def __init__(self, text, parent_gav, fetched_date):
+        self.text = text
+        self.parent_gav = parent_gav
+        self.fetched_date = fetched_date
+        self._package = None
+
+    def get_package(self):
+        """
+        Return a new copy of the PackageData parsed from this POM text. The
+        copy can be updated without changing the cached PackageData.
+        """
+        if self._package is None:
+            self._package = _parse(
+                datasource_id='maven_pom',
+                package_type='maven',
+                primary_language='Java',
+                text=self.text,
+            )
+        return copy.deepcopy(self._package)
+
+
+# In-process LRU cache of CachedPOM keyed by (base_url, namespace, name, version)
+_parent_poms = OrderedDict()
+_parent_poms_lock = threading.Lock()
+
+
+def clear_parent_pom_cache():
+    """
+    Clear the in-process cache of parent POMs.
+    """
+    with _parent_poms_lock:
+        _parent_poms.clear()
+
+
+def is_expired(version, fetched_date):
+    """
+    Return True if a POM of `version` fetched on `fetched_date` should be
+    fetched again. Only SNAPSHOT versions can change once released.
+    """
+    if not version.endswith('-SNAPSHOT'):
+        return False
+    ttl = timedelta(seconds=settings.MINECODE_MAVEN_SNAPSHOT_POM_TTL)
+    return fetched_date + ttl < timezone.now()
+
+
+def get_parent_pom(namespace, name, version, base_url=MAVEN_BASE_URL):
+    """
+    Return a CachedPOM for the parent POM of the Maven package described by the
+    purl field arguments or None if it cannot be fetched.
+
+    The parent POMs are cached in the ParentPOM table, with a bounded LRU cache
+    of the most recently used parent POMs of this process in front.
+    """
+    from minecode.models import ParentPOM
+
+    key = (base_url, namespace, name, version)
+    with _parent_poms_lock:
+        cached_pom = _parent_poms.get(key)
+        if cached_pom:
+            if not is_expired(version, cached_pom.fetched_date):
+                _parent_poms.move_to_end(key)
+                return cached_pom
+            del _parent_poms[key]
+
+    parent_pom = ParentPOM.objects.filter(
+        repository_url=base_url,
+        namespace=namespace,
+        name=name,
+        version=version,
+    ).first()
+
+    if parent_pom and not is_expired(version, parent_pom.fetched_date):
+        cached_pom = CachedPOM(
+            text=parent_pom.text,
+            parent_gav=parent_pom.parent_gav,
+            fetched_date=parent_pom.fetched_date,
+        )
+    else:
+        pom_text = get_pom_text(
+            namespace=namespace,
+            name=name,
+            version=version,
+            qualifiers={},
+            base_url=base_url,
+        )
+        if not pom_text:
+            return
+
+        parent_gav = get_parent_gav(pom_text)
+        parent_namespace, parent_name, parent_version = parent_gav or (None, None, None)
+        parent_pom, _ = ParentPOM.objects.update_or_create(
+            repository_url=base_url,
+            namespace=namespace,
+            name=name,
+            version=version,
+            defaults=dict(
+                text=pom_text,
+                parent_namespace=parent_namespace,
+                parent_name=parent_name,
+                parent_version=parent_version,
+                fetched_date=timezone.now(),
+            ),
+        )
+        cached_pom = CachedPOM(
+            text=pom_text,
+            parent_gav=parent_gav,
+            fetched_date=parent_pom.fetched_date,
+        )
+
+    with _parent_poms_lock:
+        _parent_poms[key] = cached_pom
+        while len(_parent_poms) > settings.MINECODE_MAVEN_PARENT_POM_CACHE_SIZE:
+            _parent_poms.popitem(last=False)
+
+    return cached_pom
+
+
+def get_parent_poms(pom_text, base_url=MAVEN_BASE_URL):
+    """
+    Return a list of CachedPOM of the ancestors of the POM `pom_text`. The list
+    is ordered from newest ancestor to oldest. The list is empty is there is no
+    parent pom.
+
+    Only `pom_text` is parsed: the parents of the ancestors are cached.
+    """
+    parent_poms = []
+    seen = set()
+    parent_gav = get_parent_gav(pom_text)
+    # a POM cannot be its own ancestor
+    while parent_gav and parent_gav not in seen:
+        seen.add(parent_gav)
+        parent_namespace, parent_name, parent_version = parent_gav
+        parent_pom = get_parent_pom(
+            namespace=parent_namespace,
+            name=parent_name,
+            version=parent_version,
+            base_url=base_url,
+        )
+        if not parent_pom:
+            break
+        parent_poms.append(parent_pom)
+        parent_gav = parent_pom.parent_gav
+    return parent_poms
+
+
+def fetch_parent(pom_text, base_url=MAVEN_BASE_URL):
+    """
+    Return the parent pom text of `pom_text`, or None if `pom_text` has no parent.
+    """
+    parent_gav = get_parent_gav(pom_text)
+    if parent_gav:
+        parent_namespace, parent_name, parent_version = parent_gav
+        parent_pom = get_parent_pom(
             namespace=parent_namespace,
             name=parent_name,
             version=parent_version,
-            qualifiers={},
             base_url=base_url,
         )
-        return parent_pom_text
+        if parent_pom:
+            return parent_pom.text
 
 
 def get_ancestry(pom_text, base_url=MAVEN_BASE_URL):
@@ -167,15 +340,10 @@ def get_ancestry(pom_text, base_url=MAVEN_BASE_URL):
     Return a list of pom text of the ancestors of `pom`. The list is ordered
     from oldest ancestor to newest. The list is empty is there is no parent pom.
     """
-    ancestors = []
-    has_parent = True
-    while has_parent:
-        parent_pom_text = fetch_parent(pom_text=pom_text, base_url=base_url)
-        if not parent_pom_text:
-            has_parent = False
-        else:
-            ancestors.append(parent_pom_text)
-            pom_text = parent_pom_text
+    ancestors = [
+        parent_pom.text
+        for parent_pom in get_parent_poms(pom_text=pom_text, base_url=base_url)
+    ]
     return reversed(ancestors)
 
 
@@ -282,8 +450,10 @@ def map_maven_package(package_url, package_content, pipelines, priority=0, reind
         text=pom_text,
         base_url=base_url,
     )
-    ancestor_pom_texts = get_ancestry(pom_text=pom_text, base_url=base_url)
-    package = merge_ancestors(ancestor_pom_texts=ancestor_pom_texts, package=package)
+    # merge from the oldest ancestor to the newest, using the cached parsed
+    # ancestors rather than parsing their POM text again
+    for parent_pom in reversed(get_parent_poms(pom_text=pom_text, base_url=base_url)):
+        package = merge_parent(package, parent_pom.get_package())
 
     urls = get_urls(
         namespace=package_url.namespace,
@@ -728,12 +898,12 @@ def get_directory_links(url):
     return timestamps_by_directory_links
 
 
-def get_artifact_links(url):
+def get_artifact_links(url, timeout=10):
     """
     Return a list of absolute directory URLs of the hyperlinks from `url`
     """
     timestamps_by_artifact_links = []
-    response = requests.get(url)
+    response = get_http_session().get(url, timeout=timeout)
     if response:
         timestamps_by_artifact_links = create_absolute_urls_for_links(
             response.text, url=url, filter=filter_for_artifacts
@@ -753,21 +923,148 @@ def crawl_to_package(url, root_url):
         crawl_to_package(link, root_url)
 
 
-def crawl_maven_repo_from_root(root_url):
+def get_package_url_from_package_page_url(url, root_url):
     """
-    Given the `url` to a maven root, traverse the repo depth-first and add
-    packages to the import queue.
+    Return a PackageURL for the Maven package page at `url` in the Maven repo
+    at `root_url`, using the Maven repository layout where the path of a
+    package page is the groupId path followed by the artifactId.
+
+    >>> get_package_url_from_package_page_url('https://repo1.maven.org/maven2/net/shibboleth/parent/', 'https://repo1.maven.org/maven2')
+    PackageURL(type='maven', namespace='net.shibboleth', name='parent', version=None, qualifiers={}, subpath=None)
+    """
+    _, _, remaining_path = url.partition(root_url.rstrip('/'))
+    path_segments = [p for p in remaining_path.split('/') if p]
+    return PackageURL(
+        type='maven',
+        namespace='.'.join(path_segments[:-1]),
+        name=path_segments[-1],
+    )
+
+
+def crawl_page(crawlable_uri, text):
     """
-    crawl_to_package(root_url, root_url)
+    Process the `text` content of the directory page of a `crawlable_uri`
+    CrawlableURI: add a package page to the import queue, or queue the
+    directory pages linked from it for crawling.
+    """
+    from minecode.models import CrawlableURI
+    from minecode.models import ImportableURI
+
+    url = crawlable_uri.uri
+    root_url = crawlable_uri.root_uri
+
+    if check_if_package_page(collect_links(text)):
+        package_url = get_package_url_from_package_page_url(url, root_url)
+        importable_uri = ImportableURI.objects.insert(url, text, package_url)
+        if importable_uri:
+            logger.info(f'Inserted {url} into ImportableURI queue')
+        return
+
+    timestamps_by_directory_links = create_absolute_urls_for_links(
+        text, url=url, filter=filter_only_directories
+    )
+    # keep the trailing slash of directory URIs
+    timestamps_by_directory_links = {
+        f'{link.rstrip("/")}/': timestamp
+        for link, timestamp in timestamps_by_directory_links.items()
+    }
+    CrawlableURI.objects.insert_links(
+        timestamps_by_directory_links,
+        root_uri=root_url,
+        depth=crawlable_uri.depth + 1,
+    )
 
 
-def get_artifact_sha1(artifact_url):
+def fetch_page(url, timeout=10):
+    """
+    Return the text content of the page at `url` fetched with the shared HTTP
+    session.
+    """
+    response = get_http_session().get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.text
+
+
+def crawl_maven_repo_from_root(root_url, max_workers=8, batch_size=100, timeout=10):
+    """
+    Given the `url` to a maven root, traverse the repo breadth-first and add
+    packages to the import queue.
+
+    The pages left to crawl are queued as CrawlableURIs and each crawled page
+    is recorded as soon as it is processed such that an interrupted crawl
+    resumes where it stopped. Pages are fetched by batches of `batch_size`
+    with up to `max_workers` concurrent requests.
+
+    A new crawl starts from the root when there is nothing left to crawl and
+    skips the subtrees whose listing timestamp did not change since they were
+    last crawled. The pages that failed to be crawled are crawled again.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from concurrent.futures import as_completed
+    from minecode.models import CrawlableURI
+
+    root_url = f'{root_url.rstrip("/")}/'
+
+    reset_count = CrawlableURI.objects.reset_in_progress(root_url)
+    if reset_count:
+        logger.info(f'Resuming the crawl of {root_url}: {reset_count} interrupted URIs')
+
+    if not CrawlableURI.objects.get_requests(root_url).exists():
+        logger.info(f'Starting a new crawl of {root_url}')
+        # retry the pages that failed, wherever their parent page is unchanged
+        error_count = CrawlableURI.objects.reset_crawl_errors(root_url)
+        if error_count:
+            logger.info(f'Retrying {error_count} pages of {root_url} that failed')
+        CrawlableURI.objects.update_or_create(
+            uri=root_url,
+            defaults=dict(root_uri=root_url, depth=0, wip_date=None, crawled_date=None),
+        )
+
+    crawled_count = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            crawlable_uris = CrawlableURI.objects.get_next_batch(root_url, batch_size)
+            if not crawlable_uris:
+                break
+
+            futures = {
+                executor.submit(fetch_page, crawlable_uri.uri, timeout): crawlable_uri
+                for crawlable_uri in crawlable_uris
+            }
+            for future in as_completed(futures):
+                crawlable_uri = futures[future]
+                crawl_error = None
+                try:
+                    crawl_page(crawlable_uri, future.result())
+                except Exception as e:
+                    crawl_error = f'Failed to crawl {crawlable_uri.uri}: {e!r}'
+                    logger.error(crawl_error)
+
+                crawlable_uri.wip_date = None
+                crawlable_uri.crawled_date = timezone.now()
+                # a page that failed is crawled again by the next crawl
+                # that starts from the root
+                if crawl_error:
+                    crawlable_uri.crawled_timestamp = None
+                else:
+                    crawlable_uri.crawled_timestamp = crawlable_uri.listing_timestamp
+                crawlable_uri.has_crawl_error = bool(crawl_error)
+                crawlable_uri.crawl_error = crawl_error
+                crawlable_uri.save()
+                crawled_count += 1
+
+            logger.info(f'Crawled {crawled_count} pages of {root_url}')
+
+    return crawled_count
+
+
+def get_artifact_sha1(artifact_url, timeout=10):
     """
     Return the SHA1 value of the Maven artifact located at `artifact_url`.
     """
     sha1 = None
     artifact_sha1_url = f'{artifact_url}.sha1'
-    response = requests.get(artifact_sha1_url)
+    response = get_http_session().get(artifact_sha1_url, timeout=timeout)
     if response:
         sha1_contents = response.text.strip().split()
         sha1 = sha1_contents[0]
@@ -801,16 +1098,103 @@ def get_classifier_from_artifact_url(
     return classifier
 
 
+MAVEN_INDEX_BASE_URL = 'https://repo1.maven.org/maven2/.index/'
+
+
+def get_index_increments(properties, chain_id=None, last_incremental=None):
+    """
+    Return a list of the ids of the incremental indexes to process, oldest
+    first, given the `properties` mapping of a Nexus index properties file and
+    the `chain_id` and `last_incremental` id of the indexes processed earlier.
+
+    Return None if the full index must be processed instead: when nothing was
+    processed, when the chain of indexes was rebuilt with a new chain id, or
+    when some increments that follow `last_incremental` are not available
+    anymore.
+    """
+    if last_incremental is None or chain_id != properties.get('nexus.index.chain-id'):
+        return
+
+    increments = sorted(
+        int(increment)
+        for key, increment in properties.items()
+        if key.startswith('nexus.index.incremental-')
+    )
+    new_increments = [increment for increment in increments if increment > last_incremental]
+    if new_increments and new_increments[0] != last_incremental + 1:
+        return
+    return new_increments
+
+
+def get_index_state(properties, increments=None):
+    """
+    Return a mapping of the state of the indexes processed given the
+    `properties` mapping of a Nexus index properties file and the list of
+    `increments` ids processed, or None if the full index is processed.
+    """
+    last_incremental = properties.get('nexus.index.last-incremental')
+    if increments:
+        last_incremental = increments[-1]
+    return dict(
+        chain_id=properties.get('nexus.index.chain-id'),
+        last_incremental=last_incremental and int(last_incremental),
+        timestamp=properties.get('nexus.index.timestamp'),
+        # None when the full index is processed
+        increments=increments,
+    )
+
+
+def get_index_uri(increment_index=None):
+    """
+    Return the URI of the incremental index with the `increment_index` id or
+    of the full index if `increment_index` is None.
+    """
+    if increment_index is None:
+        return MAVEN_INDEX_BASE_URL + 'nexus-maven-repository-index.gz'
+    return MAVEN_INDEX_BASE_URL + f'nexus-maven-repository-index.{increment_index}.gz'
+
+
+def get_failed_indexes(increments):
+    """
+    Return a set of the ids of the incremental indexes in the `increments`
+    list that failed to be visited or mapped, with None standing for the full
+    index. Only the latest ResourceURI of each index URI is considered.
+    """
+    from minecode.models import ResourceURI
+
+    increments_by_uri = {get_index_uri(increment): increment for increment in increments}
+    errors_by_uri = {}
+    index_uris = (
+        ResourceURI.objects
+        .filter(uri__in=list(increments_by_uri))
+        .order_by('pk')
+        .values_list('uri', 'has_visit_error', 'has_map_error')
+    )
+    for uri, has_visit_error, has_map_error in index_uris:
+        errors_by_uri[uri] = has_visit_error or has_map_error
+
+    return {
+        increments_by_uri[uri]
+        for uri, has_error in errors_by_uri.items()
+        if has_error
+    }
+
+
 @visit_router.route('http://repo1\.maven\.org/maven2/\.index/nexus-maven-repository-index.properties')
 @visit_router.route('https://repo1\.maven\.org/maven2/\.index/nexus-maven-repository-index.properties')
 class MavenNexusPropertiesVisitor(NonPersistentHttpVisitor):
     """
     Fetch the property files, parse the create the URI for each increment index
+
+    The state of the indexes processed is saved as the data of the visited
+    properties URI such that the next visits yield only the new increments.
     """
 
     def get_uris(self, content):
         """
-        Parse a NEXUS index properties file and yield increment index URIs
+        Parse a NEXUS index properties file and return a list of the URIs of
+        the increment indexes that were not processed yet, or of the URI of the
+        full index if it must be processed.
         This file is a Java properties file with rows likes this:
             nexus.index.incremental-15=526
             nexus.index.incremental-14=527
@@ -818,17 +1202,69 @@ class MavenNexusPropertiesVisitor(NonPersistentHttpVisitor):
         Each value points to a fragment increamental index that has the same
         format as the bigger one.
         """
-
-        base_url = 'https://repo1.maven.org/maven2/.index/nexus-maven-repository-index.{index}.gz'
         with open(content) as config_file:
             properties = javaproperties.load(config_file) or {}
 
-        for key, increment_index in properties.items():
-            if key.startswith('nexus.index.incremental'):
-                yield URI(
-                    uri=base_url.format(index=increment_index),
-                    source_uri=self.uri,
-                )
+        previous_state = self.get_previous_state()
+        increments = get_index_increments(properties, **previous_state)
+        # NOTE: the state is computed here, before dumps() is called
+        self.state = get_index_state(properties, increments)
+
+        return [
+            URI(uri=get_index_uri(increment_index), source_uri=self.uri)
+            # None is the full index
+            for increment_index in ([None] if increments is None else increments)
+        ]
+
+    def get_previous_state(self):
+        """
+        Return the state mapping saved by the last successful visit of this
+        properties URI or an empty mapping.
+
+        The state is moved back to before the first index scheduled by the
+        last visit that failed to be visited or mapped, such that it is
+        processed again.
+        """
+        from minecode.models import ResourceURI
+
+        data = (
+            ResourceURI.objects
+            .filter(uri=self.uri, has_visit_error=False)
+            .exclude(data=None)
+            .order_by('-last_visit_date')
+            .values_list('data', flat=True)
+            .first()
+        )
+        try:
+            state = json.loads(data or '{}')
+        except ValueError:
+            return {}
+        if not isinstance(state, dict):
+            return {}
+
+        chain_id = state.get('chain_id')
+        last_incremental = state.get('last_incremental')
+
+        if 'increments' in state:
+            # the state moves forward only from the indexes processed: process
+            # again the indexes scheduled by the last visit that failed
+            increments = state['increments']
+            failed_indexes = get_failed_indexes([None] if increments is None else increments)
+            if None in failed_indexes:
+                return {}
+            if failed_indexes:
+                last_incremental = min(failed_indexes) - 1
+
+        return dict(
+            chain_id=chain_id,
+            last_incremental=last_incremental,
+        )
+
+    def dumps(self, content):
+        """
+        Return the state of the indexes processed as JSON.
+        """
+        return json.dumps(self.state)
 
 
 @visit_router.route(
@@ -1391,25 +1827,19 @@ def get_entries(location, fields=frozenset(ENTRY_FIELDS)):
             # FIXME: we do nothing with these two
             # NOTE: this reads 1+8=9 bytes of the stream
             _index_version, _last_modified = decode_index_header(jstream)
-            while True:
-                try:
-                    entry = decode_entry(jstream, fields)
-                    if TRACE_DEEP:
-                        if entry:
-                            keys_update(entry)
-                        entries_count += 1
 
-                    if entry:
-                        yield entry
+            for entry in decode_entries(nexus_index, fields):
+                if TRACE_DEEP:
+                    keys_update(entry)
+                    entries_count += 1
+                yield entry
 
-                except EOFError:
-                    if TRACE_DEEP:
-                        print('Index version: %(_index_version)r last_modified: %(_last_modified)r' % locals())
-                        print('Processed %(entries_count)d docs. Last entry: %(entry)r' % locals())
-                        print('Unique keys:')
-                        for k in sorted(keys):
-                            print(k)
-                    break
+            if TRACE_DEEP:
+                print('Index version: %(_index_version)r last_modified: %(_last_modified)r' % locals())
+                print('Processed %(entries_count)d docs. Last entry: %(entry)r' % locals())
+                print('Unique keys:')
+                for k in sorted(keys):
+                    print(k)
 
 
 def decode_index_header(jstream):
@@ -1511,6 +1941,85 @@ def decode_entry(jstream, fields=()):
     return entry
 
 
+unpack_entry_int = struct.Struct('>i').unpack_from
+unpack_entry_short = struct.Struct('>H').unpack_from
+
+
+def decode_entries(stream, fields=(), chunk_size=16 * 1024 * 1024):
+    """
+    Yield non-empty entry mappings of name -> values read from a Maven index
+    binary `stream` positioned after the index header. This is a faster
+    equivalent of calling decode_entry() until the end of the stream.
+
+    Only includes `fields` names. The values of the other fields are skipped
+    without being decoded.
+
+    The stream is read by chunks of `chunk_size` bytes and the entries are
+    decoded from these chunks with struct.unpack_from() rather than with one
+    stream read per field. An entry that spans two chunks is decoded again once
+    the next chunk is read. The decoding of field names is cached and the names
+    are interned as there are only a few distinct field names in an index.
+    """
+    has_fields = bool(fields)
+    names_by_bytes = {}
+
+    buf = b''
+    # the start of the entry being decoded
+    start = 0
+
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            # a truncated last entry is ignored, like decode_entry() does
+            return
+
+        buf = buf[start:] + chunk
+        buf_length = len(buf)
+        start = 0
+
+        try:
+            while True:
+                # the entry layout is documented in decode_entry()
+                field_count, = unpack_entry_int(buf, start)
+                pos = start + 4
+                entry = {}
+                for _ in range(field_count):
+                    # skip the one byte lucene indexing flags
+                    name_length, = unpack_entry_short(buf, pos + 1)
+                    pos += 3
+                    name_end = pos + name_length
+                    value_length, = unpack_entry_int(buf, name_end)
+                    pos = name_end + 4
+                    value_end = pos + value_length
+                    if value_end > buf_length:
+                        raise EOFError
+
+                    raw_name = buf[name_end - name_length:name_end]
+                    name = names_by_bytes.get(raw_name)
+                    if name is None:
+                        name = sys.intern(decode_modified_utf8(raw_name))
+                        names_by_bytes[raw_name] = name
+
+                    if not has_fields or name in fields:
+                        value = buf[pos:value_end]
+                        if value.isascii():
+                            value = value.decode('ascii')
+                        else:
+                            # NOTE: this is not the same as a UTF-8 decoding
+                            value = decode_modified_utf8(value)
+                        entry[name] = value
+
+                    pos = value_end
+
+                start = pos
+                if entry:
+                    yield entry
+
+        except (struct.error, EOFError):
+            # the entry at start is incomplete: read the next chunk
+            pass
+
+
 def java_time_ts(tm):
     """
     Convert a Java time long (as milliseconds since epoch) to an UTC ISO
@@ -1610,6 +2119,27 @@ u'dtddoc', u'it', u'java', u'javadoc', u'jdbc3', u'pom']
     """
 
 
+def _entries_benchmark(location, fields=frozenset(ENTRY_FIELDS)):
+    """
+    Print the number of entries decoded per second from a Gzipped Maven nexus
+    index data file at location and return a tuple of (entries count, entries
+    per second).
+    """
+    import time
+
+    start = time.perf_counter()
+    entries_count = 0
+    for entries_count, _entry in enumerate(get_entries(location, fields), 1):
+        if entries_count % 1000000 == 0:
+            print('number of entries:', entries_count)
+    duration = time.perf_counter() - start
+    entries_per_second = entries_count / duration if duration else 0
+
+    print('Total number of entries:', entries_count)
+    print(f'Decoded in {duration:.2f}s: {entries_per_second:.0f} entries/sec')
+    return entries_count, entries_per_second
+
+
 def _entries_stats(location):
     """
     Print entries stats from a Gzipped Maven nexus index data file
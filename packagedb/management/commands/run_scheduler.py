@@ -10,6 +10,7 @@
 from django_rq.management.commands import rqscheduler
 from packagedb.models import PackageWatch
 from packagedb.schedules import clear_zombie_watch_schedules
+from packagedb.schedules import schedule_scan_queue_statistics
 from packagedb.schedules import scheduled_job_exists
 
 
@@ -28,4 +29,5 @@ class Command(rqscheduler.Command):
     def handle(self, *args, **kwargs):
         clear_zombie_watch_schedules()
         init_watch_scheduled()
+        schedule_scan_queue_statistics()
         super(Command, self).handle(*args, **kwargs)
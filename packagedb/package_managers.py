@@ -10,6 +10,8 @@
 import dataclasses
 import json
 import logging
+import os
+import threading
 import traceback
 import xml.etree.ElementTree as ET
 from datetime import datetime
@@ -52,6 +54,28 @@ class VersionResponse:
     newer_versions: Set[str] = dataclasses.field(default_factory=set)
 
 
+# The HTTP session of the current process, keyed by process id
+_http_sessions = {}
+_http_sessions_lock = threading.Lock()
+
+
+def get_http_session():
+    """
+    Return the requests Session shared by all the threads of the current
+    process to fetch package versions. Its connections are kept alive and
+    reused across requests. A new Session is created in a forked process.
+    """
+    pid = os.getpid()
+    session = _http_sessions.get(pid)
+    if session is None:
+        with _http_sessions_lock:
+            session = _http_sessions.get(pid)
+            if session is None:
+                _http_sessions.clear()
+                session = _http_sessions[pid] = requests.Session()
+    return session
+
+
 def get_response(url, content_type="json", headers=None):
     """
     Fetch ``url`` and return its content as ``content_type`` which is one of
@@ -60,7 +84,7 @@ def get_response(url, content_type="json", headers=None):
     assert content_type in ("binary", "text", "json")
 
     try:
-        resp = requests.get(url=url, headers=headers)
+        resp = get_http_session().get(url=url, headers=headers)
     except:
         logger.error(traceback.format_exc())
         return
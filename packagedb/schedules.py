@@ -18,6 +18,9 @@ from packagedb.tasks import watch_new_packages
 log = logging.getLogger(__name__)
 scheduler = django_rq.get_scheduler()
 
+# The ID of the recurring job that refreshes the scan queue statistics
+SCAN_QUEUE_STATISTICS_JOB_ID = "minecode.scan_queue_statistics"
+
 
 def get_next_execution(watch_interval_days, last_watch_date):
     """
@@ -54,6 +57,29 @@ def schedule_watch(watch):
     return job._id
 
 
+def schedule_scan_queue_statistics():
+    """
+    Schedule a recurring job that refreshes the scan queue statistics every
+    MINECODE_SCAN_QUEUE_STATISTICS_INTERVAL seconds, replacing the job
+    scheduled earlier if any.
+    """
+    from django.conf import settings
+
+    if SCAN_QUEUE_STATISTICS_JOB_ID in scheduler:
+        clear_job(SCAN_QUEUE_STATISTICS_JOB_ID)
+
+    interval_in_seconds = settings.MINECODE_SCAN_QUEUE_STATISTICS_INTERVAL
+    job = scheduler.schedule(
+        scheduled_time=datetime.datetime.now(tz=datetime.timezone.utc),
+        func="minecode.tasks.refresh_scan_queue_statistics",
+        id=SCAN_QUEUE_STATISTICS_JOB_ID,
+        interval=interval_in_seconds,
+        result_ttl=interval_in_seconds,  # Remove job results after next run
+        repeat=None,  # None means repeat forever
+    )
+    return job._id
+
+
 def clear_job(job):
     """
     Take a job object or job ID as input
@@ -77,6 +103,8 @@ def clear_zombie_watch_schedules(logger=log):
     schedule_ids = PackageWatch.objects.all().values_list("schedule_work_id", flat=True)
     
     for job in scheduler.get_jobs():
+        if job._id == SCAN_QUEUE_STATISTICS_JOB_ID:
+            continue
         if job._id not in schedule_ids:
             logger.info(f"Deleting scheduled job {job}")
             clear_job(job)
@@ -27,6 +27,8 @@ from packagedb.package_managers import PackageVersion
 from packagedb.package_managers import PypiVersionAPI
 from packagedb.package_managers import RubyVersionAPI
 from packagedb.package_managers import VersionResponse
+from packagedb.package_managers import get_http_session
+from packagedb.package_managers import get_response
 from packagedb.package_managers import get_version_fetcher
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -62,6 +64,14 @@ class TestPackageManagers(TestCase):
         assert results == expected
 
 
+    def test_get_response_reuses_the_session_of_the_process(self):
+        assert get_http_session() is get_http_session()
+        with mock.patch.object(get_http_session(), "get") as mock_http_get:
+            mock_http_get.return_value = mock.Mock(status_code=200, text="versions")
+            assert get_response("https://example.com/1", content_type="text") == "versions"
+            assert get_response("https://example.com/2", content_type="text") == "versions"
+        assert mock_http_get.call_count == 2
+
     def test_nuget_extract_version_with_illformed_data(self):
         test_data = {"items": [{"items": [{"catalogEntry": {}}]}]}
         results = list(NugetVersionAPI.extract_versions(test_data))
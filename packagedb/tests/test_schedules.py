@@ -41,3 +41,19 @@ def test_get_next_execution():
 
         assert expected1 == get_next_execution(watch_interval_days1, last_watch_date1)
         assert expected2 == get_next_execution(watch_interval_days2, last_watch_date2)
+
+
+@patch("packagedb.schedules.scheduler")
+def test_schedule_scan_queue_statistics(mock_scheduler):
+    from packagedb.schedules import SCAN_QUEUE_STATISTICS_JOB_ID
+    from packagedb.schedules import schedule_scan_queue_statistics
+
+    mock_scheduler.__contains__.return_value = True
+    mock_scheduler.schedule.return_value._id = SCAN_QUEUE_STATISTICS_JOB_ID
+
+    assert SCAN_QUEUE_STATISTICS_JOB_ID == schedule_scan_queue_statistics()
+    mock_scheduler.cancel.assert_called_once_with(SCAN_QUEUE_STATISTICS_JOB_ID)
+    kwargs = mock_scheduler.schedule.call_args.kwargs
+    assert "minecode.tasks.refresh_scan_queue_statistics" == kwargs["func"]
+    assert SCAN_QUEUE_STATISTICS_JOB_ID == kwargs["id"]
+    assert kwargs["repeat"] is None
@@ -54,6 +54,47 @@ SCANCODEIO_API_KEY = env.str("SCANCODEIO_API_KEY", "")
 
 PURLDB_LOG_LEVEL = env.str("PURLDB_LOG_LEVEL", "INFO")
 
+# MineCode
+
+# The HTTP connection pools shared by the visitors of a process: the number of
+# hosts to keep pools for and the number of connections kept for each host.
+# The pool size can be set for some hosts, such as "repo1.maven.org=20"
+MINECODE_HTTP_POOL_CONNECTIONS = env.int("MINECODE_HTTP_POOL_CONNECTIONS", default=10)
+MINECODE_HTTP_POOL_MAXSIZE = env.int("MINECODE_HTTP_POOL_MAXSIZE", default=10)
+MINECODE_HTTP_POOL_MAXSIZE_BY_HOST = env.dict(
+    "MINECODE_HTTP_POOL_MAXSIZE_BY_HOST", cast={"value": int}, default={}
+)
+# The number of times a failed HTTP request is retried with an exponential
+# backoff of MINECODE_HTTP_BACKOFF_FACTOR seconds
+MINECODE_HTTP_RETRIES = env.int("MINECODE_HTTP_RETRIES", default=3)
+MINECODE_HTTP_BACKOFF_FACTOR = env.float("MINECODE_HTTP_BACKOFF_FACTOR", default=0.5)
+
+# The number of seconds between two refreshes of the scan queue statistics by
+# the scheduler
+MINECODE_SCAN_QUEUE_STATISTICS_INTERVAL = env.int(
+    "MINECODE_SCAN_QUEUE_STATISTICS_INTERVAL", default=60
+)
+
+# The number of Maven parent POMs cached in memory by a process, in front of
+# the ParentPOM table. SNAPSHOT parent POMs are fetched again once they are
+# older than MINECODE_MAVEN_SNAPSHOT_POM_TTL seconds.
+MINECODE_MAVEN_PARENT_POM_CACHE_SIZE = env.int(
+    "MINECODE_MAVEN_PARENT_POM_CACHE_SIZE", default=10000
+)
+MINECODE_MAVEN_SNAPSHOT_POM_TTL = env.int(
+    "MINECODE_MAVEN_SNAPSHOT_POM_TTL", default=24 * 60 * 60
+)
+
+# MatchCode
+
+# Load the approximate matching fingerprints in memory for faster lookups
+MATCHCODE_RESIDENT_INDEX = env.bool("MATCHCODE_RESIDENT_INDEX", default=False)
+
+# Refresh the in-memory fingerprints with the new database rows every N seconds
+MATCHCODE_RESIDENT_INDEX_REFRESH_INTERVAL = env.int(
+    "MATCHCODE_RESIDENT_INDEX_REFRESH_INTERVAL", default=60
+)
+
 # Application definition
 
 INSTALLED_APPS = (
@@ -318,6 +359,10 @@ RQ_QUEUES = {
     }
 }
 
+# Uploaded scan results are indexed on their own queue: the number of scans
+# indexed concurrently is bounded by the number of workers of this queue
+RQ_QUEUES['scan_results'] = dict(RQ_QUEUES['default'])
+
 PURLDB_ASYNC = env.bool("PURLDB_ASYNC", default=False)
 if not PURLDB_ASYNC:
     for queue_config in RQ_QUEUES.values():
@@ -21,3 +21,8 @@ It exposes the WSGI callable as a module-level variable named ``application``.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'purldb_project.settings')
 
 application = get_wsgi_application()
+
+# Load the resident matching indexes when the worker starts, if enabled
+from matchcode.index import load_resident_indexes  # NOQA
+
+load_resident_indexes()